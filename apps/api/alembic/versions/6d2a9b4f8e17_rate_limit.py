@@ -0,0 +1,37 @@
+"""rate limit
+
+Revision ID: 6d2a9b4f8e17
+Revises: 5c8f1a3e6d42
+Create Date: 2026-10-19 12:00:00.000000
+"""
+
+from pathlib import Path
+from alembic import op
+
+revision = "6d2a9b4f8e17"
+down_revision = "5c8f1a3e6d42"
+branch_labels = None
+depends_on = None
+
+slug = "rate_limit"
+
+
+def _read_sql(kind: str) -> str:
+    base_dir = Path(__file__).resolve().parent
+    path_with_slug = base_dir / "sql" / f"{revision}_{slug}_{kind}.sql"
+    if path_with_slug.exists():
+        return path_with_slug.read_text(encoding="utf-8")
+    path_simple = base_dir / "sql" / f"{revision}_{kind}.sql"
+    if path_simple.exists():
+        return path_simple.read_text(encoding="utf-8")
+    raise FileNotFoundError(
+        f"Expected SQL file not found. Looked for: {path_with_slug.name} or {path_simple.name} in 'versions/sql'."
+    )
+
+
+def upgrade() -> None:
+    op.execute(_read_sql("upgrade"))
+
+
+def downgrade() -> None:
+    op.execute(_read_sql("downgrade"))
@@ -0,0 +1,37 @@
+"""message keyset index
+
+Revision ID: 7e3c5a1d9b60
+Revises: 6d2a9b4f8e17
+Create Date: 2026-10-19 12:00:00.000000
+"""
+
+from pathlib import Path
+from alembic import op
+
+revision = "7e3c5a1d9b60"
+down_revision = "6d2a9b4f8e17"
+branch_labels = None
+depends_on = None
+
+slug = "message_keyset_index"
+
+
+def _read_sql(kind: str) -> str:
+    base_dir = Path(__file__).resolve().parent
+    path_with_slug = base_dir / "sql" / f"{revision}_{slug}_{kind}.sql"
+    if path_with_slug.exists():
+        return path_with_slug.read_text(encoding="utf-8")
+    path_simple = base_dir / "sql" / f"{revision}_{kind}.sql"
+    if path_simple.exists():
+        return path_simple.read_text(encoding="utf-8")
+    raise FileNotFoundError(
+        f"Expected SQL file not found. Looked for: {path_with_slug.name} or {path_simple.name} in 'versions/sql'."
+    )
+
+
+def upgrade() -> None:
+    op.execute(_read_sql("upgrade"))
+
+
+def downgrade() -> None:
+    op.execute(_read_sql("downgrade"))
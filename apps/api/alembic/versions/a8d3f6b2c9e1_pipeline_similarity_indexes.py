@@ -0,0 +1,37 @@
+"""pipeline trigram and hash indexes
+
+Revision ID: a8d3f6b2c9e1
+Revises: f1c4a8e2b7d3
+Create Date: 2026-10-19 12:00:00.000000
+"""
+
+from pathlib import Path
+from alembic import op
+
+revision = "a8d3f6b2c9e1"
+down_revision = "f1c4a8e2b7d3"
+branch_labels = None
+depends_on = None
+
+slug = "pipeline_similarity_indexes"
+
+
+def _read_sql(kind: str) -> str:
+    base_dir = Path(__file__).resolve().parent
+    path_with_slug = base_dir / "sql" / f"{revision}_{slug}_{kind}.sql"
+    if path_with_slug.exists():
+        return path_with_slug.read_text(encoding="utf-8")
+    path_simple = base_dir / "sql" / f"{revision}_{kind}.sql"
+    if path_simple.exists():
+        return path_simple.read_text(encoding="utf-8")
+    raise FileNotFoundError(
+        f"Expected SQL file not found. Looked for: {path_with_slug.name} or {path_simple.name} in 'versions/sql'."
+    )
+
+
+def upgrade() -> None:
+    op.execute(_read_sql("upgrade"))
+
+
+def downgrade() -> None:
+    op.execute(_read_sql("downgrade"))
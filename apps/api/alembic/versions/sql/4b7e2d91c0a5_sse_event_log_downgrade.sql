@@ -0,0 +1,6 @@
+-- =========================================================
+-- Downgrade for 4b7e2d91c0a5_sse_event_log_upgrade.sql
+-- =========================================================
+SET search_path TO api, public;
+
+DROP TABLE IF EXISTS sse_event CASCADE;
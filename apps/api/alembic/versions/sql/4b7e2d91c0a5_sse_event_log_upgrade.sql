@@ -0,0 +1,32 @@
+-- =========================================================
+-- Durable SSE event log (append-only, monthly range partitions)
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE TABLE IF NOT EXISTS sse_event
+(
+    channel    text        NOT NULL,
+    seq        bigint      NOT NULL,
+    event      text        NOT NULL,
+    data       jsonb       NOT NULL,
+    created_at timestamptz NOT NULL DEFAULT now(),
+    PRIMARY KEY (channel, seq, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Current and next month; later months are created by the retention worker.
+DO
+$$
+DECLARE
+    m  date;
+    lo date;
+BEGIN
+    FOR m IN SELECT generate_series(date_trunc('month', now()), date_trunc('month', now()) + interval '1 month', interval '1 month')::date
+        LOOP
+            lo := m;
+            EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF sse_event FOR VALUES FROM (%L) TO (%L)',
+                    'sse_event_' || to_char(lo, 'YYYYMM'), lo, (lo + interval '1 month')::date
+                    );
+        END LOOP;
+END
+$$;
@@ -0,0 +1,6 @@
+-- =========================================================
+-- Downgrade for 5c8f1a3e6d42_idempotency_key_upgrade.sql
+-- =========================================================
+SET search_path TO api, public;
+
+DROP TABLE IF EXISTS idempotency_key;
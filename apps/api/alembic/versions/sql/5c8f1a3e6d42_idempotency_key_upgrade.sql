@@ -0,0 +1,18 @@
+-- =========================================================
+-- Shared idempotency store (reservation + stored response)
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE TABLE IF NOT EXISTS idempotency_key
+(
+    key         text PRIMARY KEY,
+    body_hash   text        NOT NULL,
+    state       text        NOT NULL DEFAULT 'in_progress' CHECK (state IN ('in_progress', 'completed')),
+    status_code int         NULL,
+    headers     jsonb       NULL,
+    content     bytea       NULL,
+    media_type  text        NULL,
+    created_at  timestamptz NOT NULL DEFAULT now(),
+    expires_at  timestamptz NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_idempotency_key_expires_at ON idempotency_key (expires_at);
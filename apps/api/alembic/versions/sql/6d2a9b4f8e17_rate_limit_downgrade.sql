@@ -0,0 +1,6 @@
+-- =========================================================
+-- Downgrade for 6d2a9b4f8e17_rate_limit_upgrade.sql
+-- =========================================================
+SET search_path TO api, public;
+
+DROP TABLE IF EXISTS rate_limit;
@@ -0,0 +1,10 @@
+-- =========================================================
+-- Shared GCRA rate limiter state (one row per limited key)
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE TABLE IF NOT EXISTS rate_limit
+(
+    key text PRIMARY KEY,
+    tat double precision NOT NULL -- theoretical arrival time, epoch seconds
+);
@@ -0,0 +1,6 @@
+-- =========================================================
+-- Downgrade for 7e3c5a1d9b60_message_keyset_index_upgrade.sql
+-- =========================================================
+SET search_path TO api, public;
+
+DROP INDEX IF EXISTS ix_message_thread_created_id;
@@ -0,0 +1,6 @@
+-- =========================================================
+-- Composite index for keyset pagination of thread messages
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE INDEX IF NOT EXISTS ix_message_thread_created_id ON message (thread_id, created_at, id);
@@ -0,0 +1,7 @@
+-- =========================================================
+-- Downgrade for 8a4f6c2e1b73_flow_stats_upgrade.sql
+-- =========================================================
+SET search_path TO api, public;
+
+DROP INDEX IF EXISTS ix_flow_name_id;
+DROP TABLE IF EXISTS flow_stats;
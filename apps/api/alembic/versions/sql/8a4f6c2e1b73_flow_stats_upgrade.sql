@@ -0,0 +1,24 @@
+-- =========================================================
+-- Denormalized per-flow statistics for the flows listing
+-- Rows are maintained by the API in the same transaction as the
+-- pipeline/thread writes they count; existing flows are backfilled
+-- at API startup (FlowStatsRepo.rebuild(missing_only=True)).
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE TABLE IF NOT EXISTS flow_stats
+(
+    flow_id               uuid PRIMARY KEY REFERENCES flow (id) ON DELETE CASCADE,
+    pipeline_count        int         NOT NULL DEFAULT 0,
+    published_pipeline_id uuid        NULL REFERENCES pipeline (id) ON DELETE SET NULL,
+    published_version     text        NULL,
+    thread_count          int         NOT NULL DEFAULT 0,
+    open_thread_count     int         NOT NULL DEFAULT 0,
+    last_activity_at      timestamp   NOT NULL DEFAULT now()
+);
+
+-- keyset pagination: ORDER BY <sort column>, flow_id
+CREATE INDEX IF NOT EXISTS ix_flow_stats_last_activity ON flow_stats (last_activity_at, flow_id);
+CREATE INDEX IF NOT EXISTS ix_flow_stats_threads ON flow_stats (thread_count, flow_id);
+CREATE INDEX IF NOT EXISTS ix_flow_stats_pipelines ON flow_stats (pipeline_count, flow_id);
+CREATE INDEX IF NOT EXISTS ix_flow_name_id ON flow (name, id);
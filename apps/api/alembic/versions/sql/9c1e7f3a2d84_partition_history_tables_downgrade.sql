@@ -0,0 +1,53 @@
+-- =========================================================
+-- Downgrade for 9c1e7f3a2d84_partition_history_tables_upgrade.sql
+-- Rebuilds each partitioned table as a plain table keyed on id.
+-- Partitions already detached or archived by retention are not
+-- restored. The foreign keys dropped by the upgrade are not re-added:
+-- rows they would reject may have been written since.
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE OR REPLACE FUNCTION pg_temp.unpartition(tbl text) RETURNS void
+    LANGUAGE plpgsql AS
+$$
+DECLARE
+    old_tbl text   := tbl || '_partitioned';
+    old_oid oid    := to_regclass(tbl);
+    defs    text[] := '{}';
+    def     text;
+    r       record;
+BEGIN
+    IF old_oid IS NULL OR (SELECT relkind FROM pg_class WHERE oid = old_oid) <> 'p' THEN
+        RETURN;
+    END IF;
+    FOR r IN SELECT conname, pg_get_constraintdef(oid) AS condef
+             FROM pg_constraint
+             WHERE contype = 'f' AND conrelid = old_oid
+        LOOP
+            defs := defs || format('ALTER TABLE %I ADD CONSTRAINT %I %s', tbl, r.conname, r.condef);
+        END LOOP;
+    FOR r IN SELECT pg_get_indexdef(indexrelid) AS idxdef FROM pg_index WHERE indrelid = old_oid AND NOT indisunique
+        LOOP
+            defs := defs || regexp_replace(r.idxdef, ' ON (ONLY )?\S+ USING ', format(' ON %I USING ', tbl));
+        END LOOP;
+
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', tbl, old_tbl);
+    EXECUTE format('ALTER TABLE %I RENAME CONSTRAINT %I TO %I', old_tbl, tbl || '_pkey', old_tbl || '_pkey');
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', tbl, old_tbl);
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', tbl, old_tbl);
+    EXECUTE format('DROP TABLE %I CASCADE', old_tbl);
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I PRIMARY KEY (id)', tbl, tbl || '_pkey');
+    FOREACH def IN ARRAY defs
+        LOOP
+            EXECUTE def;
+        END LOOP;
+END
+$$;
+
+DROP INDEX IF EXISTS ix_agent_log_thread_created;
+DROP INDEX IF EXISTS ix_validation_issue_run;
+
+SELECT pg_temp.unpartition('validation_issue');
+SELECT pg_temp.unpartition('generation_run');
+SELECT pg_temp.unpartition('agent_log');
+SELECT pg_temp.unpartition('message');
@@ -0,0 +1,87 @@
+-- =========================================================
+-- Monthly range partitions for the append-mostly history tables
+-- (message, agent_log, generation_run, validation_issue).
+-- Existing tables are rebuilt as partitioned parents with one
+-- partition per month of data plus the next month; further
+-- months are created and expired by the API retention worker.
+-- The partition key has to be in the primary key, so it becomes
+-- (id, created_at) and foreign keys that pointed at id alone
+-- (message.parent_id, flow_summary.last_message_id,
+-- validation_issue.generation_run_id) are dropped.
+-- Defaults and CHECK constraints are carried over (LIKE ...
+-- INCLUDING DEFAULTS INCLUDING CONSTRAINTS).
+-- Tables that do not exist yet are created partitioned by the API.
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE OR REPLACE FUNCTION pg_temp.partition_monthly(tbl text) RETURNS void
+    LANGUAGE plpgsql AS
+$$
+DECLARE
+    old_tbl  text   := tbl || '_unpartitioned';
+    old_oid  oid    := to_regclass(tbl);
+    old_pk   text;
+    defs     text[] := '{}';
+    def      text;
+    r        record;
+    m        date;
+    lo_month date;
+BEGIN
+    IF old_oid IS NULL OR (SELECT relkind FROM pg_class WHERE oid = old_oid) = 'p' THEN
+        RETURN;
+    END IF;
+
+    FOR r IN SELECT conname, conrelid::regclass AS rel
+             FROM pg_constraint
+             WHERE contype = 'f' AND confrelid = old_oid AND conrelid <> old_oid
+        LOOP
+            EXECUTE format('ALTER TABLE %s DROP CONSTRAINT %I', r.rel, r.conname);
+        END LOOP;
+
+    -- outgoing foreign keys and secondary indexes are re-created on the new parent
+    FOR r IN SELECT conname, pg_get_constraintdef(oid) AS condef
+             FROM pg_constraint
+             WHERE contype = 'f' AND conrelid = old_oid AND confrelid <> old_oid
+        LOOP
+            defs := defs || format('ALTER TABLE %I ADD CONSTRAINT %I %s', tbl, r.conname, r.condef);
+        END LOOP;
+    FOR r IN SELECT pg_get_indexdef(indexrelid) AS idxdef FROM pg_index WHERE indrelid = old_oid AND NOT indisunique
+        LOOP
+            defs := defs || regexp_replace(r.idxdef, ' ON (ONLY )?\S+ USING ', format(' ON %I USING ', tbl));
+        END LOOP;
+
+    SELECT conname INTO old_pk FROM pg_constraint WHERE conrelid = old_oid AND contype = 'p';
+    EXECUTE format('ALTER TABLE %I RENAME TO %I', tbl, old_tbl);
+    IF old_pk IS NOT NULL THEN
+        EXECUTE format('ALTER TABLE %I RENAME CONSTRAINT %I TO %I', old_tbl, old_pk, old_tbl || '_pkey');
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS) PARTITION BY RANGE (created_at)', tbl, old_tbl);
+    EXECUTE format('ALTER TABLE %I ADD CONSTRAINT %I PRIMARY KEY (id, created_at)', tbl, tbl || '_pkey');
+
+    EXECUTE format('SELECT date_trunc(''month'', min(created_at))::date FROM %I', old_tbl) INTO lo_month;
+    FOR m IN SELECT generate_series(coalesce(lo_month, date_trunc('month', now())::date),
+                                    date_trunc('month', now()) + interval '1 month',
+                                    interval '1 month')::date
+        LOOP
+            EXECUTE format('CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           tbl || '_' || to_char(m, 'YYYYMM'), tbl, m, (m + interval '1 month')::date);
+        END LOOP;
+
+    EXECUTE format('INSERT INTO %I SELECT * FROM %I', tbl, old_tbl);
+    EXECUTE format('DROP TABLE %I', old_tbl);
+    FOREACH def IN ARRAY defs
+        LOOP
+            EXECUTE def;
+        END LOOP;
+END
+$$;
+
+-- generation_run before validation_issue so the run FK is gone before issues are copied
+SELECT pg_temp.partition_monthly('message');
+SELECT pg_temp.partition_monthly('agent_log');
+SELECT pg_temp.partition_monthly('generation_run');
+SELECT pg_temp.partition_monthly('validation_issue');
+
+CREATE INDEX IF NOT EXISTS ix_agent_log_thread_created ON agent_log (thread_id, created_at);
+CREATE INDEX IF NOT EXISTS ix_validation_issue_run ON validation_issue (generation_run_id);
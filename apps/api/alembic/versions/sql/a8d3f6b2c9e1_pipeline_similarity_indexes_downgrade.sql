@@ -0,0 +1,9 @@
+-- =========================================================
+-- Downgrade for a8d3f6b2c9e1_pipeline_similarity_indexes_upgrade.sql
+-- The pg_trgm extension is left installed; other objects may use it.
+-- =========================================================
+SET search_path TO api, public;
+
+DROP INDEX IF EXISTS ix_pipeline_content_text_trgm;
+DROP INDEX IF EXISTS ix_pipeline_flow_content_hash;
+ALTER TABLE pipeline DROP COLUMN IF EXISTS content_text;
@@ -0,0 +1,18 @@
+-- =========================================================
+-- Indexes behind SimilarityService.find_candidate:
+--   * (flow_id, content_hash) for the exact-duplicate lookup
+--   * pg_trgm GIN index on the generated content_text column for
+--     `content_text % :q` (threshold via pg_trgm.similarity_threshold)
+-- Adding a stored generated column rewrites pipeline once.
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public;
+
+ALTER TABLE pipeline
+    ADD COLUMN IF NOT EXISTS content_text text GENERATED ALWAYS AS (content::text) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_pipeline_flow_content_hash ON pipeline (flow_id, content_hash);
+CREATE INDEX IF NOT EXISTS ix_pipeline_content_text_trgm ON pipeline USING gin (content_text public.gin_trgm_ops);
+
+ANALYZE pipeline;
@@ -0,0 +1,32 @@
+-- =========================================================
+-- Downgrade for b5d2e8f4c1a6_jsonb_columns_upgrade.sql
+-- Drops the GIN indexes and turns the jsonb columns back into json.
+-- Key order and duplicate keys normalized away by jsonb are not
+-- recovered.
+-- =========================================================
+SET search_path TO api, public;
+
+DROP INDEX IF EXISTS ix_message_content_gin;
+DROP INDEX IF EXISTS ix_pipeline_connection_types;
+DROP INDEX IF EXISTS ix_pipeline_content_gin;
+
+CREATE OR REPLACE FUNCTION pg_temp.jsonb_to_json(tbl text, col text) RETURNS void
+    LANGUAGE plpgsql AS
+$$
+BEGIN
+    IF EXISTS (SELECT 1
+               FROM information_schema.columns
+               WHERE table_schema = current_schema()
+                 AND table_name = tbl
+                 AND column_name = col
+                 AND data_type = 'jsonb') THEN
+        EXECUTE format('ALTER TABLE %I ALTER COLUMN %I TYPE json USING %I::json', tbl, col, col);
+    END IF;
+END
+$$;
+
+SELECT pg_temp.jsonb_to_json('pipeline', 'content');
+SELECT pg_temp.jsonb_to_json('message', 'content');
+SELECT pg_temp.jsonb_to_json('generation_run', 'result');
+SELECT pg_temp.jsonb_to_json('flow_summary', 'content');
+SELECT pg_temp.jsonb_to_json('flow_summary', 'pinned');
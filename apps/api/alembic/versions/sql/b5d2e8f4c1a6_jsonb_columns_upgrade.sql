@@ -0,0 +1,46 @@
+-- =========================================================
+-- JSON document columns -> jsonb, plus GIN indexes for containment
+-- Columns: pipeline.content, message.content, generation_run.result,
+-- flow_summary.content, flow_summary.pinned. Tables or columns that
+-- are missing or already jsonb are skipped. jsonb_path_ops indexes
+-- answer @> only, which is all the repositories ask of them.
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE OR REPLACE FUNCTION pg_temp.json_to_jsonb(tbl text, col text) RETURNS void
+    LANGUAGE plpgsql AS
+$$
+BEGIN
+    IF EXISTS (SELECT 1
+               FROM information_schema.columns
+               WHERE table_schema = current_schema()
+                 AND table_name = tbl
+                 AND column_name = col
+                 AND data_type = 'json') THEN
+        EXECUTE format('ALTER TABLE %I ALTER COLUMN %I TYPE jsonb USING %I::jsonb', tbl, col, col);
+    END IF;
+END
+$$;
+
+SELECT pg_temp.json_to_jsonb('pipeline', 'content');
+SELECT pg_temp.json_to_jsonb('message', 'content');
+SELECT pg_temp.json_to_jsonb('generation_run', 'result');
+SELECT pg_temp.json_to_jsonb('flow_summary', 'content');
+SELECT pg_temp.json_to_jsonb('flow_summary', 'pinned');
+
+-- WHERE content @> '{...}'
+CREATE INDEX IF NOT EXISTS ix_pipeline_content_gin ON pipeline USING gin (content jsonb_path_ops);
+
+-- connections are keyed by name; index the array of their types so
+-- "flows using a kafka connection" does not need a wildcard key path
+CREATE INDEX IF NOT EXISTS ix_pipeline_connection_types
+    ON pipeline USING gin (jsonb_path_query_array(content, '$.connections.*.type') jsonb_path_ops);
+
+DO
+$$
+BEGIN
+    IF to_regclass('message') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS ix_message_content_gin ON message USING gin (content jsonb_path_ops);
+    END IF;
+END
+$$;
@@ -0,0 +1,6 @@
+-- =========================================================
+-- Downgrade for c2e9a4f7b1d8_idempotency_reservation_token_upgrade.sql
+-- =========================================================
+SET search_path TO api, public;
+
+ALTER TABLE idempotency_key DROP COLUMN IF EXISTS token;
@@ -0,0 +1,10 @@
+-- =========================================================
+-- Owner token for idempotency reservations: complete/release
+-- match on it, so a worker whose lock expired cannot overwrite
+-- or delete the reservation another worker took over.
+-- Rows reserved before this migration have no token; they
+-- expire within the lock TTL.
+-- =========================================================
+SET search_path TO api, public;
+
+ALTER TABLE idempotency_key ADD COLUMN IF NOT EXISTS token text NULL;
@@ -0,0 +1,6 @@
+-- =========================================================
+-- Downgrade for d7b3e9f1a4c6_sse_worker_sequence_upgrade.sql
+-- =========================================================
+SET search_path TO api, public;
+
+DROP SEQUENCE IF EXISTS sse_worker_seq;
@@ -0,0 +1,9 @@
+-- =========================================================
+-- Worker slots for SSE event seqs. Each API process that logs
+-- events takes nextval() at startup and puts it (mod 1024) in
+-- the low bits of every seq it issues, so two workers never
+-- write the same (channel, seq) to sse_event.
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE SEQUENCE IF NOT EXISTS sse_worker_seq;
@@ -0,0 +1,8 @@
+-- =========================================================
+-- Downgrade for e3a7c9d1f5b2_thread_archive_upgrade.sql
+-- Drops thread_archive. Archived threads are NOT moved back into
+-- message/agent_log; rehydrate them first if they must survive.
+-- =========================================================
+SET search_path TO api, public;
+
+DROP TABLE IF EXISTS thread_archive;
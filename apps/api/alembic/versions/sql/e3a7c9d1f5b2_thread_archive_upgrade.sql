@@ -0,0 +1,24 @@
+-- =========================================================
+-- Cold storage for closed threads (see src/archive.py).
+-- One row per archived thread: its messages and agent logs packed
+-- into a single zstd-compressed JSON document, kept in `blob` or in
+-- a file under API_ARCHIVE_DIR (`path`). The hot rows are deleted
+-- when the archive row is written.
+-- =========================================================
+SET search_path TO api, public;
+
+CREATE TABLE IF NOT EXISTS thread_archive (
+    thread_id       uuid PRIMARY KEY REFERENCES thread (id) ON DELETE CASCADE,
+    codec           varchar NOT NULL DEFAULT 'zstd',
+    storage         varchar NOT NULL,
+    blob            bytea,
+    path            varchar,
+    message_count   integer NOT NULL DEFAULT 0,
+    agent_log_count integer NOT NULL DEFAULT 0,
+    raw_bytes       bigint  NOT NULL DEFAULT 0,
+    stored_bytes    bigint  NOT NULL DEFAULT 0,
+    created_at      timestamp NOT NULL DEFAULT now()
+);
+
+-- blobs are already compressed; skip TOAST's pglz pass
+ALTER TABLE thread_archive ALTER COLUMN blob SET STORAGE EXTERNAL;
@@ -0,0 +1,6 @@
+-- =========================================================
+-- Downgrade for f1c4a8e2b7d3_pipeline_minhash_upgrade.sql
+-- =========================================================
+SET search_path TO api, public;
+
+ALTER TABLE pipeline DROP COLUMN IF EXISTS minhash;
@@ -0,0 +1,10 @@
+-- =========================================================
+-- MinHash signature per pipeline version (128 x uint32,
+-- little-endian), written by PipelineService.create_version and
+-- used for near-duplicate lookups (src/infrastructure/minhash.py).
+-- Existing rows stay NULL; the in-process index computes their
+-- signatures from content when a flow is loaded.
+-- =========================================================
+SET search_path TO api, public;
+
+ALTER TABLE pipeline ADD COLUMN IF NOT EXISTS minhash bytea;
@@ -0,0 +1,83 @@
+"""Time to write N validation issues for one run.
+
+Compares the previous path (one ORM ValidationIssue per issue, flushed
+together) with repositories.bulk.bulk_insert in executemany and COPY mode.
+COPY needs Postgres with psycopg; point --dsn at a scratch database (the
+validation_issue table and its current partition are created if missing,
+and every round is rolled back).
+
+    python -m benchmarks.bench_bulk_insert [--issues 1000] [--rounds 5] [--dsn postgresql+psycopg://...]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.models import ValidationIssue
+from src.repositories import bulk
+from src.repositories.runs_repo import _issue_rows
+
+RUN_ID = "00000000-0000-0000-0000-0000000000be"
+
+
+def _issues(n: int):
+    return [{"path": f"/steps/{i}/type", "code": "enum", "severity": "error",
+             "message": f"'x{i}' is not one of ['http', 'sql', 'python']"} for i in range(n)]
+
+
+def _orm(db: Session, issues) -> None:
+    db.add_all([ValidationIssue(**row) for row in _issue_rows(RUN_ID, issues)])
+    db.flush()
+
+
+def _bulk(db: Session, issues) -> None:
+    bulk.bulk_insert(db, ValidationIssue.__table__, _issue_rows(RUN_ID, issues))
+
+
+def _time(engine, fn, issues, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds + 1):
+        with Session(engine) as db:
+            t0 = time.perf_counter()
+            fn(db, issues)
+            samples.append(time.perf_counter() - t0)
+            db.rollback()
+    return statistics.median(samples[1:])  # first round warms the connection and caches
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--issues", type=int, default=1000)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--dsn", default=os.getenv("API_BENCH_DSN", "sqlite://"))
+    args = ap.parse_args()
+
+    engine = create_engine(args.dsn)
+    ValidationIssue.__table__.create(engine, checkfirst=True)
+    if engine.dialect.name == "postgresql":
+        from src.infrastructure.partitions import ensure_monthly_partitions
+        with Session(engine) as db:
+            ensure_monthly_partitions(db, "validation_issue", months_ahead=0)
+            db.commit()
+
+    issues = _issues(args.issues)
+    modes = [("orm (before)", _orm, None), ("executemany", _bulk, 0)]
+    if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg":
+        modes.append(("copy", _bulk, 1))
+    baseline = None
+    for name, fn, copy_min in modes:
+        if copy_min is not None:
+            settings.API_BULK_COPY_MIN_ROWS = copy_min
+        t = _time(engine, fn, issues, args.rounds)
+        baseline = baseline or t
+        print(f"{name:14s} {args.issues} issues: {t * 1000:8.1f} ms  ({baseline / t:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
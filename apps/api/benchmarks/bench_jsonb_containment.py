@@ -0,0 +1,107 @@
+"""Find the pipelines of one flow that use a given connection type.
+
+Compares loading every pipeline of the flow and filtering content in Python
+(what callers had to do with json columns) against the JSONB containment
+helpers on PipelineRepo, which the GIN indexes serve. Needs Postgres: point
+--dsn at a scratch database; the pipeline table and the tables it
+references are created in a throwaway schema that is dropped afterwards.
+
+    python -m benchmarks.bench_jsonb_containment [--pipelines 100000] [--flows 50] [--rounds 5] --dsn postgresql+psycopg://...
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import create_engine, event, select, text
+from sqlalchemy.orm import Session
+
+from src.models import Flow, Pipeline, SchemaDef
+from src.repositories import bulk
+from src.repositories.pipeline_repo import PipelineRepo
+
+SCHEMA = "bench_jsonb"
+TYPES = ["http", "postgres", "s3", "kafka", "sftp", "redis"]
+
+
+def _content(rng: random.Random) -> dict:
+    conns = {f"c{i}": {"type": rng.choice(TYPES), "options": {"retries": rng.randint(0, 5)}}
+             for i in range(rng.randint(1, 4))}
+    steps = [{"id": f"s{i}", "type": rng.choice(["map", "filter", "join"])} for i in range(rng.randint(2, 8))]
+    return {"connections": conns, "steps": steps, "meta": {"owner": f"team{rng.randint(0, 9)}"}}
+
+
+def _seed(db: Session, n: int, flows: int) -> list[str]:
+    rng = random.Random(7)
+    flow_ids = [str(uuid.uuid4()) for _ in range(flows)]
+    bulk.bulk_insert(db, Flow.__table__, [{"id": f, "slug": f"bench-{i}", "name": f"bench {i}", "meta": {}}
+                                          for i, f in enumerate(flow_ids)])
+    rows = [{"id": str(uuid.uuid4()), "flow_id": flow_ids[i % flows], "version": f"1.0.{i}",
+             "schema_version": "1.0.0", "status": "draft", "is_published": False, "content": _content(rng)}
+            for i in range(n)]
+    bulk.bulk_insert(db, Pipeline.__table__, rows)
+    db.execute(text("ANALYZE flow; ANALYZE pipeline"))
+    return flow_ids
+
+
+def _client_side(db: Session, flow_id: str, conn_type: str) -> list:
+    rows = db.execute(select(Pipeline).where(Pipeline.flow_id == flow_id)).scalars().all()
+    return [p for p in rows if any(c.get("type") == conn_type for c in (p.content.get("connections") or {}).values())]
+
+
+def _containment(db: Session, flow_id: str, conn_type: str) -> list:
+    return PipelineRepo(db).with_connection_type(flow_id, conn_type)
+
+
+def _time(engine, fn, flow_ids, rounds: int) -> tuple[float, int]:
+    samples, found = [], 0
+    for r in range(rounds + 1):
+        with Session(engine) as db:
+            t0 = time.perf_counter()
+            found = sum(len(fn(db, f, "kafka")) for f in flow_ids[:10])
+            samples.append(time.perf_counter() - t0)
+    return statistics.median(samples[1:]), found  # first round warms the connection and caches
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pipelines", type=int, default=100_000)
+    ap.add_argument("--flows", type=int, default=50)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--dsn", default=os.getenv("API_BENCH_DSN"))
+    args = ap.parse_args()
+    if not args.dsn or not args.dsn.startswith("postgresql"):
+        ap.error("a Postgres --dsn (or API_BENCH_DSN) is required")
+
+    engine = create_engine(args.dsn)
+
+    @event.listens_for(engine, "connect")
+    def _search_path(dbapi_conn, _):
+        with dbapi_conn.cursor() as cur:
+            cur.execute(f"SET search_path TO {SCHEMA}, public")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    try:
+        for model in (Flow, SchemaDef, Pipeline):
+            model.__table__.create(engine)
+        with Session(engine) as db:
+            flow_ids = _seed(db, args.pipelines, args.flows)
+            db.commit()
+        baseline = None
+        for name, fn in (("client-side (before)", _client_side), ("jsonb @> + gin", _containment)):
+            t, found = _time(engine, fn, flow_ids, args.rounds)
+            baseline = baseline or t
+            print(f"{name:22s} 10 flows, {found} matches: {t * 1000:8.1f} ms  ({baseline / t:4.1f}x)")
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Request throughput through the middleware stack on a trivial endpoint.
+
+Compares the current pure-ASGI stack with an equivalent four-layer
+BaseHTTPMiddleware stack (the previous implementation style).
+
+    python -m benchmarks.bench_middleware [--requests 5000]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+import httpx
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from src.infrastructure.idempotency_store import MemoryIdempotencyStore
+from src.middleware.auth import AuthMiddleware
+from src.middleware.idempotency import IdempotencyMiddleware
+from src.middleware.limits import SizeLimitMiddleware
+from src.middleware.metrics import MetricsMiddleware
+
+
+class _Passthrough(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        return await call_next(request)
+
+
+def _app(stack: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/ping")
+    async def ping():
+        return {"ok": True}
+
+    if stack == "asgi":
+        app.add_middleware(SizeLimitMiddleware, max_bytes=1_048_576)
+        app.add_middleware(IdempotencyMiddleware, store=MemoryIdempotencyStore())
+        app.add_middleware(MetricsMiddleware)
+        app.add_middleware(AuthMiddleware, token_env=None)
+    elif stack == "base":
+        for _ in range(4):
+            app.add_middleware(_Passthrough)
+    return app
+
+
+async def _run(stack: str, n: int, keyed: bool) -> float:
+    transport = httpx.ASGITransport(app=_app(stack))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for i in range(50):  # warm-up
+            await client.post("/ping", json={})
+        t0 = time.perf_counter()
+        for i in range(n):
+            headers = {"Idempotency-Key": f"k{i}"} if keyed else {}
+            await client.post("/ping", json={"i": i}, headers=headers)
+        return n / (time.perf_counter() - t0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=5000)
+    args = ap.parse_args()
+    for stack in ("none", "base", "asgi"):
+        for keyed in (False, True):
+            if keyed and stack != "asgi":
+                continue
+            rps = asyncio.run(_run(stack, args.requests, keyed))
+            label = f"{stack}{' +idempotency-key' if keyed else ''}"
+            print(f"{label:<24} {rps:>10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Rank a flow's pipelines against a near-copy of one of them.
+
+Seeds one flow per size (10, 1k and 100k pipelines by default) with DSL
+documents built from the v1.0.0 schema vocabulary. Each query is an edited
+copy of a random pipeline: a renamed stage, a changed parameter and a new
+description. Recall@k is the share of queries whose source pipeline is in
+the top k.
+
+The in-process TF-IDF index (src.infrastructure.similarity_index) always
+runs, followed by its MinHash/LSH near-duplicate lookup at --near-dup
+(the synthetic documents are small, so three edits already cost about
+0.2 Jaccard) and by the batch path behind POST /similarity/batch: all
+probes scored in one search_many() call, reported per item. With --dsn
+pointing at a Postgres database where pg_trgm can be installed, the pg_trgm
+paths run as well: a full similarity() scan of the flow, and the indexed
+`content_text %` query SimilarityService uses with
+API_SIMILARITY_BACKEND=trgm (at --trgm-threshold). Tables are created in a
+throwaway schema that is dropped afterwards.
+
+    python -m benchmarks.bench_similarity_index [--sizes 10,1000,100000] [--queries 50] [--k 5] [--dsn postgresql+psycopg://...]
+"""
+from __future__ import annotations
+
+import argparse
+import copy
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+from sqlalchemy import create_engine, event, func, select, text
+from sqlalchemy.orm import Session
+
+from src.infrastructure import fingerprint
+from src.infrastructure.similarity_index import FlowIndex, vectorize
+from src.models import Flow, Pipeline, SchemaDef
+from src.repositories import bulk
+from src.services.similarity_service import _trgm_stmt
+
+SCHEMA = "bench_similarity"
+TRIGGERS = ["manual", "interval", "cron", "scheduleWindow", "event", "approval", "nlp.intent", "onBackpressure"]
+SOURCES = ["http.webhook", "sse.subscribe", "websocket.subscribe", "kafka.subscribe", "mqtt.subscribe",
+           "redis.stream.read", "eventlog.subscribe", "ros2.subscribe", "db.listen"]
+ACTIONS = ["http.request", "websocket.send", "kafka.publish", "mqtt.publish", "redis.stream.append",
+           "eventlog.append", "ros2.publish", "ros2.service", "db.query", "db.upsert", "media.pull",
+           "media.push", "ai.generate", "fn.invoke"]
+CONNECTIONS = ["http", "websocket", "sse", "kafka", "mqtt", "redis", "eventlog", "ros2", "postgres", "s3"]
+WORDS = ("order payment invoice sensor device user account shipment alert report metric camera robot "
+         "ticket email audit price stock review session").split()
+
+
+def _document(rng: random.Random) -> dict:
+    noun = lambda: rng.choice(WORDS)
+    conns = {f"{noun()}_{i}": {"type": rng.choice(CONNECTIONS), "url": f"https://{noun()}.example/{noun()}"}
+             for i in range(rng.randint(1, 3))}
+    sources = [{"id": f"src_{noun()}_{i}", "type": rng.choice(SOURCES), "connectionRef": rng.choice(list(conns)),
+                "topic": f"{noun()}.{noun()}"} for i in range(rng.randint(1, 3))]
+    actions = [{"id": f"act_{noun()}_{i}", "type": rng.choice(ACTIONS), "connectionRef": rng.choice(list(conns)),
+                "table": f"{noun()}_{noun()}", "retry": {"maxAttempts": rng.randint(1, 5)}}
+               for i in range(rng.randint(1, 4))]
+    rules = [{"id": f"rule_{i}", "when": f"event.{noun()} > {rng.randint(1, 100)}",
+              "do": [{"id": f"do_{i}", "type": rng.choice(ACTIONS)}]} for i in range(rng.randint(1, 3))]
+    return {
+        "version": "3.0",
+        "meta": {"name": f"{noun()} {noun()} sync", "description": " ".join(rng.choices(WORDS, k=8))},
+        "connections": conns,
+        "sources": sources,
+        "actions": actions,
+        "pipelines": [{"id": f"pl_{noun()}", "sources": [s["id"] for s in sources],
+                       "triggers": [{"type": rng.choice(TRIGGERS)}], "rules": rules}],
+    }
+
+
+def _edit(doc: dict, rng: random.Random) -> dict:
+    """Near-duplicate: rename a stage, change a parameter, rewrite the description."""
+    out = copy.deepcopy(doc)
+    out["actions"][0]["id"] = f"act_{rng.choice(WORDS)}_renamed"
+    out["actions"][0]["retry"]["maxAttempts"] += 1
+    out["meta"]["description"] = " ".join(rng.choices(WORDS, k=8))
+    return out
+
+
+def _corpus(size: int, queries: int, seed: int) -> Tuple[List[Tuple[str, dict]], List[Tuple[str, str]]]:
+    rng = random.Random(seed)
+    docs = [(str(uuid.uuid4()), _document(rng)) for _ in range(size)]
+    probes = [(pid, json.dumps(_edit(doc, rng))) for pid, doc in rng.sample(docs, min(queries, size))]
+    return docs, probes
+
+
+def _measure(search: Callable[[str], List[str]], probes: List[Tuple[str, str]], k: int) -> Dict[str, float]:
+    samples, at1, atk = [], 0, 0
+    for expected, query in probes:
+        t0 = time.perf_counter()
+        ranked = search(query)
+        samples.append(time.perf_counter() - t0)
+        at1 += ranked[:1] == [expected]
+        atk += expected in ranked[:k]
+    samples.sort()
+    return {"median_ms": statistics.median(samples) * 1000, "p95_ms": samples[int(0.95 * (len(samples) - 1))] * 1000,
+            "recall@1": at1 / len(probes), f"recall@{k}": atk / len(probes)}
+
+
+def _report(name: str, size: int, stats: Dict[str, float], extra: str = "") -> None:
+    recall = "  ".join(f"{k} {v:.2f}" for k, v in stats.items() if k.startswith("recall"))
+    print(f"{name:9s} {size:>7} pipelines  median {stats['median_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  {recall}{extra}")
+
+
+def _run_index(docs, probes, k: int, dim: int, near_dup: float) -> None:
+    index = FlowIndex(dim)
+    t0 = time.perf_counter()
+    index.add_many((pid, "1.0.0", doc, None) for pid, doc in docs)
+    build = time.perf_counter() - t0
+    stats = _measure(lambda q: [h.pipeline_id for h in index.search(q, k)], probes, k)
+    mb = index._tf.nbytes / 2**20
+    _report("index", len(docs), stats, f"  (build {build:.2f} s, {mb:.1f} MiB)")
+    stats = _measure(lambda q: [h.pipeline_id for h in index.near_duplicates(json.loads(q), near_dup, k)], probes, k)
+    _report("minhash", len(docs), stats)
+
+    t0 = time.perf_counter()
+    queries = np.stack([vectorize(q, dim) for _, q in probes])
+    shapes = np.stack([fingerprint.fingerprint(json.loads(q)) for _, q in probes])
+    results = index.search_many(queries, shapes, np.ones(len(probes), dtype=bool), k, shape_weight=0.3)
+    per_item = (time.perf_counter() - t0) / len(probes) * 1000
+    ranked = [[h.pipeline_id for h in hits] for hits in results]
+    stats = {"median_ms": per_item, "p95_ms": per_item,
+             "recall@1": sum(r[:1] == [e] for (e, _), r in zip(probes, ranked)) / len(probes),
+             f"recall@{k}": sum(e in r[:k] for (e, _), r in zip(probes, ranked)) / len(probes)}
+    _report("batch", len(docs), stats, f"  ({len(probes)} items in one pass)")
+
+
+def _run_trgm(engine, docs, probes, k: int, threshold: float) -> None:
+    flow_id = str(uuid.uuid4())
+    with Session(engine) as db:
+        bulk.bulk_insert(db, Flow.__table__, [{"id": flow_id, "slug": flow_id, "name": "bench", "meta": {}}])
+        bulk.bulk_insert(db, Pipeline.__table__, [
+            {"id": pid, "flow_id": flow_id, "version": f"1.0.{i}", "schema_version": "1.0.0", "status": "draft",
+             "is_published": False, "content": doc} for i, (pid, doc) in enumerate(docs)])
+        db.execute(text("ANALYZE pipeline"))
+        db.commit()
+
+    def scan(query: str) -> List[str]:
+        # every row of the flow scored by similarity()
+        with Session(engine) as db:
+            return list(db.execute(text(
+                "SELECT id::text FROM pipeline WHERE flow_id = :f ORDER BY similarity(content_text, :q) DESC LIMIT :k"
+            ), {"f": flow_id, "q": query[:4000], "k": k}).scalars())
+
+    def indexed(query: str) -> List[str]:
+        with Session(engine) as db:
+            db.execute(select(func.set_config("pg_trgm.similarity_threshold", str(threshold), True)))
+            return [str(r.id) for r in db.execute(_trgm_stmt(flow_id, query[:4000], k))]
+
+    scan(probes[0][1])  # warm the connection
+    _report("trgm scan", len(docs), _measure(scan, probes, k))
+    _report("trgm %", len(docs), _measure(indexed, probes, k))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10,1000,100000")
+    ap.add_argument("--queries", type=int, default=50)
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--near-dup", type=float, default=0.6)
+    ap.add_argument("--trgm-threshold", type=float, default=0.3)
+    ap.add_argument("--dsn", default=os.getenv("API_BENCH_DSN"))
+    args = ap.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    engine = None
+    if args.dsn and args.dsn.startswith("postgresql"):
+        engine = create_engine(args.dsn)
+
+        @event.listens_for(engine, "connect")
+        def _search_path(dbapi_conn, _):
+            with dbapi_conn.cursor() as cur:
+                cur.execute(f"SET search_path TO {SCHEMA}, public")
+
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        for model in (Flow, SchemaDef, Pipeline):
+            model.__table__.create(engine)  # pipeline: content_text and its trigram index come with it
+    else:
+        print("no Postgres --dsn: pg_trgm path skipped")
+    try:
+        for size in sizes:
+            docs, probes = _corpus(size, args.queries, seed=size)
+            _run_index(docs, probes, args.k, args.dim, args.near_dup)
+            if engine is not None:
+                _run_trgm(engine, docs, probes, args.k, args.trgm_threshold)
+    finally:
+        if engine is not None:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+
+
+if __name__ == "__main__":
+    main()
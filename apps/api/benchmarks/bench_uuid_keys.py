@@ -0,0 +1,103 @@
+"""Insert throughput on message and agent_log with random (v4) vs time-ordered (v7) keys.
+
+Each round inserts --rows rows in committed batches of --batch into an empty
+table, so the primary-key index grows the way it does in production: v4 keys
+land on random leaf pages, v7 keys append to the right edge. On Postgres the
+final primary-key index size is printed as well (page splits leave it larger).
+--dsn should point at a scratch database; the tables are created in a
+throwaway schema that is dropped afterwards.
+
+    python -m benchmarks.bench_uuid_keys [--rows 200000] [--batch 1000] [--dsn postgresql+psycopg://...]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+import uuid
+from datetime import UTC, datetime
+
+from sqlalchemy import create_engine, event, insert, text
+from sqlalchemy.orm import Session
+
+from src.database import _search_path
+from src.ids import id_time, new_id
+from src.models import AgentLog, Message
+
+SCHEMA = "bench_uuid_keys"
+THREAD = "bbbbbbbb-0000-0000-0000-0000000000be"
+FLOW = "ffffffff-0000-0000-0000-0000000000be"
+
+
+def _v4() -> str:
+    return str(uuid.uuid4())
+
+
+def _rows(table, make_id, n: int):
+    for i in range(n):
+        row_id = make_id()
+        created_at = id_time(row_id) or datetime.now(UTC).replace(tzinfo=None)
+        if table is Message.__table__:
+            yield {"id": row_id, "created_at": created_at, "thread_id": THREAD, "role": "user", "format": "text",
+                   "content": {"text": f"message {i}"}}
+        else:
+            yield {"id": row_id, "created_at": created_at, "thread_id": THREAD, "flow_id": FLOW, "level": "info",
+                   "event": "llm:request", "data": {"i": i}}
+
+
+def _engine(dsn: str):
+    if dsn.startswith("sqlite"):
+        return create_engine("sqlite://")
+    engine = create_engine(dsn)
+    event.listen(engine, "connect", _search_path(SCHEMA))
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    return engine
+
+
+def _run(dsn: str, model, make_id, rows: int, batch: int) -> tuple[float, int | None]:
+    engine = _engine(dsn)
+    table = model.__table__
+    table.create(engine)
+    pg = engine.dialect.name == "postgresql"
+    if pg:
+        from src.infrastructure.partitions import ensure_monthly_partitions
+        with Session(engine) as db:
+            ensure_monthly_partitions(db, table.name, months_ahead=1)
+            db.commit()
+    source = list(_rows(table, make_id, rows))
+    t0 = time.perf_counter()
+    with engine.connect() as conn:
+        for i in range(0, rows, batch):
+            conn.execute(insert(table), source[i:i + batch])
+            conn.commit()
+    elapsed = time.perf_counter() - t0
+    index_bytes = None
+    with engine.begin() as conn:
+        if pg:
+            index_bytes = conn.execute(text(
+                "SELECT sum(pg_relation_size(i.indexrelid)) FROM pg_index i "
+                "JOIN pg_inherits h ON h.inhrelid = i.indrelid "
+                "WHERE h.inhparent = CAST(:t AS regclass) AND i.indisprimary"), {"t": table.name}).scalar()
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    engine.dispose()
+    return elapsed, index_bytes
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--batch", type=int, default=1000)
+    ap.add_argument("--dsn", default=os.getenv("API_BENCH_DSN", "sqlite://"))
+    args = ap.parse_args()
+
+    for model in (Message, AgentLog):
+        for name, make_id in (("uuid4", _v4), ("uuid7", new_id)):
+            elapsed, index_bytes = _run(args.dsn, model, make_id, args.rows, args.batch)
+            size = f"  pk index {index_bytes / 2**20:7.1f} MiB" if index_bytes is not None else ""
+            print(f"{model.__tablename__:10s} {name}: {args.rows / elapsed:10.0f} rows/s{size}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""Statement budgets for the hot use cases.
+
+Each scenario runs one use case against a seeded database and records every
+statement it sends (count, rows, time) with src.query_stats.record_queries.
+The checked-in budgets live in query_budgets.json next to this file;
+src/tests/test_query_budgets.py fails when a scenario needs more statements
+(or, on Postgres, more rows) than its budget, so an added N+1 or an extra
+round trip shows up in review. This script prints the full report with the
+slowest statements per scenario.
+
+Without --dsn the scenarios run on in-memory SQLite, which skips the ones
+that need Postgres-only tables and cannot report rows read by SELECTs. With
+--dsn the tables are created in a throwaway schema that is dropped afterwards.
+
+    python -m benchmarks.query_budgets [--rounds 5] [--dsn postgresql+psycopg://...] [--update]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.database import Base, _search_path
+from src.models import AgentLog, Flow, FlowStats, FlowSummary, Message, Pipeline, Thread, ThreadArchive, ThreadSummary
+from src.query_stats import QueryLog, record_queries
+
+BASELINE = Path(__file__).with_name("query_budgets.json")
+SCHEMA = "bench_queries"
+SQLITE_TABLES = (Flow, FlowStats, Pipeline, Thread, Message, AgentLog, ThreadArchive, ThreadSummary, FlowSummary)
+PARTITIONED = ("message", "agent_log", "generation_run", "validation_issue", "sse_event")
+
+
+@dataclass
+class Fixture:
+    engine: Engine
+    async_engine: Optional[AsyncEngine] = None
+    flow_id: str = ""
+    thread_id: str = ""
+    short_thread_id: str = ""  # live thread with fewer rows than a page
+    ids: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def postgres(self) -> bool:
+        return self.engine.dialect.name == "postgresql"
+
+
+@dataclass
+class Scenario:
+    name: str
+    run: Callable[[Fixture], None]
+    postgres_only: bool = False
+
+
+class _SummaryLLM:
+    async def summarize(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {"summary": f"{len(payload['messages'])} messages", "bullets": []}
+
+
+def _seed(fx: Fixture, flows: int = 30, messages: int = 60) -> None:
+    from src.repositories.flow_stats_repo import FlowStatsRepo
+
+    with Session(fx.engine) as db:
+        flow_ids = [str(uuid.uuid4()) for _ in range(flows)]
+        db.add_all(Flow(id=f, slug=f"bench-{i}", name=f"bench {i}", meta={}) for i, f in enumerate(flow_ids))
+        db.flush()
+        fx.flow_id = flow_ids[0]
+        fx.thread_id = str(uuid.uuid4())
+        db.add(Thread(id=fx.thread_id, flow_id=fx.flow_id, status="NEW"))
+        db.add(Pipeline(id=str(uuid.uuid4()), flow_id=fx.flow_id, version="1.0.0", schema_version="1.0.0",
+                        content={"connections": {}}, is_published=True, status="published"))
+        db.flush()
+        db.add_all(Message(id=str(uuid.uuid4()), thread_id=fx.thread_id, role="user" if i % 2 == 0 else "assistant",
+                           content={"text": f"message {i}"}) for i in range(messages))
+        fx.short_thread_id = str(uuid.uuid4())
+        db.add(Thread(id=fx.short_thread_id, flow_id=fx.flow_id, status="NEW"))
+        db.flush()
+        db.add_all(Message(id=str(uuid.uuid4()), thread_id=fx.short_thread_id, role="user",
+                           content={"text": f"short {i}"}) for i in range(3))
+        db.add_all(AgentLog(id=str(uuid.uuid4()), thread_id=fx.short_thread_id, flow_id=fx.flow_id, level="info",
+                            event=f"step{i}", data={}) for i in range(3))
+        FlowStatsRepo(db).rebuild()
+        db.commit()
+
+
+def build_fixture(dsn: Optional[str] = None) -> Fixture:
+    """Create the schema and seed data; SQLite in memory unless a Postgres DSN is given."""
+    if not dsn or dsn.startswith("sqlite"):
+        engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        for model in SQLITE_TABLES:
+            model.__table__.create(engine)
+        fx = Fixture(engine)
+    else:
+        engine = create_engine(dsn)
+        async_engine = create_async_engine(dsn)
+        event.listen(engine, "connect", _search_path(SCHEMA))
+        event.listen(async_engine.sync_engine, "connect", _search_path(SCHEMA))
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        Base.metadata.create_all(engine)
+        from src.infrastructure.partitions import ensure_monthly_partitions
+        with Session(engine) as db:
+            for table in PARTITIONED:
+                ensure_monthly_partitions(db, table, months_ahead=0)
+            db.commit()
+        fx = Fixture(engine, async_engine)
+    _seed(fx)
+    return fx
+
+
+def drop_fixture(fx: Fixture) -> None:
+    if fx.postgres:
+        with fx.engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    fx.engine.dispose()
+
+
+# ---------------- scenarios ----------------
+
+def _create_message(fx: Fixture) -> None:
+    # the handler behind POST /threads/{id}/messages, on the fixture's async engine
+    from unittest import mock
+
+    from src.dto import MessageIn
+    from src.routers import messages
+
+    sessions = async_sessionmaker(fx.async_engine, expire_on_commit=False)
+
+    @asynccontextmanager
+    async def get_async_db():
+        async with sessions() as db:
+            yield db
+            await db.commit()
+
+    payload = MessageIn(role="user", content={"text": "hello"})
+    with mock.patch.object(messages, "get_async_db", get_async_db):
+        asyncio.run(messages.create_message(fx.thread_id, payload, request=None, run=0))
+
+
+def _list_messages(fx: Fixture) -> None:
+    from src.repositories.message_repo import MessageRepo
+
+    with Session(fx.engine) as db:
+        MessageRepo(db).list_page(fx.thread_id, 50)
+
+
+def _list_messages_short_page(fx: Fixture) -> None:
+    # the last page of a live thread: the thread lookup and the page, no thread_archive read
+    from src.services.message_service import MessageService
+
+    with Session(fx.engine) as db:
+        MessageService(db).page(fx.short_thread_id, 50)
+
+
+def _agent_logs_short_page(fx: Fixture) -> None:
+    from fastapi import Response
+    from src.routers.agent_logs import by_thread
+
+    with Session(fx.engine) as db:
+        by_thread(fx.short_thread_id, response=Response(), limit=50, after=None, db=db)
+
+
+def _close_thread(fx: Fixture) -> None:
+    from src.services.summary_service import SummaryService
+
+    with Session(fx.engine) as db:
+        asyncio.run(SummaryService(db, llm=_SummaryLLM()).close_thread(fx.thread_id))
+        db.rollback()  # keep the thread open for the next round
+
+
+def _flow_listing(fx: Fixture) -> None:
+    from src.services.flow_service import FlowService
+
+    with Session(fx.engine) as db:
+        FlowService(db).page(sort="last_activity", order="desc", limit=20)
+
+
+def _agent_context(fx: Fixture) -> None:
+    # the database half of StartAgentRun; the rest of a run is LLM calls
+    from src.agent.graph import AgentRunner
+
+    runner = AgentRunner(session_factory=async_sessionmaker(fx.async_engine, expire_on_commit=False),
+                         similarity_service=object(), llm_client=object())
+    asyncio.run(runner._gather_context(fx.flow_id))
+
+
+SCENARIOS: Dict[str, Scenario] = {s.name: s for s in (
+    Scenario("create_message", _create_message, postgres_only=True),
+    Scenario("list_messages", _list_messages),
+    Scenario("list_messages_short_page", _list_messages_short_page),
+    Scenario("agent_logs_short_page", _agent_logs_short_page),
+    Scenario("close_thread", _close_thread),
+    Scenario("flow_listing", _flow_listing),
+    Scenario("agent_context", _agent_context, postgres_only=True),
+)}
+
+
+def run_scenario(fx: Fixture, scenario: Scenario) -> QueryLog:
+    engine = fx.async_engine if fx.async_engine is not None and scenario.postgres_only else fx.engine
+    with record_queries(engine) as log:
+        scenario.run(fx)
+    return log
+
+
+def load_budgets(path: Path = BASELINE) -> Dict[str, Dict[str, int]]:
+    return json.loads(path.read_text(encoding="utf-8"))["scenarios"]
+
+
+def over_budget(log: QueryLog, budget: Dict[str, int]) -> List[str]:
+    problems = []
+    if log.count > budget["statements"]:
+        problems.append(f"{log.count} statements > budget {budget['statements']}")
+    if "rows" in budget and log.rows is not None and log.rows > budget["rows"]:
+        problems.append(f"{log.rows} rows > budget {budget['rows']}")
+    return problems
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--dsn", default=os.getenv("API_BENCH_DSN"))
+    ap.add_argument("--slowest", type=int, default=3)
+    ap.add_argument("--update", action="store_true", help="rewrite query_budgets.json from this run")
+    args = ap.parse_args()
+
+    fx = build_fixture(args.dsn)
+    budgets = load_budgets()
+    failed = False
+    try:
+        for scenario in SCENARIOS.values():
+            if scenario.postgres_only and not fx.postgres:
+                print(f"{scenario.name:16s} skipped (needs Postgres)")
+                continue
+            run_scenario(fx, scenario)  # warm-up: connection, compiled statement cache
+            logs = [run_scenario(fx, scenario) for _ in range(args.rounds)]
+            log = logs[-1]
+            ms = statistics.median(run.seconds for run in logs) * 1000
+            budget = budgets.get(scenario.name)
+            problems = over_budget(log, budget) if budget else ["no budget"]
+            failed = failed or bool(budget and problems)
+            status = "; ".join(problems) or "ok"
+            print(f"{scenario.name:16s} median {ms:7.2f} ms  [{status}]")
+            print("  " + log.report(args.slowest).replace("\n", "\n  "))
+            if args.update:
+                budgets[scenario.name] = {"statements": log.count}
+                if log.rows is not None:
+                    budgets[scenario.name]["rows"] = log.rows
+    finally:
+        drop_fixture(fx)
+    if args.update:
+        BASELINE.write_text(json.dumps({"scenarios": budgets}, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"wrote {BASELINE.name}")
+    elif failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
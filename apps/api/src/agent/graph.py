@@ -5,21 +5,30 @@ from __future__ import annotations
 # Langgraph - checkpoint
 # Store - State ()
 
+import asyncio
 import logging
 import time
-import uuid
 import re as _re
-from typing import Any, Callable, Dict, Optional, Protocol, TypedDict, cast
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Protocol, TypedDict, cast
 
 from langgraph.graph import END, START, StateGraph
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
 from ..metrics import AGENT_RUN_ERRORS, AGENT_RUN_SECONDS, MESSAGES_CREATED
+from ..pool_stats import pool_usage
 from ..sse import bus
 from ..tracing import get_tracer
-from ..database import SessionLocal
+from ..database import AsyncSessionLocal
+from ..repositories.message_repo import AsyncMessageRepo
+from ..repositories.runs_repo import AsyncRunsRepo
 from ..services.llm import LLMClient
+from ..services.pipeline_service import PipelineService
 from ..services.similarity_service import SimilarityService
+from ..services.validation_service import ValidationService
+from ..ids import new_id
 
 logger = logging.getLogger(__name__)
 
@@ -43,10 +52,10 @@ class LLMClientProtocol(Protocol):
 
 
 class RunsRepoProtocol(Protocol):
-    def start(self, run_id: str, flow_id: str, thread_id: str, *, stage: str, source: Dict[str, Any]) -> None: ...
-    def tick(self, run_id: str, *, stage: str, status: str, result: Dict[str, Any] | None = None) -> None: ...
-    def add_issues(self, run_id: str, issues: list[Any]) -> None: ...
-    def finish(self, run_id: str, status: str) -> None: ...
+    async def start(self, run_id: str, flow_id: str, thread_id: str, *, stage: str, source: Dict[str, Any]) -> Any: ...
+    async def tick(self, run_id: str, *, stage: str, status: str, result: Dict[str, Any] | None = None) -> Any: ...
+    async def add_issues(self, run_id: str, issues: list[Any]) -> None: ...
+    async def finish(self, run_id: str, status: str) -> Any: ...
 
 
 class ValidationServiceProtocol(Protocol):
@@ -80,6 +89,8 @@ class AgentState(TypedDict, total=False):
 class AgentRunner:
     """LangGraph-powered agent runner.
     Each node pushes SSE events and updates generation_run via RunsRepo.
+    DB I/O goes through AsyncSession so nodes never block the event loop; the sync
+    validation/pipeline services run inside `AsyncSession.run_sync`.
     """
 
     # ---------------- utils (version/compat) ----------------
@@ -124,52 +135,63 @@ class AgentRunner:
 
     def __init__(
             self,
-            session_factory: Callable[[], Any] = SessionLocal,
+            session_factory: Callable[[], AsyncSession] | None = None,
             similarity_service: SimilarityServiceProtocol | None = None,
             llm_client: LLMClientProtocol | None = None,
-            runs_repo_factory: Callable[[Any], RunsRepoProtocol] | None = None,
-            validation_service_factory: Callable[[Any], ValidationServiceProtocol] | None = None,
-            pipeline_service_factory: Callable[[Any], PipelineServiceProtocol] | None = None,
+            runs_repo_factory: Callable[[AsyncSession], RunsRepoProtocol] | None = None,
+            validation_service_factory: Callable[[Session], ValidationServiceProtocol] | None = None,
+            pipeline_service_factory: Callable[[Session], PipelineServiceProtocol] | None = None,
     ) -> None:
-        self.session_factory = session_factory
+        self.session_factory = session_factory or AsyncSessionLocal
         self.similarity: SimilarityServiceProtocol = similarity_service or SimilarityService()
         self.llm: LLMClientProtocol = llm_client or LLMClient()
-        self.runs_repo_factory = runs_repo_factory or (lambda session: self.runs_repo)  # type: ignore[attr-defined]
-        self.validation_service_factory = validation_service_factory or (  # type: ignore[attr-defined]
-            lambda session: self.validation_service
-        )
-        self.pipeline_service_factory = pipeline_service_factory or (  # type: ignore[attr-defined]
-            lambda session: self.pipeline_service
-        )
+        self.runs_repo_factory: Callable[[AsyncSession], RunsRepoProtocol] = runs_repo_factory or AsyncRunsRepo
+        self.validation_service_factory = validation_service_factory or ValidationService
+        self.pipeline_service_factory = pipeline_service_factory or PipelineService
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[AsyncSession]:
+        """One AsyncSession transaction: commit on success, rollback on error."""
+        if self.session_factory is None:
+            raise RuntimeError("AsyncSessionLocal is not initialized (likely running under Alembic).")
+        async with self.session_factory() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+    async def find_candidate(self, flow_id: str, user_message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # the similarity service owns a sync session; keep it off the loop
+        return await asyncio.to_thread(self.similarity.find_candidate, flow_id, user_message)
 
     # ---------------- context gather ----------------
 
-    def _gather_context(self, flow_id: str) -> Dict[str, Any]:
-        from sqlalchemy import select
-        from ..models import Pipeline, SchemaChannel
+    async def _gather_context(self, flow_id: str) -> Dict[str, Any]:
+        from sqlalchemy import lambda_stmt, select
+        from ..models import SchemaChannel, SchemaDef
         from ..repositories.flow_summary_repo import get_active as get_active_flow_summary
+        from ..repositories.pipeline_repo import AsyncPipelineRepo
         from ..config import settings
 
-        db = self.session_factory()
-        try:
-            ch = (
-                db.execute(select(SchemaChannel).where(SchemaChannel.name == settings.SCHEMA_CHANNEL))
-                .scalar_one_or_none()
-            )
-            schema_def = ch.active_schema.json if ch and ch.active_schema else {}
-            fs = get_active_flow_summary(db, flow_id)
-            ap = (
-                db.execute(
-                    select(Pipeline).where(Pipeline.flow_id == flow_id, Pipeline.is_published.is_(True)).limit(1)
-                ).scalar_one_or_none()
-            )
+        channel_name = settings.SCHEMA_CHANNEL
+        async with self.transaction() as db:
+            # join instead of ch.active_schema: lazy loads are unavailable on AsyncSession
+            schema_def = (
+                await db.execute(lambda_stmt(
+                    lambda: select(SchemaDef.json)
+                    .join(SchemaChannel, SchemaChannel.active_schema_def_id == SchemaDef.id)
+                    .where(SchemaChannel.name == channel_name)
+                ))
+            ).scalar_one_or_none()
+            fs = await db.run_sync(get_active_flow_summary, flow_id)
+            ap = await AsyncPipelineRepo(db).get_published(flow_id)
             return dict(
-                schema_def=schema_def,
+                schema_def=schema_def or {},
                 flow_summary=(fs.content if fs else None),
                 active_pipeline=(ap.content if ap else None),
             )
-        finally:
-            db.close()
 
     # ---------------- chat helpers ----------------
 
@@ -256,7 +278,7 @@ class AgentRunner:
             options: Dict[str, Any] | None = None,
             run_id: str | None = None,
     ) -> str:
-        run_id_str: str = run_id or str(uuid.uuid4())
+        run_id_str: str = run_id or new_id()
         opts: Dict[str, Any] = options if options is not None else {}
         state: AgentState = {
             "flow_id": flow_id,
@@ -277,52 +299,19 @@ class AgentRunner:
         graph = StateGraph(AgentState)  # type: ignore[arg-type]
 
         # helpers to reduce duplication
-        def _with_repo(op: Callable[[RunsRepoProtocol], None]) -> None:
-            session = self.session_factory()
-            try:
-                repo = self.runs_repo_factory(session)
-                op(repo)
-                session.commit()
-            except Exception:
-                session.rollback()
-                raise
-            finally:
-                session.close()
+        async def _with_repo(op: Callable[[RunsRepoProtocol], Awaitable[Any]]) -> None:
+            async with self.transaction() as session:
+                await op(self.runs_repo_factory(session))
 
-        def _tick(stage: str, status: str, result: Dict[str, Any] | None = None) -> None:
-            def apply(repo: RunsRepoProtocol) -> None:
-                repo.tick(run_id_str, stage=stage, status=status, result=result)
-
-            _with_repo(apply)
+        async def _tick(stage: str, status: str, result: Dict[str, Any] | None = None) -> None:
+            await _with_repo(lambda repo: repo.tick(run_id_str, stage=stage, status=status, result=result))
 
         # helper: persist assistant message and emit SSE
         async def _emit_message(role: str, format: str, content: Dict[str, Any]) -> str:
             """Create Message row and emit SSE events. Returns message_id."""
-            from ..models import Message  # local import to avoid circulars
-            import uuid as _uuid
-
-            session = self.session_factory()
-            msg_id = str(_uuid.uuid4())
-            try:
-                m = Message(
-                    id=msg_id,
-                    thread_id=state["thread_id"],  # type: ignore[index]
-                    role=role,
-                    format=format,
-                    content=content,
-                )
-                session.add(m)
-                session.flush()
-                try:
-                    session.refresh(m)
-                except Exception:
-                    pass
-                session.commit()
-            except Exception:
-                session.rollback()
-                raise
-            finally:
-                session.close()
+            msg_id = new_id()
+            async with self.transaction() as session:
+                await AsyncMessageRepo(session).add(msg_id, state["thread_id"], role, content, fmt=format)
 
             # metrics
             try:
@@ -353,20 +342,20 @@ class AgentRunner:
         # --- nodes ---
         async def init_node(s: AgentState) -> AgentState:
             await bus.publish(s["thread_id"], "run.started", {"run_id": s["run_id"], "stage": "discovery"})
-            def apply(repo: RunsRepoProtocol) -> None:
-                repo.start(s["run_id"], s["flow_id"], s["thread_id"], stage="discovery", source=s["user_message"])
-                repo.tick(s["run_id"], stage="discovery", status="succeeded")
+            async def apply(repo: RunsRepoProtocol) -> None:
+                await repo.start(s["run_id"], s["flow_id"], s["thread_id"], stage="discovery", source=s["user_message"])
+                await repo.tick(s["run_id"], stage="discovery", status="succeeded")
 
-            _with_repo(apply)
+            await _with_repo(apply)
             return s
 
         async def search_existing(s: AgentState) -> AgentState:
             await bus.publish(
                 s["thread_id"], "run.stage", {"run_id": s["run_id"], "stage": "search_existing", "status": "running"}
             )
-            cand = self.similarity.find_candidate(s["flow_id"], s["user_message"])
+            cand = await self.find_candidate(s["flow_id"], s["user_message"])
             s["candidate"] = cand
-            _tick("search_existing", "succeeded")
+            await _tick("search_existing", "succeeded")
             await bus.publish(
                 s["thread_id"], "run.stage", {"run_id": s["run_id"], "stage": "search_existing", "status": "succeeded"}
             )
@@ -382,10 +371,10 @@ class AgentRunner:
             await bus.publish(
                 s["thread_id"], "run.stage", {"run_id": s["run_id"], "stage": "generate", "status": "running"}
             )
-            ctx = self._gather_context(s["flow_id"])
+            ctx = await self._gather_context(s["flow_id"])
             draft = await self.llm.generate_pipeline(ctx, s["user_message"])
             s["draft"] = draft
-            _tick("generate", "succeeded", result={"draft_head": list(draft.keys())})
+            await _tick("generate", "succeeded", result={"draft_head": list(draft.keys())})
             await _emit_message("assistant", "markdown", {"text": "Generating pipeline..."})
             await bus.publish(
                 s["thread_id"], "run.stage", {"run_id": s["run_id"], "stage": "generate", "status": "succeeded"}
@@ -399,7 +388,7 @@ class AgentRunner:
             draft_in = cast(Dict[str, Any], s.get("draft") or {})
             notes = await self.llm.self_check(draft_in)
             s["notes"] = notes
-            _tick("self_check", "succeeded", result={"notes": notes})
+            await _tick("self_check", "succeeded", result={"notes": notes})
             await _emit_message("assistant", "markdown", {"text": "Checking consistency..."})
             await _emit_message("assistant", "json", cast(Dict[str, Any], s.get("notes") or {}))
             await bus.publish(
@@ -415,23 +404,17 @@ class AgentRunner:
             issues: list[Dict[str, Any]] = []
             status = "succeeded"
 
-            session = self.session_factory()
-            try:
-                validator = self.validation_service_factory(session)
-                draft_in = cast(Dict[str, Any], s.get("draft") or {})
-                issues = validator.validate_pipeline(draft_in) or []
+            draft_in = cast(Dict[str, Any], s.get("draft") or {})
+            async with self.transaction() as session:
+                issues = await session.run_sync(
+                    lambda db: self.validation_service_factory(db).validate_pipeline(draft_in)
+                ) or []
                 s["issues"] = issues
                 runs_repo = self.runs_repo_factory(session)
                 status = "failed" if issues else "succeeded"
-                runs_repo.tick(s["run_id"], stage="hard_validate", status=status, result={"issues": issues})
+                await runs_repo.tick(s["run_id"], stage="hard_validate", status=status, result={"issues": issues})
                 if issues:
-                    runs_repo.add_issues(s["run_id"], issues)
-                session.commit()
-            except Exception:
-                session.rollback()
-                raise
-            finally:
-                session.close()
+                    await runs_repo.add_issues(s["run_id"], issues)
 
             if issues:
                 await bus.publish(s["thread_id"], "issues", {"items": issues})
@@ -447,30 +430,27 @@ class AgentRunner:
             await bus.publish(
                 s["thread_id"], "run.stage", {"run_id": s["run_id"], "stage": "persist", "status": "running"}
             )
-            session = self.session_factory()
             persisted_payload: Dict[str, Any] | None = None
+            content = cast(Dict[str, Any], s.get("draft") or {})
             try:
-                pipelines = self.pipeline_service_factory(session)
-                content = cast(Dict[str, Any], s.get("draft") or {})
-                p = pipelines.create_version(s["flow_id"], content)
-                version_str = str(p.version) if getattr(p, "version", None) is not None else ""
-                persisted_payload = {"pipeline_id": str(p.id), "version": version_str, "status": p.status}
-                session.commit()
+                async with self.transaction() as session:
+                    p = await session.run_sync(
+                        lambda db: self.pipeline_service_factory(db).create_version(s["flow_id"], content)
+                    )
+                    version_str = str(p.version) if getattr(p, "version", None) is not None else ""
+                    persisted_payload = {"pipeline_id": str(p.id), "version": version_str, "status": p.status}
             except Exception as exc:
-                session.rollback()
                 error_message = getattr(exc, "message", str(exc))
-                _tick("persist", "failed", result={"error": error_message})
+                await _tick("persist", "failed", result={"error": error_message})
                 await bus.publish(
                     s["thread_id"],
                     "run.stage",
                     {"run_id": s["run_id"], "stage": "persist", "status": "failed", "error": error_message},
                 )
                 raise
-            finally:
-                session.close()
 
             s["persisted"] = {"pipeline_id": persisted_payload["pipeline_id"], "version": persisted_payload["version"]}
-            _tick("persist", "succeeded")
+            await _tick("persist", "succeeded")
             await bus.publish(s["thread_id"], "pipeline.created", persisted_payload)
             await bus.publish(
                 s["thread_id"], "run.stage", {"run_id": s["run_id"], "stage": "persist", "status": "succeeded"}
@@ -484,33 +464,29 @@ class AgentRunner:
             await bus.publish(
                 s["thread_id"], "run.stage", {"run_id": s["run_id"], "stage": "publish", "status": "running"}
             )
-            session = self.session_factory()
             published_payload: Dict[str, str] | None = None
             try:
-                pipelines = self.pipeline_service_factory(session)
                 if s.get("persisted"):
-                    pipelines.publish(s["persisted"]["pipeline_id"])
+                    pipeline_id = s["persisted"]["pipeline_id"]
+                    async with self.transaction() as session:
+                        await session.run_sync(lambda db: self.pipeline_service_factory(db).publish(pipeline_id))
                     published_payload = {
-                        "pipeline_id": s["persisted"]["pipeline_id"],
+                        "pipeline_id": pipeline_id,
                         "version": s["persisted"]["version"],
                     }
-                session.commit()
             except Exception as exc:
-                session.rollback()
                 error_message = getattr(exc, "message", str(exc))
-                _tick("publish", "failed", result={"error": error_message})
+                await _tick("publish", "failed", result={"error": error_message})
                 await bus.publish(
                     s["thread_id"],
                     "run.stage",
                     {"run_id": s["run_id"], "stage": "publish", "status": "failed", "error": error_message},
                 )
                 raise
-            finally:
-                session.close()
 
             if published_payload:
                 await bus.publish(s["thread_id"], "pipeline.published", published_payload)
-            _tick("publish", "succeeded")
+            await _tick("publish", "succeeded")
             await bus.publish(
                 s["thread_id"], "run.stage", {"run_id": s["run_id"], "stage": "publish", "status": "succeeded"}
             )
@@ -518,16 +494,7 @@ class AgentRunner:
 
         async def finish_node(s: AgentState) -> AgentState:
             status = "failed" if s.get("issues") else "succeeded"
-            session = self.session_factory()
-            try:
-                runs_repo = self.runs_repo_factory(session)
-                runs_repo.finish(s["run_id"], status=status)
-                session.commit()
-            except Exception:
-                session.rollback()
-                raise
-            finally:
-                session.close()
+            await _with_repo(lambda repo: repo.finish(s["run_id"], status=status))
 
             await bus.publish(s["thread_id"], "run.finished", {"run_id": s["run_id"], "status": status})
 
@@ -573,19 +540,15 @@ class AgentRunner:
         app = graph.compile()
 
         try:
-            await app.ainvoke(state)  # we stream via SSE inside nodes
+            # connections held by the nodes (including across LLM calls) show up as usage="agent.run"
+            with pool_usage("agent.run"):
+                await app.ainvoke(state)  # we stream via SSE inside nodes
         except Exception as e:  # noqa: BLE001
             # Ensure we mark the run as failed and emit a terminal event
-            db_session = self.session_factory()
             try:
-                runs = self.runs_repo_factory(db_session)
-                try:
-                    runs.finish(run_id_str, status="failed")
-                    db_session.commit()
-                except SQLAlchemyError:
-                    db_session.rollback()
-            finally:
-                db_session.close()
+                await _with_repo(lambda repo: repo.finish(run_id_str, status="failed"))
+            except SQLAlchemyError:
+                pass
 
             # Metrics and logs for unexpected error
             try:
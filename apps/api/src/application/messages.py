@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 from ..app_decorators import instrument_uc
-import uuid
 from typing import Optional, Any, Dict, Iterable
 from ..core.ports import MessageRepo, ThreadRepo
 from ..core.uow import UnitOfWork
 from ..core.errors import NotFound, ValidationFailed
+from ..ids import new_id
 
 ALLOWED_ROLES = {"user", "assistant", "system", "tool"}
 ALLOWED_FORMATS = {"text", "markdown", "json", "buttons", "card"}
@@ -23,7 +23,7 @@ class CreateMessage:
         t = self.threads.get(thread_id)
         if not t:
             raise NotFound(f"Thread {thread_id} not found")
-        msg_id = str(uuid.uuid4())
+        msg_id = new_id()
         m = self.messages.add(message_id=msg_id, thread_id=thread_id, role=role, content=content,
                               parent_id=parent_id, tool_name=tool_name, tool_result=tool_result, fmt=fmt)
         self.uow.commit()
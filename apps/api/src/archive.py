@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type
+
+import zstandard
+from sqlalchemy import DateTime, and_, delete, event, or_, select
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import get_db
+from .metrics import THREAD_ARCHIVE_BYTES, THREAD_ARCHIVE_READS, THREADS_ARCHIVED
+from .models import AgentLog, Message, Thread, ThreadArchive
+from .pagination import Key
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# Session.info key: archive files written in the session's open transaction
+_PENDING_FILES = "thread_archive_files"
+
+
+# ---------------- payload ----------------
+
+def _dump_row(obj: Any) -> Dict[str, Any]:
+    out = {}
+    for col in obj.__table__.columns:
+        value = getattr(obj, col.key)
+        out[col.key] = value.isoformat() if isinstance(value, datetime) else value
+    return out
+
+
+def _load_row(model: Type[Any], data: Dict[str, Any]) -> Any:
+    values = {}
+    for col in model.__table__.columns:
+        value = data.get(col.key)
+        if value is not None and isinstance(col.type, DateTime):
+            value = datetime.fromisoformat(value)
+        values[col.key] = value
+    # transient: never added to a session, so nothing is written back
+    return model(**values)
+
+
+def pack(messages: List[Message], logs: List[AgentLog], *, level: Optional[int] = None) -> tuple[bytes, int]:
+    """zstd-compressed JSON of a thread's rows; returns (blob, uncompressed size)."""
+    raw = json.dumps({
+        "version": FORMAT_VERSION,
+        "messages": [_dump_row(m) for m in messages],
+        "agent_logs": [_dump_row(r) for r in logs],
+    }, separators=(",", ":"), default=str).encode("utf-8")
+    cctx = zstandard.ZstdCompressor(level=settings.API_ARCHIVE_ZSTD_LEVEL if level is None else level)
+    return cctx.compress(raw), len(raw)
+
+
+def unpack(blob: bytes) -> Dict[str, List[Any]]:
+    data = json.loads(zstandard.ZstdDecompressor().decompress(blob))
+    if data.get("version") != FORMAT_VERSION:
+        raise ValueError(f"unsupported thread archive version {data.get('version')!r}")
+    return {
+        "messages": [_load_row(Message, m) for m in data["messages"]],
+        "agent_logs": [_load_row(AgentLog, r) for r in data["agent_logs"]],
+    }
+
+
+# ---------------- storage ----------------
+
+def _file_path(thread_id: str) -> str:
+    return os.path.join(thread_id[:2], f"{thread_id}.json.zst")
+
+
+def _write_file(rel: str, blob: bytes) -> None:
+    path = Path(settings.API_ARCHIVE_DIR) / rel
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(blob)
+    os.replace(tmp, path)  # readers never see a partial file
+
+
+@event.listens_for(Session, "after_commit")
+def _keep_committed_files(session: Session) -> None:
+    session.info.pop(_PENDING_FILES, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _remove_uncommitted_files(session: Session) -> None:
+    # the thread_archive row never made it, so nothing points at these files
+    for rel in session.info.pop(_PENDING_FILES, ()):
+        try:
+            (Path(settings.API_ARCHIVE_DIR) / rel).unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning("could not remove uncommitted archive file %s: %s", rel, e)
+
+
+def _read_blob(row: ThreadArchive) -> bytes:
+    if row.storage == "file":
+        return (Path(settings.API_ARCHIVE_DIR) / row.path).read_bytes()
+    return row.blob
+
+
+# ---------------- archive ----------------
+
+def archive_thread(db: Session, thread_id: str, *, storage: Optional[str] = None) -> Optional[ThreadArchive]:
+    """
+    Move a thread's messages and agent logs into one thread_archive row (blob in the row or in a
+    file under API_ARCHIVE_DIR), delete the hot rows and mark the thread archived, in the
+    caller's transaction.
+    Returns None when the thread is already archived.
+    """
+    if db.get(ThreadArchive, thread_id) is not None:
+        return None
+    storage = storage or settings.API_ARCHIVE_STORAGE
+    if storage not in ("db", "file"):
+        raise ValueError(f"unknown archive storage {storage!r}")
+    messages = db.execute(
+        select(Message).where(Message.thread_id == thread_id).order_by(Message.created_at, Message.id)
+    ).scalars().all()
+    logs = db.execute(
+        select(AgentLog).where(AgentLog.thread_id == thread_id).order_by(AgentLog.created_at, AgentLog.id)
+    ).scalars().all()
+    blob, raw_bytes = pack(messages, logs)
+    row = ThreadArchive(thread_id=thread_id, codec="zstd", storage=storage, message_count=len(messages),
+                        agent_log_count=len(logs), raw_bytes=raw_bytes, stored_bytes=len(blob))
+    if storage == "file":
+        row.path = _file_path(thread_id)
+        # written before the commit so a committed row always has its file; removed again if the
+        # caller's transaction rolls back
+        _write_file(row.path, blob)
+        db.info.setdefault(_PENDING_FILES, []).append(row.path)
+    else:
+        row.blob = blob
+    db.add(row)
+    thread = db.get(Thread, thread_id)
+    if thread is not None and not thread.archived:
+        # readers only look in thread_archive for closed or archived threads (may_be_archived)
+        thread.archived = True
+        thread.archived_at = thread.archived_at or datetime.now(UTC).replace(tzinfo=None)
+    db.execute(delete(Message).where(Message.thread_id == thread_id).execution_options(synchronize_session=False))
+    db.execute(delete(AgentLog).where(AgentLog.thread_id == thread_id).execution_options(synchronize_session=False))
+    for obj in (*messages, *logs):
+        db.expunge(obj)
+    db.flush()
+    THREADS_ARCHIVED.labels(storage=storage).inc()
+    THREAD_ARCHIVE_BYTES.labels(kind="raw").inc(raw_bytes)
+    THREAD_ARCHIVE_BYTES.labels(kind="stored").inc(len(blob))
+    return row
+
+
+def archivable_threads(db: Session, *, older_than: datetime, limit: int) -> List[str]:
+    stmt = (
+        select(Thread.id)
+        .outerjoin(ThreadArchive, ThreadArchive.thread_id == Thread.id)
+        .where(ThreadArchive.thread_id.is_(None))
+        .where(or_(Thread.closed_at < older_than, and_(Thread.archived.is_(True), Thread.archived_at < older_than)))
+        .order_by(Thread.id)
+        .limit(limit)
+    )
+    return [str(t) for t in db.execute(stmt).scalars().all()]
+
+
+def archive_closed_threads(*, now: Optional[datetime] = None) -> int:
+    """Retention job: archive up to API_ARCHIVE_BATCH_SIZE threads closed/archived API_ARCHIVE_AFTER_DAYS ago."""
+    if settings.API_ARCHIVE_AFTER_DAYS <= 0:
+        return 0
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    with get_db() as db:
+        thread_ids = archivable_threads(db, older_than=now - timedelta(days=settings.API_ARCHIVE_AFTER_DAYS),
+                                        limit=settings.API_ARCHIVE_BATCH_SIZE)
+    done = 0
+    for thread_id in thread_ids:
+        # one transaction per thread: a failure leaves the others archived and this one hot
+        try:
+            with get_db() as db:
+                if archive_thread(db, thread_id) is not None:
+                    done += 1
+        except Exception as e:
+            logger.warning("archiving thread %s failed: %s", thread_id, e)
+    return done
+
+
+# ---------------- read path ----------------
+
+class _Cache:
+    """Small LRU of decoded archives: paging through an archived thread decompresses it once."""
+
+    def __init__(self):
+        self._items: OrderedDict[str, Dict[str, List[Any]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict[str, List[Any]]]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Dict[str, List[Any]]) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > max(0, settings.API_ARCHIVE_CACHE_SIZE):
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+
+cache = _Cache()
+
+
+def load_archive(db: Session, thread_id: str) -> Optional[Dict[str, List[Any]]]:
+    """Decoded archive of a thread ({"messages": [...], "agent_logs": [...]}, transient rows), or None."""
+    hit = cache.get(thread_id)
+    if hit is not None:
+        THREAD_ARCHIVE_READS.labels(source="cache").inc()
+        return hit
+    row = db.get(ThreadArchive, thread_id)
+    if row is None:
+        return None
+    data = unpack(_read_blob(row))
+    THREAD_ARCHIVE_READS.labels(source="storage").inc()
+    cache.put(thread_id, data)
+    return data
+
+
+def may_be_archived(thread: Optional[Thread]) -> bool:
+    """Only closed or archived threads are ever moved to thread_archive (see archivable_threads)."""
+    return thread is not None and bool(thread.archived or thread.closed_at is not None)
+
+
+def archived_messages(db: Session, thread_id: str) -> List[Message]:
+    data = load_archive(db, thread_id)
+    return list(data["messages"]) if data else []
+
+
+def archived_agent_logs(db: Session, thread_id: str) -> List[AgentLog]:
+    data = load_archive(db, thread_id)
+    return list(data["agent_logs"]) if data else []
+
+
+def merge_archived(rows: Sequence[Any], archived: Sequence[Any], key: Callable[[Any], Key], *,
+                   descending: bool, bound: Optional[Key] = None, limit: Optional[int] = None) -> List[Any]:
+    """
+    Combine a hot page with the archived rows of the same thread under the page's keyset rules:
+    rows past the cursor `bound` (below it when descending, above it otherwise), in key order.
+    With `limit`, returns at most limit + 1 rows so keyset_page still detects the next page.
+    """
+    if bound is not None:
+        archived = [r for r in archived if (key(r) < bound if descending else key(r) > bound)]
+    merged = sorted([*rows, *archived], key=key, reverse=descending)
+    return merged if limit is None else merged[:limit + 1]
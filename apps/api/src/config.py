@@ -27,18 +27,100 @@ class Settings(BaseSettings):
     def DSN(self) -> str:
         return self.dsn
 
+    # Optional read replicas: comma-separated DSNs (same form as `dsn`)
+    API_DB_REPLICA_DSNS: str = Field(default="", env="API_DB_REPLICA_DSNS")
+    API_DB_REPLICA_MAX_LAG_SEC: float = Field(default=5.0, env="API_DB_REPLICA_MAX_LAG_SEC")
+    API_DB_REPLICA_SAMPLE_INTERVAL_SEC: float = Field(default=2.0, env="API_DB_REPLICA_SAMPLE_INTERVAL_SEC")
+    # psycopg prepares a statement server-side once it has run this many times on a connection;
+    # -1 disables (required behind a transaction-pooling PgBouncer older than 1.21)
+    API_DB_PREPARE_THRESHOLD: int = Field(default=5, env="API_DB_PREPARE_THRESHOLD")
+    # Pools per worker process. The sync engines (primary and each replica) use POOL_SIZE +
+    # MAX_OVERFLOW, the async primary engine of the hot paths ASYNC_POOL_SIZE + ASYNC_MAX_OVERFLOW.
+    # Ceiling per worker: 15 + 15 = 30 primary connections with the defaults, plus 15 per replica.
+    API_DB_POOL_SIZE: int = Field(default=5, env="API_DB_POOL_SIZE")
+    API_DB_MAX_OVERFLOW: int = Field(default=10, env="API_DB_MAX_OVERFLOW")
+    API_DB_ASYNC_POOL_SIZE: int = Field(default=5, env="API_DB_ASYNC_POOL_SIZE")
+    API_DB_ASYNC_MAX_OVERFLOW: int = Field(default=10, env="API_DB_ASYNC_MAX_OVERFLOW")
+    API_DB_POOL_TIMEOUT_SEC: float = Field(default=30.0, env="API_DB_POOL_TIMEOUT_SEC")
+    # record the code location of each checkout for /admin/db/pool (one stack walk per checkout)
+    API_DB_POOL_TRACK_CALLERS: bool = Field(default=True, env="API_DB_POOL_TRACK_CALLERS")
+
+    @property
+    def replica_dsns(self) -> List[str]:
+        return [d.strip() for d in (self.API_DB_REPLICA_DSNS or "").split(",") if d.strip()]
+
     API_HOST: str = Field(default="0.0.0.0", env="API_HOST")
     API_PORT: int = Field(default=8000, env="API_PORT")
     APP_VERSION: str = Field(default="0.1.0", env="APP_VERSION")
     API_INIT_SCHEMA_ON_START: bool = Field(default=True, env="API_INIT_SCHEMA_ON_START")
     API_INIT_SCHEMA_PATH: str = Field(default="v1.0.0.json", env="API_INIT_SCHEMA_PATH")
     API_SCHEMA_CHANNEL: str = Field(default="stable", env="API_SCHEMA_CHANNEL")
+    API_SIMILARITY_THRESHOLD: float = Field(default=0.75, env="API_SIMILARITY_THRESHOLD")
+    API_SIMILARITY_BACKEND: str = Field(default="index", env="API_SIMILARITY_BACKEND")  # index|trgm
+    API_SIMILARITY_INDEX_DIM: int = Field(default=1024, env="API_SIMILARITY_INDEX_DIM")  # hashed terms, power of two
+    API_SIMILARITY_INDEX_MAX_FLOWS: int = Field(default=64, env="API_SIMILARITY_INDEX_MAX_FLOWS")
+    API_SIMILARITY_INDEX_REFRESH_SEC: float = Field(default=30, env="API_SIMILARITY_INDEX_REFRESH_SEC")
+    API_SIMILARITY_NEAR_DUP_THRESHOLD: float = Field(default=0.8, env="API_SIMILARITY_NEAR_DUP_THRESHOLD")  # MinHash Jaccard; 0 disables
+    API_SIMILARITY_STRUCTURE_WEIGHT: float = Field(default=0.3, env="API_SIMILARITY_STRUCTURE_WEIGHT")  # 0..1, index backend
+    API_SIMILARITY_BATCH_MAX_ITEMS: int = Field(default=1000, env="API_SIMILARITY_BATCH_MAX_ITEMS")
+    API_SIMILARITY_BATCH_MAX_FLOWS: int = Field(default=16, env="API_SIMILARITY_BATCH_MAX_FLOWS")  # per request without flow_id
+    API_SIMILARITY_BATCH_STREAM_MIN: int = Field(default=100, env="API_SIMILARITY_BATCH_STREAM_MIN")  # NDJSON above this many items
     API_MAX_JSON_SIZE: int = Field(default=1_048_576, env="API_MAX_JSON_SIZE")
     API_SSE_PING_INTERVAL: int = Field(default=15, env="API_SSE_PING_INTERVAL")
     API_SSE_BUFFER_TTL_SEC: int = Field(default=300, env="API_SSE_BUFFER_TTL_SEC")
     API_SSE_BUFFER_MAXLEN: int = Field(default=500, env="API_SSE_BUFFER_MAXLEN")
+    API_SSE_REPLAY_MAX: int = Field(default=5000, env="API_SSE_REPLAY_MAX")
+    API_SSE_EVENT_LOG_ENABLED: bool = Field(default=True, env="API_SSE_EVENT_LOG_ENABLED")
+    API_SSE_EVENT_LOG_BATCH_SIZE: int = Field(default=200, env="API_SSE_EVENT_LOG_BATCH_SIZE")
+    API_SSE_EVENT_LOG_FLUSH_INTERVAL_MS: int = Field(default=250, env="API_SSE_EVENT_LOG_FLUSH_INTERVAL_MS")
+    API_SSE_EVENT_LOG_QUEUE_MAX: int = Field(default=10_000, env="API_SSE_EVENT_LOG_QUEUE_MAX")
+    API_SSE_EVENT_LOG_RETENTION_DAYS: int = Field(default=30, env="API_SSE_EVENT_LOG_RETENTION_DAYS")
+    API_RETENTION_INTERVAL_SEC: int = Field(default=3600, env="API_RETENTION_INTERVAL_SEC")
+    # Monthly partitions older than <days> are expired with <action> (drop|detach|archive); 0 (default) keeps forever.
+    API_RETENTION_MESSAGE_DAYS: int = Field(default=0, env="API_RETENTION_MESSAGE_DAYS")
+    API_RETENTION_MESSAGE_ACTION: str = Field(default="archive", env="API_RETENTION_MESSAGE_ACTION")
+    API_RETENTION_AGENT_LOG_DAYS: int = Field(default=0, env="API_RETENTION_AGENT_LOG_DAYS")
+    API_RETENTION_AGENT_LOG_ACTION: str = Field(default="drop", env="API_RETENTION_AGENT_LOG_ACTION")
+    API_RETENTION_GENERATION_RUN_DAYS: int = Field(default=0, env="API_RETENTION_GENERATION_RUN_DAYS")
+    API_RETENTION_GENERATION_RUN_ACTION: str = Field(default="drop", env="API_RETENTION_GENERATION_RUN_ACTION")
+    # issues are only read through their run, so keep them no longer than generation_run
+    API_RETENTION_VALIDATION_ISSUE_DAYS: int = Field(default=0, env="API_RETENTION_VALIDATION_ISSUE_DAYS")
+    API_RETENTION_VALIDATION_ISSUE_ACTION: str = Field(default="drop", env="API_RETENTION_VALIDATION_ISSUE_ACTION")
+    API_RETENTION_ARCHIVE_SCHEMA: str = Field(default="archive", env="API_RETENTION_ARCHIVE_SCHEMA")
+    API_BULK_BATCH_SIZE: int = Field(default=1000, env="API_BULK_BATCH_SIZE")
+    API_BULK_COPY_MIN_ROWS: int = Field(default=200, env="API_BULK_COPY_MIN_ROWS")  # 0 disables COPY
+    # Threads closed (or archived) longer than <days> move to thread_archive; 0 (default) disables the job.
+    API_ARCHIVE_AFTER_DAYS: int = Field(default=0, env="API_ARCHIVE_AFTER_DAYS")
+    API_ARCHIVE_STORAGE: str = Field(default="db", env="API_ARCHIVE_STORAGE")  # db|file
+    API_ARCHIVE_DIR: str = Field(default="/var/lib/dsl-hub/archive", env="API_ARCHIVE_DIR")
+    API_ARCHIVE_ZSTD_LEVEL: int = Field(default=10, env="API_ARCHIVE_ZSTD_LEVEL")
+    API_ARCHIVE_BATCH_SIZE: int = Field(default=100, env="API_ARCHIVE_BATCH_SIZE")
+    API_ARCHIVE_CACHE_SIZE: int = Field(default=32, env="API_ARCHIVE_CACHE_SIZE")  # decoded archives kept in memory
     API_IDEMPOTENCY_TTL_SEC: int = Field(default=300, env="API_IDEMPOTENCY_TTL_SEC")
     API_IDEMPOTENCY_CACHE_MAX: int = Field(default=1000, env="API_IDEMPOTENCY_CACHE_MAX")
+    API_IDEMPOTENCY_CACHE_MAX_BYTES: int = Field(default=33_554_432, env="API_IDEMPOTENCY_CACHE_MAX_BYTES")
+    API_IDEMPOTENCY_BACKEND: str = Field(default="postgres", env="API_IDEMPOTENCY_BACKEND")  # postgres|memory
+    API_IDEMPOTENCY_LOCK_TTL_SEC: int = Field(default=120, env="API_IDEMPOTENCY_LOCK_TTL_SEC")
+    API_IDEMPOTENCY_WAIT_TIMEOUT_SEC: int = Field(default=30, env="API_IDEMPOTENCY_WAIT_TIMEOUT_SEC")
+    API_IDEMPOTENCY_POLL_INTERVAL_MS: int = Field(default=200, env="API_IDEMPOTENCY_POLL_INTERVAL_MS")
+    API_RATE_LIMIT_BACKEND: str = Field(default="postgres", env="API_RATE_LIMIT_BACKEND")  # postgres|memory
+    API_RATE_LIMIT_MAX_KEYS: int = Field(default=100_000, env="API_RATE_LIMIT_MAX_KEYS")
+    # "<count>/<seconds>"; empty disables. Scope defaults, overridable per action.
+    API_RATE_LIMIT_THREAD: str = Field(default="", env="API_RATE_LIMIT_THREAD")
+    API_RATE_LIMIT_FLOW: str = Field(default="", env="API_RATE_LIMIT_FLOW")
+    API_RATE_LIMIT_CLIENT: str = Field(default="600/60", env="API_RATE_LIMIT_CLIENT")
+    API_RATE_LIMIT_MESSAGES_THREAD: Optional[str] = Field(default="30/60", env="API_RATE_LIMIT_MESSAGES_THREAD")
+    API_RATE_LIMIT_AGENT_RUN_THREAD: Optional[str] = Field(default="10/60", env="API_RATE_LIMIT_AGENT_RUN_THREAD")
+    API_RATE_LIMIT_SUMMARY_THREAD: Optional[str] = Field(default="6/60", env="API_RATE_LIMIT_SUMMARY_THREAD")
+    API_RATE_LIMIT_SUMMARY_FLOW: Optional[str] = Field(default="6/60", env="API_RATE_LIMIT_SUMMARY_FLOW")
+    API_ADMISSION_ENABLED: bool = Field(default=True, env="API_ADMISSION_ENABLED")
+    API_ADMISSION_SAMPLE_INTERVAL_MS: int = Field(default=100, env="API_ADMISSION_SAMPLE_INTERVAL_MS")
+    API_ADMISSION_LOOP_LAG_MS: int = Field(default=200, env="API_ADMISSION_LOOP_LAG_MS")
+    # DB pool checkout wait (primary sync and async pools) at which the pool counts as saturated
+    API_ADMISSION_POOL_WAIT_MS: int = Field(default=100, env="API_ADMISSION_POOL_WAIT_MS")
+    API_ADMISSION_AGENT_BACKLOG: int = Field(default=50, env="API_ADMISSION_AGENT_BACKLOG")
+    API_ADMISSION_SEVERE_PRESSURE: float = Field(default=1.5, env="API_ADMISSION_SEVERE_PRESSURE")
+    API_ADMISSION_RETRY_AFTER_SEC: int = Field(default=5, env="API_ADMISSION_RETRY_AFTER_SEC")
     API_LLM_TIMEOUT: int = Field(default=30, env="API_LLM_TIMEOUT")
     API_LLM_RETRIES: int = Field(default=3, env="API_LLM_RETRIES")
     API_OPENAI_API_KEY: Optional[str] = Field(default=None, env="API_OPENAI_API_KEY")
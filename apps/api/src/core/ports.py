@@ -79,3 +79,4 @@ class CompatRuleRepo(Protocol):
 
 class AgentLogRepo(Protocol):
     def write(self, run_id: str, thread_id: str, flow_id: str, step: str, level: str, message: str, data: dict | None = None) -> None: ...
+    def write_many(self, entries: Iterable[dict]) -> int: ...
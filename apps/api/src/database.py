@@ -1,15 +1,19 @@
 from __future__ import annotations
 
 import os
-from contextlib import contextmanager
-from typing import Iterator, Optional
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Iterator, Optional
 
 from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.engine import default as _default
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, declarative_base, sessionmaker
 
 from .config import settings
+from .metrics import DB_COMPILE_CACHE
+from .pool_stats import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_pool
 
 # --- Build URL & extract ?schema=... from DSN --------------------------------
 url = make_url(settings.dsn)
@@ -26,15 +30,89 @@ Base = declarative_base()
 # --- Create engine / SessionLocal only when NOT running Alembic ---------------
 engine: Optional[Engine] = None
 SessionLocal: Optional[sessionmaker[Session]] = None
+# Async twin for the request and agent hot paths; same DSN, separate pool
+async_engine: Optional[AsyncEngine] = None
+AsyncSessionLocal: Optional[async_sessionmaker[AsyncSession]] = None
+
+
+def _search_path(schema_name: str):
+    def _set_search_path(dbapi_connection, connection_record) -> None:
+        # plain cursor calls: the async driver's adapted cursor is not a context manager
+        cur = dbapi_connection.cursor()
+        try:
+            # include public for safety, so extensions remain visible
+            cur.execute(f"SET search_path TO {schema_name}, public")
+        finally:
+            cur.close()
+    return _set_search_path
+
+
+def _connect_args(db_url) -> dict:
+    # psycopg 3: server-side prepare after N executions on a connection (None = never)
+    if db_url.get_driver_name() != "psycopg":
+        return {}
+    n = settings.API_DB_PREPARE_THRESHOLD
+    return {"prepare_threshold": n if n >= 0 else None}
+
+
+_CACHE_RESULTS = {
+    _default.CACHE_HIT: "hit",
+    _default.CACHE_MISS: "miss",
+    _default.CACHING_DISABLED: "disabled",
+    _default.NO_CACHE_KEY: "uncacheable",
+    _default.NO_DIALECT_SUPPORT: "unsupported",
+}
+
+
+def instrument_compile_cache(target: Engine, name: str) -> None:
+    """Count statements on `target` by compiled-cache outcome (db_compile_cache_total)."""
+    def _after_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        # context is None for exec_driver_sql on a raw cursor
+        result = _CACHE_RESULTS.get(getattr(context, "cache_hit", None))
+        if result is not None:
+            DB_COMPILE_CACHE.labels(name, result).inc()
+
+    event.listen(target, "after_cursor_execute", _after_execute)
+
+
+def _pool_args(name: str, poolclass=InstrumentedQueuePool, *, size: Optional[int] = None,
+               overflow: Optional[int] = None) -> dict:
+    return dict(
+        poolclass=poolclass,
+        pool_logging_name=name,  # also the pool label on the db_pool_* metrics
+        pool_size=settings.API_DB_POOL_SIZE if size is None else size,
+        max_overflow=settings.API_DB_MAX_OVERFLOW if overflow is None else overflow,
+        pool_timeout=settings.API_DB_POOL_TIMEOUT_SEC,
+    )
+
+
+def create_replica_engine(dsn: str, name: str = "replica") -> Engine:
+    """Sync engine for a read replica; its ?schema= defaults to the primary's."""
+    replica_url = make_url(dsn)
+    q = dict(replica_url.query)
+    replica_schema = q.pop("schema", None) or schema
+    replica_engine = create_engine(
+        str(replica_url.set(query=q)),
+        pool_pre_ping=True,
+        future=True,
+        connect_args=_connect_args(replica_url),
+        **_pool_args(name),
+    )
+    instrument_compile_cache(replica_engine, name)
+    instrument_pool(replica_engine, name)
+    if replica_schema:
+        event.listen(replica_engine, "connect", _search_path(replica_schema))
+    return replica_engine
+
 
 if not os.getenv("ALEMBIC"):
     # NOTE: str(url) to pass a DBAPI-compatible URL to create_engine
     engine = create_engine(
         str(url),
         pool_pre_ping=True,
-        pool_size=10,
-        max_overflow=20,
         future=True,
+        connect_args=_connect_args(url),
+        **_pool_args("primary"),
     )
     SessionLocal = sessionmaker(
         bind=engine,
@@ -44,13 +122,30 @@ if not os.getenv("ALEMBIC"):
         expire_on_commit=False,
     )
 
+    async_engine = create_async_engine(
+        str(url),
+        pool_pre_ping=True,
+        connect_args=_connect_args(url),
+        # its own budget: the sync and async primary pools together bound the worker's connections
+        **_pool_args("primary_async", InstrumentedAsyncQueuePool, size=settings.API_DB_ASYNC_POOL_SIZE,
+                     overflow=settings.API_DB_ASYNC_MAX_OVERFLOW),
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+    instrument_compile_cache(engine, "primary")
+    instrument_compile_cache(async_engine.sync_engine, "primary_async")
+    instrument_pool(engine, "primary")
+    instrument_pool(async_engine.sync_engine, "primary_async")
+
     # Set search_path if ?schema=... was provided
     if schema:
-        @event.listens_for(engine, "connect")
-        def _set_search_path(dbapi_connection, connection_record) -> None:
-            with dbapi_connection.cursor() as cur:
-                # include public for safety, so extensions remain visible
-                cur.execute(f"SET search_path TO {schema}, public")
+        event.listen(engine, "connect", _search_path(schema))
+        event.listen(async_engine.sync_engine, "connect", _search_path(schema))
 
 # --- DB session provider (only valid in app/runtime, not in Alembic) ----------
 @contextmanager
@@ -70,3 +165,21 @@ def get_db() -> Iterator[Session]:
         raise
     finally:
         db.close()
+
+
+@asynccontextmanager
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Async counterpart of get_db(): commits on success, rolls back on error.
+    Lazy loads are not available on an AsyncSession; sync-only helpers can be
+    reused through `await db.run_sync(fn, *args)`.
+    """
+    if AsyncSessionLocal is None:
+        raise RuntimeError("AsyncSessionLocal is not initialized (likely running under Alembic).")
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+            await db.commit()
+        except SQLAlchemyError:
+            await db.rollback()
+            raise
@@ -5,6 +5,7 @@ from fastapi import Depends
 from sqlalchemy.orm import Session
 
 from .database import get_db
+from .replicas import get_read_db
 from .infrastructure.sqlalchemy_repos import SAThreadRepo, SAMessageRepo
 from .infrastructure.uow_sqlalchemy import SAUnitOfWork
 from .application.messages import CreateMessage, ListMessages
@@ -14,6 +15,14 @@ def sa_session() -> Iterator[Session]:
     with get_db() as db:
         yield db
 
+# legacy name used by the routers
+db_session = sa_session
+
+def read_session() -> Iterator[Session]:
+    """Session for read-only handlers; served by a replica when one is caught up."""
+    with get_read_db() as db:
+        yield db
+
 def thread_repo(db: Session = Depends(sa_session)) -> SAThreadRepo:
     return SAThreadRepo(db)
 
@@ -92,10 +101,9 @@ from .application.agent import StartAgentRun
 from .services.llm import LLMClient as LegacyLLMClient  # fallback
 from .services.similarity_service import SimilarityService as LegacySimilarity
 from .agent.graph import AgentRunner
-from .database import SessionLocal
 
 def agent_runner(sim: LegacySimilarity = Depends(similarity), llm_client: LegacyLLMClient = Depends(llm)) -> AgentRunner:
-    return AgentRunner(session_factory=SessionLocal, similarity_service=sim, llm_client=llm_client)
+    return AgentRunner(similarity_service=sim, llm_client=llm_client)
 
 def uc_start_agent_run(r: AgentRunner = Depends(agent_runner)) -> StartAgentRun:
     return StartAgentRun(r)
@@ -122,17 +130,18 @@ def summarizer(llm_client = Depends(llm)) -> LLMSummarizer:
     # LLMSummarizer wraps LLM client; LLMSummarizer creates its own OpenAILLM if llm_client is None
     from .infrastructure.llm_openai import OpenAILLM
     return LLMSummarizer(OpenAILLM())
-def uc_generate_thread_summary(m = Depends(message_repo), t = Depends(thread_repo), ts = Depends(thread_summary_repo), s = Depends(summarizer), eb = Depends(event_bus)) -> GenerateThreadSummary:
-    return GenerateThreadSummary(m, t, ts, s, eb)
-def uc_refresh_flow_summary(ts = Depends(thread_summary_repo), fs = Depends(flow_summary_repo), s = Depends(summarizer), eb = Depends(event_bus)) -> RefreshFlowSummary:
-    return RefreshFlowSummary(ts, fs, s, eb)
-
 from .infrastructure.event_bus import SSEEventBus
 
 
 def event_bus() -> SSEEventBus:
     return SSEEventBus()
 
+def uc_generate_thread_summary(m = Depends(message_repo), t = Depends(thread_repo), ts = Depends(thread_summary_repo), s = Depends(summarizer), eb = Depends(event_bus)) -> GenerateThreadSummary:
+    return GenerateThreadSummary(m, t, ts, s, eb)
+def uc_refresh_flow_summary(ts = Depends(thread_summary_repo), fs = Depends(flow_summary_repo), s = Depends(summarizer), eb = Depends(event_bus)) -> RefreshFlowSummary:
+    return RefreshFlowSummary(ts, fs, s, eb)
+
+
 from .infrastructure.prompt_repo import SAPromptTemplateRepo
 from .infrastructure.compat_repo import SACompatRuleRepo
 from .infrastructure.agent_log_repo import SAAgentLogRepo
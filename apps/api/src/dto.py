@@ -11,6 +11,10 @@ class FlowOut(BaseModel):
     name: str
     has_published: bool = False
     active_version: Optional[str] = None
+    pipeline_count: int = 0
+    thread_count: int = 0
+    open_thread_count: int = 0
+    last_activity_at: Optional[str] = None
 
 class UpdateFlow(BaseModel):
     name: Optional[str] = Field(default=None, min_length=1, max_length=100)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+from datetime import UTC, datetime, timedelta
+from typing import Optional, Union
+
+# UUIDv7 (RFC 9562): 48-bit unix ms | ver 7 | 12-bit counter | variant | 62 random bits.
+# Ids from one process are strictly increasing: within a millisecond the counter (rand_a) is
+# bumped, and if it runs out the timestamp is borrowed from the next millisecond.
+_EPOCH = datetime(1970, 1, 1)
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    global _last_ms, _counter
+    with _lock:
+        now = time.time_ns() // 1_000_000
+        if now > _last_ms:
+            _last_ms = now
+            _counter = int.from_bytes(os.urandom(2), "big") & 0x3FF  # leave headroom before 0xFFF
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_ms += 1
+                _counter = 0
+        ts, seq = _last_ms, _counter
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (ts & ((1 << 48) - 1)) << 80 | 0x7 << 76 | seq << 64 | 0b10 << 62 | rand_b
+    return uuid.UUID(int=value)
+
+
+def new_id() -> str:
+    """Primary key for any new row: a time-ordered UUIDv7 string."""
+    return str(uuid7())
+
+
+def id_time(value: Union[str, uuid.UUID, None]) -> Optional[datetime]:
+    """Naive UTC creation time (ms precision) embedded in a UUIDv7; None for other ids."""
+    if value is None:
+        return None
+    try:
+        u = value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except ValueError:
+        return None
+    if u.version != 7:
+        return None
+    return _EPOCH + timedelta(milliseconds=u.int >> 80)
+
+
+def created_at_from_id(context) -> datetime:
+    """Column default: created_at equal to the row id's timestamp, so (created_at, id) sorts like id."""
+    return id_time(context.get_current_parameters().get("id")) or datetime.now(UTC).replace(tzinfo=None)
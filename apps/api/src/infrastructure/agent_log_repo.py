@@ -1,12 +1,28 @@
 from __future__ import annotations
 
+from typing import Iterable
+
 from sqlalchemy.orm import Session
 from ..models import AgentLog
 from ..core.ports import AgentLogRepo
-from uuid import uuid4
+from ..repositories.bulk import bulk_insert
+from ..ids import id_time, new_id
+
+
+def _row(run_id: str, thread_id: str, flow_id: str, step: str, level: str, message: str, data: dict | None = None) -> dict:
+    # agent_log has no run/step/message columns: step is the event name, the rest rides in data
+    log_id = new_id()
+    # explicit created_at: the COPY path skips column defaults
+    return {
+        "id": log_id, "created_at": id_time(log_id), "thread_id": thread_id, "flow_id": flow_id, "level": level, "event": step,
+        "data": {"run_id": run_id, "message": message, **(data or {})},
+    }
+
 
 class SAAgentLogRepo(AgentLogRepo):
     def __init__(self, db: Session): self.db = db
     def write(self, run_id: str, thread_id: str, flow_id: str, step: str, level: str, message: str, data: dict | None = None) -> None:
-        row = AgentLog(id=str(uuid4()), run_id=run_id, thread_id=thread_id, flow_id=flow_id, step=step, level=level, message=message, data=data or {})
-        self.db.add(row)
\ No newline at end of file
+        self.write_many([dict(run_id=run_id, thread_id=thread_id, flow_id=flow_id, step=step, level=level, message=message, data=data)])
+    def write_many(self, entries: Iterable[dict]) -> int:
+        """Entries take write()'s keyword arguments; all go out in one batch."""
+        return bulk_insert(self.db, AgentLog.__table__, [_row(**e) for e in entries])
@@ -7,6 +7,7 @@ from ..models import Flow, Pipeline, ThreadSummary
 from ..repositories import flow_repo as legacy_flow_repo
 from ..repositories import pipeline_repo as legacy_pipeline_repo
 from ..repositories import thread_summary_repo as legacy_ts_repo
+from ..ids import new_id
 
 class SAFlowRepo:
     def __init__(self, db: Session): self.db = db
@@ -72,8 +73,7 @@ class SAFlowSummaryRepo:
             cur.is_active = False
             self.db.add(cur)
         # New version
-        import uuid
         version = (cur.version + 1) if cur else 1
-        fs = FlowSummary(id=str(uuid.uuid4()), flow_id=flow_id, version=version, content=content, last_message_id=last_message_id, is_active=True)
+        fs = FlowSummary(id=new_id(), flow_id=flow_id, version=version, content=content, last_message_id=last_message_id, is_active=True)
         self.db.add(fs); self.db.flush(); self.db.refresh(fs)
         return {"version": fs.version, "content": fs.content, "last_message_id": str(fs.last_message_id) if fs.last_message_id else None}
@@ -5,4 +5,4 @@ from ..sse import bus
 
 class SSEEventBus(EventBusPort):
     def publish(self, data: dict, *, channel: str | None = None) -> None:
-        bus.publish(data, channel=channel)
\ No newline at end of file
+        bus.publish_nowait(channel or "global", str(data.get("kind") or "message"), data)
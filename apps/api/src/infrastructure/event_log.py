@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from ..database import get_db
+from ..replicas import get_read_db, replica_router
+from ..repositories.event_log_repo import EventLogRepo
+from ..metrics import SSE_EVENT_LOG_WRITES, SSE_EVENT_LOG_FLUSH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+def _count(status: str, n: int = 1) -> None:
+    try:
+        SSE_EVENT_LOG_WRITES.labels(status=status).inc(n)
+    except (ValueError, TypeError, RuntimeError):
+        pass
+
+
+class EventLogWriter:
+    """Batches published SSE events into the `sse_event` table off the request path.
+
+    `submit` never blocks: when the queue is full the event is dropped (it is still
+    available from the in-memory replay buffer) and counted as `dropped`.
+    """
+
+    def __init__(self, *, batch_size: int = 200, flush_interval: float = 0.25, queue_max: int = 10_000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize=queue_max)
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        # primary WAL position after the last flush; replay reads only use replicas past it
+        self._flushed_lsn: Optional[int] = None
+
+    def submit(self, item: Dict[str, Any]) -> None:
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            _count("dropped")
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # best effort: persist what is still queued
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=timeout))
+                except asyncio.TimeoutError:
+                    break
+            async with self._lock:
+                await self._write(batch)
+
+    async def flush(self) -> None:
+        """Write everything currently queued; used before reading the log back."""
+        async with self._lock:
+            while not self._queue.empty():
+                batch: List[Dict[str, Any]] = []
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                await self._write(batch)
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        if not batch:
+            return
+        t0 = time.perf_counter()
+        try:
+            written = await asyncio.to_thread(self._write_sync, batch)
+            _count("ok", written)
+            if written < len(batch):
+                _count("conflict", len(batch) - written)
+        except Exception as e:
+            logger.warning("sse event log flush failed (%d events): %s", len(batch), e)
+            _count("error", len(batch))
+        finally:
+            try:
+                SSE_EVENT_LOG_FLUSH_SECONDS.observe(time.perf_counter() - t0)
+            except (ValueError, TypeError, RuntimeError):
+                pass
+
+    def _write_sync(self, batch: List[Dict[str, Any]]) -> int:
+        with get_db() as db:
+            written = EventLogRepo(db).insert_many(batch)
+        if replica_router.enabled:
+            try:
+                self._flushed_lsn = replica_router.current_lsn_sync()
+            except Exception as e:
+                logger.warning("could not read primary WAL position after flush: %s", e)
+        return written
+
+    async def read_after(self, channel: str, after_seq: int, limit: int) -> List[Dict[str, Any]]:
+        await self.flush()
+
+        def _read() -> List[Dict[str, Any]]:
+            with get_read_db(self._flushed_lsn) as db:
+                return EventLogRepo(db).list_after(channel, after_seq, limit)
+        return await asyncio.to_thread(_read)
+
+    async def contains(self, channel: str, seq: int) -> bool:
+        await self.flush()
+
+        def _read() -> bool:
+            with get_read_db(self._flushed_lsn) as db:
+                return EventLogRepo(db).has_at_or_before(channel, seq)
+        return await asyncio.to_thread(_read)
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import json
+import zlib
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Set
+
+import numpy as np
+
+# Structural fingerprint of a DSL document: what it is built from, not what it says.
+# Features are the trigger, source, action and connection kinds (vocabulary from the v1.0.0
+# schema $defs), how they are wired (connectionRef targets, source/trigger -> rule action,
+# action -> fallback/onError/finally) and repeat counts. Ids, names, descriptions, urls and
+# expressions are ignored. The feature set is hashed into a BITS-bit set; Jaccard over the
+# bitsets approximates Jaccard over the feature sets.
+BITS = 512
+WORDS = BITS // 64
+
+_SCHEMA = Path(__file__).resolve().parent.parent / "schemas" / "v1.0.0.json"
+_NESTED_ACTIONS = ("fallback", "onError", "finally")
+
+
+@lru_cache(maxsize=1)
+def vocabulary() -> Dict[str, FrozenSet[str]]:
+    """Known kinds per feature family, from the DSL schema."""
+    schema = json.loads(_SCHEMA.read_text(encoding="utf-8"))
+    defs = schema["$defs"]
+    (conn,) = schema["properties"]["connections"]["patternProperties"].values()
+    return {
+        "trigger": frozenset(defs["trigger"]["properties"]["type"]["enum"]),
+        "source": frozenset(defs["sourceBase"]["properties"]["type"]["enum"]),
+        "action": frozenset(defs["actionBase"]["properties"]["type"]["enum"]),
+        "connection": frozenset(conn["properties"]["type"]["enum"]),
+    }
+
+
+def _kind(family: str, value: Any) -> str:
+    return value if isinstance(value, str) and value in vocabulary()[family] else "other"
+
+
+def _list(value: Any) -> List[Dict[str, Any]]:
+    return [v for v in value if isinstance(v, dict)] if isinstance(value, list) else []
+
+
+def _actions(actions: Any, parent: str | None = None) -> Iterator[tuple[str | None, str, str]]:
+    """(parent kind, relation, kind) for each action, descending into fallback/onError/finally."""
+    for a in _list(actions):
+        kind = _kind("action", a.get("type"))
+        yield parent, "do", kind
+        for rel in _NESTED_ACTIONS:
+            for _, _, child in _actions(a.get(rel)):
+                yield kind, rel, child
+
+
+def features(content: Any) -> Set[str]:
+    if not isinstance(content, dict):
+        return set()
+    out: List[str] = []
+    connections = content.get("connections") if isinstance(content.get("connections"), dict) else {}
+    conn_kind = {name: _kind("connection", c.get("type")) for name, c in connections.items() if isinstance(c, dict)}
+    out += [f"connection:{k}" for k in conn_kind.values()]
+
+    source_kind: Dict[str, str] = {}
+    for s in _list(content.get("sources")):
+        kind = _kind("source", s.get("type"))
+        source_kind[str(s.get("id"))] = kind
+        out.append(f"source:{kind}")
+        if s.get("connectionRef") in conn_kind:
+            out.append(f"uses:{kind}>{conn_kind[s['connectionRef']]}")
+
+    def action_features(actions: Any, heads: Iterable[str]) -> None:
+        heads = list(heads)
+        for parent, rel, kind in _actions(actions):
+            out.append(f"action:{kind}")
+            if parent is None:
+                out.extend(f"edge:{h}>{kind}" for h in heads)
+            else:
+                out.append(f"edge:{parent}>{rel}>{kind}")
+        for a in _list(actions):
+            if a.get("connectionRef") in conn_kind:
+                out.append(f"uses:{_kind('action', a.get('type'))}>{conn_kind[a['connectionRef']]}")
+
+    action_features(content.get("actions"), [])
+    for p in _list(content.get("pipelines")):
+        heads = [f"source:{source_kind.get(str(s), 'other')}" for s in p.get("sources") or [] if isinstance(s, str)]
+        for t in _list(p.get("triggers")):
+            kind = _kind("trigger", t.get("type"))
+            out.append(f"trigger:{kind}")
+            heads.append(f"trigger:{kind}")
+        for r in _list(p.get("rules")):
+            out.append("rule:when" if r.get("when") is not None else "rule")
+            action_features(r.get("do"), heads)
+            action_features(r.get("else"), [f"else:{h}" for h in heads])
+        sm = p.get("stateMachine")
+        if isinstance(sm, dict):
+            out.append("stateMachine")
+            out += ["transition"] * len(_list(sm.get("transitions")))
+            for st in _list(sm.get("states")):
+                action_features(st.get("onEnter"), ["state:enter"])
+                action_features(st.get("onExit"), ["state:exit"])
+
+    # keep multiplicity: the second kafka source is a different feature from the first
+    counts: Counter = Counter()
+    result: Set[str] = set()
+    for f in out:
+        counts[f] += 1
+        result.add(f if counts[f] == 1 else f"{f}#{counts[f]}")
+    return result
+
+
+def fingerprint(content: Any) -> np.ndarray:
+    """BITS-bit set of the structural features, as WORDS uint64 words."""
+    bits = np.zeros(BITS, dtype=bool)
+    for f in features(content):
+        bits[zlib.crc32(f.encode()) % BITS] = True
+    return np.packbits(bits).view(np.uint64).copy()
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    union = int(np.bitwise_count(a | b).sum())
+    return int(np.bitwise_count(a & b).sum()) / union if union else 0.0
+
+
+def jaccard_many(matrix: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """Jaccard of `fp` against every row of an (n, WORDS) fingerprint matrix."""
+    inter = np.bitwise_count(matrix & fp).sum(axis=1, dtype=np.float32)
+    union = np.bitwise_count(matrix | fp).sum(axis=1, dtype=np.float32)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.nan_to_num(inter / union)
+
+
+def jaccard_matrix(queries: np.ndarray, matrix: np.ndarray, chunk: int = 1 << 20) -> np.ndarray:
+    """(m, n) Jaccard of each query row against each matrix row, in slabs of about `chunk` pairs."""
+    out = np.zeros((len(queries), len(matrix)), dtype=np.float32)
+    step = max(1, chunk // max(len(matrix), 1))
+    for i in range(0, len(queries), step):
+        q = queries[i:i + step, None, :]
+        inter = np.bitwise_count(q & matrix).sum(axis=2, dtype=np.float32)
+        union = np.bitwise_count(q | matrix).sum(axis=2, dtype=np.float32)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[i:i + step] = np.nan_to_num(inter / union)
+    return out
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+from typing import Dict, List, Optional, Protocol, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from ..database import get_db
+from ..models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    timestamp: float
+    body_hash: str
+    status_code: int
+    headers: List[Tuple[str, str]]  # (name, value) pairs as sent, so repeated headers survive
+    content: bytes
+    media_type: str
+
+
+@dataclass
+class Reservation:
+    state: str  # acquired|in_progress|completed
+    body_hash: str
+    response: Optional[CachedResponse] = None
+    token: Optional[str] = None  # set on "acquired": proves ownership to complete/release
+
+
+class IdempotencyStore(Protocol):
+    async def reserve(self, key: str, body_hash: str, *, lock_ttl: float) -> Reservation: ...
+    async def get(self, key: str) -> Optional[Reservation]: ...
+    async def complete(self, key: str, response: CachedResponse, *, ttl: float, token: str) -> None: ...
+    async def release(self, key: str, *, token: str) -> None: ...
+
+
+class MemoryIdempotencyStore:
+    """Single-process store; only dedupes requests that hit the same worker."""
+
+    def __init__(self):
+        self._rows: Dict[str, tuple[Reservation, float]] = {}
+
+    async def reserve(self, key: str, body_hash: str, *, lock_ttl: float) -> Reservation:
+        now = time.time()
+        row = self._rows.get(key)
+        if row is not None and row[1] > now:
+            return row[0]
+        token = uuid.uuid4().hex
+        self._rows[key] = (Reservation("in_progress", body_hash, token=token), now + lock_ttl)
+        return Reservation("acquired", body_hash, token=token)
+
+    async def get(self, key: str) -> Optional[Reservation]:
+        row = self._rows.get(key)
+        if row is None or row[1] <= time.time():
+            return None
+        return row[0]
+
+    def _owns(self, key: str, token: str) -> bool:
+        row = self._rows.get(key)
+        return row is not None and row[0].state == "in_progress" and row[0].token == token
+
+    async def complete(self, key: str, response: CachedResponse, *, ttl: float, token: str) -> None:
+        if not self._owns(key, token):
+            logger.warning("idempotency key %s is no longer owned by this request; result not stored", key)
+            return
+        self._rows[key] = (Reservation("completed", response.body_hash, response), time.time() + ttl)
+        # opportunistic cleanup keeps the dict bounded by the live key set
+        if len(self._rows) > 10_000:
+            now = time.time()
+            self._rows = {k: v for k, v in self._rows.items() if v[1] > now}
+
+    async def release(self, key: str, *, token: str) -> None:
+        if self._owns(key, token):
+            self._rows.pop(key, None)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+def _headers(stored) -> List[Tuple[str, str]]:
+    # rows written before headers were kept as pairs hold a name -> value object
+    pairs = stored.items() if isinstance(stored, dict) else stored or []
+    return [(name, value) for name, value in pairs]
+
+
+def _to_reservation(row: IdempotencyKey) -> Reservation:
+    if row.state != "completed":
+        return Reservation("in_progress", row.body_hash)
+    return Reservation("completed", row.body_hash, CachedResponse(
+        timestamp=row.created_at.replace(tzinfo=UTC).timestamp(),
+        body_hash=row.body_hash,
+        status_code=row.status_code,
+        headers=_headers(row.headers),
+        content=bytes(row.content or b""),
+        media_type=row.media_type or "application/json",
+    ))
+
+
+class PostgresIdempotencyStore:
+    """Shared store: the first worker to INSERT the key owns it until it completes,
+    releases, or its lock expires (so a crashed worker cannot block a key forever).
+    Ownership is a random reservation token: once a lock expires and another worker takes
+    the key, the late owner's complete/release match nothing instead of clobbering it.
+    """
+
+    def _reserve_sync(self, key: str, body_hash: str, lock_ttl: float) -> Reservation:
+        now = _utcnow()
+        token = uuid.uuid4().hex
+        with get_db() as db:
+            # expired rows (finished or abandoned) no longer own the key
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at <= now))
+            got = db.execute(
+                insert(IdempotencyKey)
+                .values(key=key, body_hash=body_hash, state="in_progress", token=token,
+                        created_at=now, expires_at=now + timedelta(seconds=lock_ttl))
+                .on_conflict_do_nothing(index_elements=[IdempotencyKey.key])
+                .returning(IdempotencyKey.key)
+            ).first()
+            if got is not None:
+                return Reservation("acquired", body_hash, token=token)
+            row = db.get(IdempotencyKey, key)
+            if row is None:
+                # owner released between our INSERT and SELECT; let the caller retry
+                return Reservation("in_progress", body_hash)
+            return _to_reservation(row)
+
+    def _get_sync(self, key: str) -> Optional[Reservation]:
+        with get_db() as db:
+            row = db.execute(
+                select(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at > _utcnow())
+            ).scalar_one_or_none()
+            return _to_reservation(row) if row is not None else None
+
+    def _complete_sync(self, key: str, response: CachedResponse, ttl: float, token: str) -> None:
+        with get_db() as db:
+            done = db.execute(
+                update(IdempotencyKey)
+                .where(IdempotencyKey.key == key, IdempotencyKey.state == "in_progress", IdempotencyKey.token == token)
+                .values(state="completed", status_code=response.status_code, headers=response.headers,
+                        content=response.content, media_type=response.media_type,
+                        expires_at=_utcnow() + timedelta(seconds=ttl))
+            ).rowcount
+        if not done:
+            logger.warning("idempotency key %s is no longer owned by this request; result not stored", key)
+
+    def _release_sync(self, key: str, token: str) -> None:
+        with get_db() as db:
+            db.execute(delete(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.state == "in_progress",
+                                                    IdempotencyKey.token == token))
+
+    async def reserve(self, key: str, body_hash: str, *, lock_ttl: float) -> Reservation:
+        return await asyncio.to_thread(self._reserve_sync, key, body_hash, lock_ttl)
+
+    async def get(self, key: str) -> Optional[Reservation]:
+        return await asyncio.to_thread(self._get_sync, key)
+
+    async def complete(self, key: str, response: CachedResponse, *, ttl: float, token: str) -> None:
+        await asyncio.to_thread(self._complete_sync, key, response, ttl, token)
+
+    async def release(self, key: str, *, token: str) -> None:
+        await asyncio.to_thread(self._release_sync, key, token)
+
+
+def purge_expired_keys() -> int:
+    """Delete expired reservations/results; run periodically by the retention worker."""
+    with get_db() as db:
+        return db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= _utcnow())).rowcount or 0
+
+
+def build_store(backend: str) -> IdempotencyStore:
+    if backend == "postgres":
+        return PostgresIdempotencyStore()
+    if backend == "memory":
+        return MemoryIdempotencyStore()
+    raise ValueError(f"unknown idempotency backend: {backend}")
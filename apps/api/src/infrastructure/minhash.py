@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import json
+import re
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# MinHash over token shingles of the canonical (sorted-key) JSON of a DSL document, with a
+# banded LSH table for candidate lookup. Signatures are stored in pipeline.minhash, so the
+# permutation count and seed are part of the format: changing them needs a backfill.
+NUM_PERM = 128
+BANDS = 16  # 8 rows per band: pairs above ~0.7 Jaccard share a bucket with high probability
+ROWS = NUM_PERM // BANDS
+SHINGLE = 3
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_PRIME = (1 << 61) - 1
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, _PRIME, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERM, dtype=np.uint64)
+_EMPTY = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+
+def shingles(content: Any) -> Set[int]:
+    """crc32 of each run of SHINGLE tokens in the canonical JSON of `content`."""
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    tokens = _TOKEN.findall(canonical.lower())
+    if len(tokens) < SHINGLE:
+        return {zlib.crc32(" ".join(tokens).encode())} if tokens else set()
+    return {zlib.crc32(" ".join(tokens[i:i + SHINGLE]).encode()) for i in range(len(tokens) - SHINGLE + 1)}
+
+
+def signature(content: Any) -> np.ndarray:
+    """NUM_PERM uint32 minimums of (a * h + b) mod p over the shingle hashes."""
+    hashes = np.fromiter(shingles(content), dtype=np.uint64)
+    if hashes.size == 0:
+        return _EMPTY.copy()
+    # a * h wraps around 2**64 on purpose: it mixes the bits, and the result is still deterministic
+    with np.errstate(over="ignore"):
+        values = (np.outer(hashes, _A) + _B) % _PRIME
+    return (values.min(axis=0) & 0xFFFFFFFF).astype(np.uint32)
+
+
+def to_bytes(sig: np.ndarray) -> bytes:
+    return sig.astype("<u4").tobytes()
+
+
+def from_bytes(raw: bytes) -> Optional[np.ndarray]:
+    if not raw or len(raw) != NUM_PERM * 4:
+        return None
+    return np.frombuffer(raw, dtype="<u4").astype(np.uint32)
+
+
+def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity: share of equal signature slots."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+class LSHIndex:
+    """Banded LSH buckets over MinHash signatures; not thread-safe, guarded by the owning FlowIndex."""
+
+    def __init__(self):
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = defaultdict(set)
+        self._sigs: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._sigs)
+
+    @staticmethod
+    def _keys(sig: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(BANDS):
+            yield band, sig[band * ROWS:(band + 1) * ROWS].tobytes()
+
+    def add(self, key: str, sig: np.ndarray) -> None:
+        self.remove(key)
+        self._sigs[key] = sig
+        for k in self._keys(sig):
+            self._buckets[k].add(key)
+
+    def remove(self, key: str) -> None:
+        old = self._sigs.pop(key, None)
+        if old is None:
+            return
+        for k in self._keys(old):
+            members = self._buckets.get(k)
+            if members is not None:
+                members.discard(key)
+                if not members:
+                    del self._buckets[k]
+
+    def signature(self, key: str) -> Optional[np.ndarray]:
+        return self._sigs.get(key)
+
+    def candidates(self, sig: np.ndarray) -> Set[str]:
+        out: Set[str] = set()
+        for k in self._keys(sig):
+            out |= self._buckets.get(k, set())
+        return out
+
+    def query(self, sig: np.ndarray, threshold: float) -> List[Tuple[str, float]]:
+        """Keys whose estimated Jaccard with `sig` is at least `threshold`, best first."""
+        hits = [(key, jaccard(sig, self._sigs[key])) for key in self.candidates(sig)]
+        return sorted((h for h in hits if h[1] >= threshold), key=lambda h: (-h[1], h[0]))
+
+    def clusters(self, threshold: float) -> List[List[str]]:
+        """Groups of keys linked by pairs at or above `threshold` (connected components), largest first."""
+        parent = {key: key for key in self._sigs}
+
+        def find(x: str) -> str:
+            while parent[x] != x:
+                parent[x] = parent[parent[x]]
+                x = parent[x]
+            return x
+
+        seen: Set[Tuple[str, str]] = set()
+        for members in self._buckets.values():
+            if len(members) < 2:
+                continue
+            ordered = sorted(members)
+            for i, a in enumerate(ordered):
+                for b in ordered[i + 1:]:
+                    if (a, b) in seen:
+                        continue
+                    seen.add((a, b))
+                    if find(a) != find(b) and jaccard(self._sigs[a], self._sigs[b]) >= threshold:
+                        parent[find(a)] = find(b)
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for key in self._sigs:
+            groups[find(key)].append(key)
+        return sorted((sorted(g) for g in groups.values() if len(g) > 1), key=lambda g: (-len(g), g[0]))
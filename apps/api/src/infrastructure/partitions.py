@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import logging
+import re
+from datetime import datetime, UTC
+from typing import List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+_IDENT_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _ident(name: str) -> str:
+    if not _IDENT_RE.match(name):
+        raise ValueError(f"invalid identifier: {name!r}")
+    return name
+
+
+def _month_start(dt: datetime, offset: int = 0) -> datetime:
+    idx = dt.year * 12 + (dt.month - 1) + offset
+    return datetime(idx // 12, idx % 12 + 1, 1)
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_{month:%Y%m}"
+
+
+def is_partitioned(db: Session, table: str) -> bool:
+    return db.execute(text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"),
+                      {"table": _ident(table)}).scalar() is True
+
+
+def ensure_monthly_partitions(db: Session, table: str, *, months_ahead: int = 1, now: datetime | None = None) -> List[str]:
+    """
+    Create monthly range partitions for the current month and `months_ahead` following ones.
+    A table that is missing or not partitioned yet (migration 9c1e7f3a2d84 not applied) is
+    skipped with a warning.
+    """
+    table = _ident(table)
+    if not is_partitioned(db, table):
+        logger.warning("%s is not a partitioned table; skipping its monthly partitions", table)
+        return []
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    created: List[str] = []
+    for offset in range(0, months_ahead + 1):
+        lo, hi = _month_start(now, offset), _month_start(now, offset + 1)
+        name = partition_name(table, lo)
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{lo:%Y-%m-%d}') TO ('{hi:%Y-%m-%d}')"
+        ))
+        created.append(name)
+    return created
+
+
+def list_partitions(db: Session, table: str) -> List[Tuple[str, datetime, datetime]]:
+    """Return (name, lower, upper) for every range partition attached to `table`."""
+    rows = db.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:table)"
+    ), {"table": _ident(table)}).all()
+    out: List[Tuple[str, datetime, datetime]] = []
+    for name, bound in rows:
+        m = _BOUND_RE.search(bound or "")
+        if not m:
+            # DEFAULT partition or non-range bound
+            continue
+        out.append((name, datetime.fromisoformat(m.group(1)), datetime.fromisoformat(m.group(2))))
+    return sorted(out, key=lambda p: p[1])
+
+
+def expire_partitions(db: Session, table: str, *, older_than: datetime, action: str = "drop",
+                      archive_schema: str = "archive") -> List[str]:
+    """
+    Detach partitions whose upper bound is <= older_than, then drop them (action='drop'), leave
+    them as standalone tables (action='detach') or move them into `archive_schema` (action='archive').
+    """
+    if action not in ("drop", "detach", "archive"):
+        raise ValueError(f"unsupported retention action: {action}")
+    table = _ident(table)
+    expired: List[str] = []
+    for name, _lo, hi in list_partitions(db, table):
+        if hi > older_than:
+            continue
+        db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {_ident(name)}"))
+        if action == "drop":
+            db.execute(text(f"DROP TABLE IF EXISTS {_ident(name)}"))
+        elif action == "archive":
+            db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {_ident(archive_schema)}"))
+            db.execute(text(f"ALTER TABLE {_ident(name)} SET SCHEMA {_ident(archive_schema)}"))
+        logger.info("partition %s %s (upper bound %s)", name, action, hi.date())
+        expired.append(name)
+    return expired
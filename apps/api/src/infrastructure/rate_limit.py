@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Protocol
+
+from sqlalchemy import text
+
+from ..database import get_db
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    limit: int
+    period: float  # seconds
+
+    @property
+    def interval(self) -> float:
+        return self.period / self.limit
+
+    @classmethod
+    def parse(cls, spec: str | None) -> Optional["RateLimit"]:
+        """Parse "30/60" (30 per 60 s) or "30" (per minute); empty or 0 disables."""
+        spec = (spec or "").strip()
+        if not spec:
+            return None
+        count, _, period = spec.partition("/")
+        limit = int(count)
+        if limit <= 0:
+            return None
+        return cls(limit=limit, period=float(period or 60))
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    retry_after: float = 0.0
+
+
+class RateLimitBackend(Protocol):
+    async def hit(self, key: str, rule: RateLimit) -> Decision: ...
+
+
+def _gcra(tat: float, now: float, rule: RateLimit) -> tuple[Decision, float]:
+    """Generic cell rate algorithm: one theoretical arrival time per key.
+
+    Allows bursts of `rule.limit` and then one request every `rule.interval`.
+    Returns the decision and the TAT to store (unchanged when denied).
+    """
+    new_tat = max(tat, now) + rule.interval
+    allow_at = new_tat - rule.period
+    if allow_at > now:
+        return Decision(False, allow_at - now), tat
+    return Decision(True), new_tat
+
+
+class MemoryRateLimiter:
+    """Per-process GCRA with an LRU of at most `max_keys` keys.
+
+    Keys whose TAT is in the past are indistinguishable from unseen keys, so
+    they are dropped from the cold end of the LRU as new keys arrive.
+    """
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._tat: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._tat)
+
+    def hit_sync(self, key: str, rule: RateLimit, now: float | None = None) -> Decision:
+        now = time.time() if now is None else now
+        decision, tat = _gcra(self._tat.get(key, 0.0), now, rule)
+        self._tat[key] = tat
+        self._tat.move_to_end(key)
+        while self._tat:
+            oldest_key, oldest_tat = next(iter(self._tat.items()))
+            if len(self._tat) > self.max_keys or oldest_tat <= now:
+                self._tat.popitem(last=False)
+            else:
+                break
+        return decision
+
+    async def hit(self, key: str, rule: RateLimit) -> Decision:
+        return self.hit_sync(key, rule)
+
+
+_UPSERT = text("""
+WITH c AS (SELECT extract(epoch FROM clock_timestamp())::float8 AS now)
+INSERT INTO rate_limit AS r (key, tat)
+SELECT :key, c.now + :interval FROM c
+ON CONFLICT (key) DO UPDATE
+    SET tat = GREATEST(r.tat, EXCLUDED.tat - :interval) + :interval
+    WHERE GREATEST(r.tat, EXCLUDED.tat - :interval) + :interval - :period <= EXCLUDED.tat - :interval
+RETURNING r.tat
+""")
+_RETRY_AFTER = text("""
+SELECT r.tat + :interval - :period - extract(epoch FROM clock_timestamp())::float8 FROM rate_limit r WHERE r.key = :key
+""")
+
+
+class PostgresRateLimiter:
+    """Shared GCRA: one conditional UPSERT per hit against the database clock, so all
+    workers enforce one budget. Idle rows are purged by `purge_idle_keys`."""
+
+    def _hit_sync(self, key: str, rule: RateLimit) -> Decision:
+        params = {"key": key, "interval": rule.interval, "period": rule.period}
+        with get_db() as db:
+            if db.execute(_UPSERT, params).first() is not None:
+                return Decision(True)
+            retry = db.execute(_RETRY_AFTER, params).scalar()
+            return Decision(False, max(0.0, float(retry or 0.0)))
+
+    async def hit(self, key: str, rule: RateLimit) -> Decision:
+        return await asyncio.to_thread(self._hit_sync, key, rule)
+
+
+def purge_idle_keys() -> int:
+    """Delete keys whose TAT has passed (they carry no state); run by the retention worker."""
+    with get_db() as db:
+        return db.execute(text(
+            "DELETE FROM rate_limit WHERE tat < extract(epoch FROM clock_timestamp())"
+        )).rowcount or 0
+
+
+class RateLimiter:
+    """Front for a backend; falls back to the in-process limiter if the shared one fails."""
+
+    def __init__(self, backend: RateLimitBackend, fallback: MemoryRateLimiter | None = None):
+        self.backend = backend
+        self.fallback = fallback or (backend if isinstance(backend, MemoryRateLimiter) else MemoryRateLimiter())
+
+    async def hit(self, key: str, rule: RateLimit) -> Decision:
+        if self.backend is self.fallback:
+            return self.fallback.hit_sync(key, rule)
+        try:
+            return await self.backend.hit(key, rule)
+        except Exception as e:
+            logger.warning("rate limit backend failed, using local limiter: %s", e)
+            return self.fallback.hit_sync(key, rule)
+
+
+def build_limiter(backend: str, *, max_keys: int) -> RateLimiter:
+    memory = MemoryRateLimiter(max_keys=max_keys)
+    if backend == "postgres":
+        return RateLimiter(PostgresRateLimiter(), memory)
+    if backend == "memory":
+        return RateLimiter(memory)
+    raise ValueError(f"unknown rate limit backend: {backend}")
@@ -0,0 +1,371 @@
+from __future__ import annotations
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Pipeline
+from . import fingerprint, minhash
+
+# In-process TF-IDF index of pipeline content, one matrix per flow.
+# Terms (word tokens and adjacent word pairs) are hashed into API_SIMILARITY_INDEX_DIM buckets;
+# each row holds log-scaled term counts. IDF weights are applied at query time, so adding a
+# pipeline is one row append plus a document-frequency update, and a top-k query is one
+# matrix-vector product. Each flow also keeps a MinHash LSH table (minhash.py) for near-duplicate
+# lookups on the canonical DSL, and a row-aligned matrix of structural fingerprints
+# (fingerprint.py) for shape-aware scoring.
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_PENDING = "similarity_index_pending"
+_DISCARD = "similarity_index_discard"
+_LOAD_CHUNK = 500  # ids per IN (...) when reconciling
+
+
+@dataclass(frozen=True)
+class Hit:
+    pipeline_id: str
+    version: str
+    score: float
+
+
+def pipeline_text(content: Any) -> str:
+    """Keys and scalar values of a DSL document, in document order."""
+    parts: List[str] = []
+    stack = [content]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for k, v in reversed(list(node.items())):
+                stack.append(v)
+                stack.append(str(k))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+        elif node is not None and not isinstance(node, bool):
+            parts.append(str(node))
+    return " ".join(parts)
+
+
+def _buckets(text: str, dim: int) -> np.ndarray:
+    tokens = _TOKEN.findall(text.lower())
+    mask = dim - 1
+    out = [zlib.crc32(t.encode()) & mask for t in tokens]
+    out += [zlib.crc32(f"{a} {b}".encode()) & mask for a, b in zip(tokens, tokens[1:])]
+    return np.fromiter(out, dtype=np.int64, count=len(out))
+
+
+def vectorize(text: str, dim: int) -> np.ndarray:
+    """log(1 + tf) over hashed terms, float32."""
+    return np.log1p(np.bincount(_buckets(text, dim), minlength=dim).astype(np.float32))
+
+
+class FlowIndex:
+    """Term matrix of one flow's pipelines. Thread-safe; rows are replaced in place on re-add."""
+
+    def __init__(self, dim: int):
+        if dim <= 0 or dim & (dim - 1):
+            raise ValueError("index dimension must be a power of two")
+        self.dim = dim
+        self.ids: List[str] = []
+        self.versions: List[str] = []
+        self._row: Dict[str, int] = {}
+        self._tf = np.zeros((0, dim), dtype=np.float32)
+        self._df = np.zeros(dim, dtype=np.float32)
+        self._norms: Optional[np.ndarray] = None  # |tf * idf| per row, dropped whenever df changes
+        self._shape = np.zeros((0, fingerprint.WORDS), dtype=np.uint64)
+        self._lsh = minhash.LSHIndex()
+        self._lock = threading.Lock()
+        self.checked_at: Optional[float] = None  # last load/reconcile against the database
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _grow(self, need: int) -> None:
+        if need <= self._tf.shape[0]:
+            return
+        tf = np.zeros((max(need, 2 * self._tf.shape[0], 16), self.dim), dtype=np.float32)
+        shape = np.zeros((tf.shape[0], fingerprint.WORDS), dtype=np.uint64)
+        tf[:len(self.ids)] = self._tf[:len(self.ids)]
+        shape[:len(self.ids)] = self._shape[:len(self.ids)]
+        self._tf, self._shape = tf, shape
+
+    def add_many(self, items: Iterable[Tuple[str, str, Any, Optional[bytes]]]) -> None:
+        """
+        (pipeline_id, version, content, minhash) rows; an id already present is replaced.
+        A missing or stale stored minhash is recomputed from content.
+        """
+        vectors = []
+        for pid, version, content, raw in items:
+            sig = minhash.from_bytes(raw) if raw is not None else None
+            if sig is None:
+                sig = minhash.signature(content)
+            vectors.append((str(pid), version, vectorize(pipeline_text(content), self.dim), sig,
+                            fingerprint.fingerprint(content)))
+        if not vectors:
+            return
+        with self._lock:
+            self._grow(len(self.ids) + len(vectors))
+            for pid, version, vec, sig, fp in vectors:
+                self._lsh.add(pid, sig)
+                row = self._row.get(pid)
+                if row is None:
+                    row = self._row[pid] = len(self.ids)
+                    self.ids.append(pid)
+                    self.versions.append(version)
+                else:
+                    self._df -= self._tf[row] > 0
+                    self.versions[row] = version
+                self._tf[row] = vec
+                self._shape[row] = fp
+                self._df += vec > 0
+            self._norms = None
+
+    def add(self, pipeline_id: str, version: str, content: Any, sig: Optional[bytes] = None) -> None:
+        self.add_many([(pipeline_id, version, content, sig)])
+
+    def known_ids(self) -> Set[str]:
+        with self._lock:
+            return set(self.ids)
+
+    def remove_many(self, pipeline_ids: Iterable[str]) -> None:
+        """Drop rows; the last row moves into each freed slot so the matrices stay dense."""
+        with self._lock:
+            for pid in pipeline_ids:
+                row = self._row.pop(str(pid), None)
+                if row is None:
+                    continue
+                self._lsh.remove(str(pid))
+                self._df -= self._tf[row] > 0
+                last = len(self.ids) - 1
+                if row != last:
+                    self._tf[row], self._shape[row] = self._tf[last], self._shape[last]
+                    self.ids[row], self.versions[row] = self.ids[last], self.versions[last]
+                    self._row[self.ids[row]] = row
+                self._tf[last] = 0
+                self._shape[last] = 0
+                self.ids.pop()
+                self.versions.pop()
+            self._norms = None
+
+    def _weights(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        n = len(self.ids)
+        tf = self._tf[:n]
+        idf = np.log((1.0 + n) / (1.0 + self._df)) + 1.0
+        w = (idf * idf).astype(np.float32)
+        if self._norms is None:
+            self._norms = np.sqrt(np.einsum("ij,ij,j->i", tf, tf, w))
+        return tf, w, self._norms
+
+    def _text_scores(self, q: np.ndarray) -> Optional[np.ndarray]:
+        tf, w, norms = self._weights()
+        qw = q * w
+        qnorm = float(np.sqrt(q @ qw))
+        if qnorm == 0.0:
+            return None
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.nan_to_num((tf @ qw) / (norms * qnorm))
+
+    def _top(self, scores: np.ndarray, k: int) -> List[Hit]:
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [Hit(self.ids[i], self.versions[i], float(scores[i])) for i in top]
+
+    def search(self, text: str, k: int = 5, shape: Any = None, shape_weight: float = 0.0) -> List[Hit]:
+        """
+        Top-k pipelines by TF-IDF cosine similarity to `text`, best first. With a DSL document
+        in `shape`, the score is (1 - shape_weight) * text + shape_weight * structural Jaccard.
+        """
+        q = vectorize(text, self.dim)
+        fp = fingerprint.fingerprint(shape) if shape is not None and shape_weight > 0 else None
+        with self._lock:
+            if not self.ids:
+                return []
+            scores = self._text_scores(q)
+            if fp is None:
+                return self._top(scores, k) if scores is not None else []
+            shape_scores = fingerprint.jaccard_many(self._shape[:len(self.ids)], fp)
+            text_scores = scores if scores is not None else 0.0
+            return self._top((1.0 - shape_weight) * text_scores + shape_weight * shape_scores, k)
+
+    def search_shape(self, content: Any, k: int = 5) -> List[Hit]:
+        """Top-k pipelines by Jaccard similarity of structural fingerprints, best first."""
+        fp = fingerprint.fingerprint(content)
+        with self._lock:
+            if not self.ids:
+                return []
+            return self._top(fingerprint.jaccard_many(self._shape[:len(self.ids)], fp), k)
+
+    def search_many(self, queries: np.ndarray, shapes: np.ndarray, shaped: np.ndarray, k: int = 5,
+                    shape_weight: float = 0.0) -> List[List[Hit]]:
+        """
+        search() for a batch: `queries` are vectorize() rows, `shapes` fingerprint rows and
+        `shaped` marks the rows whose fingerprint takes part. One matrix product scores the whole
+        batch; rows with neither text nor structure to match get no hits.
+        """
+        with self._lock:
+            n = len(self.ids)
+            if not n or not len(queries):
+                return [[] for _ in range(len(queries))]
+            tf, w, norms = self._weights()
+            qw = queries * w
+            qnorms = np.sqrt(np.einsum("ij,ij->i", queries, qw))
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scores = np.nan_to_num((qw @ tf.T) / (qnorms[:, None] * norms[None, :]))
+            live = qnorms > 0
+            if shape_weight > 0 and shaped.any():
+                rows = np.flatnonzero(shaped)
+                jac = fingerprint.jaccard_matrix(shapes[rows], self._shape[:n])
+                scores[rows] = (1.0 - shape_weight) * scores[rows] + shape_weight * jac
+                live[rows] = True
+            k = min(k, n)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            return [[Hit(self.ids[j], self.versions[j], float(scores[i, j])) for j in top[i]] if live[i] else []
+                    for i in range(len(queries))]
+
+    def near_duplicates(self, content: Any, threshold: float, k: int = 5) -> List[Hit]:
+        """Pipelines whose estimated Jaccard similarity with `content` is at least `threshold`."""
+        sig = minhash.signature(content)
+        with self._lock:
+            hits = self._lsh.query(sig, threshold)[:k]
+            return [Hit(pid, self.versions[self._row[pid]], score) for pid, score in hits]
+
+    def duplicate_clusters(self, threshold: float) -> List[List[Tuple[str, str]]]:
+        """Groups of (pipeline_id, version) that are near-duplicates of each other, largest first."""
+        with self._lock:
+            return [[(pid, self.versions[self._row[pid]]) for pid in group] for group in self._lsh.clusters(threshold)]
+
+    def signature(self, pipeline_id: str) -> Optional[np.ndarray]:
+        with self._lock:
+            return self._lsh.signature(pipeline_id)
+
+
+class SimilarityIndex:
+    """
+    FlowIndex per flow, built from the database on first use and kept in an LRU of
+    API_SIMILARITY_INDEX_MAX_FLOWS flows. Versions created in this process are added after their
+    transaction commits (see add_after_commit), and deleted flows are dropped the same way
+    (discard_after_commit). At most every API_SIMILARITY_INDEX_REFRESH_SEC the flow's id set is
+    reconciled with the database: unknown ids are loaded, vanished ones removed. That does not
+    depend on created_at, which follows transaction start rather than commit order.
+    """
+
+    def __init__(self, dim: Optional[int] = None, max_flows: Optional[int] = None,
+                 refresh_sec: Optional[float] = None):
+        self.dim = dim or settings.API_SIMILARITY_INDEX_DIM
+        self.max_flows = max_flows or settings.API_SIMILARITY_INDEX_MAX_FLOWS
+        self.refresh_sec = settings.API_SIMILARITY_INDEX_REFRESH_SEC if refresh_sec is None else refresh_sec
+        self._flows: OrderedDict[str, FlowIndex] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _load(self, db: Session, index: FlowIndex, flow_id: str) -> None:
+        columns = (Pipeline.id, Pipeline.version, Pipeline.content, Pipeline.minhash)
+        if index.checked_at is None:
+            rows = db.execute(select(*columns).where(Pipeline.flow_id == flow_id)).all()
+            index.add_many((r.id, r.version, r.content, r.minhash) for r in rows)
+        else:
+            # ids added in-process while the query runs are not in `known`, so they are never
+            # mistaken for deleted rows; re-adding an id that is already present is idempotent
+            known = index.known_ids()
+            current = {str(i) for i in db.scalars(select(Pipeline.id).where(Pipeline.flow_id == flow_id))}
+            index.remove_many(known - current)
+            new = sorted(current - known)
+            for i in range(0, len(new), _LOAD_CHUNK):
+                rows = db.execute(select(*columns).where(Pipeline.id.in_(new[i:i + _LOAD_CHUNK]))).all()
+                index.add_many((r.id, r.version, r.content, r.minhash) for r in rows)
+        index.checked_at = time.monotonic()
+
+    def flow(self, db: Session, flow_id: str, *, cache: bool = True) -> FlowIndex:
+        """
+        The flow's index. With cache=False a flow that is not already cached gets a throwaway
+        index, so one-off scans (cross-flow batches) do not evict the hot flows from the LRU.
+        """
+        flow_id = str(flow_id)
+        with self._lock:
+            index = self._flows.get(flow_id)
+            if index is not None and cache:
+                self._flows.move_to_end(flow_id)
+        if index is None:
+            index = FlowIndex(self.dim)
+            self._load(db, index, flow_id)
+            if not cache:
+                return index
+            with self._lock:
+                index = self._flows.setdefault(flow_id, index)
+                self._flows.move_to_end(flow_id)
+                while len(self._flows) > self.max_flows:
+                    self._flows.popitem(last=False)
+        elif time.monotonic() - index.checked_at > self.refresh_sec:
+            self._load(db, index, flow_id)
+        return index
+
+    def search(self, db: Session, flow_id: str, text: str, k: int = 5, shape: Any = None,
+               shape_weight: float = 0.0) -> List[Hit]:
+        return self.flow(db, flow_id).search(text, k, shape, shape_weight)
+
+    def search_shape(self, db: Session, flow_id: str, content: Any, k: int = 5) -> List[Hit]:
+        return self.flow(db, flow_id).search_shape(content, k)
+
+    def near_duplicates(self, db: Session, flow_id: str, content: Any, threshold: float, k: int = 5) -> List[Hit]:
+        return self.flow(db, flow_id).near_duplicates(content, threshold, k)
+
+    def add(self, flow_id: str, pipeline_id: str, version: str, content: Any, sig: Optional[bytes] = None) -> None:
+        """Add a committed version to a loaded flow; unloaded flows pick it up when they load."""
+        with self._lock:
+            index = self._flows.get(str(flow_id))
+        if index is not None:
+            index.add(pipeline_id, version, content, sig)
+
+    def discard(self, flow_id: Optional[str] = None) -> None:
+        with self._lock:
+            if flow_id is None:
+                self._flows.clear()
+            else:
+                self._flows.pop(str(flow_id), None)
+
+
+pipeline_index = SimilarityIndex()
+
+
+def add_after_commit(db: Session, flow_id: str, pipeline_id: str, version: str, content: Any,
+                     sig: Optional[bytes] = None) -> None:
+    """Queue a new version for the index; applied when `db` commits, dropped if it rolls back."""
+    db.info.setdefault(_PENDING, []).append((flow_id, pipeline_id, version, content, sig))
+
+
+def discard_after_commit(db: Session, flow_id: str) -> None:
+    """Forget a flow's cached index once `db` commits (the flow and its pipelines were deleted)."""
+    db.info.setdefault(_DISCARD, []).append(flow_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session) -> None:
+    for item in session.info.pop(_PENDING, ()):
+        try:
+            pipeline_index.add(*item)
+        except Exception as e:
+            logger.warning("similarity index update failed: %s", e)
+    for flow_id in session.info.pop(_DISCARD, ()):
+        pipeline_index.discard(flow_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+    session.info.pop(_DISCARD, None)
@@ -5,6 +5,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import select, and_, or_
 from ..models import Thread, Message
 from ..core.entities import ThreadEntity, MessageEntity
+from ..repositories.flow_stats_repo import FlowStatsRepo
 
 def _t(row: Thread) -> ThreadEntity:
     return ThreadEntity(
@@ -30,6 +31,7 @@ class SAThreadRepo:
         if row: return _t(row)
         row = Thread(id=thread_id, flow_id=flow_id, status="NEW")
         self.db.add(row); self.db.flush()
+        FlowStatsRepo(self.db).apply(flow_id, threads=1, open_threads=1)
         return _t(row)
 
 class SAMessageRepo:
@@ -38,7 +40,8 @@ class SAMessageRepo:
             parent_id: Optional[str], tool_name: Optional[str], tool_result: Optional[Any], fmt: str):
         m = Message(id=message_id, thread_id=thread_id, role=role, content=content,
                     parent_id=parent_id, tool_name=tool_name, tool_result=tool_result, format=fmt)
-        self.db.add(m); self.db.flush(); self.db.refresh(m)
+        # created_at (part of the key) comes back from the INSERT ... RETURNING; no refresh needed
+        self.db.add(m); self.db.flush()
         return _m(m)
     def list_for_thread(self, thread_id: str, limit: int = 50) -> Iterable[MessageEntity]:
         q = self.db.query(Message).filter(Message.thread_id==thread_id).order_by(Message.created_at.asc()).limit(limit)
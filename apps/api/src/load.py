@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, Optional, Sequence, Tuple
+
+from .config import settings
+from .metrics import LOAD_EVENT_LOOP_LAG, LOAD_DB_POOL_WAIT, LOAD_PRESSURE, AGENT_RUNS_IN_FLIGHT
+from .pool_stats import pool_waits
+
+logger = logging.getLogger(__name__)
+
+
+def _set(gauge, value: float, *labels: str) -> None:
+    try:
+        (gauge.labels(*labels) if labels else gauge).set(value)
+    except (ValueError, TypeError, RuntimeError):
+        pass
+
+
+class LoadMonitor:
+    """Samples event-loop lag, DB pool wait time and agent-run backlog.
+
+    `pressure` is the worst of the three signals normalised by its threshold, so
+    1.0 means "at capacity" for at least one resource. The pool signal is the
+    worst of `pools` (pool_logging_name of each engine, see pool_stats): the mean
+    checkout wait since the previous sample, or the age of a checkout that is
+    still waiting when the pool is exhausted.
+    """
+
+    def __init__(self, *, interval: float, lag_threshold: float, pool_wait_threshold: float, backlog_threshold: int,
+                 pools: Sequence[str] = ("primary", "primary_async"), alpha: float = 0.3):
+        self.interval = interval
+        self.lag_threshold = lag_threshold
+        self.pool_wait_threshold = pool_wait_threshold
+        self.backlog_threshold = backlog_threshold
+        self.pools = tuple(pools)
+        self.alpha = alpha
+        self.loop_lag = 0.0
+        self.pool_wait = 0.0
+        self.agent_runs = 0
+        self._waits: Dict[str, Tuple[float, int]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def pressure(self) -> float:
+        return max(
+            self.loop_lag / self.lag_threshold if self.lag_threshold > 0 else 0.0,
+            self.pool_wait / self.pool_wait_threshold if self.pool_wait_threshold > 0 else 0.0,
+            self.agent_runs / self.backlog_threshold if self.backlog_threshold > 0 else 0.0,
+        )
+
+    def sample_pools(self) -> None:
+        worst = 0.0
+        for name in self.pools:
+            total, count, stalled = pool_waits(name)
+            last_total, last_count = self._waits.get(name, (0.0, 0))
+            self._waits[name] = (total, count)
+            mean = (total - last_total) / (count - last_count) if count > last_count else 0.0
+            wait = max(mean, stalled)
+            _set(LOAD_DB_POOL_WAIT, wait, name)
+            worst = max(worst, wait)
+        self.pool_wait = worst
+
+    def observe_lag(self, lag: float) -> None:
+        # EWMA so a single slow tick does not trigger shedding
+        self.loop_lag = self.alpha * max(0.0, lag) + (1 - self.alpha) * self.loop_lag
+        _set(LOAD_EVENT_LOOP_LAG, self.loop_lag)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            self.observe_lag(loop.time() - t0 - self.interval)
+            self.sample_pools()
+            _set(LOAD_PRESSURE, self.pressure)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def track_agent_run(self, coro: Awaitable[Any]) -> Any:
+        """Await an agent run while counting it towards the backlog."""
+        self.agent_runs += 1
+        _set(AGENT_RUNS_IN_FLIGHT, self.agent_runs)
+        try:
+            return await coro
+        finally:
+            self.agent_runs -= 1
+            _set(AGENT_RUNS_IN_FLIGHT, self.agent_runs)
+
+
+monitor = LoadMonitor(
+    interval=settings.API_ADMISSION_SAMPLE_INTERVAL_MS / 1000,
+    lag_threshold=settings.API_ADMISSION_LOOP_LAG_MS / 1000,
+    pool_wait_threshold=settings.API_ADMISSION_POOL_WAIT_MS / 1000,
+    backlog_threshold=settings.API_ADMISSION_AGENT_BACKLOG,
+)
@@ -10,35 +10,89 @@ from fastapi.exceptions import RequestValidationError
 from sqlalchemy.exc import IntegrityError
 
 from .config import settings
-from .database import engine, Base
+from .database import engine, Base, get_db
+from .repositories.event_log_repo import EventLogRepo
+from .repositories.flow_stats_repo import FlowStatsRepo
 from .middleware.idempotency import IdempotencyMiddleware
 from .middleware.limits import SizeLimitMiddleware
 from .middleware.metrics import MetricsMiddleware
 from .middleware.auth import AuthMiddleware
+from .middleware.admission import AdmissionMiddleware
+from .middleware.consistency import ConsistencyMiddleware, HEADER as CONSISTENCY_HEADER
+from .load import monitor as load_monitor
+from .replicas import replica_router
 from .middleware.error import AppError, handle_app_error, handle_generic_error, handle_integrity_error, handle_validation_error
-from .routers import flows, threads, pipelines, summaries, schemas, agent, messages, upgrades, system, admin_prompts, admin_compat, agent_logs, schema_store
-from .sse import router as sse_router
+from .routers import flows, threads, pipelines, summaries, schemas, agent, messages, upgrades, system, admin_prompts, admin_compat, admin_db, admin_pipelines, agent_logs, schema_store, similarity
+from .sse import router as sse_router, bus
+from .ws import router as ws_router
+from .infrastructure.event_log import EventLogWriter
+from .archive import archive_closed_threads
+from .retention import RetentionWorker, default_policies, ensure_partitions
+from .infrastructure.idempotency_store import purge_expired_keys
+from .infrastructure.rate_limit import purge_idle_keys
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
-    yield
+    policies = default_policies()
+    ensure_partitions(policies)
+    with get_db() as db:
+        # flows created before flow_stats existed would be missing from the flows listing
+        FlowStatsRepo(db).rebuild(missing_only=True)
+    writer = None
+    if settings.API_SSE_EVENT_LOG_ENABLED:
+        writer = EventLogWriter(
+            batch_size=settings.API_SSE_EVENT_LOG_BATCH_SIZE,
+            flush_interval=settings.API_SSE_EVENT_LOG_FLUSH_INTERVAL_MS / 1000,
+            queue_max=settings.API_SSE_EVENT_LOG_QUEUE_MAX,
+        )
+        with get_db() as db:
+            # distinct per worker, so seqs from workers sharing the log never collide
+            bus.set_worker(EventLogRepo(db).next_worker())
+        await writer.start()
+        bus.attach_log(writer)
+    jobs = [purge_expired_keys] if settings.API_IDEMPOTENCY_BACKEND == "postgres" else []
+    if settings.API_RATE_LIMIT_BACKEND == "postgres":
+        jobs.append(purge_idle_keys)
+    if settings.API_ARCHIVE_AFTER_DAYS > 0:
+        jobs.append(archive_closed_threads)
+    if settings.API_ADMISSION_ENABLED:
+        await load_monitor.start()
+    retention = RetentionWorker(policies, interval=settings.API_RETENTION_INTERVAL_SEC, jobs=jobs)
+    await retention.start()
+    await replica_router.start()
+    try:
+        yield
+    finally:
+        await replica_router.stop()
+        await retention.stop()
+        await load_monitor.stop()
+        if writer is not None:
+            bus.attach_log(None)
+            await writer.stop()
 
 def create_app() -> FastAPI:
     init_tracer("dslhub-api")
 
     app = FastAPI(title="DSL Hub Backend", version=settings.APP_VERSION, lifespan=lifespan)
+    app.add_middleware(ConsistencyMiddleware)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=settings.CORS_ORIGINS,
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[CONSISTENCY_HEADER, "X-Next-Cursor"],
     )
+    app.add_middleware(IdempotencyMiddleware, ttl_seconds=settings.API_IDEMPOTENCY_TTL_SEC, max_entries=settings.API_IDEMPOTENCY_CACHE_MAX, max_bytes=settings.API_IDEMPOTENCY_CACHE_MAX_BYTES)
+    # outside Idempotency, which buffers the whole body to hash it: the limit must see it first
     app.add_middleware(SizeLimitMiddleware, max_bytes=settings.API_MAX_JSON_SIZE)
-    app.add_middleware(IdempotencyMiddleware, ttl_seconds=settings.API_IDEMPOTENCY_TTL_SEC, max_entries=settings.API_IDEMPOTENCY_CACHE_MAX)
     app.add_middleware(MetricsMiddleware)
     app.add_middleware(AuthMiddleware, token_env="API_AUTH_TOKEN")
+    if settings.API_ADMISSION_ENABLED:
+        # outermost: shed before any other work is done for the request
+        app.add_middleware(AdmissionMiddleware, severe=settings.API_ADMISSION_SEVERE_PRESSURE,
+                           retry_after=settings.API_ADMISSION_RETRY_AFTER_SEC)
     app.add_exception_handler(AppError, handle_app_error)
     app.add_exception_handler(FastHTTPException, handle_generic_error)
     app.add_exception_handler(RequestValidationError, handle_validation_error)
@@ -53,10 +107,14 @@ def create_app() -> FastAPI:
     app.include_router(messages.router)
     app.include_router(upgrades.router)
     app.include_router(sse_router)
+    app.include_router(ws_router)
     app.include_router(admin_prompts.router)
     app.include_router(admin_compat.router)
+    app.include_router(admin_db.router)
+    app.include_router(admin_pipelines.router)
     app.include_router(agent_logs.router)
     app.include_router(schema_store.router)
+    app.include_router(similarity.router)
 
     @app.get("/metrics")
     def metrics():
@@ -20,6 +20,26 @@ SSE_CONNECTIONS = Counter(
 SSE_SESSION_SECONDS = Histogram(
     "sse_session_duration_seconds", "Duration of SSE connections in seconds"
 )
+SSE_REPLAY = Counter(
+    "sse_replay_total", "SSE replays by source", ["source"]  # source: memory|log|none
+)
+SSE_EVENT_LOG_WRITES = Counter(
+    "sse_event_log_writes_total", "SSE events persisted to the event log", ["status"]  # status: ok|error|dropped|conflict
+)
+SSE_EVENT_LOG_FLUSH_SECONDS = Histogram(
+    "sse_event_log_flush_seconds", "Duration of SSE event log batch flushes in seconds"
+)
+RETENTION_PARTITIONS = Counter(
+    "retention_partitions_total", "Partitions expired by the retention worker", ["table", "action"]
+)
+
+# WebSocket metrics
+WS_CONNECTIONS = Counter(
+    "ws_connections_total", "WebSocket connections open/close", ["action", "encoding"]
+)
+WS_FRAMES = Counter(
+    "ws_frames_total", "WebSocket frames", ["direction", "encoding"]  # direction: in|out
+)
 
 # Agent metrics
 AGENT_RUNS = Counter(
@@ -47,10 +67,78 @@ LLM_LATENCY = Histogram(
     "llm_call_latency_seconds", "LLM call latency seconds", ["method", "provider"]
 )
 
+# Load shedding
+ADMISSION_DECISIONS = Counter(
+    "admission_decisions_total", "Admission controller decisions", ["priority", "result"]  # result: admitted|shed
+)
+LOAD_PRESSURE = Gauge(
+    "load_pressure", "Worst normalised load signal (>= 1 means shedding low-priority work)"
+)
+LOAD_EVENT_LOOP_LAG = Gauge(
+    "load_event_loop_lag_seconds", "Smoothed event loop scheduling lag in seconds"
+)
+LOAD_DB_POOL_WAIT = Gauge(
+    "load_db_pool_wait_seconds", "Mean wait for a pooled connection over the last sample, or the oldest wait still pending",
+    ["pool"],
+)
+AGENT_RUNS_IN_FLIGHT = Gauge(
+    "agent_runs_in_flight", "Agent runs currently executing in this worker"
+)
+
+# Rate limiting
+RATE_LIMIT_DECISIONS = Counter(
+    "rate_limit_decisions_total", "Rate limit decisions", ["action", "scope", "result"]  # result: allowed|limited
+)
+
 # Idempotency cache
 IDEMPOTENCY_CACHE_ENTRIES = Gauge(
     "idempotency_cache_entries", "Number of entries in idempotency cache"
 )
+IDEMPOTENCY_CACHE_BYTES = Gauge(
+    "idempotency_cache_bytes", "Approximate bytes held by idempotency cache"
+)
+IDEMPOTENCY_CACHE_EVICTIONS = Counter(
+    "idempotency_cache_evictions_total", "Idempotency cache evictions", ["reason"]  # reason: expired|capacity|bytes
+)
+# Read replicas
+DB_REPLICA_LAG = Gauge(
+    "db_replica_lag_seconds", "Replay lag of each read replica in seconds", ["replica"]
+)
+DB_READ_SESSIONS = Counter(
+    "db_read_sessions_total", "Read-only sessions by target", ["target", "reason"]  # target: replica|primary
+)
+# SQLAlchemy compiled-statement cache, per executed statement
+DB_COMPILE_CACHE = Counter(
+    "db_compile_cache_total", "Statements by compiled cache outcome", ["engine", "result"]  # result: hit|miss|disabled|uncacheable|unsupported
+)
+# Connection pools; usage is the route template or use case holding the connection
+DB_POOL_WAIT_SECONDS = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["pool", "usage"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_POOL_HOLD_SECONDS = Histogram(
+    "db_pool_checkout_hold_seconds", "Time a connection stays checked out", ["pool", "usage"],
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120),
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use", "Connections currently checked out", ["pool"]
+)
+DB_POOL_OVERFLOW = Gauge(
+    "db_pool_overflow_connections", "Connections open beyond pool_size", ["pool"]
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Checkouts that gave up after pool_timeout", ["pool", "usage"]
+)
+# Cold storage of closed threads
+THREADS_ARCHIVED = Counter(
+    "threads_archived_total", "Threads moved to thread_archive", ["storage"]
+)
+THREAD_ARCHIVE_BYTES = Counter(
+    "thread_archive_bytes_total", "Bytes packed into thread archives", ["kind"]  # kind: raw|stored
+)
+THREAD_ARCHIVE_READS = Counter(
+    "thread_archive_reads_total", "Archived thread rehydrations", ["source"]  # source: cache|storage
+)
 
 def prometheus_body() -> tuple[bytes, str]:
     """Return metrics body and content-type for FastAPI response."""
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+from starlette.requests import Request
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .error import AppError, handle_app_error
+from ..load import LoadMonitor, monitor as default_monitor
+from ..metrics import ADMISSION_DECISIONS
+
+CRITICAL, NORMAL, LOW = "critical", "normal", "low"
+
+# streams, probes and message writes must stay responsive under load
+_CRITICAL = [
+    (None, re.compile(r"^/(health|metrics|version)$")),
+    (None, re.compile(r"^/sse/")),
+    (None, re.compile(r"^/ws$")),
+    ("GET", re.compile(r"^/threads/[^/]+/events$")),
+    ("POST", re.compile(r"^/threads/[^/]+/messages$")),
+]
+# expensive or deferrable work goes first
+_LOW = [
+    ("POST", re.compile(r"^/threads/[^/]+/agent/run$")),
+    (None, re.compile(r"^/summaries/")),
+]
+
+
+def classify(method: str, path: str) -> str:
+    for m, rx in _CRITICAL:
+        if (m is None or m == method) and rx.search(path):
+            return CRITICAL
+    for m, rx in _LOW:
+        if (m is None or m == method) and rx.search(path):
+            return LOW
+    # plain reads (lists) are cheaper to retry than writes
+    return LOW if method == "GET" else NORMAL
+
+
+class AdmissionMiddleware:
+    """
+    Sheds load with 503 + Retry-After when the LoadMonitor reports pressure:
+    LOW priority at pressure >= 1, NORMAL at pressure >= `severe`. CRITICAL is never shed.
+    """
+
+    def __init__(self, app: ASGIApp, monitor: LoadMonitor | None = None, severe: float = 1.5, retry_after: int = 5):
+        self.app = app
+        self.monitor = monitor or default_monitor
+        self.severe = severe
+        self.retry_after = retry_after
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = classify(scope["method"].upper(), scope["path"])
+        pressure = self.monitor.pressure
+        shed = (priority == LOW and pressure >= 1.0) or (priority == NORMAL and pressure >= self.severe)
+        try:
+            ADMISSION_DECISIONS.labels(priority=priority, result="shed" if shed else "admitted").inc()
+        except (ValueError, TypeError, RuntimeError):
+            pass
+        if shed:
+            error = AppError(
+                status=503,
+                code="OVERLOADED",
+                message="Server is overloaded, retry later",
+                details=[{"priority": priority, "pressure": round(pressure, 2)}],
+                headers={"Retry-After": str(self.retry_after)},
+            )
+            response = await handle_app_error(Request(scope), error)
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -2,31 +2,40 @@ from __future__ import annotations
 
 
 import logging
+import os
 
 logger = logging.getLogger(__name__)
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from starlette.requests import Request
-from starlette.responses import Response
-from typing import Callable, Awaitable
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from .error import AppError, handle_app_error
 from ..config import settings
 
+_MUTATING = {"POST", "PUT", "PATCH", "DELETE"}
 
-class AuthMiddleware(BaseHTTPMiddleware):
+
+def auth_token(token_env: str | None = "API_AUTH_TOKEN") -> str | None:
+    return getattr(settings, "AUTH_TOKEN", None) or (os.getenv(token_env) if token_env else None)
+
+
+class AuthMiddleware:
     """
     Minimal Bearer token auth for mutating requests.
-    Enabled only if settings.AUTH_TOKEN is set (non-empty).
+    Enabled only if settings.AUTH_TOKEN (or the `token_env` variable) is set (non-empty).
     Applies to methods: POST, PUT, PATCH, DELETE.
     """
 
-    async def dispatch(self, request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
-        token = getattr(settings, "AUTH_TOKEN", None)
-        method = request.method.upper()
-        if token and method in {"POST", "PUT", "PATCH", "DELETE"}:
-            auth = request.headers.get("Authorization")
-            expected = f"Bearer {token}"
-            if auth != expected:
+    def __init__(self, app: ASGIApp, token_env: str | None = "API_AUTH_TOKEN"):
+        self.app = app
+        self.token_env = token_env
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["method"].upper() in _MUTATING:
+            token = auth_token(self.token_env)
+            if token and Headers(scope=scope).get("authorization") != f"Bearer {token}":
                 error = AppError(status=401, code="UNAUTHORIZED", message="Missing or invalid Authorization token")
-                return await handle_app_error(request, error)
-        return await call_next(request)
+                response = await handle_app_error(Request(scope), error)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
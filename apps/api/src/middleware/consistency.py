@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+
+import logging
+
+logger = logging.getLogger(__name__)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ..replicas import ReplicaRouter, format_lsn, min_lsn, parse_lsn, replica_router
+
+HEADER = "X-DB-Consistency"
+_HEADER_KEY = HEADER.lower().encode("latin-1")
+_WRITES = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+class ConsistencyMiddleware:
+    """
+    Read-your-writes for replica routing: successful writes answer with the primary
+    WAL position in X-DB-Consistency; a client echoing it makes this request's reads
+    skip replicas that have not replayed that far. No-op without replicas.
+    """
+
+    def __init__(self, app: ASGIApp, router: ReplicaRouter | None = None):
+        self.app = app
+        self.router = router or replica_router
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.router.enabled:
+            await self.app(scope, receive, send)
+            return
+        token = None
+        for key, value in scope.get("headers") or []:
+            if key == _HEADER_KEY:
+                try:
+                    token = parse_lsn(value.decode("latin-1"))
+                except ValueError:
+                    logger.debug("ignoring malformed %s header", HEADER)
+                break
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                try:
+                    lsn = await self.router.current_lsn()
+                except Exception as e:
+                    logger.warning("could not read primary WAL position: %s", e)
+                    lsn = None
+                if lsn is not None:
+                    headers = [(k, v) for k, v in message.get("headers", []) if k != _HEADER_KEY]
+                    headers.append((_HEADER_KEY, format_lsn(lsn).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        reset = min_lsn.set(token)
+        try:
+            await self.app(scope, receive, send_wrapper if scope["method"].upper() in _WRITES else send)
+        finally:
+            min_lsn.reset(reset)
@@ -9,18 +9,19 @@ from fastapi.responses import JSONResponse
 from fastapi import HTTPException as FastHTTPException
 from fastapi.exceptions import RequestValidationError
 from starlette.responses import Response
-from typing import Any, List, Optional
+from typing import Any, Dict, List, Optional
 
 from sqlalchemy.exc import IntegrityError
 
 
 class AppError(Exception):
     def __init__(self, status: int = 400, code: str = "UNKNOWN", message: str = "",
-                 details: Optional[List[Any]] = None):
+                 details: Optional[List[Any]] = None, headers: Optional[Dict[str, str]] = None):
         self.status = status
         self.code = code
         self.message = message
         self.details = details or []
+        self.headers = headers or {}
 
 
 def _error_response(status_code: int, code: str, message: str, details: Optional[List[Any]] = None) -> JSONResponse:
@@ -43,8 +44,10 @@ def _with_request(details: Optional[List[Any]], request: Request) -> List[Any]:
 
 async def handle_app_error(request: Request, exc: Exception) -> Response:
     if isinstance(exc, AppError):
-        return _error_response(status_code=exc.status, code=exc.code, message=exc.message,
-                               details=_with_request(exc.details, request))
+        response = _error_response(status_code=exc.status, code=exc.code, message=exc.message,
+                                   details=_with_request(exc.details, request))
+        response.headers.update(exc.headers)
+        return response
     return _error_response(status_code=500, code="INTERNAL", message="Internal server error",
                            details=_with_request([{"reason": str(exc)}], request))
 
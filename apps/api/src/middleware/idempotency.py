@@ -4,39 +4,133 @@ from __future__ import annotations
 import logging
 
 logger = logging.getLogger(__name__)
-from starlette.middleware.base import BaseHTTPMiddleware
-from dataclasses import dataclass
-from typing import Dict, Tuple, List
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, Tuple
+import asyncio
 import time
 import hashlib
 
 from starlette.requests import Request
 from starlette.responses import Response
-from starlette.types import Message
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from .error import AppError, handle_app_error
 from ..config import settings
+from ..infrastructure.idempotency_store import CachedResponse, IdempotencyStore, Reservation, build_store
 
 CacheKey = Tuple[str, str, str]
 
 
-@dataclass
-class CachedResponse:
-    timestamp: float
-    body_hash: str
-    status_code: int
-    headers: Dict[str, str]
-    content: bytes
-    media_type: str
+try:
+    # Optional metrics; if Prometheus not configured, ignore
+    from ..metrics import IDEMPOTENCY_CACHE_ENTRIES, IDEMPOTENCY_CACHE_BYTES, IDEMPOTENCY_CACHE_EVICTIONS  # type: ignore
+except ImportError:  # pragma: no cover
+    IDEMPOTENCY_CACHE_ENTRIES = IDEMPOTENCY_CACHE_BYTES = IDEMPOTENCY_CACHE_EVICTIONS = None  # type: ignore
 
 
-_CACHE: Dict[CacheKey, CachedResponse] = {}
+def _entry_size(entry: CachedResponse) -> int:
+    return len(entry.content) + sum(len(k) + len(v) for k, v in entry.headers) + 256
 
-try:
-    # Optional metric; if Prometheus not configured, ignore
-    from ..metrics import IDEMPOTENCY_CACHE_ENTRIES  # type: ignore
-except ImportError:  # pragma: no cover
-    IDEMPOTENCY_CACHE_ENTRIES = None  # type: ignore
+
+class ResponseCache:
+    """TTL-aware LRU for cached responses, bounded by entry count and total bytes.
+
+    Recency lives in an OrderedDict; expiry uses a FIFO of (expires_at, key, timestamp)
+    since the TTL is the same for every entry. Stale FIFO records (key overwritten or
+    already evicted) are skipped lazily, so get/put/expire are amortized O(1).
+    """
+
+    def __init__(self, ttl: float, max_entries: int, max_bytes: int = 0):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[CacheKey, CachedResponse]" = OrderedDict()
+        self._expiry: Deque[Tuple[float, CacheKey, float]] = deque()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _drop(self, key: CacheKey, reason: str) -> None:
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= _entry_size(entry)
+        try:
+            if IDEMPOTENCY_CACHE_EVICTIONS is not None:
+                IDEMPOTENCY_CACHE_EVICTIONS.labels(reason=reason).inc()
+        except (ValueError, TypeError, RuntimeError):
+            pass
+
+    def expire(self, now: float | None = None) -> None:
+        now = time.time() if now is None else now
+        while self._expiry and self._expiry[0][0] <= now:
+            _, key, ts = self._expiry.popleft()
+            entry = self._data.get(key)
+            if entry is not None and entry.timestamp == ts:
+                self._drop(key, "expired")
+        self._report()
+
+    def get(self, key: CacheKey, now: float | None = None) -> CachedResponse | None:
+        now = time.time() if now is None else now
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        if now - entry.timestamp >= self.ttl:
+            self._drop(key, "expired")
+            self._report()
+            return None
+        self._data.move_to_end(key)
+        return entry
+
+    def put(self, key: CacheKey, entry: CachedResponse) -> None:
+        size = _entry_size(entry)
+        if key in self._data:
+            self.bytes -= _entry_size(self._data.pop(key))
+        if self.max_bytes and size > self.max_bytes:
+            # a single response larger than the whole budget is never cached
+            self._report()
+            return
+        self._data[key] = entry
+        self.bytes += size
+        self._expiry.append((entry.timestamp + self.ttl, key, entry.timestamp))
+        self.expire(entry.timestamp)
+        while 0 < self.max_entries < len(self._data):
+            self._drop(next(iter(self._data)), "capacity")
+        while self.max_bytes and self.bytes > self.max_bytes:
+            self._drop(next(iter(self._data)), "bytes")
+        # keep the FIFO from growing unbounded with records of overwritten keys
+        if len(self._expiry) > 2 * len(self._data) + 64:
+            self._expiry = deque(r for r in self._expiry if (e := self._data.get(r[1])) is not None and e.timestamp == r[2])
+        self._report()
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._expiry.clear()
+        self.bytes = 0
+        self._report()
+
+    def _report(self) -> None:
+        try:
+            if IDEMPOTENCY_CACHE_ENTRIES is not None:
+                IDEMPOTENCY_CACHE_ENTRIES.set(len(self._data))
+            if IDEMPOTENCY_CACHE_BYTES is not None:
+                IDEMPOTENCY_CACHE_BYTES.set(self.bytes)
+        except (ValueError, TypeError, RuntimeError):
+            pass
+
+
+_CACHE = ResponseCache(
+    ttl=float(settings.API_IDEMPOTENCY_TTL_SEC),
+    max_entries=int(settings.API_IDEMPOTENCY_CACHE_MAX),
+    max_bytes=int(settings.API_IDEMPOTENCY_CACHE_MAX_BYTES),
+)
+
+
+_STORE: IdempotencyStore = build_store(settings.API_IDEMPOTENCY_BACKEND)
+# requests currently executing on this worker, so same-worker duplicates wait on an Event
+_INFLIGHT: Dict[CacheKey, asyncio.Event] = {}
 
 
 def _sha256_hex(data: bytes) -> str:
@@ -45,100 +139,227 @@ def _sha256_hex(data: bytes) -> str:
     return h.hexdigest()
 
 
-def _sweep_cache(ttl: float, max_entries: int) -> None:
-    now = time.time()
-    # remove expired
-    expired: List[CacheKey] = []
-    for k, v in list(_CACHE.items()):
-        if now - v.timestamp >= ttl:
-            expired.append(k)
-    for k in expired:
-        _CACHE.pop(k, None)
-    # enforce size cap
-    if 0 < max_entries < len(_CACHE):
-        # sort by ts ascending (oldest first)
-        items = sorted(_CACHE.items(), key=lambda it: it[1].timestamp)
-        to_remove = len(_CACHE) - max_entries
-        for k, _ in items[:to_remove]:
-            _CACHE.pop(k, None)
-    # update gauge
-    try:
-        if IDEMPOTENCY_CACHE_ENTRIES is not None:
-            IDEMPOTENCY_CACHE_ENTRIES.set(len(_CACHE))
-    except (ValueError, TypeError, RuntimeError):
-        pass
-
-
-def _serialize_headers(headers: Dict[str, str]) -> Dict[str, str]:
-    serialized: Dict[str, str] = {}
-    for key, value in headers.items():
+def _serialize_headers(headers: Iterable[Tuple[bytes | str, bytes | str]]) -> List[Tuple[str, str]]:
+    serialized: List[Tuple[str, str]] = []
+    for key, value in headers:
         if not isinstance(key, str):
-            key = key.decode()
+            key = key.decode("latin-1")
         if not isinstance(value, str):
-            value = value.decode()
-        serialized[key] = value
+            value = value.decode("latin-1")
+        serialized.append((key, value))
     return serialized
 
 
 def _build_response(entry: CachedResponse) -> Response:
-    headers = {k: v for k, v in entry.headers.items() if k.lower() != "content-length"}
-    return Response(content=entry.content, media_type=entry.media_type, status_code=entry.status_code, headers=headers)
-
-
-class IdempotencyMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        method = request.method.upper()
-        if method == "POST":
-            key = request.headers.get("Idempotency-Key")
-            if key:
-                # Read body safely and restore the stream
-                body = await request.body()
-                body_hash = _sha256_hex(body)
-
-                async def receive() -> Message:
-                    return dict(type="http.request", body=body, more_body=False)
-
-                # Rebuild request with restored body
-                request = Request(request.scope, receive)
-
-                ck: CacheKey = (method, str(request.url.path), key)
-                now = time.time()
-                ttl = float(getattr(settings, "IDEMPOTENCY_TTL_SEC", 300))
-                max_entries = int(getattr(settings, "IDEMPOTENCY_CACHE_MAX", 1000))
-                _sweep_cache(ttl, max_entries)
-                cached = _CACHE.get(ck)
-                if cached:
-                    if now - cached.timestamp < ttl:
-                        if cached.body_hash != body_hash:
-                            error = AppError(
-                                status=409,
-                                code="IDEMPOTENCY_KEY_REUSED",
-                                message="Idempotency-Key has already been used with a different request body",
-                                details=[{"path": request.url.path}],
-                            )
-                            return await handle_app_error(request, error)
-                        return _build_response(cached)
-                # Not cached or expired → process and cache
-                resp = await call_next(request)
-                try:
-                    content_chunks = [chunk async for chunk in resp.body_iterator]
-                except Exception:
-                    return resp
-                content_bytes = b"".join(content_chunks)
-                media_type = resp.media_type or resp.headers.get("content-type", "application/json")
-                headers = _serialize_headers(dict(resp.headers.items()))
-                entry = CachedResponse(
-                    timestamp=now,
-                    body_hash=body_hash,
-                    status_code=resp.status_code,
-                    headers=headers,
-                    content=content_bytes,
-                    media_type=media_type,
-                )
-                _CACHE[ck] = entry
-                _sweep_cache(ttl, max_entries)
-                response = _build_response(entry)
-                if resp.background:
-                    response.background = resp.background
-                return response
-        return await call_next(request)
+    response = Response(content=entry.content, media_type=entry.media_type, status_code=entry.status_code)
+    stored = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in entry.headers]
+    names = {k for k, _ in stored}
+    # set raw pairs rather than a dict so repeated headers (Set-Cookie) all replay;
+    # content-length always comes from the body we actually send
+    response.raw_headers = [h for h in response.raw_headers if h[0] == b"content-length" or h[0] not in names]
+    response.raw_headers += [h for h in stored if h[0] != b"content-length"]
+    return response
+
+
+def _key_reused(request: Request) -> AppError:
+    return AppError(
+        status=409,
+        code="IDEMPOTENCY_KEY_REUSED",
+        message="Idempotency-Key has already been used with a different request body",
+        details=[{"path": request.url.path}],
+    )
+
+
+async def _in_progress(request: Request, retry_after: float) -> Response:
+    error = AppError(
+        status=409,
+        code="IDEMPOTENCY_IN_PROGRESS",
+        message="A request with this Idempotency-Key is still being processed",
+        details=[{"path": request.url.path}],
+    )
+    resp = await handle_app_error(request, error)
+    resp.headers["Retry-After"] = str(max(1, int(retry_after)))
+    return resp
+
+
+async def _read_body(receive: Receive) -> bytes | None:
+    """Drain the request body; None if the client disconnected first."""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+class IdempotencyMiddleware:
+    """Replays the stored response for a repeated (POST, path, Idempotency-Key).
+
+    Tiers: the local LRU serves hot keys; `_INFLIGHT` makes duplicates on the same
+    worker wait for the first request; the shared store reserves the key across
+    workers ("in_progress") so duplicates elsewhere poll for the result instead of
+    executing again. If the shared store is unavailable we degrade to local-only.
+    The response is streamed to the client unchanged and captured at the `send` level.
+    """
+
+    def __init__(self, app: ASGIApp, ttl_seconds: int | None = None, max_entries: int | None = None,
+                 max_bytes: int | None = None, store: IdempotencyStore | None = None):
+        self.app = app
+        if ttl_seconds is not None:
+            _CACHE.ttl = float(ttl_seconds)
+        if max_entries is not None:
+            _CACHE.max_entries = int(max_entries)
+        if max_bytes is not None:
+            _CACHE.max_bytes = int(max_bytes)
+        self.store = store or _STORE
+        self.lock_ttl = float(settings.API_IDEMPOTENCY_LOCK_TTL_SEC)
+        self.wait_timeout = float(settings.API_IDEMPOTENCY_WAIT_TIMEOUT_SEC)
+        self.poll_interval = settings.API_IDEMPOTENCY_POLL_INTERVAL_MS / 1000
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"].upper() != "POST":
+            await self.app(scope, receive, send)
+            return
+        key = Headers(scope=scope).get("idempotency-key")
+        if not key:
+            await self.app(scope, receive, send)
+            return
+
+        body = await _read_body(receive)
+        if body is None:
+            return
+        body_hash = _sha256_hex(body)
+        replayed = False
+
+        async def replay_receive() -> Message:
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return dict(type="http.request", body=body, more_body=False)
+            return await receive()
+
+        request = Request(scope)
+        ck: CacheKey = ("POST", scope["path"], key)
+        _CACHE.expire()
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            cached = _CACHE.get(ck)
+            if cached:
+                response = await self._replay(request, cached, body_hash)
+                await response(scope, receive, send)
+                return
+            inflight = _INFLIGHT.get(ck)
+            if inflight is None:
+                break
+            try:
+                await asyncio.wait_for(inflight.wait(), timeout=max(0.0, deadline - time.monotonic()))
+            except asyncio.TimeoutError:
+                await (await _in_progress(request, self.wait_timeout))(scope, receive, send)
+                return
+            # owner finished: either it cached a response or it failed and we run it ourselves
+
+        done = _INFLIGHT[ck] = asyncio.Event()
+        try:
+            await self._process(scope, replay_receive, send, request, ck, body_hash, deadline)
+        finally:
+            _INFLIGHT.pop(ck, None)
+            done.set()
+
+    async def _replay(self, request: Request, entry: CachedResponse, body_hash: str) -> Response:
+        if entry.body_hash != body_hash:
+            return await handle_app_error(request, _key_reused(request))
+        return _build_response(entry)
+
+    async def _reserve(self, store_key: str, body_hash: str) -> tuple[Reservation, bool]:
+        try:
+            return await self.store.reserve(store_key, body_hash, lock_ttl=self.lock_ttl), True
+        except Exception as e:
+            logger.warning("idempotency store unavailable, using local cache only: %s", e)
+            return Reservation("acquired", body_hash), False
+
+    async def _process(self, scope: Scope, receive: Receive, send: Send, request: Request,
+                       ck: CacheKey, body_hash: str, deadline: float) -> None:
+        store_key = "|".join(ck)
+        res, shared = await self._reserve(store_key, body_hash)
+        while res.state != "acquired":
+            response: Response | None = None
+            if res.body_hash != body_hash:
+                response = await handle_app_error(request, _key_reused(request))
+            elif res.state == "completed" and res.response is not None:
+                _CACHE.put(ck, res.response)
+                response = _build_response(res.response)
+            elif time.monotonic() >= deadline:
+                response = await _in_progress(request, self.wait_timeout)
+            if response is not None:
+                await response(scope, receive, send)
+                return
+            # another worker owns the key: poll its result
+            await asyncio.sleep(self.poll_interval)
+            try:
+                current = await self.store.get(store_key)
+            except Exception as e:
+                logger.warning("idempotency store poll failed: %s", e)
+                await (await _in_progress(request, self.poll_interval))(scope, receive, send)
+                return
+            res, shared = (current, True) if current is not None else await self._reserve(store_key, body_hash)
+
+        status_code = 500
+        raw_headers: list = []
+        chunks: list[bytes] = []
+        size = 0
+        capture = True
+        complete = False
+
+        async def send_capture(message: Message) -> None:
+            nonlocal status_code, raw_headers, size, capture, complete
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                raw_headers = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                if capture:
+                    chunk = message.get("body", b"")
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if _CACHE.max_bytes and size > _CACHE.max_bytes:
+                        # too large to keep: stop copying, the client still gets everything
+                        capture = False
+                        chunks.clear()
+                if not message.get("more_body", False):
+                    complete = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_capture)
+        except Exception:
+            if shared:
+                await self._release(store_key, res.token)
+            raise
+
+        if not (complete and capture) or status_code >= 500:
+            # server errors and uncaptured responses are not final: let a retry execute again
+            if shared:
+                await self._release(store_key, res.token)
+            return
+        headers = _serialize_headers(raw_headers)
+        entry = CachedResponse(
+            timestamp=time.time(),
+            body_hash=body_hash,
+            status_code=status_code,
+            headers=headers,
+            content=b"".join(chunks),
+            media_type=next((v for k, v in headers if k.lower() == "content-type"), "application/json"),
+        )
+        _CACHE.put(ck, entry)
+        if shared:
+            try:
+                await self.store.complete(store_key, entry, ttl=_CACHE.ttl, token=res.token)
+            except Exception as e:
+                logger.warning("idempotency store complete failed: %s", e)
+
+    async def _release(self, store_key: str, token: str) -> None:
+        try:
+            await self.store.release(store_key, token=token)
+        except Exception as e:
+            logger.warning("idempotency store release failed: %s", e)
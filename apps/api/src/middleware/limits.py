@@ -4,31 +4,75 @@ from __future__ import annotations
 import logging
 
 logger = logging.getLogger(__name__)
-from typing import Callable, Awaitable
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import Headers
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
-from .error import AppError
+from .error import AppError, handle_app_error
 from ..config import settings
 
 
-class SizeLimitMiddleware(BaseHTTPMiddleware):
+def _too_large(size: int, limit: int) -> AppError:
+    return AppError(status=413, code="PAYLOAD_TOO_LARGE", message=f"Request body too large: {size} > {limit}")
+
+
+class SizeLimitMiddleware:
     """
-    Reject over-sized JSON payloads early using Content-Length when available.
-    This is a best-effort guard; if Content-Length is absent, the request passes through.
+    Reject over-sized payloads. Content-Length is checked up front; the streamed body is
+    counted as well, so chunked uploads or a lying Content-Length cannot bypass the limit.
     """
 
-    async def dispatch(self, request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
-        method = request.method.upper()
-        if method in {"POST", "PUT", "PATCH"}:
-            cl = request.headers.get("content-length")
-            if cl:
-                try:
-                    size = int(cl)
-                except ValueError:
-                    size = None
-                if size is not None and size > int(getattr(settings, "MAX_JSON_SIZE", 1048576)):
-                    raise AppError(status=413, code="PAYLOAD_TOO_LARGE",
-                                   message=f"Request body too large: {size} > {settings.MAX_JSON_SIZE}")
-        return await call_next(request)
+    def __init__(self, app: ASGIApp, max_bytes: int | None = None):
+        self.app = app
+        self.max_bytes = int(max_bytes if max_bytes is not None else settings.API_MAX_JSON_SIZE)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"].upper() not in {"POST", "PUT", "PATCH"}:
+            await self.app(scope, receive, send)
+            return
+        limit = self.max_bytes
+        cl = Headers(scope=scope).get("content-length")
+        if cl:
+            try:
+                size = int(cl)
+            except ValueError:
+                size = None
+            if size is not None and size > limit:
+                response = await handle_app_error(Request(scope), _too_large(size, limit))
+                await response(scope, receive, send)
+                return
+
+        received = 0
+        started = False
+        rejected = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit and not started:
+                    # answer 413 ourselves and make the app see a disconnect; whatever it
+                    # tries to send afterwards is dropped
+                    rejected = True
+                    response = await handle_app_error(Request(scope), _too_large(received, limit))
+                    await response(scope, receive, send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal started
+            if rejected:
+                return
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, send_wrapper)
+        except Exception:
+            # the app failing on the synthetic disconnect is expected once we answered 413
+            if not rejected:
+                raise
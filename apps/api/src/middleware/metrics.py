@@ -5,32 +5,46 @@ import logging
 
 logger = logging.getLogger(__name__)
 import time
-from typing import Callable, Awaitable
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from ..metrics import HTTP_REQUESTS, HTTP_LATENCY
+from ..pool_stats import reset_usage, set_usage
 
 
-class MetricsMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable[[Request], Awaitable[Response]]) -> Response:
-        method = request.method
-        path_label = request.url.path
-        try:
-            route = request.scope.get("route")
-            if route is not None:
-                path_label = getattr(route, "path_format", None) or getattr(route, "path", path_label)
-        except (AttributeError, TypeError):
-            pass
+def _path_label(scope: Scope) -> str:
+    # the router stores the matched route in the shared scope
+    route = scope.get("route")
+    if route is not None:
+        return getattr(route, "path_format", None) or getattr(route, "path", scope.get("path", ""))
+    return scope.get("path", "")
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
         start = time.perf_counter()
         status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        # connections checked out while handling the request are attributed to its route
+        token = set_usage(lambda: f"{method} {_path_label(scope)}")
         try:
-            response = await call_next(request)
-            status_code = getattr(response, "status_code", 200)
-            return response
+            await self.app(scope, receive, send_wrapper)
         finally:
+            reset_usage(token)
             dur = time.perf_counter() - start
+            path_label = _path_label(scope)
             try:
                 HTTP_LATENCY.labels(method=method, path=path_label).observe(dur)
                 HTTP_REQUESTS.labels(method=method, path=path_label, status=str(status_code)).inc()
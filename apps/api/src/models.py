@@ -1,9 +1,16 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Integer, ForeignKey, ARRAY, JSON, LargeBinary
+from sqlalchemy import Column, String, DateTime, Boolean, Integer, BigInteger, Float, ForeignKey, ARRAY, JSON, LargeBinary, Index, DDL, Sequence, event, literal_column
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 import enum
 from .database import Base
+from .ids import created_at_from_id
+
+# JSONB on Postgres (binary, indexable, no re-parse on read); plain JSON elsewhere (SQLite tests)
+JsonDoc = JSON().with_variant(JSONB(), "postgresql")
+
+# connection types declared in a pipeline, e.g. ["http", "kafka"]; GIN-indexed for containment
+PIPELINE_CONNECTION_TYPES = "$.connections.*.type"
 
 
 class ThreadStatus(str, enum.Enum):
@@ -16,6 +23,7 @@ class ThreadStatus(str, enum.Enum):
 
 class Flow(Base):
     __tablename__ = "flow"
+    __table_args__ = (Index("ix_flow_name_id", "name", "id"),)
 
     id = Column(UUID(as_uuid=False), primary_key=True, index=True)
     slug = Column(String, unique=True, nullable=False)
@@ -32,6 +40,24 @@ class Flow(Base):
     summary_runs = relationship("SummaryRun", back_populates="flow", passive_deletes=True)
 
 
+class FlowStats(Base):
+    """Per-flow counters kept in step with pipeline/thread writes (see FlowStatsRepo)."""
+    __tablename__ = "flow_stats"
+    __table_args__ = (
+        Index("ix_flow_stats_last_activity", "last_activity_at", "flow_id"),
+        Index("ix_flow_stats_threads", "thread_count", "flow_id"),
+        Index("ix_flow_stats_pipelines", "pipeline_count", "flow_id"),
+    )
+
+    flow_id = Column(UUID(as_uuid=False), ForeignKey("flow.id", ondelete="CASCADE"), primary_key=True)
+    pipeline_count = Column(Integer, nullable=False, default=0, server_default="0")
+    published_pipeline_id = Column(UUID(as_uuid=False), ForeignKey("pipeline.id", ondelete="SET NULL"), nullable=True)
+    published_version = Column(String, nullable=True)
+    thread_count = Column(Integer, nullable=False, default=0, server_default="0")
+    open_thread_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_activity_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
 class Thread(Base):
     __tablename__ = "thread"
 
@@ -59,19 +85,29 @@ class Thread(Base):
 
 class Message(Base):
     __tablename__ = "message"
+    # keyset pagination: WHERE thread_id = ? AND (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC
+    # Monthly range partitions (see retention.py); the key must be part of the primary key, so
+    # nothing can hold a foreign key to message.id alone and parent_id is a plain reference.
+    __table_args__ = (
+        Index("ix_message_thread_created_id", "thread_id", "created_at", "id"),
+        Index("ix_message_content_gin", "content", postgresql_using="gin",
+              postgresql_ops={"content": "jsonb_path_ops"}).ddl_if(dialect="postgresql"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(UUID(as_uuid=False), primary_key=True, index=True)
     thread_id = Column(UUID(as_uuid=False), ForeignKey("thread.id", ondelete="CASCADE"), nullable=False)
     role = Column(String, nullable=False)
     format = Column(String, nullable=False, default="text")
-    parent_id = Column(UUID(as_uuid=False), ForeignKey("message.id", ondelete="SET NULL"), nullable=True)
+    parent_id = Column(UUID(as_uuid=False), nullable=True)
     tool_name = Column(String, nullable=True)
     tool_result = Column(JSON, nullable=True)
-    content = Column(JSON, nullable=False)
-    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    content = Column(JsonDoc, nullable=False)
+    created_at = Column(DateTime, primary_key=True, default=created_at_from_id, server_default=func.now(), nullable=False)
 
     thread = relationship("Thread", back_populates="messages")
-    parent = relationship("Message", remote_side=[id], uselist=False)
+    parent = relationship("Message", primaryjoin="remote(Message.id) == foreign(Message.parent_id)",
+                          uselist=False, viewonly=True)
 
 
 class SchemaDef(Base):
@@ -109,6 +145,12 @@ class SchemaChannel(Base):
 
 class Pipeline(Base):
     __tablename__ = "pipeline"
+    __table_args__ = (
+        Index("ix_pipeline_content_gin", "content", postgresql_using="gin",
+              postgresql_ops={"content": "jsonb_path_ops"}).ddl_if(dialect="postgresql"),
+        # exact-duplicate lookup in SimilarityService.find_candidate
+        Index("ix_pipeline_flow_content_hash", "flow_id", "content_hash"),
+    )
 
     id = Column(UUID(as_uuid=False), primary_key=True, index=True)
     flow_id = Column(UUID(as_uuid=False), ForeignKey("flow.id", ondelete="CASCADE"), nullable=False)
@@ -117,8 +159,9 @@ class Pipeline(Base):
     schema_def_id = Column(UUID(as_uuid=False), ForeignKey("schema_def.id", ondelete="RESTRICT"), nullable=True)
     status = Column(String, nullable=False, default="draft")
     is_published = Column(Boolean, nullable=False, default=False)
-    content = Column(JSON, nullable=False)
+    content = Column(JsonDoc, nullable=False)
     content_hash = Column(LargeBinary, nullable=True)
+    minhash = Column(LargeBinary, nullable=True)  # MinHash signature of the canonical content (infrastructure/minhash.py)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
@@ -127,8 +170,36 @@ class Pipeline(Base):
     generation_runs = relationship("GenerationRun", back_populates="pipeline")
 
 
+def pipeline_connection_types():
+    return func.jsonb_path_query_array(Pipeline.content, literal_column(f"'{PIPELINE_CONNECTION_TYPES}'"))
+
+
+def pipeline_content_text():
+    # generated text of content, Postgres only (see the DDL below); ranked with pg_trgm
+    return literal_column("pipeline.content_text")
+
+
+# A generated column cannot be declared portably (SQLite has no ::text), so it is added after
+# CREATE TABLE on Postgres, together with its trigram index. Existing databases get it from
+# migration a8d3f6b2c9e1.
+event.listen(Pipeline.__table__, "after_create", DDL("""
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public;
+ALTER TABLE pipeline ADD COLUMN IF NOT EXISTS content_text text GENERATED ALWAYS AS (content::text) STORED;
+CREATE INDEX IF NOT EXISTS ix_pipeline_content_text_trgm ON pipeline USING gin (content_text public.gin_trgm_ops);
+""").execute_if(dialect="postgresql"))
+
+
+Index(
+    "ix_pipeline_connection_types",
+    pipeline_connection_types().label("connection_types"),
+    postgresql_using="gin",
+    postgresql_ops={"connection_types": "jsonb_path_ops"},
+).ddl_if(dialect="postgresql")
+
+
 class GenerationRun(Base):
     __tablename__ = "generation_run"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
 
     id = Column(UUID(as_uuid=False), primary_key=True, index=True)
     flow_id = Column(UUID(as_uuid=False), ForeignKey("flow.id", ondelete="CASCADE"), nullable=False)
@@ -137,31 +208,43 @@ class GenerationRun(Base):
     stage = Column(String, nullable=False)
     status = Column(String, nullable=False, default="queued")
     source = Column(JSON, nullable=False)
-    result = Column(JSON, nullable=True)
+    result = Column(JsonDoc, nullable=True)
     error = Column(String, nullable=True)
     cost = Column(JSON, nullable=True)
-    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    created_at = Column(DateTime, primary_key=True, default=created_at_from_id, server_default=func.now(), nullable=False)
     started_at = Column(DateTime, nullable=True)
     finished_at = Column(DateTime, nullable=True)
 
     flow = relationship("Flow", back_populates="generation_runs")
     thread = relationship("Thread", back_populates="generation_runs")
     pipeline = relationship("Pipeline", back_populates="generation_runs")
-    validation_issues = relationship("ValidationIssue", back_populates="generation_run", cascade="all, delete-orphan")
+    validation_issues = relationship(
+        "ValidationIssue", back_populates="generation_run", cascade="all, delete-orphan",
+        primaryjoin="GenerationRun.id == foreign(ValidationIssue.generation_run_id)",
+    )
 
 
 class ValidationIssue(Base):
     __tablename__ = "validation_issue"
+    __table_args__ = (
+        Index("ix_validation_issue_run", "generation_run_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(UUID(as_uuid=False), primary_key=True, index=True)
-    generation_run_id = Column(UUID(as_uuid=False), ForeignKey("generation_run.id", ondelete="CASCADE"), nullable=False)
+    # generation_run is partitioned too; issues are written in the same transaction as their
+    # run and expire with it, so there is no foreign key
+    generation_run_id = Column(UUID(as_uuid=False), nullable=False)
     path = Column(String, nullable=False)
     code = Column(String, nullable=False)
     severity = Column(String, nullable=False)
     message = Column(String, nullable=False)
-    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    created_at = Column(DateTime, primary_key=True, default=created_at_from_id, server_default=func.now(), nullable=False)
 
-    generation_run = relationship("GenerationRun", back_populates="validation_issues")
+    generation_run = relationship(
+        "GenerationRun", back_populates="validation_issues",
+        primaryjoin="GenerationRun.id == foreign(ValidationIssue.generation_run_id)",
+    )
 
 
 class FlowSummary(Base):
@@ -170,15 +253,16 @@ class FlowSummary(Base):
     id = Column(UUID(as_uuid=False), primary_key=True, index=True)
     flow_id = Column(UUID(as_uuid=False), ForeignKey("flow.id", ondelete="CASCADE"), nullable=False)
     version = Column(Integer, nullable=False, default=1)
-    content = Column(JSON, nullable=False)
-    pinned = Column(JSON, nullable=False, default=dict)
-    last_message_id = Column(UUID(as_uuid=False), ForeignKey("message.id", ondelete="SET NULL"), nullable=True)
+    content = Column(JsonDoc, nullable=False)
+    pinned = Column(JsonDoc, nullable=False, default=dict)
+    last_message_id = Column(UUID(as_uuid=False), nullable=True)
     is_active = Column(Boolean, nullable=False, default=False)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
     flow = relationship("Flow", back_populates="summaries")
-    last_message = relationship("Message", foreign_keys=[last_message_id])
+    last_message = relationship("Message", primaryjoin="remote(Message.id) == foreign(FlowSummary.last_message_id)",
+                                uselist=False, viewonly=True)
     summary_runs = relationship("SummaryRun", back_populates="flow_summary")
     context_snapshots = relationship("ContextSnapshot", back_populates="flow_summary")
 
@@ -303,6 +387,10 @@ class CompatRule(Base):
 
 class AgentLog(Base):
     __tablename__ = "agent_log"
+    __table_args__ = (
+        Index("ix_agent_log_thread_created", "thread_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id = Column(UUID(as_uuid=False), primary_key=True, index=True)
     flow_id = Column(UUID(as_uuid=False), ForeignKey("flow.id", ondelete="SET NULL"), nullable=True)
@@ -310,7 +398,60 @@ class AgentLog(Base):
     level = Column(String, nullable=False)
     event = Column(String, nullable=False)
     data = Column(JSON, nullable=True)
-    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    created_at = Column(DateTime, primary_key=True, default=created_at_from_id, server_default=func.now(), nullable=False)
 
     flow = relationship("Flow", back_populates="logs")
     thread = relationship("Thread", back_populates="logs")
+
+
+class ThreadArchive(Base):
+    """Messages and agent logs of a closed thread, packed into one zstd blob (see archive.py)."""
+    __tablename__ = "thread_archive"
+
+    thread_id = Column(UUID(as_uuid=False), ForeignKey("thread.id", ondelete="CASCADE"), primary_key=True)
+    codec = Column(String, nullable=False, default="zstd")
+    storage = Column(String, nullable=False)  # db|file
+    blob = Column(LargeBinary, nullable=True)  # storage=db
+    path = Column(String, nullable=True)  # storage=file, relative to API_ARCHIVE_DIR
+    message_count = Column(Integer, nullable=False, default=0)
+    agent_log_count = Column(Integer, nullable=False, default=0)
+    raw_bytes = Column(BigInteger, nullable=False, default=0)
+    stored_bytes = Column(BigInteger, nullable=False, default=0)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+
+
+class SSEEvent(Base):
+    __tablename__ = "sse_event"
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+
+    channel = Column(String, primary_key=True)
+    seq = Column(BigInteger, primary_key=True)
+    event = Column(String, nullable=False)
+    data = Column(JSON, nullable=False)
+    created_at = Column(DateTime, primary_key=True, server_default=func.now(), nullable=False)
+
+
+# one value per process that logs SSE events; it becomes the worker slot in the low bits of seq
+SSE_WORKER_SEQ = Sequence("sse_worker_seq", metadata=Base.metadata)
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_key"
+
+    key = Column(String, primary_key=True)
+    body_hash = Column(String, nullable=False)
+    state = Column(String, nullable=False, default="in_progress")
+    status_code = Column(Integer, nullable=True)
+    headers = Column(JSON, nullable=True)
+    content = Column(LargeBinary, nullable=True)
+    media_type = Column(String, nullable=True)
+    token = Column(String, nullable=True)  # reservation id of the current owner
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class RateLimitKey(Base):
+    __tablename__ = "rate_limit"
+
+    key = Column(String, primary_key=True)
+    tat = Column(Float, nullable=False)  # GCRA theoretical arrival time, epoch seconds
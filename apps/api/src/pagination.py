@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from .ids import id_time
+from .middleware.error import AppError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+Key = Tuple[datetime, str]
+
+
+def encode_position(*values: Any) -> str:
+    """Opaque keyset cursor for an arbitrary sort position; datetimes travel as ISO strings."""
+    raw = json.dumps(
+        [v.isoformat() if isinstance(v, datetime) else v for v in values], separators=(",", ":")
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _bad_cursor() -> AppError:
+    return AppError(status=400, code="BAD_CURSOR", message="Invalid pagination cursor")
+
+
+def _decode_values(cursor: str) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise _bad_cursor() from exc
+    if not isinstance(values, list):
+        raise _bad_cursor()
+    return values
+
+
+def decode_position(cursor: str, *types: Callable[[Any], Any]) -> Tuple[Any, ...]:
+    """Inverse of encode_position; `types` convert each decoded value (e.g. datetime.fromisoformat)."""
+    values = _decode_values(cursor)
+    if len(values) != len(types):
+        raise _bad_cursor()
+    try:
+        return tuple(conv(v) for conv, v in zip(types, values))
+    except (ValueError, TypeError) as exc:
+        raise _bad_cursor() from exc
+
+
+def encode_cursor(created_at: datetime, id_: str) -> str:
+    """
+    Opaque keyset cursor for the position (created_at, id). Rows whose created_at was taken from
+    their UUIDv7 id (see ids.created_at_from_id) are encoded as the id alone.
+    """
+    if id_time(id_) == created_at:
+        return encode_position(str(id_))
+    return encode_position(created_at, str(id_))
+
+
+def decode_cursor(cursor: str) -> Key:
+    values = _decode_values(cursor)
+    if len(values) == 1:
+        created_at = id_time(values[0]) if isinstance(values[0], str) else None
+        if created_at is None:
+            raise _bad_cursor()
+        return created_at, values[0]
+    return decode_position(cursor, datetime.fromisoformat, str)
+
+
+def keyset_page(rows: Sequence[T], limit: int, key: Callable[[T], Sequence[Any]],
+                encode: Callable[..., str] = encode_position) -> Tuple[List[T], Optional[str]]:
+    """Split a `limit + 1` fetch into the page and the cursor of its last row (None on the last page)."""
+    items = list(rows[:limit])
+    if len(rows) <= limit or not items:
+        return items, None
+    return items, encode(*key(items[-1]))
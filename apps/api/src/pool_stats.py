@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+from .config import settings
+from .metrics import DB_POOL_HOLD_SECONDS, DB_POOL_IN_USE, DB_POOL_OVERFLOW, DB_POOL_TIMEOUTS, DB_POOL_WAIT_SECONDS
+
+# Who is using the pool right now: a route template (set per request by MetricsMiddleware) or a
+# use-case name (pool_usage()). A callable is resolved at checkout time, because the route is only
+# matched after the middleware has entered.
+_usage: ContextVar[Union[str, Callable[[], str], None]] = ContextVar("pool_usage", default=None)
+
+_SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+_SKIP_FILES = {os.path.abspath(__file__), os.path.join(_SRC_DIR, "database.py")}
+
+_lock = threading.Lock()
+# id(connection record) -> details of the current checkout, for the debug endpoint
+_checked_out: Dict[int, Dict[str, Any]] = {}
+# pool name -> [seconds spent waiting, completed checkouts] since start, for the load monitor
+_wait_totals: Dict[str, List[float]] = {}
+# checkouts still waiting: id(marker) -> (pool name, perf_counter at start)
+_waiting: Dict[int, Tuple[str, float]] = {}
+
+
+def current_usage() -> str:
+    value = _usage.get()
+    if callable(value):
+        try:
+            value = value()
+        except Exception:
+            value = None
+    return value or "other"
+
+
+def set_usage(value: Union[str, Callable[[], str], None]):
+    """Label pool activity in the current context; returns a token for reset_usage()."""
+    return _usage.set(value)
+
+
+def reset_usage(token) -> None:
+    _usage.reset(token)
+
+
+@contextmanager
+def pool_usage(label: str) -> Iterator[None]:
+    """Attribute connections checked out inside the block to `label` (e.g. "agent.run")."""
+    token = _usage.set(label)
+    try:
+        yield
+    finally:
+        _usage.reset(token)
+
+
+def _app_frame(frame) -> Optional[str]:
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_SRC_DIR) and filename not in _SKIP_FILES:
+            return f"{os.path.relpath(filename, os.path.dirname(_SRC_DIR))}:{frame.f_lineno} in {frame.f_code.co_name}"
+        frame = frame.f_back
+    return None
+
+
+def _caller() -> Optional[str]:
+    """First frame in this package that led to the checkout."""
+    location = _app_frame(sys._getframe(2))
+    if location is None:
+        # AsyncSession runs the sync checkout inside a greenlet; the awaiting coroutine chain
+        # is on the parent greenlet's stack
+        try:
+            import greenlet
+            parent = greenlet.getcurrent().parent
+            location = _app_frame(parent.gr_frame) if parent is not None else None
+        except Exception:
+            location = None
+    return location
+
+
+class _TimedCheckout:
+    """Times the wait for a connection (including overflow connects) and counts pool timeouts."""
+
+    def _do_get(self):
+        name = self.logging_name or "default"
+        marker = object()
+        t0 = time.perf_counter()
+        with _lock:
+            _waiting[id(marker)] = (name, t0)
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError:
+            DB_POOL_TIMEOUTS.labels(name, current_usage()).inc()
+            raise
+        finally:
+            waited = time.perf_counter() - t0
+            with _lock:
+                _waiting.pop(id(marker), None)
+                totals = _wait_totals.setdefault(name, [0.0, 0])
+                totals[0] += waited
+                totals[1] += 1
+            DB_POOL_WAIT_SECONDS.labels(name, current_usage()).observe(waited)
+
+
+def pool_waits(name: str) -> Tuple[float, int, float]:
+    """(seconds spent waiting, completed checkouts, age of the oldest checkout still waiting) for a pool."""
+    now = time.perf_counter()
+    with _lock:
+        total, count = _wait_totals.get(name, (0.0, 0))
+        stalled = max((now - t0 for pool, t0 in _waiting.values() if pool == name), default=0.0)
+    return total, int(count), stalled
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def _sample(pool: Pool, name: str) -> None:
+    try:
+        DB_POOL_IN_USE.labels(name).set(pool.checkedout())
+        DB_POOL_OVERFLOW.labels(name).set(max(0, pool.overflow()))
+    except (AttributeError, ValueError, TypeError):
+        pass
+
+
+def instrument_pool(target, name: str) -> None:
+    """Attach hold-time and in-use tracking to an engine's pool (sync Engine or AsyncEngine.sync_engine)."""
+
+    def _checkout(dbapi_conn, record, proxy) -> None:
+        info = {
+            "pool": name,
+            "usage": current_usage(),
+            "since": time.time(),
+            "t0": time.perf_counter(),
+            "acquired_at": _caller() if settings.API_DB_POOL_TRACK_CALLERS else None,
+            "thread": threading.current_thread().name,
+        }
+        record.info["pool_checkout"] = info
+        with _lock:
+            _checked_out[id(record)] = info
+        _sample(target.pool, name)
+
+    def _checkin(dbapi_conn, record) -> None:
+        info = record.info.pop("pool_checkout", None)
+        with _lock:
+            _checked_out.pop(id(record), None)
+        if info is not None:
+            DB_POOL_HOLD_SECONDS.labels(name, info["usage"]).observe(time.perf_counter() - info["t0"])
+        _sample(target.pool, name)
+
+    event.listen(target, "checkout", _checkout)
+    event.listen(target, "checkin", _checkin)
+
+
+def pool_status(pools: Dict[str, Pool]) -> Dict[str, Any]:
+    """Pool sizes plus every connection currently checked out, longest-held first."""
+    now = time.time()
+    with _lock:
+        held = [dict(i) for i in _checked_out.values()]
+    connections: List[Dict[str, Any]] = []
+    for i in sorted(held, key=lambda i: i["since"]):
+        i.pop("t0", None)
+        i["held_seconds"] = round(now - i.pop("since"), 3)
+        connections.append(i)
+    out: Dict[str, Any] = {"pools": {}, "checked_out": connections}
+    for name, pool in pools.items():
+        try:
+            out["pools"][name] = {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "overflow": max(0, pool.overflow()),
+                "max_overflow": getattr(pool, "_max_overflow", 0),
+                "timeout": pool.timeout(),
+            }
+        except AttributeError:
+            out["pools"][name] = {"status": pool.status()}
+    return out
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, List, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+@dataclass
+class QueryRecord:
+    statement: str
+    seconds: float
+    # cursor.rowcount: affected rows for DML; sqlite3 reports -1 for SELECT, psycopg the rows returned
+    rows: int
+    executemany: bool = False
+
+
+@dataclass
+class QueryLog:
+    records: List[QueryRecord] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.records)
+
+    @property
+    def rows(self) -> Optional[int]:
+        """Total rows, or None when the driver did not report them for every statement."""
+        if any(r.rows < 0 for r in self.records):
+            return None
+        return sum(r.rows for r in self.records)
+
+    @property
+    def seconds(self) -> float:
+        return sum(r.seconds for r in self.records)
+
+    def slowest(self, n: int = 5) -> List[QueryRecord]:
+        return sorted(self.records, key=lambda r: r.seconds, reverse=True)[:n]
+
+    def report(self, n: int = 5) -> str:
+        rows = "?" if self.rows is None else self.rows
+        lines = [f"{self.count} statements, {rows} rows, {self.seconds * 1000:.2f} ms"]
+        for r in self.slowest(n):
+            sql = " ".join(r.statement.split())
+            lines.append(f"  {r.seconds * 1000:8.2f} ms {r.rows:>6} rows  {sql[:160]}")
+        return "\n".join(lines)
+
+
+@contextmanager
+def record_queries(engine: Union[Engine, AsyncEngine]) -> Iterator[QueryLog]:
+    """
+    Record every statement sent through `engine` (statement, rowcount, wall time) while the
+    block runs. Used by the query budget tests and benchmarks/query_budgets.py.
+    """
+    target = engine.sync_engine if isinstance(engine, AsyncEngine) else engine
+    log = QueryLog()
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_stats_t0", []).append(time.perf_counter())
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        t0 = conn.info["query_stats_t0"].pop()
+        log.records.append(QueryRecord(statement, time.perf_counter() - t0, cursor.rowcount, executemany))
+
+    event.listen(target, "before_cursor_execute", before)
+    event.listen(target, "after_cursor_execute", after)
+    try:
+        yield log
+    finally:
+        event.remove(target, "before_cursor_execute", before)
+        event.remove(target, "after_cursor_execute", after)
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Sequence
+
+from fastapi import Request
+
+from .config import settings
+from .database import get_db
+from .infrastructure.rate_limit import RateLimit, RateLimiter, build_limiter
+from .metrics import RATE_LIMIT_DECISIONS
+from .middleware.error import AppError
+
+logger = logging.getLogger(__name__)
+
+limiter: RateLimiter = build_limiter(settings.API_RATE_LIMIT_BACKEND, max_keys=settings.API_RATE_LIMIT_MAX_KEYS)
+
+
+def rules(action: str) -> Dict[str, Optional[RateLimit]]:
+    """Per-scope limits for an action; `API_RATE_LIMIT_<ACTION>_<SCOPE>` overrides `API_RATE_LIMIT_<SCOPE>`."""
+    out: Dict[str, Optional[RateLimit]] = {}
+    for scope in ("thread", "flow", "client"):
+        specific = getattr(settings, f"API_RATE_LIMIT_{action.upper()}_{scope.upper()}", None)
+        spec = specific if specific is not None else getattr(settings, f"API_RATE_LIMIT_{scope.upper()}", "")
+        out[scope] = RateLimit.parse(spec)
+    return out
+
+
+@lru_cache(maxsize=10_000)
+def _flow_of_thread(thread_id: str) -> Optional[str]:
+    from .models import Thread
+    with get_db() as db:
+        t = db.get(Thread, thread_id)
+        return str(t.flow_id) if t is not None else None
+
+
+def _client_id(request: Request) -> str:
+    return request.headers.get("X-Client-Id") or (request.client.host if request.client else "unknown")
+
+
+async def enforce(action: str, *, thread_id: str | None = None, flow_id: str | None = None,
+                  client_id: str | None = None, scopes: Sequence[str] = ("thread", "flow", "client")) -> None:
+    ids = {"thread": thread_id, "flow": flow_id, "client": client_id}
+    for scope, rule in rules(action).items():
+        if scope not in scopes or rule is None or not ids[scope]:
+            continue
+        decision = await limiter.hit(f"{action}:{scope}:{ids[scope]}", rule)
+        try:
+            RATE_LIMIT_DECISIONS.labels(action=action, scope=scope, result="allowed" if decision.allowed else "limited").inc()
+        except (ValueError, TypeError, RuntimeError):
+            pass
+        if not decision.allowed:
+            raise AppError(
+                status=429,
+                code="RATE_LIMITED",
+                message=f"Rate limit exceeded: max {rule.limit} {action} requests per {int(rule.period)}s for this {scope}",
+                details=[{"scope": scope, "retry_after": round(decision.retry_after, 3)}],
+                headers={"Retry-After": str(max(1, int(decision.retry_after + 0.999)))},
+            )
+
+
+def rate_limited(action: str, scopes: Sequence[str] = ("thread", "flow", "client")) -> Callable:
+    """FastAPI dependency applying the `action` limits, keyed by the route's thread_id/flow_id and the client."""
+
+    async def dependency(request: Request) -> None:
+        thread_id = request.path_params.get("thread_id")
+        flow_id = request.path_params.get("flow_id")
+        if flow_id is None and thread_id and "flow" in scopes and rules(action).get("flow") is not None:
+            try:
+                flow_id = await asyncio.to_thread(_flow_of_thread, thread_id)
+            except Exception as e:
+                logger.debug("flow lookup for rate limit failed: %s", e)
+        await enforce(action, thread_id=thread_id, flow_id=flow_id, client_id=_client_id(request), scopes=scopes)
+
+    return dependency
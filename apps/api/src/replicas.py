@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from .config import settings
+from .database import create_replica_engine, engine, get_db
+from .metrics import DB_REPLICA_LAG, DB_READ_SESSIONS
+
+logger = logging.getLogger(__name__)
+
+# LSN a read must observe (read-your-writes); set per request by ConsistencyMiddleware
+min_lsn: ContextVar[Optional[int]] = ContextVar("db_min_lsn", default=None)
+
+# receive == replay means the replica has applied everything it got, so an idle
+# primary (old replay timestamp) does not read as lag
+_SAMPLE = text("""
+SELECT pg_last_wal_replay_lsn()::text,
+       CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE COALESCE(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+       END::float8
+""")
+_CURRENT_LSN = text("SELECT pg_current_wal_lsn()::text")
+
+
+def parse_lsn(value: str) -> int:
+    """'16/B374D848' -> int, so LSNs compare numerically."""
+    hi, _, lo = value.strip().partition("/")
+    return (int(hi, 16) << 32) | int(lo, 16)
+
+
+def format_lsn(value: int) -> str:
+    return f"{value >> 32:X}/{value & 0xFFFFFFFF:X}"
+
+
+def _inc(target: str, reason: str) -> None:
+    try:
+        DB_READ_SESSIONS.labels(target=target, reason=reason).inc()
+    except (ValueError, TypeError, RuntimeError):
+        pass
+
+
+class Replica:
+    def __init__(self, name: str, engine: Engine):
+        self.name = name
+        self.engine = engine
+        self.session_factory = sessionmaker(bind=engine, class_=Session, autoflush=False, expire_on_commit=False)
+        # unknown until the first sample; a replica is not used before it is sampled
+        self.healthy = False
+        self.lag = 0.0
+        self.replay_lsn: Optional[int] = None
+
+    def sample_sync(self) -> None:
+        try:
+            with self.engine.connect() as conn:
+                lsn, lag = conn.execute(_SAMPLE).one()
+            self.replay_lsn = parse_lsn(lsn) if lsn else None
+            self.lag = float(lag or 0.0)
+            self.healthy = True
+        except Exception as e:
+            logger.warning("replica %s sample failed: %s", self.name, e)
+            self.healthy = False
+        try:
+            DB_REPLICA_LAG.labels(replica=self.name).set(self.lag if self.healthy else float("inf"))
+        except (ValueError, TypeError, RuntimeError):
+            pass
+
+
+class ReplicaRouter:
+    """Routes read-only sessions to replicas that are healthy, within `max_lag`
+    seconds and, when a consistency token is present, already past that LSN;
+    everything else goes to the primary.
+    """
+
+    def __init__(self, replicas: List[Replica], *, max_lag: float, interval: float, primary: Optional[Engine] = None):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.interval = interval
+        self.primary = primary
+        self._next = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def pick(self, lsn: Optional[int] = None) -> tuple[Optional[Replica], str]:
+        """Return (replica or None, reason) using round-robin over eligible replicas."""
+        if not self.replicas:
+            return None, "no_replica"
+        reason = "unhealthy"
+        for i in range(len(self.replicas)):
+            r = self.replicas[(self._next + i) % len(self.replicas)]
+            if not r.healthy:
+                continue
+            if r.lag > self.max_lag:
+                reason = "lagging"
+                continue
+            if lsn is not None and (r.replay_lsn is None or r.replay_lsn < lsn):
+                reason = "behind_token"
+                continue
+            self._next = (self._next + i + 1) % len(self.replicas)
+            return r, "ok"
+        return None, reason
+
+    def sample_sync(self) -> None:
+        for r in self.replicas:
+            r.sample_sync()
+
+    def current_lsn_sync(self) -> Optional[int]:
+        """Primary WAL position; any commit made before this call is at or below it."""
+        if self.primary is None:
+            return None
+        with self.primary.connect() as conn:
+            return parse_lsn(conn.execute(_CURRENT_LSN).scalar_one())
+
+    async def current_lsn(self) -> Optional[int]:
+        return await asyncio.to_thread(self.current_lsn_sync)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.to_thread(self.sample_sync)
+            await asyncio.sleep(self.interval)
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def build_router() -> ReplicaRouter:
+    replicas: List[Replica] = []
+    if not os.getenv("ALEMBIC"):
+        for i, dsn in enumerate(settings.replica_dsns):
+            replicas.append(Replica(f"replica{i}", create_replica_engine(dsn, f"replica{i}")))
+    return ReplicaRouter(
+        replicas,
+        max_lag=settings.API_DB_REPLICA_MAX_LAG_SEC,
+        interval=settings.API_DB_REPLICA_SAMPLE_INTERVAL_SEC,
+        primary=engine,
+    )
+
+
+replica_router = build_router()
+
+
+@contextmanager
+def get_read_db(lsn: Optional[int] = None) -> Iterator[Session]:
+    """
+    Read-only session: a replica when one qualifies, otherwise the primary via get_db().
+    `lsn` (default: the request's consistency token) is the WAL position the read must see.
+    """
+    replica, reason = replica_router.pick(lsn if lsn is not None else min_lsn.get())
+    if replica is None:
+        _inc("primary", reason)
+        with get_db() as db:
+            yield db
+        return
+    _inc("replica", reason)
+    db = replica.session_factory()
+    try:
+        yield db
+    finally:
+        # nothing to commit on a replica; end the read transaction
+        db.rollback()
+        db.close()
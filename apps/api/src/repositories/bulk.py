@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+import json
+from typing import Any, Dict, Sequence
+
+from sqlalchemy import JSON, Table, insert
+from sqlalchemy.orm import Session
+
+from ..config import settings
+
+
+def _use_copy(db: Session, n: int) -> bool:
+    if settings.API_BULK_COPY_MIN_ROWS <= 0 or n < settings.API_BULK_COPY_MIN_ROWS:
+        return False
+    dialect = db.get_bind().dialect
+    return dialect.name == "postgresql" and dialect.driver == "psycopg"
+
+
+def _copy(db: Session, table: Table, rows: Sequence[Dict[str, Any]]) -> None:
+    cols = list(rows[0])
+    json_cols = {c for c in cols if isinstance(table.c[c].type, JSON)}
+    # the session's own connection, so the COPY joins the current transaction
+    raw = db.connection().connection.driver_connection
+    quoted = ", ".join(f'"{c}"' for c in cols)
+    with raw.cursor() as cur:
+        with cur.copy(f'COPY "{table.name}" ({quoted}) FROM STDIN') as cp:
+            for r in rows:
+                cp.write_row([json.dumps(r[c]) if c in json_cols and r[c] is not None else r[c] for c in cols])
+
+
+def bulk_insert(db: Session, table: Table, rows: Sequence[Dict[str, Any]]) -> int:
+    """
+    Insert plain row dicts (all with the same keys) without building ORM objects: COPY on
+    psycopg once a batch reaches API_BULK_COPY_MIN_ROWS, otherwise one executemany INSERT
+    per API_BULK_BATCH_SIZE rows. Columns left out get their server defaults. Rows are not
+    added to the session.
+    """
+    if not rows:
+        return 0
+    # pending ORM rows (e.g. the run these issues point at) must reach the DB first
+    db.flush()
+    if _use_copy(db, len(rows)):
+        _copy(db, table, rows)
+        return len(rows)
+    size = settings.API_BULK_BATCH_SIZE
+    for i in range(0, len(rows), size):
+        db.execute(insert(table), list(rows[i:i + size]))
+    return len(rows)
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+from typing import Any, Dict, List
+from datetime import datetime, UTC
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from ..models import SSE_WORKER_SEQ, SSEEvent
+
+
+class EventLogRepo:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def next_worker(self) -> int:
+        return int(self.db.execute(select(SSE_WORKER_SEQ.next_value())).scalar_one())
+
+    def insert_many(self, items: List[Dict[str, Any]]) -> int:
+        """Insert a batch; returns how many rows were written (conflicting ones are skipped and logged)."""
+        if not items:
+            return 0
+        rows = [
+            {
+                "channel": it["channel"],
+                "seq": it["seq"],
+                "event": it["event"],
+                "data": it["data"],
+                "created_at": datetime.fromtimestamp(it["ts"], UTC).replace(tzinfo=None),
+            }
+            for it in items
+        ]
+        stmt = insert(SSEEvent).values(rows).on_conflict_do_nothing().returning(SSEEvent.seq)
+        inserted = len(self.db.execute(stmt).all())
+        if inserted < len(rows):
+            logger.warning("sse event log skipped %d of %d events already logged under the same (channel, seq)",
+                           len(rows) - inserted, len(rows))
+        return inserted
+
+    def list_after(self, channel: str, after_seq: int, limit: int) -> List[Dict[str, Any]]:
+        rows = self.db.execute(
+            select(SSEEvent.seq, SSEEvent.event, SSEEvent.data, SSEEvent.created_at)
+            .where(SSEEvent.channel == channel, SSEEvent.seq > after_seq)
+            .order_by(SSEEvent.seq.asc())
+            .limit(limit)
+        ).all()
+        return [
+            {
+                "channel": channel,
+                "seq": int(r.seq),
+                "event": r.event,
+                "data": r.data,
+                "ts": r.created_at.replace(tzinfo=UTC).timestamp(),
+            }
+            for r in rows
+        ]
+
+    def has_at_or_before(self, channel: str, seq: int) -> bool:
+        row = self.db.execute(
+            select(SSEEvent.seq)
+            .where(SSEEvent.channel == channel, SSEEvent.seq <= seq)
+            .limit(1)
+        ).first()
+        return row is not None
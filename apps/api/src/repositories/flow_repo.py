@@ -4,49 +4,54 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
 from sqlalchemy.orm import Session
-from sqlalchemy import select, func
-from ..models import Flow, Pipeline
+from sqlalchemy import asc, desc, select, tuple_
+from ..models import Flow, FlowStats
+from .flow_stats_repo import FlowStatsRepo
+
+# sort name -> (column, cursor value decoder); every sort is keyset-paged on (column, flow.id)
+SORTS = {
+    "name": (Flow.name, str),
+    "last_activity": (FlowStats.last_activity_at, datetime.fromisoformat),
+    "pipelines": (FlowStats.pipeline_count, int),
+    "threads": (FlowStats.thread_count, int),
+}
+
+
+def _list_stmt(sort: str, order: str, limit: Optional[int], after: Optional[Sequence[Any]]):
+    col = SORTS[sort][0]
+    stmt = select(Flow, FlowStats, col.label("sort_value")).join(FlowStats, FlowStats.flow_id == Flow.id)
+    if after is not None:
+        pos, bound = tuple_(col, Flow.id), tuple_(*after, types=(col.type, Flow.id.type))
+        stmt = stmt.where(pos > bound if order == "asc" else pos < bound)
+    direction = asc if order == "asc" else desc
+    stmt = stmt.order_by(direction(col), direction(Flow.id))
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    return stmt
+
 
 class FlowRepo:
     def __init__(self, db: Session):
         self.db = db
 
-    def list(self):
-        published_count = self._published_count_subquery().label("published_count")
-        active_version = self._active_version_subquery().label("active_version")
-        stmt = select(Flow, published_count, active_version)
-        return self.db.execute(stmt).all()
+    def list(self, *, sort: str = "name", order: str = "asc", limit: Optional[int] = None,
+             after: Optional[Sequence[Any]] = None) -> List[Any]:
+        """(Flow, FlowStats, sort_value) rows; with `limit`, one extra row is fetched so callers can tell if more remain."""
+        return list(self.db.execute(_list_stmt(sort, order, limit, after)).all())
 
     def get_with_stats(self, flow_id: str):
-        published_count = self._published_count_subquery().label("published_count")
-        active_version = self._active_version_subquery().label("active_version")
-        stmt = select(Flow, published_count, active_version).where(Flow.id == flow_id)
+        stmt = select(Flow, FlowStats).outerjoin(FlowStats, FlowStats.flow_id == Flow.id).where(Flow.id == flow_id)
         return self.db.execute(stmt).one_or_none()
 
-    @staticmethod
-    def _published_count_subquery():
-        return (
-            select(func.count())
-            .select_from(Pipeline)
-            .where(Pipeline.flow_id == Flow.id, Pipeline.is_published == True)
-            .scalar_subquery()
-        )
-
-    @staticmethod
-    def _active_version_subquery():
-        return (
-            select(Pipeline.version)
-            .where(Pipeline.flow_id == Flow.id, Pipeline.is_published == True)
-            .order_by(Pipeline.created_at.desc())
-            .limit(1)
-            .scalar_subquery()
-        )
-
     def create(self, flow_id, slug, name, meta=None):
         f = Flow(id=flow_id, slug=slug, name=name, meta=meta or {})
         self.db.add(f)
         self.db.flush()
+        FlowStatsRepo(self.db).ensure(flow_id)
         return f
 
     def get(self, flow_id):
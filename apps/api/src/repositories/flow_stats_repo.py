@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, exists, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..models import Flow, FlowStats, Pipeline, Thread
+
+_COUNTERS = ("pipeline_count", "thread_count", "open_thread_count")
+
+
+def _insert(db: Session):
+    # ON CONFLICT exists on both backends we run against, but under dialect-specific constructs
+    return (sqlite_insert if db.get_bind().dialect.name == "sqlite" else pg_insert)(FlowStats)
+
+
+class FlowStatsRepo:
+    """
+    flow_stats keeps the per-flow numbers the flows listing sorts and filters on, so the listing
+    is a join on a primary key instead of correlated subqueries per flow. Writers call `apply`
+    in the same transaction as the change they count; `rebuild` recomputes from source tables.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def ensure(self, flow_id: str) -> None:
+        self.db.execute(_insert(self.db).values(flow_id=flow_id).on_conflict_do_nothing(index_elements=["flow_id"]))
+
+    def apply(
+        self,
+        flow_id: str,
+        *,
+        pipelines: int = 0,
+        threads: int = 0,
+        open_threads: int = 0,
+        published: Optional[Pipeline] = None,
+    ) -> None:
+        """Add deltas and bump last_activity_at. `col = col + n` is applied under the row lock,
+        so concurrent writers never lose an increment."""
+        values: Dict[str, object] = {"last_activity_at": func.now()}
+        for name, delta in zip(_COUNTERS, (pipelines, threads, open_threads)):
+            if delta:
+                values[name] = getattr(FlowStats, name) + delta
+        if published is not None:
+            values["published_pipeline_id"] = published.id
+            values["published_version"] = published.version
+        res = self.db.execute(
+            update(FlowStats)
+            .where(FlowStats.flow_id == flow_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        if res.rowcount == 0:
+            # flow predates flow_stats; source tables already include this write
+            logger.info("flow_stats row missing for %s; rebuilding", flow_id)
+            self.rebuild([flow_id])
+
+    def rebuild(self, flow_ids: Optional[Iterable[str]] = None, *, missing_only: bool = False) -> int:
+        """Recompute rows from pipeline/thread (all flows by default). Returns the number of rows written."""
+        flows = select(Flow.id, Flow.updated_at)
+        if flow_ids is not None:
+            flows = flows.where(Flow.id.in_(list(flow_ids)))
+        if missing_only:
+            flows = flows.where(~exists().where(FlowStats.flow_id == Flow.id))
+        rows = {str(fid): {"flow_id": str(fid), "pipeline_count": 0, "thread_count": 0, "open_thread_count": 0,
+                           "published_pipeline_id": None, "published_version": None, "last_activity_at": ts}
+                for fid, ts in self.db.execute(flows).all()}
+        if not rows:
+            return 0
+        ids = list(rows)
+
+        def touch(row: dict, ts: Optional[datetime]) -> None:
+            if ts is not None and ts > row["last_activity_at"]:
+                row["last_activity_at"] = ts
+
+        for fid, n, last in self.db.execute(
+            select(Pipeline.flow_id, func.count(), func.max(Pipeline.updated_at))
+            .where(Pipeline.flow_id.in_(ids)).group_by(Pipeline.flow_id)
+        ).all():
+            rows[str(fid)]["pipeline_count"] = int(n)
+            touch(rows[str(fid)], last)
+        for fid, pid, version in self.db.execute(
+            select(Pipeline.flow_id, Pipeline.id, Pipeline.version)
+            .where(Pipeline.flow_id.in_(ids), Pipeline.is_published == True)
+            .order_by(Pipeline.created_at)
+        ).all():
+            rows[str(fid)].update(published_pipeline_id=str(pid), published_version=version)
+        for fid, n, n_open, last in self.db.execute(
+            select(
+                Thread.flow_id,
+                func.count(),
+                func.sum(case((Thread.closed_at.is_(None), 1), else_=0)),
+                func.max(Thread.updated_at),
+            ).where(Thread.flow_id.in_(ids)).group_by(Thread.flow_id)
+        ).all():
+            rows[str(fid)].update(thread_count=int(n), open_thread_count=int(n_open or 0))
+            touch(rows[str(fid)], last)
+
+        values: List[dict] = list(rows.values())
+        for chunk in (values[i:i + 500] for i in range(0, len(values), 500)):
+            stmt = _insert(self.db).values(chunk)
+            self.db.execute(stmt.on_conflict_do_update(
+                index_elements=["flow_id"],
+                set_={c: stmt.excluded[c] for c in chunk[0] if c != "flow_id"},
+            ))
+        return len(values)
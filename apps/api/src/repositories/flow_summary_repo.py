@@ -6,17 +6,19 @@ logger = logging.getLogger(__name__)
 
 from typing import Any, Dict, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import lambda_stmt, select
 from ..models import FlowSummary
 
 
 def get_active(db: Session, flow_id: str) -> Optional[FlowSummary]:
     """Return active FlowSummary for a flow, if any."""
-    return db.execute(
-        select(FlowSummary)
+    # hot path (every context gather / thread create): lambda_stmt skips rebuilding the
+    # statement and its cache key on each call
+    return db.execute(lambda_stmt(
+        lambda: select(FlowSummary)
         .where(FlowSummary.flow_id == flow_id, FlowSummary.is_active == True)  # noqa: E712
         .limit(1)
-    ).scalar_one_or_none()
+    )).scalar_one_or_none()
 
 
 def active_payload(fs: Optional[FlowSummary]) -> Dict[str, Any]:
@@ -4,8 +4,46 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import lambda_stmt, select, tuple_, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from ..archive import archived_messages, merge_archived
 from ..models import Message
+from ..pagination import Key, encode_cursor, keyset_page
+
+
+def _page_stmt(thread_id: str, limit: int, before: Optional[Key]):
+    # newest first; served by ix_message_thread_created_id, so each page is one index range scan.
+    # Cached lambda: the first/next-page shapes are built and keyed once, then only rebound.
+    stmt = lambda_stmt(lambda: select(Message).where(Message.thread_id == thread_id))
+    if before is not None:
+        created_at, message_id = before
+        # closure values bind with their Python type; coerce so the id is processed as a UUID
+        stmt += lambda s: s.where(tuple_(Message.created_at, Message.id) < tuple_(
+            type_coerce(created_at, Message.created_at.type), type_coerce(message_id, Message.id.type)))
+    fetch = limit + 1  # a closure variable, not an expression, so it is rebound per call
+    stmt += lambda s: s.order_by(Message.created_at.desc(), Message.id.desc()).limit(fetch)
+    return stmt
+
+
+def _containing_stmt(thread_id: str, fragment: Dict[str, Any], limit: int):
+    # content @> fragment; served by ix_message_content_gin (Postgres only)
+    stmt = select(Message).where(Message.thread_id == thread_id, type_coerce(Message.content, JSONB).contains(fragment))
+    return stmt.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit)
+
+
+def _key(m: Message) -> Key:
+    return m.created_at, str(m.id)
+
+
+def _with_archived(db: Session, thread_id: str, rows, limit: int, before: Optional[Key]) -> List[Message]:
+    archived = archived_messages(db, thread_id)
+    if not archived:
+        return list(rows)
+    return merge_archived(rows, archived, _key, descending=True, bound=before, limit=limit)
+
 
 class MessageRepo:
     def __init__(self, db: Session):
@@ -19,3 +57,50 @@ class MessageRepo:
     def list_for_thread(self, thread_id, limit=50):
         q = self.db.query(Message).filter(Message.thread_id==thread_id).order_by(Message.created_at.asc()).limit(limit)
         return q.all()
+
+    def list_page(self, thread_id: str, limit: int, before: Optional[Key] = None, *,
+                  archived: bool = False) -> Tuple[List[Message], Optional[str]]:
+        """
+        Messages older than `before`, newest first, plus the cursor for the next (older) page.
+        `archived`: the thread is closed or archived (archive.may_be_archived), so the rest of
+        it may live in thread_archive; live threads never pay for that lookup.
+        """
+        rows = self.db.execute(_page_stmt(thread_id, limit, before)).scalars().all()
+        if archived and len(rows) <= limit:
+            # short page: the rest of the thread may have been moved to thread_archive
+            rows = _with_archived(self.db, thread_id, rows, limit, before)
+        return keyset_page(rows, limit, _key, encode_cursor)
+
+    def find_containing(self, thread_id: str, fragment: Dict[str, Any], limit: int = 50) -> List[Message]:
+        """Newest messages of a thread whose content contains `fragment` (JSONB @>)."""
+        return list(self.db.execute(_containing_stmt(thread_id, fragment, limit)).scalars().all())
+
+
+class AsyncMessageRepo:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def add(self, message_id, thread_id, role, content, parent_id=None, tool_name=None, tool_result=None, fmt="text"):
+        m = Message(id=message_id, thread_id=thread_id, role=role, content=content, parent_id=parent_id, tool_name=tool_name, tool_result=tool_result, format=fmt)
+        self.db.add(m); await self.db.flush()
+        # created_at is server-side; load it now since lazy loads are unavailable later
+        await self.db.refresh(m, ["created_at"])
+        return m
+
+    async def thread_of(self, message_id: str) -> Optional[str]:
+        thread_id = (await self.db.execute(select(Message.thread_id).where(Message.id == message_id))).scalar()
+        return str(thread_id) if thread_id is not None else None
+
+    async def list_for_thread(self, thread_id, limit=50):
+        stmt = select(Message).where(Message.thread_id == thread_id).order_by(Message.created_at.asc()).limit(limit)
+        return list((await self.db.execute(stmt)).scalars().all())
+
+    async def list_page(self, thread_id: str, limit: int, before: Optional[Key] = None, *,
+                        archived: bool = False) -> Tuple[List[Message], Optional[str]]:
+        rows = (await self.db.execute(_page_stmt(thread_id, limit, before))).scalars().all()
+        if archived and len(rows) <= limit:
+            rows = await self.db.run_sync(_with_archived, thread_id, rows, limit, before)
+        return keyset_page(rows, limit, _key, encode_cursor)
+
+    async def find_containing(self, thread_id: str, fragment: Dict[str, Any], limit: int = 50) -> List[Message]:
+        return list((await self.db.execute(_containing_stmt(thread_id, fragment, limit))).scalars().all())
@@ -5,26 +5,53 @@ import logging
 logger = logging.getLogger(__name__)
 
 from typing import Any, Dict, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select
-from ..models import Pipeline
+from sqlalchemy import lambda_stmt, select, type_coerce, update
+from sqlalchemy.dialects.postgresql import JSONB
+from ..models import Pipeline, pipeline_connection_types
+from .flow_stats_repo import FlowStatsRepo
+
+def _list_stmt(flow_id: str, published: Optional[bool]):
+    stmt = select(Pipeline).where(Pipeline.flow_id == flow_id)
+    if published is True:
+        stmt = stmt.where(Pipeline.is_published == True)
+    elif published is False:
+        stmt = stmt.where(Pipeline.is_published == False)
+    return stmt.order_by(Pipeline.created_at.desc())
+
+
+def _containing_stmt(flow_id: str, fragment: Dict[str, Any]):
+    # content @> fragment; served by ix_pipeline_content_gin (Postgres only)
+    stmt = select(Pipeline).where(Pipeline.flow_id == flow_id, type_coerce(Pipeline.content, JSONB).contains(fragment))
+    return stmt.order_by(Pipeline.created_at.desc())
+
+
+def _connection_type_stmt(flow_id: str, conn_type: str):
+    # connections are keyed by name, so match on the extracted type array; served by ix_pipeline_connection_types
+    types = type_coerce(pipeline_connection_types(), JSONB)
+    stmt = select(Pipeline).where(Pipeline.flow_id == flow_id, types.contains([conn_type]))
+    return stmt.order_by(Pipeline.created_at.desc())
+
 
 class PipelineRepo:
     def __init__(self, db: Session):
         self.db = db
 
     def list_for_flow(self, flow_id: str, published: Optional[bool] = None) -> List[Pipeline]:
-        stmt = select(Pipeline).where(Pipeline.flow_id == flow_id)
-        if published is True:
-            stmt = stmt.where(Pipeline.is_published == True)
-        elif published is False:
-            stmt = stmt.where(Pipeline.is_published == False)
-        stmt = stmt.order_by(Pipeline.created_at.desc())
-        return list(self.db.execute(stmt).scalars().all())
+        return list(self.db.execute(_list_stmt(flow_id, published)).scalars().all())
 
     def get(self, pid: str) -> Optional[Pipeline]:
         return self.db.get(Pipeline, pid)
 
+    def find_containing(self, flow_id: str, fragment: Dict[str, Any]) -> List[Pipeline]:
+        """Pipelines of a flow whose content contains `fragment` (JSONB @>)."""
+        return list(self.db.execute(_containing_stmt(flow_id, fragment)).scalars().all())
+
+    def with_connection_type(self, flow_id: str, conn_type: str) -> List[Pipeline]:
+        """Pipelines of a flow with at least one connection of type `conn_type`."""
+        return list(self.db.execute(_connection_type_stmt(flow_id, conn_type)).scalars().all())
+
     def create_version(
         self,
         pipeline_id: str,
@@ -36,6 +63,7 @@ class PipelineRepo:
         is_published: bool = False,
         schema_version: Optional[str] = None,
         content_hash: Optional[bytes] = None,
+        minhash: Optional[bytes] = None,
     ) -> Pipeline:
         p = Pipeline(
             id=pipeline_id,
@@ -47,8 +75,10 @@ class PipelineRepo:
             is_published=is_published,
             schema_version=schema_version or "1.0.0",
             content_hash=content_hash,
+            minhash=minhash,
         )
         self.db.add(p); self.db.flush()
+        FlowStatsRepo(self.db).apply(flow_id, pipelines=1, published=p if is_published else None)
         return p
 
     def publish(self, pid: str) -> Optional[Pipeline]:
@@ -71,4 +101,44 @@ class PipelineRepo:
         p.is_published = True
         p.status = "published"
         self.db.flush()
+        FlowStatsRepo(self.db).apply(p.flow_id, published=p)
+        return p
+
+
+class AsyncPipelineRepo:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def list_for_flow(self, flow_id: str, published: Optional[bool] = None) -> List[Pipeline]:
+        return list((await self.db.execute(_list_stmt(flow_id, published))).scalars().all())
+
+    async def get(self, pid: str) -> Optional[Pipeline]:
+        return await self.db.get(Pipeline, pid)
+
+    async def find_containing(self, flow_id: str, fragment: Dict[str, Any]) -> List[Pipeline]:
+        return list((await self.db.execute(_containing_stmt(flow_id, fragment))).scalars().all())
+
+    async def with_connection_type(self, flow_id: str, conn_type: str) -> List[Pipeline]:
+        return list((await self.db.execute(_connection_type_stmt(flow_id, conn_type))).scalars().all())
+
+    async def get_published(self, flow_id: str) -> Optional[Pipeline]:
+        stmt = lambda_stmt(lambda: select(Pipeline).where(Pipeline.flow_id == flow_id, Pipeline.is_published == True).limit(1))
+        return (await self.db.execute(stmt)).scalar_one_or_none()
+
+    async def publish(self, pid: str) -> Optional[Pipeline]:
+        p = await self.get(pid)
+        if p is None:
+            return None
+        # same locking as PipelineRepo.publish
+        await self.db.execute(select(Pipeline.id).where(Pipeline.flow_id == p.flow_id).with_for_update())
+        await self.db.execute(
+            update(Pipeline)
+            .where(Pipeline.flow_id == p.flow_id, Pipeline.id != pid, Pipeline.is_published == True)
+            .values(is_published=False, status="draft")
+            .execution_options(synchronize_session=False)
+        )
+        p.is_published = True
+        p.status = "published"
+        await self.db.flush()
+        await self.db.run_sync(lambda db: FlowStatsRepo(db).apply(p.flow_id, published=p))
         return p
@@ -4,96 +4,102 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+from sqlalchemy import func, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from ..models import GenerationRun, ValidationIssue
+from .bulk import bulk_insert
+from ..ids import id_time, new_id
 from typing import Optional, List, Dict, Any
-from datetime import datetime, UTC
+
+
+# Every state transition is one statement that returns the updated row. The whole new row
+# state is written at once, so row CHECK constraints only ever see the final (stage, status);
+# started_at/finished_at come from the DB clock, the same one that fills created_at.
+
+def _start_stmt(run_id: str, flow_id: str, thread_id: str, stage: str, source: Dict[str, Any]):
+    return (
+        insert(GenerationRun)
+        .values(id=run_id, flow_id=flow_id, thread_id=thread_id, stage=stage, status="running",
+                source=source, started_at=func.now())
+        .returning(GenerationRun)
+    )
+
+
+def _update_stmt(run_id: str, **values: Any):
+    # generation_run is partitioned on created_at, so the primary key is (id, created_at)
+    # and rows are addressed by id alone here
+    return (
+        update(GenerationRun)
+        .where(GenerationRun.id == run_id)
+        .values(**values)
+        .returning(GenerationRun)
+    )
+
+
+def _tick_stmt(run_id: str, stage: str, status: str, result: Optional[Dict[str, Any]], error: Optional[str]):
+    values: Dict[str, Any] = {"stage": stage, "status": status}
+    if result is not None:
+        values["result"] = result
+    if error:
+        values["error"] = error
+    return _update_stmt(run_id, **values)
+
+
+def _finish_stmt(run_id: str, status: str):
+    return _update_stmt(run_id, status=status, finished_at=func.now())
+
 
 class RunsRepo:
     def __init__(self, db: Session):
         self.db = db
 
     def start(self, run_id: str, flow_id: str, thread_id: str, stage: str, source: Dict[str, Any]) -> GenerationRun:
-        """Create a GenerationRun row ensuring timestamp ordering constraints.
-        We avoid setting started_at before created_at is populated by the DB.
-        """
-        run = GenerationRun(
-            id=run_id,
-            flow_id=flow_id,
-            thread_id=thread_id,
-            stage=stage,
-            status="running",
-            source=source,
-            # defer started_at until after insert to satisfy CHECK(created_at <= started_at)
-            started_at=None,
-        )
-        self.db.add(run)
-        self.db.flush()
-        # Now that created_at is set by DB, set started_at to created_at (or now, whichever is later)
-        try:
-            self.db.refresh(run)
-            created = getattr(run, "created_at", None)
-            if created is not None:
-                run.started_at = created
-            else:
-                run.started_at = datetime.now(UTC)
-            self.db.flush()
-        except Exception:
-            # Best-effort fallback; still try to set started_at to a sane value
-            run.started_at = datetime.now(UTC)
-            self.db.flush()
-        return run
+        """INSERT ... RETURNING; started_at is set by the DB in the same statement."""
+        return self.db.execute(_start_stmt(run_id, flow_id, thread_id, stage, source)).scalar_one()
 
     def tick(self, run_id: str, stage: str, status: str = "running", result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> GenerationRun | None:
-        run = self.db.get(GenerationRun, run_id)
-        if not run:
-            return None
-        # If stage changes and caller immediately requests a terminal status (succeeded/failed),
-        # perform a two-step transition to satisfy DB CHECK constraints: set stage with "running"
-        # first, then mark the terminal status. This mirrors the real lifecycle and avoids
-        # violations like generation_run_stage_ck.
-        stage_changed = (run.stage != stage)
-        terminal = status in ("succeeded", "failed")
-        if stage_changed and terminal:
-            # Step 1: enter the new stage as running
-            run.stage = stage
-            run.status = "running"
-            self.db.flush()
-            # Step 2: finalize the stage with requested terminal status
-            run.status = status
-            if result is not None:
-                run.result = result
-            if error:
-                run.error = error
-            self.db.flush()
-            return run
-        # Default: single-step update
-        run.stage = stage
-        run.status = status
-        if result is not None:
-            run.result = result
-        if error:
-            run.error = error
-        self.db.flush()
-        return run
+        return self.db.execute(_tick_stmt(run_id, stage, status, result, error)).scalar_one_or_none()
 
     def finish(self, run_id: str, status: str = "succeeded") -> GenerationRun | None:
-        run = self.db.get(GenerationRun, run_id)
-        if not run:
-            return None
-        run.status = status
-        run.finished_at = datetime.now(UTC)
-        self.db.flush()
-        return run
-
-    def add_issues(self, run_id: str, issues: List[Dict[str, Any]]) -> None:
-        for it in issues:
-            vi = ValidationIssue(
-                generation_run_id=run_id,
-                path=it.get("path", "/"),
-                code=it.get("code", "unknown"),
-                severity=it.get("severity", "error"),
-                message=it.get("message", ""),
-            )
-            self.db.add(vi)
-        self.db.flush()
+        return self.db.execute(_finish_stmt(run_id, status)).scalar_one_or_none()
+
+    def add_issues(self, run_id: str, issues: List[Dict[str, Any]]) -> int:
+        # a bad pipeline yields hundreds of schema errors; write them in one batch, not one INSERT each
+        return bulk_insert(self.db, ValidationIssue.__table__, _issue_rows(run_id, issues))
+
+
+def _issue_rows(run_id: str, issues: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    ids = [new_id() for _ in issues]
+    return [
+        {
+            "id": issue_id,
+            "created_at": id_time(issue_id),  # explicit: the COPY path skips column defaults
+            "generation_run_id": run_id,
+            "path": it.get("path", "/"),
+            "code": it.get("code", "unknown"),
+            "severity": it.get("severity", "error"),
+            "message": it.get("message", ""),
+        }
+        for issue_id, it in zip(ids, issues)
+    ]
+
+
+class AsyncRunsRepo:
+    """RunsRepo on an AsyncSession, for the agent runner; same stage/status rules."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def start(self, run_id: str, flow_id: str, thread_id: str, stage: str, source: Dict[str, Any]) -> GenerationRun:
+        return (await self.db.execute(_start_stmt(run_id, flow_id, thread_id, stage, source))).scalar_one()
+
+    async def tick(self, run_id: str, stage: str, status: str = "running", result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> GenerationRun | None:
+        return (await self.db.execute(_tick_stmt(run_id, stage, status, result, error))).scalar_one_or_none()
+
+    async def finish(self, run_id: str, status: str = "succeeded") -> GenerationRun | None:
+        return (await self.db.execute(_finish_stmt(run_id, status))).scalar_one_or_none()
+
+    async def add_issues(self, run_id: str, issues: List[Dict[str, Any]]) -> int:
+        rows = _issue_rows(run_id, issues)
+        return await self.db.run_sync(lambda db: bulk_insert(db, ValidationIssue.__table__, rows))
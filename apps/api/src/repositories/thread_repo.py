@@ -5,13 +5,15 @@ import logging
 logger = logging.getLogger(__name__)
 
 from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import lambda_stmt, select
 from ..models import Thread, ContextSnapshot, SchemaChannel, Pipeline
 from ..config import settings
 from ..repositories.flow_summary_repo import get_active as get_active_flow_summary
+from .flow_stats_repo import FlowStatsRepo
 from ..middleware.error import AppError
-import uuid
+from ..ids import new_id
 
 class ThreadRepo:
     def __init__(self, db: Session):
@@ -19,8 +21,9 @@ class ThreadRepo:
 
     def create(self, thread_id: str, flow_id: str) -> Thread:
         # Ensure schema context is available before mutating session state
+        channel_name = settings.SCHEMA_CHANNEL
         channel = self.db.execute(
-            select(SchemaChannel).where(SchemaChannel.name == settings.SCHEMA_CHANNEL)
+            lambda_stmt(lambda: select(SchemaChannel).where(SchemaChannel.name == channel_name))
         ).scalar_one_or_none()
         if channel is None:
             raise AppError(status=503, code="SCHEMA_CHANNEL_MISSING", message="No schema channel configured")
@@ -31,10 +34,10 @@ class ThreadRepo:
 
         fs = get_active_flow_summary(self.db, flow_id)
         pub = self.db.execute(
-            select(Pipeline).where(Pipeline.flow_id == flow_id, Pipeline.is_published == True).limit(1)
+            lambda_stmt(lambda: select(Pipeline).where(Pipeline.flow_id == flow_id, Pipeline.is_published == True).limit(1))
         ).scalar_one_or_none()
 
-        snapshot_id = str(uuid.uuid4())
+        snapshot_id = new_id()
         # Create ContextSnapshot first and flush to ensure it exists before inserting Thread
         snap = ContextSnapshot(
             id=snapshot_id,
@@ -56,6 +59,7 @@ class ThreadRepo:
         # Now that thread exists, backfill origin_thread_id for the snapshot
         snap.origin_thread_id = thread_id
         self.db.flush()
+        FlowStatsRepo(self.db).apply(flow_id, threads=1, open_threads=1)
         return t
 
     def get(self, thread_id: str) -> Optional[Thread]:
@@ -64,3 +68,21 @@ class ThreadRepo:
     def list_for_flow(self, flow_id: str) -> list[Thread]:
         stmt = select(Thread).where(Thread.flow_id == flow_id).order_by(Thread.started_at.desc())
         return list(self.db.execute(stmt).scalars().all())
+
+
+class AsyncThreadRepo:
+    """Read side of ThreadRepo for async routes; creation stays on ThreadRepo."""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get(self, thread_id: str) -> Optional[Thread]:
+        return await self.db.get(Thread, thread_id)
+
+    async def flow_id(self, thread_id: str) -> Optional[str]:
+        fid = (await self.db.execute(select(Thread.flow_id).where(Thread.id == thread_id))).scalar_one_or_none()
+        return str(fid) if fid is not None else None
+
+    async def list_for_flow(self, flow_id: str) -> list[Thread]:
+        stmt = select(Thread).where(Thread.flow_id == flow_id).order_by(Thread.started_at.desc())
+        return list((await self.db.execute(stmt)).scalars().all())
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import logging
-import uuid
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -9,6 +8,7 @@ from typing import Any, Dict, List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from ..models import ThreadSummary
+from ..ids import new_id
 
 
 def list_for_thread(db: Session, thread_id: str) -> List[ThreadSummary]:
@@ -25,7 +25,7 @@ def list_for_thread(db: Session, thread_id: str) -> List[ThreadSummary]:
 def create(db: Session, thread_id: str, *, kind: str, content: Dict[str, Any], token_budget: int,
            covering_from: Optional[datetime], covering_to: Optional[datetime]) -> ThreadSummary:
     ts = ThreadSummary(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         thread_id=thread_id,
         kind=kind,
         content=content,
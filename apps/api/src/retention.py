@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+from typing import Any, Callable, List, Optional, Sequence
+
+from .config import settings
+from .database import get_db
+from .infrastructure.partitions import ensure_monthly_partitions, expire_partitions
+from .metrics import RETENTION_PARTITIONS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    table: str
+    keep_days: int  # 0 keeps every partition; upcoming ones are still created
+    action: str = "drop"  # drop|detach|archive
+    months_ahead: int = 1
+
+
+def default_policies() -> List[RetentionPolicy]:
+    return [
+        RetentionPolicy(table="sse_event", keep_days=settings.API_SSE_EVENT_LOG_RETENTION_DAYS),
+        RetentionPolicy(table="message", keep_days=settings.API_RETENTION_MESSAGE_DAYS,
+                        action=settings.API_RETENTION_MESSAGE_ACTION),
+        RetentionPolicy(table="agent_log", keep_days=settings.API_RETENTION_AGENT_LOG_DAYS,
+                        action=settings.API_RETENTION_AGENT_LOG_ACTION),
+        RetentionPolicy(table="generation_run", keep_days=settings.API_RETENTION_GENERATION_RUN_DAYS,
+                        action=settings.API_RETENTION_GENERATION_RUN_ACTION),
+        RetentionPolicy(table="validation_issue", keep_days=settings.API_RETENTION_VALIDATION_ISSUE_DAYS,
+                        action=settings.API_RETENTION_VALIDATION_ISSUE_ACTION),
+    ]
+
+
+def ensure_partitions(policies: Sequence[RetentionPolicy], *, now: Optional[datetime] = None) -> None:
+    """Create the current and upcoming partitions; run at startup so the first insert has a home."""
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    for p in policies:
+        # one transaction per table: a failure must not keep the app from starting
+        try:
+            with get_db() as db:
+                ensure_monthly_partitions(db, p.table, months_ahead=p.months_ahead, now=now)
+        except Exception as e:
+            logger.warning("creating partitions for %s failed: %s", p.table, e)
+
+
+def apply_policies(policies: Sequence[RetentionPolicy], *, now: Optional[datetime] = None) -> List[str]:
+    """Pre-create upcoming monthly partitions and expire the ones past their retention window."""
+    now = now or datetime.now(UTC).replace(tzinfo=None)
+    expired: List[str] = []
+    for p in policies:
+        try:
+            with get_db() as db:
+                ensure_monthly_partitions(db, p.table, months_ahead=p.months_ahead, now=now)
+                if p.keep_days <= 0:
+                    continue
+                names = expire_partitions(db, p.table, older_than=now - timedelta(days=p.keep_days),
+                                          action=p.action, archive_schema=settings.API_RETENTION_ARCHIVE_SCHEMA)
+        except Exception as e:
+            logger.warning("retention for %s failed: %s", p.table, e)
+            continue
+        for _ in names:
+            try:
+                RETENTION_PARTITIONS.labels(table=p.table, action=p.action).inc()
+            except (ValueError, TypeError, RuntimeError):
+                pass
+        expired += names
+    return expired
+
+
+class RetentionWorker:
+    def __init__(self, policies: Sequence[RetentionPolicy], *, interval: float, jobs: Sequence[Callable[[], Any]] = ()):
+        self.policies = list(policies)
+        self.interval = interval
+        # plain row-level cleanups for tables that are not partitioned
+        self.jobs = list(jobs)
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.to_thread(apply_policies, self.policies)
+            for job in self.jobs:
+                try:
+                    await asyncio.to_thread(job)
+                except Exception as e:
+                    logger.warning("retention job %s failed: %s", getattr(job, "__name__", job), e)
+            await asyncio.sleep(self.interval)
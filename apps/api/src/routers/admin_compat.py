@@ -7,6 +7,7 @@ from ..deps import compat_repo
 from ..models import CompatRule
 from sqlalchemy.orm import Session
 from ..deps import db_session
+from ..ids import new_id
 
 router = APIRouter(prefix="/admin/compat", tags=["admin"])
 
@@ -25,9 +26,8 @@ class CompatCreateIn(BaseModel):
 
 @router.post("")
 def create_rule(body: CompatCreateIn, db: Session = Depends(db_session)) -> Dict[str, Any]:
-    from uuid import uuid4
     row = CompatRule(
-        id=str(uuid4()),
+        id=new_id(),
         subject_kind=body.subject_kind,
         subject_key=body.subject_key,
         subject_version=body.subject_version,
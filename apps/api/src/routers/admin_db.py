@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+from fastapi import APIRouter, Query
+
+from .. import database
+from ..pool_stats import pool_status
+from ..replicas import replica_router
+
+router = APIRouter(prefix="/admin/db", tags=["admin"])
+
+
+@router.get("/pool")
+def get_pool_status(min_held_sec: float = Query(0.0, ge=0)) -> Dict[str, Any]:
+    """Pool sizes and the connections currently checked out, with who took them and where."""
+    pools = {}
+    if database.engine is not None:
+        pools["primary"] = database.engine.pool
+    if database.async_engine is not None:
+        pools["primary_async"] = database.async_engine.sync_engine.pool
+    for r in replica_router.replicas:
+        pools[r.name] = r.engine.pool
+    out = pool_status(pools)
+    out["checked_out"] = [c for c in out["checked_out"] if c["held_seconds"] >= min_held_sec]
+    return out
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..deps import read_session
+from ..infrastructure.similarity_index import pipeline_index
+from ..middleware.error import AppError
+from ..models import Flow
+
+router = APIRouter(prefix="/admin/pipelines", tags=["admin"])
+
+
+@router.get("/duplicates/{flow_id}")
+def duplicate_clusters(flow_id: str, threshold: Optional[float] = Query(None, gt=0, le=1),
+                       db: Session = Depends(read_session)) -> Dict[str, Any]:
+    """Groups of near-duplicate pipeline versions in a flow (MinHash estimated Jaccard >= threshold)."""
+    if db.get(Flow, flow_id) is None:
+        raise AppError(status=404, code="FLOW_NOT_FOUND", message="Flow not found")
+    threshold = threshold if threshold is not None else settings.API_SIMILARITY_NEAR_DUP_THRESHOLD
+    index = pipeline_index.flow(db, flow_id)
+    clusters = index.duplicate_clusters(threshold)
+    return {
+        "flow_id": flow_id,
+        "threshold": threshold,
+        "pipelines": len(index),
+        "clusters": [{"size": len(c), "pipelines": [{"id": pid, "version": v} for pid, v in c]} for c in clusters],
+    }
@@ -1,16 +1,20 @@
 from fastapi import APIRouter, Request, HTTPException, Depends
 from fastapi.responses import Response
 from typing import Union
-from ..deps import db_session
-from sqlalchemy.orm import Session
+from ..database import get_async_db
+from ..repositories.thread_repo import AsyncThreadRepo
 from ..dto import AgentRunIn, AgentRunAck, SuggestionOut, UIEventIn, UIEventAck
 from ..sse import sse_response, bus
 from ..agent.graph import AgentRunner
 from ..config import settings
+from ..rate_limits import rate_limited
+from ..load import monitor as load_monitor
 from ..services.similarity_service import SimilarityService
 from ..services.llm import LLMClient
+from ..services.ui_event_service import publish_ui_event
 from ..metrics import AGENT_RUNS
-import asyncio, uuid
+from ..ids import new_id
+import asyncio
 
 router = APIRouter(prefix="/threads", tags=["agent"])
 
@@ -28,7 +32,6 @@ def get_agent_runner(
     llm: LLMClient = Depends(get_llm_client),
 ) -> AgentRunner:
     return AgentRunner(
-        session_factory=SessionLocal,
         similarity_service=similarity,
         llm_client=llm,
     )
@@ -43,19 +46,20 @@ async def sse_events(thread_id: str, request: Request) -> Response:
             can = False
         if not can:
             return Response(status_code=204)
-    return await sse_response(thread_id, ping_interval=settings.SSE_PING_INTERVAL, last_event_id=last_id)
+    return await sse_response(thread_id, ping_interval=settings.API_SSE_PING_INTERVAL, last_event_id=last_id)
 
 @router.post("/{thread_id}/agent/run", response_model=Union[AgentRunAck, SuggestionOut])
 async def agent_run(
     thread_id: str,
     payload: AgentRunIn,
     runner: AgentRunner = Depends(get_agent_runner),
+    _rate_limit: None = Depends(rate_limited("agent_run")),
 ) -> Union[AgentRunAck, SuggestionOut]:
     flow_id = await _infer_flow(thread_id)
-    run_id = str(uuid.uuid4())
+    run_id = new_id()
 
     # Fast-path: synchronous suggestion (MVP stop-after-suggestion)
-    cand = runner.similarity.find_candidate(flow_id, payload.user_message)
+    cand = await runner.find_candidate(flow_id, payload.user_message)
     if cand:
         # Emit SSE lifecycle for suggestion-only run
         await bus.publish(thread_id, "run.started", {"run_id": run_id, "stage": "discovery"})
@@ -68,16 +72,12 @@ async def agent_run(
             # Ignore metrics errors but avoid broad exception suppression
             pass
         # Persist GenerationRun quickly
-        db = runner.session_factory()
-        try:
+        async with runner.transaction() as db:
             runs = runner.runs_repo_factory(db)
-            runs.start(run_id, flow_id, thread_id, stage="discovery", source=payload.user_message)
-            runs.tick(run_id, stage="discovery", status="succeeded")
-            runs.tick(run_id, stage="search_existing", status="succeeded", result={"suggestion": cand})
-            runs.finish(run_id, status="succeeded")
-            db.commit()
-        finally:
-            db.close()
+            await runs.start(run_id, flow_id, thread_id, stage="discovery", source=payload.user_message)
+            await runs.tick(run_id, stage="discovery", status="succeeded")
+            await runs.tick(run_id, stage="search_existing", status="succeeded", result={"suggestion": cand})
+            await runs.finish(run_id, status="succeeded")
         await bus.publish(thread_id, "run.finished", {"run_id": run_id, "status": "succeeded"})
         return SuggestionOut(ok=False, suggestion=cand)
 
@@ -88,43 +88,22 @@ async def agent_run(
         # Ignore metrics errors but avoid broad exception suppression
         pass
     # Acknowledge immediately
-    asyncio.create_task(runner.run(flow_id, thread_id, payload.user_message, payload.options or {}, run_id=run_id))
+    asyncio.create_task(load_monitor.track_agent_run(
+        runner.run(flow_id, thread_id, payload.user_message, payload.options or {}, run_id=run_id)
+    ))
     return AgentRunAck(run_id=run_id, status="queued")
 
 async def _infer_flow(thread_id: str) -> str:
-    from ..models import Thread
-    db: Session = Depends(db_session)  # injected
-    try:
-        t = db.get(Thread, thread_id)
-        if not t:
-            raise HTTPException(status_code=404, detail="Thread not found")
-        return str(t.flow_id)
-    finally:
-        pass
+    async with get_async_db() as db:
+        flow_id = await AsyncThreadRepo(db).flow_id(thread_id)
+    if flow_id is None:
+        raise HTTPException(status_code=404, detail="Thread not found")
+    return flow_id
 
 @router.post("/{thread_id}/agent/event", response_model=UIEventAck, status_code=202)
 async def agent_event(thread_id: str, payload: UIEventIn) -> UIEventAck:
     """Accept UI events from the UI and acknowledge them via SSE.
     This does not advance the FSM for now; it simply reflects user actions in the stream.
     """
-    kind = (payload.kind or "").lower()
-    msg: str
-    if kind == "action.click":
-        aid = payload.actionId or ""
-        msg = f'Action "{aid}" accepted' if aid else "Action accepted"
-    elif kind == "choice.submit":
-        value = None
-        try:
-            if isinstance(payload.payload, dict):
-                value = payload.payload.get("value")
-        except Exception:
-            value = None
-        msg = f'Choice "{value}" submitted' if value is not None else "Choice submitted"
-    elif kind == "card.open":
-        url = payload.url or ""
-        msg = f"Open card {url}" if url else "Open card"
-    else:
-        msg = f"Event {payload.kind} received"
-
-    await bus.publish(thread_id, "ui.ack", {"kind": payload.kind, "msg": msg, "event": payload.dict()})
+    await publish_ui_event(thread_id, payload)
     return UIEventAck(ok=True)
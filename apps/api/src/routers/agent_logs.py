@@ -1,27 +1,62 @@
 from __future__ import annotations
 
-from typing import List, Dict, Any
-from fastapi import APIRouter, Depends
+from typing import List, Dict, Any, Optional
+from fastapi import APIRouter, Depends, Query, Response
+from ..archive import archived_agent_logs, merge_archived
 from ..deps import agent_log
-from ..models import AgentLog
+from ..models import AgentLog, Thread
 from sqlalchemy.orm import Session
-from ..deps import db_session
-from sqlalchemy import select
+from ..deps import read_session
+from ..pagination import Key, decode_cursor, encode_cursor, keyset_page
+from sqlalchemy import and_, select, tuple_
 
 router = APIRouter(prefix="/agent/logs", tags=["agent"])
 
+def _payload(r: AgentLog) -> Dict[str, Any]:
+    data = dict(r.data or {})
+    return {
+        "id": str(r.id), "run_id": data.pop("run_id", None), "thread_id": r.thread_id, "flow_id": r.flow_id,
+        "step": r.event, "level": r.level, "message": data.pop("message", None), "data": data,
+        "created_at": r.created_at.isoformat(),
+    }
+
+def _key(r: AgentLog) -> Key:
+    return r.created_at, str(r.id)
+
 @router.get("/by-run/{run_id}")
-def by_run(run_id: str, db: Session = Depends(db_session)) -> List[Dict[str, Any]]:
-    rows = db.execute(select(AgentLog).where(AgentLog.run_id==run_id).order_by(AgentLog.created_at.asc())).scalars().all()
-    return [{
-        "id": str(r.id), "run_id": r.run_id, "thread_id": r.thread_id, "flow_id": r.flow_id,
-        "step": r.step, "level": r.level, "message": r.message, "data": r.data, "created_at": r.created_at.isoformat()
-    } for r in rows]
+def by_run(run_id: str, db: Session = Depends(read_session)) -> List[Dict[str, Any]]:
+    rows = db.execute(
+        select(AgentLog).where(AgentLog.data["run_id"].as_string() == run_id).order_by(AgentLog.created_at.asc())
+    ).scalars().all()
+    return [_payload(r) for r in rows]
 
 @router.get("/by-thread/{thread_id}")
-def by_thread(thread_id: str, db: Session = Depends(db_session)) -> List[Dict[str, Any]]:
-    rows = db.execute(select(AgentLog).where(AgentLog.thread_id==thread_id).order_by(AgentLog.created_at.asc())).scalars().all()
-    return [{
-        "id": str(r.id), "run_id": r.run_id, "thread_id": r.thread_id, "flow_id": r.flow_id,
-        "step": r.step, "level": r.level, "message": r.message, "data": r.data, "created_at": r.created_at.isoformat()
-    } for r in rows]
\ No newline at end of file
+def by_thread(thread_id: str, response: Response, limit: Optional[int] = Query(None, ge=1, le=1000),
+              after: Optional[str] = None, db: Session = Depends(read_session)) -> List[Dict[str, Any]]:
+    """Oldest first. With `limit`, pages forward from the `after` cursor (X-Next-Cursor)."""
+    bound = decode_cursor(after) if after else None
+    # the thread row rides along (LEFT JOIN), so knowing whether it may be archived costs no
+    # extra round trip; the keyset bound goes into the ON clause to keep the thread row
+    on = AgentLog.thread_id == Thread.id
+    if bound:
+        on = and_(on, tuple_(AgentLog.created_at, AgentLog.id) > tuple_(*bound,
+                                                                      types=(AgentLog.created_at.type, AgentLog.id.type)))
+    stmt = select(Thread.archived, Thread.closed_at, AgentLog).select_from(Thread).outerjoin(AgentLog, on) \
+        .where(Thread.id == thread_id).order_by(AgentLog.created_at.asc(), AgentLog.id.asc())
+    if limit is not None:
+        stmt = stmt.limit(limit + 1)
+    result = db.execute(stmt).all()
+    rows = [r.AgentLog for r in result if r.AgentLog is not None]
+    if result and (result[0].archived or result[0].closed_at is not None):
+        # closed threads may have been moved to thread_archive; rehydrate them transparently. Logs
+        # can still be written after archiving, so a full hot page may follow older archived rows:
+        # always merge the archived rows past the cursor, not only on short pages
+        archived = archived_agent_logs(db, thread_id)
+        if archived:
+            rows = merge_archived(rows, archived, _key, descending=False, bound=bound, limit=limit)
+    if limit is None:
+        return [_payload(r) for r in rows]
+    rows, next_cursor = keyset_page(rows, limit, _key, encode_cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [_payload(r) for r in rows]
@@ -1,10 +1,10 @@
 from typing import Any, Dict, List
 
-from fastapi import APIRouter, Depends
-from ..deps import uc_list_flows, uc_create_flow, uc_update_flow, uc_delete_flow, Response
+from fastapi import APIRouter, Depends, Response
+from ..deps import uc_list_flows, uc_create_flow, uc_update_flow, uc_delete_flow
 from sqlalchemy.orm import Session
 
-from ..deps import db_session
+from ..deps import db_session, read_session
 from sqlalchemy.orm import Session
 from ..dto import CreateFlow, FlowOut, ThreadOut, UpdateFlow
 from ..repositories.flow_summary_repo import get_active, active_payload
@@ -14,9 +14,12 @@ from ..services.pipeline_service import PipelineService
 router = APIRouter(prefix="/flows", tags=["flows"])
 
 @router.get("", response_model=list[FlowOut])
-def list_flows(db: Session = Depends(db_session)) -> List[FlowOut]:
+def list_flows(response: Response, sort: str = "name", order: str = "asc", limit: int | None = None,
+               cursor: str | None = None, db: Session = Depends(read_session)) -> List[FlowOut]:
     svc = FlowService(db)
-    rows = svc.list()
+    rows, next_cursor = svc.page(sort=sort, order=order, limit=limit, cursor=cursor)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [FlowOut(**row) for row in rows]
 
 @router.post("", response_model=FlowOut, status_code=201)
@@ -25,7 +28,7 @@ def create_flow(payload: CreateFlow, db: Session = Depends(db_session)) -> FlowO
     return FlowOut(**svc.create(payload.slug, payload.name))
 
 @router.get("/{flow_id}", response_model=FlowOut)
-def get_flow(flow_id: str, db: Session = Depends(db_session)) -> FlowOut:
+def get_flow(flow_id: str, db: Session = Depends(read_session)) -> FlowOut:
     svc = FlowService(db)
     return FlowOut(**svc.get_one(flow_id))
 
@@ -35,17 +38,17 @@ def create_thread_for_flow(flow_id: str, db: Session = Depends(db_session)) -> T
     return ThreadOut(**ThreadService(db).create(flow_id))
 
 @router.get("/{flow_id}/threads", response_model=list[ThreadOut])
-def list_threads_for_flow(flow_id: str, db: Session = Depends(db_session)) -> list[ThreadOut]:
+def list_threads_for_flow(flow_id: str, db: Session = Depends(read_session)) -> list[ThreadOut]:
     from ..services.thread_service import ThreadService
     rows = ThreadService(db).list_for_flow(flow_id)
     return [ThreadOut(**row) for row in rows]
 
 @router.get("/{flow_id}/pipelines")
-def list_pipelines_for_flow(flow_id: str, published: int | None = None, db: Session = Depends(db_session)) -> List[Dict[str, Any]]:
+def list_pipelines_for_flow(flow_id: str, published: int | None = None, db: Session = Depends(read_session)) -> List[Dict[str, Any]]:
     return PipelineService(db).list_for_flow(flow_id, published=published)
 
 @router.get("/{flow_id}/summary/active")
-def get_active_flow_summary(flow_id: str, db: Session = Depends(db_session)) -> Dict[str, Any]:
+def get_active_flow_summary(flow_id: str, db: Session = Depends(read_session)) -> Dict[str, Any]:
     fs = get_active(db, flow_id)
     return active_payload(fs)
 
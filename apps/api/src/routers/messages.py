@@ -1,52 +1,30 @@
 from __future__ import annotations
 
 from typing import Any, Dict, List, Optional, Union
-import uuid
+import asyncio
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
-from sqlalchemy import select, and_, or_, asc
 
-from ..deps import db_session  # legacy DI
-from ..deps import uc_create_message, uc_list_messages, uc_start_agent_run
-from sqlalchemy.orm import Session
-from ..models import Message, Thread
+from ..archive import may_be_archived
+from ..database import get_async_db
+from ..middleware.error import AppError
+from ..models import Message
+from ..repositories.message_repo import AsyncMessageRepo
+from ..repositories.thread_repo import AsyncThreadRepo
 from ..sse import bus
 from ..dto import MessageIn
-from ..application.agent import StartAgentRun
 from ..metrics import MESSAGES_CREATED
 from ..config import settings
+from ..rate_limits import rate_limited
+from ..load import monitor as load_monitor
+from ..ids import new_id
+from ..services.message_service import before_key, check_new_message
 
 router = APIRouter(prefix="/threads", tags=["messages"])  # keep same namespace under /threads
 
 
 # ---- Helpers ----
 
-# Simple in-memory rate limiter per thread (sliding 60s window)
-_RATE_BUCKETS: dict[str, list[float]] = {}
-
-def _check_rate_limit(thread_id: str) -> None:
-    import time
-    limit = max(0, int(getattr(settings, "MESSAGES_RATE_PER_MINUTE", 30)))
-    if limit <= 0:
-        return  # disabled
-    now = time.time()
-    window = 60.0
-    bucket = _RATE_BUCKETS.setdefault(thread_id, [])
-    # prune old timestamps
-    cutoff = now - window
-    i = 0
-    for ts in bucket:
-        if ts >= cutoff:
-            break
-        i += 1
-    if i:
-        del bucket[:i]
-    if len(bucket) >= limit:
-        # 429 Too Many Requests
-        raise HTTPException(status_code=429, detail=f"Rate limit exceeded: max {limit} messages per minute for this thread")
-    bucket.append(now)
-
-
 def _to_msg_out(m: Message) -> Dict[str, Any]:
     created_at = None
     try:
@@ -66,70 +44,28 @@ def _to_msg_out(m: Message) -> Dict[str, Any]:
     }
 
 
-async def _infer_flow(thread_id: str) -> str:
-    db: Session = Depends(db_session)  # injected
-    try:
-        t = db.get(Thread, thread_id)
-        if not t:
-            raise HTTPException(status_code=404, detail="Thread not found")
-        return str(t.flow_id)
-    finally:
-        pass
-
-
 # ---- Routes ----
 
 @router.get("/{thread_id}/messages")
 async def list_messages(
     thread_id: str,
+    response: Response,
     limit: int = Query(default=50, ge=1, le=200),
-    before: Optional[str] = Query(default=None, description="Cursor: message id to fetch items strictly older than"),
-    response: Response = None,
+    before: Optional[str] = Query(default=None, description="Opaque cursor from X-Next-Cursor: fetch strictly older items"),
 ) -> List[Dict[str, Any]]:
-    db: Session = Depends(db_session)  # injected
-    try:
+    bound = before_key(before)
+    async with get_async_db() as db:
         # Ensure thread exists
-        t = db.get(Thread, thread_id)
-        if not t:
-            raise HTTPException(status_code=404, detail="Thread not found")
-
-        base_q = select(Message).where(Message.thread_id == thread_id)
-        cur = None
-        if before:
-            # Try to resolve cursor by id
-            cur = db.get(Message, before)
-            if cur is not None and getattr(cur, "created_at", None) is not None:
-                base_q = base_q.where(
-                    or_(
-                        Message.created_at < cur.created_at,
-                        and_(Message.created_at == cur.created_at, Message.id < cur.id),
-                    )
-                )
-        q = base_q.order_by(asc(Message.created_at), asc(Message.id)).limit(limit)
-        rows = db.execute(q).scalars().all()
-
-        # Pagination hint header: X-Next-Cursor (older messages)
-        # If there are older messages than the first item in this page, set header to that first item's id
-        if response is not None and rows:
-            first = rows[0]
-            # Check existence of any message older than the first item
-            exists_q = (
-                select(Message.id)
-                .where(Message.thread_id == thread_id)
-                .where(
-                    or_(
-                        Message.created_at < first.created_at,
-                        and_(Message.created_at == first.created_at, Message.id < first.id),
-                    )
-                )
-                .limit(1)
-            )
-            older = db.execute(exists_q).first()
-            if older is not None:
-                response.headers["X-Next-Cursor"] = str(first.id)
-        return [_to_msg_out(m) for m in rows]
-    finally:
-        pass
+        thread = await AsyncThreadRepo(db).get(thread_id)
+        if thread is None:
+            raise AppError(status=404, code="THREAD_NOT_FOUND", message="Thread not found")
+        # limit + 1 rows tell us whether an older page exists, no second query needed
+        rows, next_cursor = await AsyncMessageRepo(db).list_page(thread_id, limit, bound,
+                                                                 archived=may_be_archived(thread))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # pages walk backwards in time; items within a page stay chronological
+    return [_to_msg_out(m) for m in reversed(rows)]
 
 
 @router.post("/{thread_id}/messages", status_code=201)
@@ -138,14 +74,11 @@ async def create_message(
     payload: MessageIn,
     request: Request,
     run: Optional[int] = Query(default=0, description="When 1, start agent FSM after creating the message"),
-    start_run: StartAgentRun = Depends(uc_start_agent_run),
-, create=Depends(uc_create_message)) -> Dict[str, Any]:
+    _rate_limit: None = Depends(rate_limited("messages")),
+) -> Dict[str, Any]:
     if (payload.role or "").lower() != "user":
         raise HTTPException(status_code=400, detail="Only role=user is supported for POST /messages")
 
-    # Per-thread rate limit (Stage 12)
-    _check_rate_limit(thread_id)
-
     # Content length validation (Stage 12)
     try:
         max_len = int(getattr(settings, "MESSAGE_TEXT_MAX_LEN", 4000))
@@ -165,66 +98,53 @@ async def create_message(
         if text_value is not None and len(text_value) > max_len:
             raise HTTPException(status_code=413, detail=f"Message content too large (max {max_len} chars)")
 
-    db: Session = Depends(db_session)  # injected
-    try:
-        # Validate thread
-        t = db.get(Thread, thread_id)
-        if not t:
-            raise HTTPException(status_code=404, detail="Thread not found")
-
-        msg_id = str(uuid.uuid4())
-        m = Message(
-            id=msg_id,
-            thread_id=thread_id,
-            role=payload.role,
-            format=payload.format or "text",
+    async with get_async_db() as db:
+        t = check_new_message(await AsyncThreadRepo(db).get(thread_id), payload.role, fmt, payload.tool_name)
+        flow_id = str(t.flow_id)
+        repo = AsyncMessageRepo(db)
+        if payload.parent_id and await repo.thread_of(payload.parent_id) != thread_id:
+            raise AppError(status=400, code="PARENT_NOT_SAME_THREAD", message="parent_id must belong to the same thread")
+        msg_id = new_id()
+        m = await repo.add(
+            msg_id,
+            thread_id,
+            payload.role,
+            payload.content,
             parent_id=payload.parent_id,
             tool_name=payload.tool_name,
             tool_result=payload.tool_result,
-            content=payload.content,
+            fmt=payload.format or "text",
         )
-        db.add(m)
-        db.flush()
-        # refresh to obtain created_at
-        try:
-            db.refresh(m)
-        except Exception:
-            pass
-        db.commit()
-
-        # Emit SSE for the created user message (so other clients see it as well)
-        try:
-            await bus.publish(thread_id, "message.created", {
-                "message_id": msg_id,
-                "role": m.role,
-                "format": m.format,
-                "content": m.content,
-            })
-        except Exception:
-            # SSE failures should not break the API response
-            pass
-        # Metrics: count created user messages via route
-        try:
-            if MESSAGES_CREATED is not None:
-                MESSAGES_CREATED.labels(role=str(m.role), source="route").inc()
-        except (ValueError, TypeError, RuntimeError):
-            pass
-
-        meta: Dict[str, Any] = {}
-        if run == 1:
-            # Start FSM using the just created message as the user_message
-            flow_id = await _infer_flow(thread_id)
-            run_id = str(uuid.uuid4())
-            # Fire and forget
-            import asyncio
-            asyncio.create_task(
-                runner.run(flow_id, thread_id, {"role": m.role, "format": m.format, "content": m.content}, {}, run_id=run_id)
-            )
-            meta["run"] = {"run_id": run_id, "status": "queued"}
-
-        out = create(thread_id=thread_id, role=m.role, content=m.content, fmt=m.format, parent_id=m.parent_id)
-        if meta:
-            out = {**out, "meta": meta}
-        return out
-    finally:
-        pass
\ No newline at end of file
+
+    # Emit SSE for the created user message (so other clients see it as well)
+    try:
+        await bus.publish(thread_id, "message.created", {
+            "message_id": msg_id,
+            "role": m.role,
+            "format": m.format,
+            "content": m.content,
+        })
+    except Exception:
+        # SSE failures should not break the API response
+        pass
+    # Metrics: count created user messages via route
+    try:
+        if MESSAGES_CREATED is not None:
+            MESSAGES_CREATED.labels(role=str(m.role), source="route").inc()
+    except (ValueError, TypeError, RuntimeError):
+        pass
+
+    out: Dict[str, Any] = {
+        "id": msg_id, "thread_id": thread_id, "role": m.role, "format": m.format, "content": m.content,
+        "created_at": m.created_at, "parent_id": m.parent_id,
+    }
+    if run == 1:
+        # Start FSM using the just created message as the user_message
+        from ..agent.graph import AgentRunner
+        run_id = new_id()
+        # Fire and forget
+        asyncio.create_task(load_monitor.track_agent_run(
+            AgentRunner().run(flow_id, thread_id, {"role": m.role, "format": m.format, "content": m.content}, {}, run_id=run_id)
+        ))
+        out["meta"] = {"run": {"run_id": run_id, "status": "queued"}}
+    return out
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends
 from ..deps import uc_create_pipeline, uc_list_pipelines_for_flow
 from sqlalchemy.orm import Session
-from ..deps import db_session
+from ..deps import db_session, read_session
 from sqlalchemy.orm import Session
 from ..services.pipeline_service import PipelineService
 from ..dto import PublishAck
@@ -10,12 +10,12 @@ from typing import Any, Dict, List
 router = APIRouter(prefix="/pipelines", tags=["pipelines"])
 
 @router.get("/by-flow/{flow_id}")
-def list_pipelines(flow_id: str, published: int | None = None, db: Session = Depends(db_session)) -> List[Dict[str, Any]]:
+def list_pipelines(flow_id: str, published: int | None = None, db: Session = Depends(read_session)) -> List[Dict[str, Any]]:
     svc = PipelineService(db)
     return svc.list_for_flow(flow_id, published=published)
 
 @router.get("/{pipeline_id}")
-def get_pipeline(pipeline_id: str, db: Session = Depends(db_session)) -> Dict[str, Any]:
+def get_pipeline(pipeline_id: str, db: Session = Depends(read_session)) -> Dict[str, Any]:
     svc = PipelineService(db)
     return svc.get(pipeline_id)
 
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import json
+from typing import Any, List, Optional
+
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..deps import read_session
+from ..middleware.error import AppError
+from ..models import Flow
+from ..services.similarity_service import SimilarityService
+
+router = APIRouter(prefix="/similarity", tags=["similarity"])
+
+NDJSON = "application/x-ndjson"
+
+
+class SimilarityBatchIn(BaseModel):
+    items: List[Any] = Field(min_length=1)
+    flow_id: Optional[str] = None  # None: page through all flows, API_SIMILARITY_BATCH_MAX_FLOWS at a time
+    after_flow: Optional[str] = None  # X-Next-Cursor of the previous cross-flow page
+    k: int = Field(default=5, ge=1, le=50)
+    min_score: float = Field(default=0.0, ge=0, le=1)
+
+
+def get_similarity_service() -> SimilarityService:
+    return SimilarityService()
+
+
+@router.post("/batch")
+def similarity_batch(body: SimilarityBatchIn, request: Request, response: Response,
+                     db: Session = Depends(read_session), svc: SimilarityService = Depends(get_similarity_service)):
+    """
+    Top-k existing pipelines for each item, in item order. Batches larger than
+    API_SIMILARITY_BATCH_STREAM_MIN (or requested with Accept: application/x-ndjson) stream one
+    {"index", "matches"} line per item; smaller ones return {"results": [...]}. Without flow_id
+    the items are matched against one page of flows; X-Next-Cursor, sent back as after_flow,
+    continues with the next page.
+    """
+    if len(body.items) > settings.API_SIMILARITY_BATCH_MAX_ITEMS:
+        raise AppError(status=413, code="BATCH_TOO_LARGE",
+                       message=f"At most {settings.API_SIMILARITY_BATCH_MAX_ITEMS} items per batch")
+    if body.flow_id is not None and db.get(Flow, body.flow_id) is None:
+        raise AppError(status=404, code="FLOW_NOT_FOUND", message="Flow not found")
+    # all database work happens here; the iterator only reads in-memory indexes, so it can be
+    # streamed after the request's session is closed
+    results, next_flow = svc.find_batch(db, body.items, flow_id=body.flow_id, k=body.k, min_score=body.min_score,
+                                        after_flow=body.after_flow)
+    headers = {"X-Next-Cursor": next_flow} if next_flow else {}
+    if len(body.items) > settings.API_SIMILARITY_BATCH_STREAM_MIN or NDJSON in request.headers.get("accept", ""):
+        return StreamingResponse((json.dumps(r, separators=(",", ":")) + "\n" for r in results), media_type=NDJSON,
+                                 headers=headers)
+    response.headers.update(headers)
+    return {"results": list(results)}
@@ -4,19 +4,19 @@ from typing import Any, Dict, List
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
-from ..deps import db_session  # legacy DI
+from ..deps import read_session  # legacy DI
 from ..deps import uc_get_thread
 from sqlalchemy.orm import Session
-from ..dto import ThreadOut, MessageIn, MessageOut
+from ..dto import ThreadOut
 from ..middleware.error import AppError
 from ..models import Thread
-from ..services.message_service import MessageService
 
+# GET/POST /threads/{thread_id}/messages are served (async) by routers/messages.py
 router = APIRouter(prefix="/threads", tags=["threads"]) 
 
 
 @router.get("/{thread_id}", response_model=ThreadOut)
-def get_thread(thread_id: str, db: Session = Depends(db_session)) -> ThreadOut:
+def get_thread(thread_id: str, db: Session = Depends(read_session)) -> ThreadOut:
     # Minimal metadata (extend as needed)
     t = db.get(Thread, thread_id)
     if not t:
@@ -30,35 +30,17 @@ def get_thread(thread_id: str, db: Session = Depends(db_session)) -> ThreadOut:
     )
     return ThreadOut(**payload)
 
-@router.get("/{thread_id}/messages")
-def list_messages(thread_id: str, limit: int = 50, before: str | None = None, db: Session = Depends(db_session)) -> List[Dict[str, Any]]:
-    svc = MessageService(db)
-    return svc.list(thread_id, limit=limit, before=before)
-
-@router.post("/{thread_id}/messages", response_model=MessageOut, status_code=201)
-def add_message(thread_id: str, payload: MessageIn, db: Session = Depends(db_session)) -> MessageOut:
-    svc = MessageService(db)
-    # Let AppError bubble up to the global error handler for unified error shape
-    result = svc.add(
-        thread_id,
-        payload.role,
-        payload.content,
-        payload.parent_id,
-        payload.tool_name,
-        payload.tool_result,
-        fmt=payload.format or "text",
-    )
-    return MessageOut(**result)
-
 @router.post("/{thread_id}/close")
-async def close_thread(thread_id: str, db: Session = Depends(db_session)) -> Dict[str, Any]:
+async def close_thread(thread_id: str) -> Dict[str, Any]:
+    from ..database import get_async_db
     from ..services.summary_service import SummaryService
-    svc = SummaryService(db)
-    # Delegate to service to ensure atomicity and single-source computations
-    return await svc.close_thread(thread_id)
+    # AsyncSession keeps the DB work (and the LLM wait) off the event loop thread
+    async with get_async_db() as db:
+        # Delegate to service to ensure atomicity and single-source computations
+        return await SummaryService(db).close_thread(thread_id)
 
 @router.get("/{thread_id}/summaries")
-def get_thread_summaries(thread_id: str, db: Session = Depends(db_session)) -> List[Dict[str, Any]]:
+def get_thread_summaries(thread_id: str, db: Session = Depends(read_session)) -> List[Dict[str, Any]]:
     from ..repositories.thread_summary_repo import list_for_thread, payload as ts_payload
     rows = list_for_thread(db, thread_id)
     return [ts_payload(r) for r in rows]
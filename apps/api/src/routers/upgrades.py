@@ -6,6 +6,7 @@ from sqlalchemy.orm import Session
 from ..deps import db_session
 from sqlalchemy.orm import Session
 from ..models import SchemaUpgradePlan, PipelineUpgradeRun, Pipeline, SchemaDef
+from ..ids import new_id
 
 router = APIRouter(tags=["upgrades"])
 
@@ -35,9 +36,8 @@ def create_upgrade_plan(body: UpgradePlanCreate = Body(...), db: Session = Depen
     # Prevent from==to early (DB also enforces this)
     if str(body.from_schema_def_id) == str(body.to_schema_def_id):
         raise HTTPException(status_code=400, detail="from_schema_def_id must differ from to_schema_def_id")
-    import uuid
     plan = SchemaUpgradePlan(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         name=f"{body.strategy}-plan",
         from_schema_def_id=body.from_schema_def_id,
         to_schema_def_id=body.to_schema_def_id,
@@ -70,9 +70,8 @@ def start_pipeline_upgrade(pipeline_id: str = Path(...), body: UpgradeStart = Bo
     plan = db.get(SchemaUpgradePlan, body.upgrade_plan_id)
     if not plan:
         raise HTTPException(status_code=400, detail="Invalid upgrade_plan_id")
-    import uuid
     run = PipelineUpgradeRun(
-        id=str(uuid.uuid4()),
+        id=new_id(),
         pipeline_id=pipeline_id,
         from_schema_def_id=p.schema_def_id,
         to_schema_def_id=plan.to_schema_def_id,
@@ -2,8 +2,8 @@
 from ..database import SessionLocal, Base, engine
 from ..models import SchemaDef, SchemaChannel
 from ..config import settings
+from ..ids import new_id
 from sqlalchemy import select
-import uuid
 import json
 
 
@@ -55,7 +55,7 @@ def main() -> None:
         ).scalar_one_or_none()
         if not schema_def:
             schema_def = SchemaDef(
-                id=str(uuid.uuid4()),
+                id=new_id(),
                 name="dsl-core",
                 version="1.0.0",
                 status="active",
@@ -72,7 +72,7 @@ def main() -> None:
         # upsert channel 'stable'
         ch = db.execute(select(SchemaChannel).where(SchemaChannel.name == "stable")).scalar_one_or_none()
         if not ch:
-            ch = SchemaChannel(id=str(uuid.uuid4()), name="stable", active_schema_def_id=schema_def.id)
+            ch = SchemaChannel(id=new_id(), name="stable", active_schema_def_id=schema_def.id)
             db.add(ch)
             db.flush()
         else:
@@ -4,37 +4,51 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-import uuid
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 
+from ..infrastructure.similarity_index import discard_after_commit
 from ..middleware.error import AppError
-from ..repositories.flow_repo import FlowRepo
-from ..models import Flow
+from ..pagination import decode_position, keyset_page
+from ..repositories.flow_repo import SORTS, FlowRepo
+from ..models import Flow, FlowStats
+from ..ids import new_id
 
 class FlowService:
     def __init__(self, db: Session):
         self.repo = FlowRepo(db)
 
-    def list(self) -> List[Dict[str, Any]]:
-        rows = self.repo.list()
-        out: List[Dict[str, Any]] = []
-        for flow, pub_count, active_ver in rows:
-            out.append(self._serialize(flow, int(pub_count or 0), active_ver))
-        return out
+    def list(self, *, sort: str = "name", order: str = "asc") -> List[Dict[str, Any]]:
+        return self.page(sort=sort, order=order, limit=None)[0]
+
+    def page(self, *, sort: str = "name", order: str = "asc", limit: Optional[int] = 50,
+             cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of flows ordered by `sort` (ties broken by id) and the cursor of the next page.
+        limit=None returns every flow after `cursor`."""
+        if sort not in SORTS:
+            raise AppError(status=400, code="BAD_SORT", message=f"sort must be one of: {', '.join(SORTS)}")
+        if order not in ("asc", "desc"):
+            raise AppError(status=400, code="BAD_ORDER", message="order must be asc or desc")
+        if limit is not None and (limit <= 0 or limit > 200):
+            raise AppError(status=400, code="BAD_LIMIT", message="limit must be between 1 and 200")
+        after = decode_position(cursor, SORTS[sort][1], str) if cursor else None
+        rows = self.repo.list(sort=sort, order=order, limit=limit, after=after)
+        next_cursor = None
+        if limit is not None:
+            rows, next_cursor = keyset_page(rows, limit, lambda r: (r.sort_value, str(r[0].id)))
+        return [self._serialize(flow, stats) for flow, stats, _ in rows], next_cursor
 
     def get_one(self, flow_id: str) -> Dict[str, Any]:
         row = self.repo.get_with_stats(flow_id)
         if row is None:
             raise AppError(status=404, code="FLOW_NOT_FOUND", message="Flow not found")
-        flow, pub_count, active_ver = row
-        return self._serialize(flow, int(pub_count or 0), active_ver)
+        flow, stats = row
+        return self._serialize(flow, stats)
 
     def create(self, slug: str, name: str) -> Dict[str, Any]:
-        fid = str(uuid.uuid4())
+        fid = new_id()
         f = self.repo.create(fid, slug, name, meta={})
-        return self._serialize(f, 0, None)
-
+        return self._serialize(f, None)
     def update(self, flow_id: str, *, name: str | None = None, slug: str | None = None) -> Dict[str, Any]:
         if name is None and slug is None:
             raise AppError(status=400, code="FLOW_NOTHING_TO_UPDATE", message="Provide name or slug to update")
@@ -48,13 +62,18 @@ class FlowService:
         deleted = self.repo.delete(flow_id)
         if not deleted:
             raise AppError(status=404, code="FLOW_NOT_FOUND", message="Flow not found")
+        discard_after_commit(self.repo.db, flow_id)
 
-    def _serialize(self, flow: Flow, published_count: int, active_version: Any) -> Dict[str, Any]:
-        version = str(active_version) if active_version else None
+    def _serialize(self, flow: Flow, stats: Optional[FlowStats]) -> Dict[str, Any]:
+        version = stats.published_version if stats is not None else None
         return {
             "id": str(flow.id),
             "slug": flow.slug,
             "name": flow.name,
-            "has_published": published_count > 0,
-            "active_version": version,
+            "has_published": bool(version),
+            "active_version": str(version) if version else None,
+            "pipeline_count": stats.pipeline_count if stats is not None else 0,
+            "thread_count": stats.thread_count if stats is not None else 0,
+            "open_thread_count": stats.open_thread_count if stats is not None else 0,
+            "last_activity_at": stats.last_activity_at.isoformat() if stats is not None and stats.last_activity_at else None,
         }
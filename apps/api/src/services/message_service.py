@@ -4,18 +4,56 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-import uuid
 from datetime import datetime
-from typing import Any, Optional, List, Dict
+from typing import Any, Optional, List, Dict, Tuple
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from ..archive import may_be_archived
 from ..middleware.error import AppError
 from ..models import Thread
+from ..pagination import Key, decode_cursor
 from ..repositories.message_repo import MessageRepo
+from ..ids import new_id
 
 ALLOWED_ROLES = {"user", "assistant", "system", "tool"}
 ALLOWED_FORMATS = {"text", "markdown", "json", "buttons", "card"}
+# sorts before every UUID, so (ts, _NIL_ID) excludes all rows at ts
+_NIL_ID = "00000000-0000-0000-0000-000000000000"
+
+def check_new_message(thread: Optional[Thread], role: str, fmt: str, tool_name: Optional[str] = None) -> Thread:
+    """Rules shared by every write path: the thread exists and is open, role/format are known."""
+    if thread is None:
+        raise AppError(status=404, code="THREAD_NOT_FOUND", message="Thread not found")
+    if getattr(thread, "archived", False):
+        raise AppError(status=409, code="THREAD_ARCHIVED", message="Thread is archived")
+    if getattr(thread, "closed_at", None):
+        raise AppError(status=409, code="THREAD_CLOSED", message="Thread is closed")
+    if role not in ALLOWED_ROLES:
+        raise AppError(status=400, code="BAD_ROLE", message=f"Invalid role: {role}")
+    if fmt not in ALLOWED_FORMATS:
+        raise AppError(status=400, code="BAD_FORMAT", message=f"Invalid format: {fmt}")
+    if role == "tool" and not tool_name:
+        raise AppError(status=400, code="TOOL_NAME_REQUIRED", message="tool_name required for role=tool")
+    return thread
+
+
+def before_key(before: Optional[str]) -> Optional[Key]:
+    """Keyset bound of a `before` cursor: an X-Next-Cursor value or a legacy ISO timestamp."""
+    if not before:
+        return None
+    try:
+        return decode_cursor(before)
+    except AppError:
+        pass
+    # legacy cursor: a plain ISO timestamp means "strictly older than"
+    ts = before.replace("Z", "+00:00") if before.endswith("Z") else before
+    try:
+        return datetime.fromisoformat(ts), _NIL_ID
+    except ValueError as exc:
+        raise AppError(status=400, code="BAD_BEFORE_CURSOR", message="Invalid before cursor") from exc
+
 
 class MessageService:
     def __init__(self, db: Session):
@@ -38,48 +76,28 @@ class MessageService:
         tool_result: Optional[Any] = None,
         fmt: str = "text",
     ) -> Dict[str, str]:
-        thread = self._require_thread(thread_id)
-        if getattr(thread, "archived", False):
-            raise AppError(status=409, code="THREAD_ARCHIVED", message="Thread is archived")
-        if getattr(thread, "closed_at", None):
-            raise AppError(status=409, code="THREAD_CLOSED", message="Thread is closed")
-
-        if role not in ALLOWED_ROLES:
-            raise AppError(status=400, code="BAD_ROLE", message=f"Invalid role: {role}")
-        if fmt not in ALLOWED_FORMATS:
-            raise AppError(status=400, code="BAD_FORMAT", message=f"Invalid format: {fmt}")
-        if role == "tool" and not tool_name:
-            raise AppError(status=400, code="TOOL_NAME_REQUIRED", message="tool_name required for role=tool")
+        check_new_message(self.db.get(Thread, thread_id), role, fmt, tool_name)
         # parent must belong to the same thread
         if parent_id:
             from ..models import Message
-            parent = self.db.get(Message, parent_id)
+            parent = self.db.execute(select(Message).where(Message.id == parent_id)).scalars().first()
             if not parent or str(parent.thread_id) != thread_id:
                 raise AppError(status=400, code="PARENT_NOT_SAME_THREAD", message="parent_id must belong to the same thread")
-        mid = str(uuid.uuid4())
+        mid = new_id()
         m = self.repo.add(mid, thread_id, role, content, parent_id, tool_name, tool_result, fmt)
         return dict(id=str(m.id), created_at=m.created_at.isoformat())
 
-    def list(self, thread_id: str, limit: int = 50, before: Optional[str] = None) -> List[Dict[str, Any]]:
-        self._require_thread(thread_id)
-        from ..models import Message
+    def page(self, thread_id: str, limit: int = 50, before: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """One page of messages, newest first, and the opaque cursor of the next (older) page."""
+        thread = self._require_thread(thread_id)
         if limit <= 0 or limit > 200:
             raise AppError(status=400, code="BAD_LIMIT", message="limit must be between 1 and 200")
-        q = self.db.query(Message).filter(Message.thread_id == thread_id)
-        if before:
-            ts = before
-            if not isinstance(ts, str):
-                raise AppError(status=400, code="BAD_BEFORE_CURSOR", message="before must be an ISO timestamp string")
-            if ts.endswith("Z"):
-                ts = ts.replace("Z", "+00:00")
-            try:
-                cutoff = datetime.fromisoformat(ts)
-            except ValueError as exc:
-                raise AppError(status=400, code="BAD_BEFORE_CURSOR", message="Invalid before timestamp") from exc
-            q = q.filter(Message.created_at < cutoff)
-        q = q.order_by(Message.created_at.desc()).limit(limit)
-        rows = q.all()
+        rows, next_cursor = self.repo.list_page(thread_id, limit, before_key(before),
+                                                archived=may_be_archived(thread))
         return [{
             "id": str(m.id), "role": m.role, "format": m.format, "content": m.content,
             "created_at": m.created_at.isoformat(), "parent_id": str(m.parent_id) if m.parent_id else None
-        } for m in rows]
+        } for m in rows], next_cursor
+
+    def list(self, thread_id: str, limit: int = 50, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self.page(thread_id, limit, before)[0]
@@ -6,7 +6,6 @@ logger = logging.getLogger(__name__)
 
 import hashlib
 import json
-import uuid
 from typing import Any, Dict, List
 
 from sqlalchemy import select, func
@@ -16,6 +15,9 @@ from ..config import settings
 from ..middleware.error import AppError
 from ..models import Flow, Pipeline, SchemaChannel, SchemaDef
 from ..repositories.pipeline_repo import PipelineRepo
+from ..ids import new_id
+from ..infrastructure import minhash
+from ..infrastructure.similarity_index import add_after_commit
 
 class PipelineService:
     def __init__(self, db: Session):
@@ -92,10 +94,12 @@ class PipelineService:
                 v = self._bump_major(getattr(last, "version", None))
             else:
                 v = self._bump_patch(getattr(last, "version", None) if last else None)
-        pid = str(uuid.uuid4())
+        pid = new_id()
         canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
         content_hash = hashlib.sha256(canonical).digest()
-        p = self.repo.create_version(pipeline_id=pid, flow_id=flow_id, schema_def_id=schema_def_id, version=v, content=content, status="draft", is_published=False, schema_version=schema_ver, content_hash=content_hash)
+        signature = minhash.to_bytes(minhash.signature(content))
+        p = self.repo.create_version(pipeline_id=pid, flow_id=flow_id, schema_def_id=schema_def_id, version=v, content=content, status="draft", is_published=False, schema_version=schema_ver, content_hash=content_hash, minhash=signature)
+        add_after_commit(self.db, flow_id, pid, v, content, signature)
         return p
 
     def publish(self, pipeline_id: str) -> Dict[str, Any]:
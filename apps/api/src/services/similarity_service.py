@@ -4,19 +4,50 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-from typing import Optional, Dict, Any
-from sqlalchemy import func, literal_column
+from typing import Optional, Dict, Any, Iterator, List, Sequence, Tuple
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 import json, hashlib
+import numpy as np
 
 from ..database import SessionLocal
-from ..models import Pipeline
+from ..infrastructure import fingerprint
+from ..infrastructure.similarity_index import FlowIndex, SimilarityIndex, pipeline_index, vectorize
+from ..models import Flow, Pipeline, pipeline_content_text
 from ..config import settings
 
+
+def _hash_stmt(flow_id: str, content_hash: bytes):
+    # served by ix_pipeline_flow_content_hash
+    return select(Pipeline.id, Pipeline.version).where(Pipeline.flow_id == flow_id,
+                                                       Pipeline.content_hash == content_hash).limit(1)
+
+
+def _trgm_stmt(flow_id: str, query_text: str, limit: int = 5):
+    # content_text % q is served by ix_pipeline_content_text_trgm; only the survivors are ranked
+    content_text = pipeline_content_text()
+    score = func.similarity(content_text, query_text).label("score")
+    return (
+        select(Pipeline.id, Pipeline.version, score)
+        .where(Pipeline.flow_id == flow_id, content_text.op("%")(query_text))
+        .order_by(score.desc(), Pipeline.id)
+        .limit(limit)
+    )
+
+
+_BATCH_CHUNK = 256  # items scored per matrix product in find_batch
+_IN_CHUNK = 500  # content hashes per IN (...) lookup
+
+
 class SimilarityService:
-    def __init__(self, threshold: float | None = None):
-        self.threshold = float(threshold) if threshold is not None else float(settings.SIMILARITY_THRESHOLD)
+    def __init__(self, threshold: float | None = None, backend: str | None = None,
+                 index: SimilarityIndex | None = None):
+        self.threshold = float(threshold) if threshold is not None else float(settings.API_SIMILARITY_THRESHOLD)
+        self.backend = backend or settings.API_SIMILARITY_BACKEND
+        self.index = index or pipeline_index
+        self.near_dup_threshold = float(settings.API_SIMILARITY_NEAR_DUP_THRESHOLD)
+        self.structure_weight = float(settings.API_SIMILARITY_STRUCTURE_WEIGHT)
 
     @staticmethod
     def _canonical_hash(data: Any) -> bytes | None:
@@ -28,65 +59,152 @@ class SimilarityService:
             return None
         return None
 
+    @staticmethod
+    def _candidate_json(user_message: Any) -> Any:
+        if isinstance(user_message, dict):
+            if isinstance(user_message.get("content"), (dict, list)):
+                return user_message.get("content")
+            if isinstance(user_message.get("pipeline"), (dict, list)):
+                return user_message.get("pipeline")
+        return None
+
+    @staticmethod
+    def _query_text(user_message: Any) -> str:
+        return str(user_message)[:4000]
+
     def find_candidate(self, flow_id: str, user_message) -> Optional[Dict[str, Any]]:
         """
         Strategy:
         1) If user_message contains a JSON pipeline candidate under keys ['content', 'pipeline'],
-           compute SHA-256 canonical hash and look for exact match in this flow via pipeline.content_hash.
-        2) Otherwise, or if not found, use pg_trgm similarity on generated column pipeline.content_text.
+           compute SHA-256 canonical hash and look for exact match in this flow via pipeline.content_hash,
+           then for a near-duplicate in the flow's MinHash LSH buckets (estimated Jaccard >=
+           API_SIMILARITY_NEAR_DUP_THRESHOLD).
+        2) Otherwise, or if not found, rank the flow's pipelines by text similarity: the in-process
+           TF-IDF index (API_SIMILARITY_BACKEND=index) or pg_trgm on the generated column
+           pipeline.content_text (=trgm; `%` filter through the trigram index, then similarity()).
+           With a JSON candidate and the index backend, the text score is blended with the Jaccard
+           similarity of structural fingerprints (API_SIMILARITY_STRUCTURE_WEIGHT), so a pipeline
+           built from the same kinds of triggers, sources and actions ranks above one that only
+           shares vocabulary.
         Returns a suggestion dict when score >= threshold or when exact match is found (score=1.0).
         Gracefully returns None if pg_trgm is unavailable or no hit passes the threshold.
         """
         db: Session = SessionLocal()
         try:
             # 1) Exact match by content_hash (if a JSON object is present)
-            candidate_json = None
-            if isinstance(user_message, dict):
-                if isinstance(user_message.get("content"), (dict, list)):
-                    candidate_json = user_message.get("content")
-                elif isinstance(user_message.get("pipeline"), (dict, list)):
-                    candidate_json = user_message.get("pipeline")
+            candidate_json = self._candidate_json(user_message)
             if candidate_json is not None:
                 h = self._canonical_hash(candidate_json)
                 if h is not None:
-                    p = (
-                        db.query(Pipeline)
-                        .filter(Pipeline.flow_id == flow_id, Pipeline.content_hash == h)
-                        .first()
-                    )
+                    p = db.execute(_hash_stmt(flow_id, h)).first()
                     if p:
                         return dict(pipeline_id=str(p.id), version=p.version, score=1.0)
+                # 1b) Near-duplicate by MinHash/LSH (a renamed stage, a changed param)
+                if self.near_dup_threshold > 0:
+                    hits = self.index.near_duplicates(db, flow_id, candidate_json, self.near_dup_threshold, k=1)
+                    if hits:
+                        return dict(pipeline_id=hits[0].pipeline_id, version=hits[0].version,
+                                    score=round(hits[0].score, 4))
 
-            # 2) TRGM similarity on generated content_text column
-            query_text = str(user_message)
+            # 2) Text similarity against the flow's pipelines
+            query_text = self._query_text(user_message)
             if not query_text:
                 return None
-            if len(query_text) > 4000:
-                query_text = query_text[:4000]
-
-            # Use literal_column to reference generated column 'pipeline.content_text'
-            content_text_col = literal_column("pipeline.content_text")
-            score = func.similarity(content_text_col, query_text)
-            q = (
-                db.query(Pipeline, score.label("score"))
-                .filter(Pipeline.flow_id == flow_id)
-                .order_by(score.desc())
-                .limit(5)
-            )
-            best: Optional[tuple[Pipeline, float]] = None
-            for p, s in q:
-                try:
-                    s_val = float(s) if s is not None else 0.0
-                except (TypeError, ValueError):
-                    s_val = 0.0
-                if best is None or s_val > best[1]:
-                    best = (p, s_val)
-            if best and best[1] >= self.threshold:
-                p, s_val = best
-                return dict(pipeline_id=str(p.id), version=p.version, score=round(s_val, 4))
+
+            best = self._index_best(db, flow_id, query_text, candidate_json) if self.backend == "index" \
+                else self._trgm_best(db, flow_id, query_text)
+            if best and best[2] >= self.threshold:
+                pipeline_id, version, s_val = best
+                return dict(pipeline_id=pipeline_id, version=version, score=round(s_val, 4))
             return None
         except SQLAlchemyError:
             # pg_trgm or similarity() may not be available — fallback to no suggestion
             return None
         finally:
             db.close()
+
+    def _index_best(self, db: Session, flow_id: str, query_text: str,
+                    shape: Any = None) -> Optional[tuple[str, str, float]]:
+        hits = self.index.search(db, flow_id, query_text, k=1, shape=shape, shape_weight=self.structure_weight)
+        return (hits[0].pipeline_id, hits[0].version, hits[0].score) if hits else None
+
+    def _trgm_best(self, db: Session, flow_id: str, query_text: str) -> Optional[tuple[str, str, float]]:
+        # `%` keeps rows at or above pg_trgm.similarity_threshold (the setting set_limit() changes),
+        # so ix_pipeline_content_text_trgm prunes candidates instead of scoring every row of the
+        # flow; set_config(..., true) scopes it to this transaction rather than the pooled connection.
+        db.execute(select(func.set_config("pg_trgm.similarity_threshold", str(self.threshold), True)))
+        row = db.execute(_trgm_stmt(flow_id, query_text)).first()
+        return (str(row.id), row.version, float(row.score)) if row else None
+
+    def find_batch(self, db: Session, items: Sequence[Any], flow_id: Optional[str] = None, k: int = 5,
+                   min_score: float = 0.0, after_flow: Optional[str] = None
+                   ) -> Tuple[Iterator[Dict[str, Any]], Optional[str]]:
+        """
+        Top-k matches for each of `items` (messages or {"content"|"pipeline": <DSL>} objects, as
+        find_candidate takes them) within one flow. Without flow_id, within one page of
+        API_SIMILARITY_BATCH_MAX_FLOWS flows after `after_flow` (in id order); the second value
+        returned is the cursor of the next page, None on the last one. Flows not already cached
+        get throwaway indexes, so a cross-flow batch does not evict the shared per-flow LRU.
+
+        Exact content_hash matches come first with score 1.0; the rest are ranked like step 2 of
+        find_candidate on the index backend (TF-IDF blended with structural fingerprints), scored
+        _BATCH_CHUNK items per matrix product. Database work (flow indexes, one hash lookup for
+        the whole batch) happens before this returns; the returned iterator yields
+        {"index", "matches"} per item in order and only touches in-memory indexes, so it can be
+        streamed after `db` is closed.
+        """
+        next_flow = None
+        if flow_id is not None:
+            flows = [str(flow_id)]
+        else:
+            page = settings.API_SIMILARITY_BATCH_MAX_FLOWS
+            stmt = select(Flow.id).order_by(Flow.id).limit(page + 1)
+            if after_flow is not None:
+                stmt = stmt.where(Flow.id > after_flow)
+            flows = [str(f) for f in db.scalars(stmt)]
+            if len(flows) > page:
+                flows = flows[:page]
+                next_flow = flows[-1]
+        indexes = [(f, self.index.flow(db, f, cache=flow_id is not None)) for f in flows]
+        candidates = [self._candidate_json(item) for item in items]
+        hashes = [self._canonical_hash(c) if c is not None else None for c in candidates]
+        exact = self._exact_matches(db, flows, [h for h in hashes if h is not None])
+        return self._score_batch(items, candidates, hashes, exact, indexes, k, min_score), next_flow
+
+    @staticmethod
+    def _exact_matches(db: Session, flows: List[str], hashes: List[bytes]) -> Dict[bytes, List[Dict[str, Any]]]:
+        out: Dict[bytes, List[Dict[str, Any]]] = {}
+        unique = sorted(set(hashes))
+        if not flows:
+            return out
+        for i in range(0, len(unique), _IN_CHUNK):
+            # (flow_id IN ..., content_hash IN ...) is served by ix_pipeline_flow_content_hash
+            stmt = select(Pipeline.id, Pipeline.version, Pipeline.flow_id, Pipeline.content_hash) \
+                .where(Pipeline.flow_id.in_(flows), Pipeline.content_hash.in_(unique[i:i + _IN_CHUNK])) \
+                .order_by(Pipeline.flow_id, Pipeline.id)
+            for r in db.execute(stmt):
+                out.setdefault(bytes(r.content_hash), []).append(
+                    dict(flow_id=str(r.flow_id), pipeline_id=str(r.id), version=r.version, score=1.0, exact=True))
+        return out
+
+    def _score_batch(self, items: Sequence[Any], candidates: List[Any], hashes: List[Optional[bytes]],
+                     exact: Dict[bytes, List[Dict[str, Any]]], indexes: List[Tuple[str, FlowIndex]],
+                     k: int, min_score: float) -> Iterator[Dict[str, Any]]:
+        empty = np.zeros(fingerprint.WORDS, dtype=np.uint64)
+        for start in range(0, len(items), _BATCH_CHUNK):
+            chunk = range(start, min(start + _BATCH_CHUNK, len(items)))
+            queries = np.stack([vectorize(self._query_text(items[i]), self.index.dim) for i in chunk])
+            shapes = np.stack([fingerprint.fingerprint(candidates[i]) if candidates[i] is not None else empty
+                               for i in chunk])
+            shaped = np.array([candidates[i] is not None for i in chunk], dtype=bool)
+            per_flow = [(f, index.search_many(queries, shapes, shaped, k, self.structure_weight))
+                        for f, index in indexes]
+            for row, i in enumerate(chunk):
+                matches = list(exact.get(hashes[i], ()))[:k] if hashes[i] is not None else []
+                seen = {m["pipeline_id"] for m in matches}
+                hits = sorted(((f, h) for f, results in per_flow for h in results[row]
+                               if h.pipeline_id not in seen and h.score > 0 and h.score >= min_score),
+                              key=lambda fh: (-fh[1].score, fh[1].pipeline_id))
+                matches += [dict(flow_id=f, pipeline_id=h.pipeline_id, version=h.version,
+                                 score=round(h.score, 4), exact=False) for f, h in hits[:k - len(matches)]]
+                yield {"index": i, "matches": matches}
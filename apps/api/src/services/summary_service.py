@@ -4,21 +4,34 @@ from __future__ import annotations
 import logging
 
 logger = logging.getLogger(__name__)
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from datetime import datetime, UTC
-import uuid
 
 from ..middleware.error import AppError
 from ..models import Thread, Message, ThreadSummary, FlowSummary
+from ..repositories.flow_stats_repo import FlowStatsRepo
 from ..services.llm import LLMClient
+from ..ids import new_id
+
+
+T = TypeVar("T")
 
 
 class SummaryService:
-    def __init__(self, db: Session):
-        self.db = db
-        self.llm = LLMClient()
+    def __init__(self, db: Session | AsyncSession, llm: LLMClient | None = None):
+        # With an AsyncSession the sync helpers below run on its sync_session inside
+        # run_sync, so DB round-trips are awaited instead of blocking the loop.
+        self.adb = db if isinstance(db, AsyncSession) else None
+        self.db: Session = db.sync_session if self.adb is not None else db
+        self.llm = llm or LLMClient()
+
+    async def _io(self, fn: Callable[..., T], *args: Any) -> T:
+        if self.adb is None:
+            return fn(*args)
+        return await self.adb.run_sync(lambda _db: fn(*args))
 
     def _messages_bounds(self, thread_id: str) -> Tuple[Optional[datetime], Optional[datetime], Optional[str]]:
         """Return covering_from, covering_to, last_message_id for a thread.
@@ -49,21 +62,28 @@ class SummaryService:
             })
         return out
 
-    async def run_thread_summary(self, thread_id: str) -> ThreadSummary:
+    def _get_thread(self, thread_id: str) -> Thread:
         t = self.db.get(Thread, thread_id)
         if not t:
             raise AppError(status=404, code="THREAD_NOT_FOUND", message="Thread not found")
+        return t
+
+    async def run_thread_summary(self, thread_id: str) -> ThreadSummary:
+        t = await self._io(self._get_thread, thread_id)
         # Collect messages for summarization (MVP: whole thread)
-        messages_payload = self._collect_messages_payload(thread_id)
+        messages_payload = await self._io(self._collect_messages_payload, thread_id)
         # Call LLM to summarize
         data = await self.llm.summarize({
             "thread_id": thread_id,
             "flow_id": str(t.flow_id),
             "messages": messages_payload,
         })
+        return await self._io(self._add_thread_summary, thread_id, data)
+
+    def _add_thread_summary(self, thread_id: str, data: Dict[str, Any]) -> ThreadSummary:
         covering_from, covering_to, _ = self._messages_bounds(thread_id)
         ts = ThreadSummary(
-            id=str(uuid.uuid4()),
+            id=new_id(),
             thread_id=thread_id,
             kind="short",
             content=data,
@@ -90,7 +110,7 @@ class SummaryService:
             return fs
         # Otherwise, create a new active summary with minimal content
         fs = FlowSummary(
-            id=str(uuid.uuid4()),
+            id=new_id(),
             flow_id=flow_id,
             version=1,
             content=new_content or {"summary": ""},
@@ -117,26 +137,32 @@ class SummaryService:
         """Atomically close a thread and update flow summary.
         Idempotent: if thread is already closed, do not create new summaries and return the latest ones.
         """
-        t = self.db.get(Thread, thread_id)
-        if not t:
-            raise AppError(status=404, code="THREAD_NOT_FOUND", message="Thread not found")
+        t = await self._io(self._get_thread, thread_id)
         # If already closed, return latest existing summary info without side effects
         if getattr(t, "closed_at", None):
-            # Latest thread summary
-            last_ts = self.db.execute(
-                select(ThreadSummary).where(ThreadSummary.thread_id == thread_id).order_by(ThreadSummary.created_at.desc()).limit(1)
-            ).scalar_one_or_none()
-            # Active flow summary
-            from ..repositories.flow_summary_repo import get_active as get_active_flow_summary
-            fs = get_active_flow_summary(self.db, str(t.flow_id))
-            return dict(
-                ok=True,
-                thread_id=thread_id,
-                thread_summary_id=str(last_ts.id) if last_ts else None,
-                flow_summary=dict(id=str(fs.id), version=fs.version) if fs else dict(id=None, version=0),
-            )
+            return await self._io(self._closed_payload, t)
         # Summarize thread
         ts = await self.run_thread_summary(thread_id)
+        return await self._io(self._close, t, ts)
+
+    def _closed_payload(self, t: Thread) -> Dict[str, Any]:
+        thread_id = str(t.id)
+        # Latest thread summary
+        last_ts = self.db.execute(
+            select(ThreadSummary).where(ThreadSummary.thread_id == thread_id).order_by(ThreadSummary.created_at.desc()).limit(1)
+        ).scalar_one_or_none()
+        # Active flow summary
+        from ..repositories.flow_summary_repo import get_active as get_active_flow_summary
+        fs = get_active_flow_summary(self.db, str(t.flow_id))
+        return dict(
+            ok=True,
+            thread_id=thread_id,
+            thread_summary_id=str(last_ts.id) if last_ts else None,
+            flow_summary=dict(id=str(fs.id), version=fs.version) if fs else dict(id=None, version=0),
+        )
+
+    def _close(self, t: Thread, ts: ThreadSummary) -> Dict[str, Any]:
+        thread_id = str(t.id)
         # Compute last message id once
         last_message_id = self.get_last_message_id(thread_id)
         # Upsert flow summary and ensure single active
@@ -147,6 +173,7 @@ class SummaryService:
         t.status = "SUCCESS"
         t.closed_at = datetime.now(UTC)
         self.db.flush()
+        FlowStatsRepo(self.db).apply(str(t.flow_id), open_threads=-1)
         return dict(
             ok=True,
             thread_id=thread_id,
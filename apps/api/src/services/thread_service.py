@@ -4,12 +4,12 @@ import logging
 
 logger = logging.getLogger(__name__)
 
-import uuid
 from sqlalchemy.orm import Session
 
 from ..middleware.error import AppError
 from ..models import Flow
 from ..repositories.thread_repo import ThreadRepo
+from ..ids import new_id
 
 class ThreadService:
     def __init__(self, db: Session):
@@ -19,7 +19,7 @@ class ThreadService:
     def create(self, flow_id: str):
         if self.db.get(Flow, flow_id) is None:
             raise AppError(status=404, code="FLOW_NOT_FOUND", message="Flow not found")
-        tid = str(uuid.uuid4())
+        tid = new_id()
         t = self.repo.create(tid, flow_id)
         return dict(id=str(t.id), flow_id=str(t.flow_id), status=t.status, started_at=t.started_at.isoformat())
 
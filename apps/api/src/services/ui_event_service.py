@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+from ..dto import UIEventIn
+from ..sse import bus
+
+
+def ui_ack_message(payload: UIEventIn) -> str:
+    kind = (payload.kind or "").lower()
+    if kind == "action.click":
+        aid = payload.actionId or ""
+        return f'Action "{aid}" accepted' if aid else "Action accepted"
+    if kind == "choice.submit":
+        value = payload.payload.get("value") if isinstance(payload.payload, dict) else None
+        return f'Choice "{value}" submitted' if value is not None else "Choice submitted"
+    if kind == "card.open":
+        url = payload.url or ""
+        return f"Open card {url}" if url else "Open card"
+    return f"Event {payload.kind} received"
+
+
+async def publish_ui_event(thread_id: str, payload: UIEventIn) -> int:
+    """Reflect a UI event back to every subscriber of the thread as `ui.ack`.
+    This does not advance the FSM for now.
+    """
+    msg = ui_ack_message(payload)
+    return await bus.publish(thread_id, "ui.ack", {"kind": payload.kind, "msg": msg, "event": payload.dict()})
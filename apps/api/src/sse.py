@@ -1,75 +1,220 @@
 from __future__ import annotations
 
 import asyncio, time, json
-from typing import AsyncIterator, Dict, Any, Optional, List
-from collections import deque
+from typing import AsyncIterator, Dict, Any, Optional, List, Protocol
+from collections import deque, OrderedDict
 from sse_starlette.sse import EventSourceResponse
 from fastapi import APIRouter
 from .config import settings
+from .metrics import SSE_EVENTS, SSE_CONNECTIONS, SSE_SESSION_SECONDS, SSE_REPLAY
+
+
+# low bits of every seq hold the publishing worker's slot; ms << 10 stays below 2**53, so seqs
+# survive JSON numbers in browsers, and is above the microsecond seqs issued before it
+WORKER_BITS = 10
+
+
+class EventLog(Protocol):
+    def submit(self, item: Dict[str, Any]) -> None: ...
+    async def read_after(self, channel: str, after_seq: int, limit: int) -> List[Dict[str, Any]]: ...
+    async def contains(self, channel: str, seq: int) -> bool: ...
+
+
+def _inc(metric, **labels) -> None:
+    try:
+        metric.labels(**labels).inc()
+    except (ValueError, TypeError, RuntimeError):
+        pass
 
 
 class ChannelBus:
-    def __init__(self, maxlen: int = None, ttl: int = None):
+    """In-process pub/sub keyed by channel (thread id).
+
+    Every event gets a per-channel monotonically increasing `seq` derived from the
+    wall clock in milliseconds, so ids keep increasing across restarts and can be
+    used as SSE `Last-Event-ID`. The low WORKER_BITS bits hold the worker slot
+    (set_worker, allocated from the database), so workers publishing to the same
+    channel in the same microsecond never share a seq. Recent events are kept in
+    a per-channel ring buffer; when an optional durable `EventLog` is attached,
+    replay falls back to it for anything that has already left the buffer.
+    """
+
+    def __init__(self, maxlen: int = None, ttl: int = None, max_channels: int = 10_000):
         self.maxlen = maxlen or settings.API_SSE_BUFFER_MAXLEN
         self.ttl = ttl or settings.API_SSE_BUFFER_TTL_SEC
-        self._buf: deque[Dict[str, Any]] = deque(maxlen=self.maxlen)
+        self.max_channels = max_channels
+        self._buf: "OrderedDict[str, deque[Dict[str, Any]]]" = OrderedDict()
+        self._last_seq: Dict[str, int] = {}
         self._subs: List[asyncio.Queue] = []
-        self._chan_subs: dict[str, list[asyncio.Queue]] = {}
-    def publish(self, data: Any, *, channel: str | None = None) -> None:
-        item = {"data": data, "ts": time.time(), "channel": channel}
-        self._buf.append(item)
-        targets = list(self._subs)
-        if channel:
-            targets += self._chan_subs.get(channel, [])
-        for q in list(set(targets)):
+        self._chan_subs: Dict[str, List[asyncio.Queue]] = {}
+        self._log: Optional[EventLog] = None
+        self.worker = 0
+
+    def set_worker(self, slot: int) -> None:
+        self.worker = slot % (1 << WORKER_BITS)
+
+    def attach_log(self, log: Optional[EventLog]) -> None:
+        self._log = log
+
+    def _next_seq(self, channel: str) -> int:
+        tick = max((self._last_seq.get(channel, 0) >> WORKER_BITS) + 1, int(time.time() * 1000))
+        seq = tick << WORKER_BITS | self.worker
+        self._last_seq[channel] = seq
+        return seq
+
+    def _buffer(self, channel: str) -> deque:
+        buf = self._buf.get(channel)
+        if buf is None:
+            buf = self._buf[channel] = deque(maxlen=self.maxlen)
+            while len(self._buf) > self.max_channels:
+                old, _ = self._buf.popitem(last=False)
+                self._last_seq.pop(old, None)
+        else:
+            self._buf.move_to_end(channel)
+        return buf
+
+    def publish_nowait(self, channel: str, event: str, data: Any) -> int:
+        item = {
+            "channel": channel,
+            "seq": self._next_seq(channel),
+            "event": event,
+            "data": data,
+            "ts": time.time(),
+        }
+        self._buffer(channel).append(item)
+        for q in list(self._subs) + list(self._chan_subs.get(channel, [])):
             try:
                 q.put_nowait(item)
             except asyncio.QueueFull:
                 # drop slow subscriber
-                for lst in (self._subs, self._chan_subs.get(channel, [])):
-                    if q in lst:
-                        lst.remove(q)
+                self.unsubscribe(q, channel)
+        if self._log is not None:
+            self._log.submit(item)
+        _inc(SSE_EVENTS, event=event)
+        return item["seq"]
+
+    async def publish(self, channel: str, event: str, data: Any) -> int:
+        return self.publish_nowait(channel, event, data)
+
     def subscribe(self) -> asyncio.Queue:
         q: asyncio.Queue = asyncio.Queue(maxsize=100)
         self._subs.append(q)
         return q
+
     def subscribe_channel(self, channel: str) -> asyncio.Queue:
         q: asyncio.Queue = asyncio.Queue(maxsize=100)
         self._chan_subs.setdefault(channel, []).append(q)
         return q
-    def replay(self, since_ts: float, channel: str | None = None) -> List[Dict[str, Any]]:
+
+    def unsubscribe(self, q: asyncio.Queue, channel: str | None = None) -> None:
+        for lst in (self._subs, self._chan_subs.get(channel, []) if channel else []):
+            if q in lst:
+                lst.remove(q)
+        if channel and not self._chan_subs.get(channel):
+            self._chan_subs.pop(channel, None)
+
+    def _buffered_after(self, channel: str, after_seq: int) -> Optional[List[Dict[str, Any]]]:
+        """Buffered items after `after_seq`, or None if the buffer no longer covers that point."""
+        if channel in self._last_seq and after_seq >= self._last_seq[channel]:
+            return []
         cutoff = time.time() - self.ttl
-        items = [m for m in self._buf if m["ts"] >= max(cutoff, since_ts)]
-        if channel:
-            items = [m for m in items if m.get("channel") == channel]
+        items = [m for m in self._buf.get(channel, ()) if m["ts"] >= cutoff]
+        if items and items[0]["seq"] <= after_seq:
+            return [m for m in items if m["seq"] > after_seq]
+        return None
+
+    async def can_replay(self, channel: str, last_seq: int) -> bool:
+        if self._buffered_after(channel, last_seq) is not None:
+            return True
+        if self._log is None:
+            return False
+        try:
+            return await self._log.contains(channel, last_seq)
+        except Exception:
+            return False
+
+    async def replay(self, channel: str, after_seq: int) -> List[Dict[str, Any]]:
+        limit = settings.API_SSE_REPLAY_MAX
+        items = self._buffered_after(channel, after_seq)
+        if items is not None:
+            _inc(SSE_REPLAY, source="memory")
+            return items[:limit]
+        if self._log is None:
+            _inc(SSE_REPLAY, source="none")
+            return []
+        try:
+            items = await self._log.read_after(channel, after_seq, limit)
+        except Exception:
+            _inc(SSE_REPLAY, source="none")
+            return []
+        _inc(SSE_REPLAY, source="log")
+        # the newest events may not be flushed yet: top up from the buffer
+        tail = items[-1]["seq"] if items else after_seq
+        if len(items) < limit:
+            items += [m for m in self._buf.get(channel, ()) if m["seq"] > tail][: limit - len(items)]
         return items
 
-    def __init__(self, maxlen: int = None, ttl: int = None):
-        self.maxlen = maxlen or settings.API_SSE_BUFFER_MAXLEN
-        self.ttl = ttl or settings.API_SSE_BUFFER_TTL_SEC
-        self._buf: deque[Dict[str, Any]] = deque(maxlen=self.maxlen)
-        self._subs: List[asyncio.Queue] = []
-    def publish(self, data: Any) -> None:
-        item = {"data": data, "ts": time.time()}
-        self._buf.append(item)
-        for q in list(self._subs):
-            try:
-                q.put_nowait(item)
-            except asyncio.QueueFull:
-                self._subs.remove(q)
-    def subscribe(self) -> asyncio.Queue:
-        q: asyncio.Queue = asyncio.Queue(maxsize=100)
-        self._subs.append(q)
-        return q
-    def replay(self, since_ts: float) -> List[Dict[str, Any]]:
+    def replay_all(self, after_seq: int) -> List[Dict[str, Any]]:
         cutoff = time.time() - self.ttl
-        return [m for m in self._buf if m["ts"] >= max(cutoff, since_ts)]
+        items = [m for buf in self._buf.values() for m in buf if m["seq"] > after_seq and m["ts"] >= cutoff]
+        return sorted(items, key=lambda m: m["seq"])
+
+
 bus = ChannelBus()
+
+
 def _to_sse_message(item: Dict[str, Any]) -> Dict[str, Any]:
-    data = item["data"]; ts = item["ts"]
-    payload = data if isinstance(data, dict) else {"value": data}
-    payload["ts"] = ts
-    return {"event": "message", "data": json.dumps(payload), "id": str(ts)}
+    data = item["data"]
+    payload = dict(data) if isinstance(data, dict) else {"value": data}
+    payload.setdefault("ts", item["ts"])
+    return {"event": item["event"], "data": json.dumps(payload, default=str), "id": str(item["seq"])}
+
+
+async def sse_response(channel: str, *, ping_interval: int, last_event_id: Optional[str] = None) -> EventSourceResponse:
+    # subscribe before replaying so nothing published in between is lost; dedupe by seq
+    q = bus.subscribe_channel(channel)
+    after_seq = 0
+    backlog: List[Dict[str, Any]] = []
+    if last_event_id:
+        try:
+            after_seq = int(last_event_id)
+            backlog = await bus.replay(channel, after_seq)
+        except ValueError:
+            after_seq = 0
+
+    async def gen() -> AsyncIterator[dict]:
+        last_sent = after_seq
+        started = time.time()
+        last_ping = started
+        _inc(SSE_CONNECTIONS, action="open")
+        try:
+            for item in backlog:
+                if item["seq"] > last_sent:
+                    last_sent = item["seq"]
+                    yield _to_sse_message(item)
+            while True:
+                try:
+                    item = await asyncio.wait_for(q.get(), timeout=1.0)
+                    if item["seq"] <= last_sent:
+                        continue
+                    last_sent = item["seq"]
+                    yield _to_sse_message(item)
+                except asyncio.TimeoutError:
+                    now = time.time()
+                    if now - last_ping >= ping_interval:
+                        last_ping = now
+                        yield {"event": "ping", "data": "ping"}
+        finally:
+            bus.unsubscribe(q, channel)
+            _inc(SSE_CONNECTIONS, action="close")
+            try:
+                SSE_SESSION_SECONDS.observe(time.time() - started)
+            except (ValueError, TypeError, RuntimeError):
+                pass
+
+    return EventSourceResponse(gen(), headers={"Cache-Control": "no-cache"})
+
+
 router = APIRouter(prefix="/sse", tags=["sse"])
 @router.get("/stream")
 async def stream(last_event_id: Optional[str] = None):
@@ -77,8 +222,7 @@ async def stream(last_event_id: Optional[str] = None):
     async def gen() -> AsyncIterator[dict]:
         if last_event_id:
             try:
-                since_ts = float(last_event_id)
-                for item in bus.replay(since_ts):
+                for item in bus.replay_all(int(last_event_id)):
                     yield _to_sse_message(item)
             except ValueError:
                 pass
@@ -95,8 +239,5 @@ async def stream(last_event_id: Optional[str] = None):
                         last_ping = now
                         yield {"event": "ping", "data": "ping"}
         finally:
-            try:
-                bus._subs.remove(q)
-            except ValueError:
-                pass
-    return EventSourceResponse(gen(), headers={"Cache-Control": "no-cache"})
\ No newline at end of file
+            bus.unsubscribe(q)
+    return EventSourceResponse(gen(), headers={"Cache-Control": "no-cache"})
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+
+from fastapi import FastAPI
+from sqlalchemy import create_engine
+from fastapi.testclient import TestClient
+from src.load import LoadMonitor, monitor
+from src.pool_stats import InstrumentedQueuePool
+from src.middleware.admission import AdmissionMiddleware, classify, CRITICAL, NORMAL, LOW
+
+
+def _client(monitor):
+    app = FastAPI()
+    app.add_middleware(AdmissionMiddleware, monitor=monitor, severe=1.5, retry_after=7)
+
+    @app.get("/flows")
+    def flows():
+        return []
+
+    @app.post("/threads/{tid}/messages")
+    def post_message(tid: str):
+        return {"ok": True}
+
+    @app.post("/flows")
+    def create_flow():
+        return {"ok": True}
+    return TestClient(app)
+
+
+def test_classify():
+    assert classify("GET", "/threads/t/events") == CRITICAL
+    assert classify("POST", "/threads/t/messages") == CRITICAL
+    assert classify("POST", "/threads/t/agent/run") == LOW
+    assert classify("GET", "/flows") == LOW
+    assert classify("POST", "/flows") == NORMAL
+
+
+def test_sheds_low_priority_first():
+    m = LoadMonitor(interval=1, lag_threshold=0.2, pool_wait_threshold=0.1, backlog_threshold=10)
+    client = _client(m)
+    assert client.get("/flows").status_code == 200
+
+    m.agent_runs = 12  # pressure 1.2
+    r = client.get("/flows")
+    assert r.status_code == 503 and r.headers["Retry-After"] == "7"
+    assert client.post("/flows").status_code == 200
+    assert client.post("/threads/t/messages").status_code == 200
+
+    m.agent_runs = 20  # pressure 2.0
+    assert client.post("/flows").status_code == 503
+    assert client.post("/threads/t/messages").status_code == 200
+
+
+def test_lag_is_smoothed_and_runs_are_tracked():
+    m = LoadMonitor(interval=1, lag_threshold=0.1, pool_wait_threshold=0.1, backlog_threshold=10, alpha=0.5)
+    m.observe_lag(0.4)
+    assert m.loop_lag == 0.2 and m.pressure == 2.0
+
+    async def _run():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def run():
+            started.set()
+            await release.wait()
+        task = asyncio.create_task(m.track_agent_run(run()))
+        await started.wait()
+        assert m.agent_runs == 1
+        release.set()
+        await task
+        assert m.agent_runs == 0
+    asyncio.run(_run())
+
+
+def test_pool_wait_of_every_pool_drives_pressure(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'load.db'}", poolclass=InstrumentedQueuePool,
+                           pool_logging_name="load_sync", pool_size=1, max_overflow=0, pool_timeout=2)
+    m = LoadMonitor(interval=1, lag_threshold=1, pool_wait_threshold=0.05, backlog_threshold=10,
+                    pools=("load_sync", "load_async"))
+    engine.connect().close()  # an uncontended checkout barely waits
+    m.sample_pools()
+    assert m.pressure < 1
+
+    held = engine.connect()
+    waiter = threading.Thread(target=lambda: engine.connect().close())
+    waiter.start()
+    time.sleep(0.2)
+    m.sample_pools()  # the blocked checkout counts while it is still waiting
+    assert m.pool_wait >= 0.15 and m.pressure > 2
+    held.close()
+    waiter.join()
+    m.sample_pools()  # ...and its completed wait is the mean of this interval
+    assert m.pool_wait >= 0.15
+    m.sample_pools()
+    assert m.pool_wait == 0.0
+    # the app's monitor watches the sync and the async primary pool
+    assert monitor.pools == ("primary", "primary_async")
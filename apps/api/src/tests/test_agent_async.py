@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+from src.agent.graph import AgentRunner
+
+
+class FakeSession:
+    def __init__(self, log):
+        self.log = log
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def commit(self):
+        self.log.append("commit")
+
+    async def rollback(self):
+        self.log.append("rollback")
+
+
+class FakeRuns:
+    def __init__(self, log):
+        self.log = log
+
+    async def start(self, run_id, flow_id, thread_id, *, stage, source):
+        self.log.append(("start", stage))
+
+    async def tick(self, run_id, *, stage, status, result=None):
+        if stage == "boom":
+            raise RuntimeError("tick failed")
+        self.log.append(("tick", stage, status))
+
+    async def add_issues(self, run_id, issues):
+        self.log.append(("issues", len(issues)))
+
+    async def finish(self, run_id, status):
+        self.log.append(("finish", status))
+
+
+class FakeSimilarity:
+    def __init__(self):
+        self.thread = None
+
+    def find_candidate(self, flow_id, user_message):
+        self.thread = threading.get_ident()
+        return {"pipeline_id": "p1", "version": "1.0.0", "score": 0.9}
+
+
+def _runner(log, similarity=None):
+    return AgentRunner(
+        session_factory=lambda: FakeSession(log),
+        similarity_service=similarity or FakeSimilarity(),
+        llm_client=object(),
+        runs_repo_factory=lambda session: FakeRuns(session.log),
+    )
+
+
+def test_suggestion_run_awaits_db_and_keeps_similarity_off_loop():
+    log = []
+    similarity = FakeSimilarity()
+    runner = _runner(log, similarity)
+
+    asyncio.run(runner.run("f1", "t-async", {"role": "user", "content": "hi"}, run_id="r1"))
+
+    calls = [c for c in log if c != "commit"]
+    assert calls == [
+        ("start", "discovery"),
+        ("tick", "discovery", "succeeded"),
+        ("tick", "search_existing", "succeeded"),
+        ("finish", "succeeded"),
+    ]
+    assert log.count("commit") == 3 and "rollback" not in log
+    assert similarity.thread is not None and similarity.thread != threading.get_ident()
+
+
+def test_transaction_rolls_back_on_error():
+    log = []
+    runner = _runner(log)
+
+    async def _run():
+        try:
+            async with runner.transaction() as session:
+                await FakeRuns(session.log).tick("r1", stage="boom", status="running")
+        except RuntimeError:
+            pass
+
+    asyncio.run(_run())
+    assert log == ["rollback"]
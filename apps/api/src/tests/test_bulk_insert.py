@@ -0,0 +1,43 @@
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import Session
+
+from src.config import settings
+from src.infrastructure.agent_log_repo import SAAgentLogRepo
+from src.models import AgentLog, ValidationIssue
+from src.repositories.runs_repo import RunsRepo
+
+RUN = "cccccccc-0000-0000-0000-000000000001"
+
+
+def _db():
+    engine = create_engine("sqlite://")
+    ValidationIssue.__table__.create(engine)
+    AgentLog.__table__.create(engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute",
+                 lambda conn, cursor, stmt, params, ctx, many: statements.append((stmt, many)))
+    return Session(engine), statements
+
+
+def test_issues_are_written_in_batches_not_row_by_row(monkeypatch):
+    monkeypatch.setattr(settings, "API_BULK_BATCH_SIZE", 400)
+    db, statements = _db()
+    issues = [{"path": f"/steps/{i}", "code": "enum", "message": "bad"} for i in range(1000)]
+    assert RunsRepo(db).add_issues(RUN, issues) == 1000
+    inserts = [many for stmt, many in statements if stmt.startswith("INSERT INTO validation_issue")]
+    assert inserts == [True, True, True]
+    assert db.scalar(select(func.count()).select_from(ValidationIssue)) == 1000
+    row = db.execute(select(ValidationIssue)).scalars().first()
+    assert row.generation_run_id == RUN and row.severity == "error" and row.created_at is not None
+
+
+def test_agent_log_entries_map_onto_the_table():
+    db, _ = _db()
+    n = SAAgentLogRepo(db).write_many([
+        dict(run_id="r1", thread_id=None, flow_id=None, step="llm:request", level="debug", message="req", data={"k": 1}),
+        dict(run_id="r1", thread_id=None, flow_id=None, step="llm:response", level="debug", message="res"),
+    ])
+    assert n == 2
+    rows = db.execute(select(AgentLog).order_by(AgentLog.event)).scalars().all()
+    assert [r.event for r in rows] == ["llm:request", "llm:response"]
+    assert rows[0].data == {"run_id": "r1", "message": "req", "k": 1}
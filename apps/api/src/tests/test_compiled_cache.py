@@ -0,0 +1,41 @@
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from src import database
+from src.config import settings
+from src.metrics import DB_COMPILE_CACHE
+from src.models import Flow, FlowSummary
+from src.repositories.flow_summary_repo import get_active
+
+FLOWS = ["ffffffff-0000-0000-0000-000000000001", "ffffffff-0000-0000-0000-000000000002"]
+
+
+def _count(result):
+    return DB_COMPILE_CACHE.labels("test", result)._value.get()
+
+
+def test_hot_lookup_is_compiled_once_and_rebound():
+    engine = create_engine("sqlite://")
+    for model in (Flow, FlowSummary):
+        model.__table__.create(engine)
+    database.instrument_compile_cache(engine, "test")
+    with Session(engine) as db:
+        for i, fid in enumerate(FLOWS):
+            db.add(Flow(id=fid, slug=f"f{i}", name=f"F{i}", meta={}))
+            db.add(FlowSummary(id=f"aaaaaaaa-0000-0000-0000-00000000000{i}", flow_id=fid, content={"n": i}, is_active=True))
+        db.flush()
+        hits, misses = _count("hit"), _count("miss")
+        # the closure value is a bound parameter, not baked into the cached statement
+        assert [get_active(db, fid).content["n"] for fid in FLOWS * 2] == [0, 1, 0, 1]
+        assert _count("miss") - misses == 1
+        assert _count("hit") - hits == 3
+
+
+def test_prepare_threshold_only_for_psycopg(monkeypatch):
+    pg = make_url("postgresql+psycopg://u:p@db/x")
+    monkeypatch.setattr(settings, "API_DB_PREPARE_THRESHOLD", 3)
+    assert database._connect_args(pg) == {"prepare_threshold": 3}
+    monkeypatch.setattr(settings, "API_DB_PREPARE_THRESHOLD", -1)
+    assert database._connect_args(pg) == {"prepare_threshold": None}
+    assert database._connect_args(make_url("sqlite://")) == {}
@@ -0,0 +1,101 @@
+import copy
+
+import numpy as np
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.infrastructure import fingerprint
+from src.infrastructure.similarity_index import FlowIndex, SimilarityIndex
+from src.models import Flow, Pipeline
+from src.services.similarity_service import SimilarityService
+from src.tests.test_minhash import _doc, _other
+
+FLOW = "ffffffff-0000-0000-0000-000000000002"
+
+
+def _relabelled(doc: dict) -> dict:
+    """Same shape, every id, name, topic and url changed."""
+    return {
+        "version": "3.0",
+        "meta": {"name": "invoices mirror", "description": "forward settled invoices to billing"},
+        "connections": {"events": {"type": "kafka"}, "billing": {"type": "postgres", "url": "postgres://billing"}},
+        "sources": [{"id": "inv", "type": "kafka.subscribe", "connectionRef": "events", "topic": "invoices"}],
+        "actions": [{"id": "save", "type": "db.upsert", "connectionRef": "billing", "table": "invoices"},
+                    {"id": "ping", "type": "http.request", "url": "https://billing.example/hook"}],
+        "pipelines": [{"id": "invoices", "sources": ["inv"], "triggers": [{"type": "event", "event": "invoice.settled"}],
+                       "rules": [{"id": "settled", "when": "payload.settled", "do": [{"id": "run", "type": "fn.invoke"}]}]}],
+    }
+
+
+def test_vocabulary_comes_from_schema():
+    vocab = fingerprint.vocabulary()
+    assert {"cron", "event", "nlp.intent"} <= vocab["trigger"]
+    assert "kafka.subscribe" in vocab["source"] and "ai.generate" in vocab["action"]
+    assert {"kafka", "postgres", "s3"} <= vocab["connection"]
+
+
+def test_features_capture_shape_not_labels():
+    feats = fingerprint.features(_doc(1))
+    assert {"trigger:event", "source:kafka.subscribe", "action:db.upsert", "connection:postgres",
+            "uses:kafka.subscribe>kafka", "uses:db.upsert>postgres",
+            "edge:source:kafka.subscribe>fn.invoke", "edge:trigger:event>fn.invoke"} <= feats
+    assert fingerprint.features(_relabelled(_doc(1))) == feats
+    assert fingerprint.features("not a document") == set()
+
+    doc = copy.deepcopy(_doc(1))
+    doc["actions"][0]["onError"] = [{"type": "kafka.publish"}, {"type": "made.up"}]
+    doc["sources"].append({"id": "more", "type": "kafka.subscribe"})
+    extra = fingerprint.features(doc) - feats
+    assert extra == {"action:kafka.publish", "action:other", "edge:db.upsert>onError>kafka.publish",
+                     "edge:db.upsert>onError>other", "source:kafka.subscribe#2"}
+
+
+def test_fingerprint_jaccard():
+    a = fingerprint.fingerprint(_doc(1))
+    assert a.dtype == np.uint64 and a.shape == (fingerprint.WORDS,)
+    assert fingerprint.jaccard(a, fingerprint.fingerprint(_relabelled(_doc(1)))) == 1.0
+    assert fingerprint.jaccard(a, fingerprint.fingerprint(_other())) < 0.2
+    assert fingerprint.jaccard(fingerprint.fingerprint({}), fingerprint.fingerprint({})) == 0.0
+    matrix = np.stack([a, fingerprint.fingerprint(_other()), a])
+    assert fingerprint.jaccard_many(matrix, a).tolist() == pytest.approx(
+        [1.0, fingerprint.jaccard(a, matrix[1]), 1.0])
+
+
+def test_flow_index_shape_search_and_blend():
+    index = FlowIndex(256)
+    index.add("p1", "1.0.0", _relabelled(_doc(1)))
+    index.add("p2", "1.0.1", _other())
+    assert [h.pipeline_id for h in index.search_shape(_doc(1), k=2)] == ["p1", "p2"]
+    assert index.search_shape(_doc(1), k=1)[0].score == 1.0
+
+    # "camera" only shares vocabulary with the text of p2; the structure points at p1
+    text = "camera feed orders kafka subscribe"
+    assert index.search(text, k=1)[0].pipeline_id == "p2"
+    assert index.search(text, k=1, shape=_doc(1), shape_weight=0.8)[0].pipeline_id == "p1"
+    # no text overlap at all still ranks by structure
+    assert index.search("zzz", k=1, shape=_doc(1), shape_weight=0.5)[0].score == pytest.approx(0.5)
+
+    index.add("p1", "1.0.2", _other())  # re-add replaces the fingerprint row too
+    assert index.search_shape(_doc(1), k=1)[0].score < 0.2
+
+
+def test_find_candidate_blends_structure(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    for model in (Flow, Pipeline):
+        model.__table__.create(engine)
+    with Session(engine) as db:
+        db.add(Flow(id=FLOW, slug="f2", name="F2", meta={}))
+        db.add(Pipeline(id="bbbbbbbb-0000-0000-0000-000000000001", flow_id=FLOW, version="1.0.0",
+                        schema_version="1.0.0", content=_relabelled(_doc(1))))
+        db.commit()
+    monkeypatch.setattr("src.services.similarity_service.SessionLocal", lambda: Session(engine))
+    service = SimilarityService(threshold=0.5, backend="index", index=SimilarityIndex(dim=256))
+    service.near_dup_threshold = 0
+
+    service.structure_weight = 0.0
+    assert service.find_candidate(FLOW, {"content": _doc(1)}) is None
+    service.structure_weight = 0.6
+    hit = service.find_candidate(FLOW, {"content": _doc(1)})
+    assert hit["pipeline_id"] == "bbbbbbbb-0000-0000-0000-000000000001" and hit["score"] >= 0.6
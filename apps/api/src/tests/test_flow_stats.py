@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src.middleware.error import AppError
+from src.models import Flow, FlowStats, Pipeline, Thread
+from src.repositories.flow_stats_repo import FlowStatsRepo
+from src.repositories.pipeline_repo import PipelineRepo
+from src.services.flow_service import FlowService
+
+
+def _fid(i):
+    return f"ffffffff-0000-0000-0000-{i:012d}"
+
+
+@pytest.fixture()
+def db():
+    engine = create_engine("sqlite://")
+    for model in (Flow, FlowStats, Pipeline, Thread):
+        model.__table__.create(engine)
+    with Session(engine) as s:
+        yield s
+
+
+def _stats(db, flow_id):
+    db.expire_all()
+    return db.get(FlowStats, flow_id)
+
+
+def test_writes_keep_counters_in_step(db):
+    svc = FlowService(db)
+    fid = svc.create("alpha", "Alpha")["id"]
+    repo = PipelineRepo(db)
+    p1 = repo.create_version("aaaaaaaa-0000-0000-0000-000000000001", fid, None, "1.0.0", {})
+    repo.create_version("aaaaaaaa-0000-0000-0000-000000000002", fid, None, "1.1.0", {})
+    repo.publish(p1.id)
+    stats = FlowStatsRepo(db)
+    stats.apply(fid, threads=2, open_threads=2)
+    stats.apply(fid, open_threads=-1)
+
+    s = _stats(db, fid)
+    assert (s.pipeline_count, s.thread_count, s.open_thread_count, s.published_version) == (2, 2, 1, "1.0.0")
+    out = svc.get_one(fid)
+    assert out["has_published"] and out["active_version"] == "1.0.0" and out["pipeline_count"] == 2
+
+
+def test_missing_row_is_rebuilt_from_source_tables(db):
+    fid = _fid(1)
+    db.add(Flow(id=fid, slug="legacy", name="Legacy", meta={}))
+    db.add(Pipeline(id="aaaaaaaa-0000-0000-0000-000000000003", flow_id=fid, version="2.0.0",
+                    schema_version="1.0.0", content={}, is_published=True))
+    db.add_all([Thread(id=f"bbbbbbbb-0000-0000-0000-00000000000{i}", flow_id=fid,
+                       closed_at=datetime(2026, 1, 1) if i == 0 else None) for i in range(3)])
+    db.flush()
+    assert FlowStatsRepo(db).rebuild(missing_only=True) == 1
+    s = _stats(db, fid)
+    assert (s.pipeline_count, s.thread_count, s.open_thread_count, s.published_version) == (1, 3, 2, "2.0.0")
+    assert FlowStatsRepo(db).rebuild(missing_only=True) == 0
+
+    db.delete(s)
+    db.flush()
+    # a delta on a flow without a row recomputes instead of storing the bare delta
+    FlowStatsRepo(db).apply(fid, threads=1, open_threads=1)
+    assert _stats(db, fid).thread_count == 3
+
+
+def test_sorted_pages_walk_every_flow_once(db):
+    svc = FlowService(db)
+    stats = FlowStatsRepo(db)
+    for i in range(7):
+        fid = _fid(i)
+        db.add(Flow(id=fid, slug=f"f{i}", name=f"flow {i % 3}", meta={}))
+        db.flush()
+        stats.ensure(fid)
+        stats.apply(fid, threads=i % 2, open_threads=i % 2)
+
+    for sort, order in (("name", "asc"), ("threads", "desc"), ("pipelines", "asc")):
+        seen, cursor = [], None
+        while True:
+            items, cursor = svc.page(sort=sort, order=order, limit=3, cursor=cursor)
+            seen += [f["id"] for f in items]
+            if cursor is None:
+                break
+        assert sorted(seen) == [_fid(i) for i in range(7)]
+        assert len(seen) == 7
+    names = [f["name"] for f in svc.list(sort="name")]
+    assert names == sorted(names)
+    with pytest.raises(AppError) as e:
+        svc.page(sort="bogus")
+    assert e.value.code == "BAD_SORT"
@@ -0,0 +1,38 @@
+from src.middleware.idempotency import ResponseCache, CachedResponse
+
+
+def _entry(ts, content=b"x"):
+    return CachedResponse(timestamp=ts, body_hash="h", status_code=200, headers=[], content=content, media_type="application/json")
+
+
+def test_lru_evicts_least_recently_used():
+    c = ResponseCache(ttl=100, max_entries=2)
+    c.put(("POST", "/a", "1"), _entry(0))
+    c.put(("POST", "/a", "2"), _entry(1))
+    assert c.get(("POST", "/a", "1"), now=2) is not None
+    c.put(("POST", "/a", "3"), _entry(3))
+    assert c.get(("POST", "/a", "2"), now=4) is None
+    assert c.get(("POST", "/a", "1"), now=4) is not None
+    assert len(c) == 2
+
+
+def test_ttl_expiry_and_overwrite():
+    c = ResponseCache(ttl=10, max_entries=100)
+    c.put(("POST", "/a", "1"), _entry(0))
+    c.put(("POST", "/a", "1"), _entry(5))
+    c.expire(now=11)
+    # the overwritten entry's original expiry must not evict the newer value
+    assert c.get(("POST", "/a", "1"), now=11) is not None
+    c.expire(now=15)
+    assert len(c) == 0 and c.bytes == 0
+
+
+def test_byte_cap():
+    c = ResponseCache(ttl=100, max_entries=100, max_bytes=1000)
+    for i in range(5):
+        c.put(("POST", "/a", str(i)), _entry(i, b"x" * 300))
+    assert c.bytes <= 1000
+    assert c.get(("POST", "/a", "4"), now=5) is not None
+    assert c.get(("POST", "/a", "0"), now=5) is None
+    c.put(("POST", "/a", "big"), _entry(6, b"x" * 5000))
+    assert c.get(("POST", "/a", "big"), now=6) is None
@@ -0,0 +1,159 @@
+import asyncio
+import os
+from contextlib import contextmanager
+
+import httpx
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+from fastapi import FastAPI, Response
+from src.middleware import idempotency
+from src.middleware.idempotency import IdempotencyMiddleware
+from src.infrastructure import idempotency_store
+from src.infrastructure.idempotency_store import MemoryIdempotencyStore, CachedResponse, PostgresIdempotencyStore
+from src.models import IdempotencyKey
+
+
+def _app(store, calls):
+    app = FastAPI()
+    app.add_middleware(IdempotencyMiddleware, store=store)
+
+    @app.post("/run")
+    async def run():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"n": len(calls)}
+    return app
+
+
+async def _post(client, key, body=b"{}"):
+    return await client.post("/run", content=body, headers={"Idempotency-Key": key, "Content-Type": "application/json"})
+
+
+def test_concurrent_duplicates_execute_once():
+    async def _run():
+        idempotency._CACHE.clear()
+        calls = []
+        transport = httpx.ASGITransport(app=_app(MemoryIdempotencyStore(), calls))
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            r1, r2, r3 = await asyncio.gather(*(_post(client, "k-concurrent") for _ in range(3)))
+            assert len(calls) == 1
+            assert r1.json() == r2.json() == r3.json() == {"n": 1}
+            r4 = await _post(client, "k-concurrent", b'{"other": 1}')
+            assert r4.status_code == 409
+    asyncio.run(_run())
+
+
+def test_waits_for_result_owned_by_another_worker():
+    async def _run():
+        idempotency._CACHE.clear()
+        store, calls = MemoryIdempotencyStore(), []
+        skey = "POST|/run|k-remote"
+        # another worker has reserved the key and is still running
+        remote = await store.reserve(skey, idempotency._sha256_hex(b"{}"), lock_ttl=60)
+        assert remote.state == "acquired"
+
+        async def finish_remote():
+            await asyncio.sleep(0.3)
+            await store.complete(skey, CachedResponse(
+                timestamp=0, body_hash=idempotency._sha256_hex(b"{}"), status_code=200,
+                headers=[("content-type", "application/json")], content=b'{"n": 42}', media_type="application/json",
+            ), ttl=60, token=remote.token)
+
+        transport = httpx.ASGITransport(app=_app(store, calls))
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            r, _ = await asyncio.gather(_post(client, "k-remote"), finish_remote())
+        assert calls == []
+        assert r.json() == {"n": 42}
+    asyncio.run(_run())
+
+
+def test_replay_keeps_repeated_headers():
+    async def _run():
+        idempotency._CACHE.clear()
+        app = FastAPI()
+        app.add_middleware(IdempotencyMiddleware, store=MemoryIdempotencyStore())
+
+        @app.post("/login")
+        async def login(response: Response):
+            response.set_cookie("session", "s1")
+            response.set_cookie("csrf", "c1")
+            return {"ok": True}
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://t") as client:
+            first, replay = [await client.post("/login", content=b"{}", headers={"Idempotency-Key": "k-cookies"})
+                             for _ in range(2)]
+        cookies = first.headers.get_list("set-cookie")
+        assert len(cookies) == 2
+        assert replay.headers.get_list("set-cookie") == cookies
+        assert replay.headers.get_list("content-length") == [str(len(replay.content))]
+        assert replay.json() == {"ok": True}
+    asyncio.run(_run())
+
+
+def _response(content: bytes) -> CachedResponse:
+    return CachedResponse(timestamp=0, body_hash="h", status_code=200, headers=[], content=content,
+                          media_type="application/json")
+
+
+@pytest.fixture(params=["memory", "postgres"])
+def store(request, monkeypatch):
+    if request.param == "memory":
+        yield MemoryIdempotencyStore()
+        return
+    dsn = os.getenv("API_TEST_DSN")
+    if not dsn or not dsn.startswith("postgresql"):
+        pytest.skip("needs Postgres (set API_TEST_DSN)")
+    schema = "test_idempotency_store"
+    engine = create_engine(dsn)
+
+    @event.listens_for(engine, "connect")
+    def _search_path(dbapi_conn, _):
+        with dbapi_conn.cursor() as cur:
+            cur.execute(f"SET search_path TO {schema}, public")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    IdempotencyKey.__table__.create(engine)
+
+    @contextmanager
+    def get_db():
+        with Session(engine) as db:
+            yield db
+            db.commit()
+
+    monkeypatch.setattr(idempotency_store, "get_db", get_db)
+    yield PostgresIdempotencyStore()
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+    engine.dispose()
+
+
+def test_expired_owner_cannot_touch_the_next_reservation(store):
+    async def _run():
+        a = await store.reserve("k", "h", lock_ttl=0)  # A's lock expires at once
+        b = await store.reserve("k", "h", lock_ttl=60)
+        assert a.state == b.state == "acquired" and a.token != b.token
+        # A finishes late: neither its result nor its release may touch B's reservation
+        await store.complete("k", _response(b"from A"), ttl=60, token=a.token)
+        await store.release("k", token=a.token)
+        assert (await store.get("k")).state == "in_progress"
+        assert (await store.reserve("k", "h", lock_ttl=60)).state == "in_progress"
+        await store.complete("k", _response(b"from B"), ttl=60, token=b.token)
+        assert (await store.get("k")).response.content == b"from B"
+        await store.release("k", token=b.token)  # completed rows are not released
+        assert (await store.get("k")).state == "completed"
+    asyncio.run(_run())
+
+
+def test_completed_response_keeps_header_pairs(store):
+    async def _run():
+        owner = await store.reserve("k-pairs", "h", lock_ttl=60)
+        headers = [("set-cookie", "a=1"), ("set-cookie", "b=2"), ("content-type", "application/json")]
+        await store.complete("k-pairs", CachedResponse(timestamp=0, body_hash="h", status_code=201, headers=headers,
+                                                       content=b"{}", media_type="application/json"),
+                             ttl=60, token=owner.token)
+        assert (await store.get("k-pairs")).response.headers == headers
+    asyncio.run(_run())
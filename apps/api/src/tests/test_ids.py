@@ -0,0 +1,62 @@
+import base64
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from src import ids as ids_module
+from src.ids import id_time, new_id, uuid7
+from src.middleware.error import AppError
+from src.models import Message, ThreadArchive
+from src.pagination import decode_cursor, encode_cursor
+from src.repositories.message_repo import MessageRepo
+
+THREAD = "bbbbbbbb-2222-2222-2222-222222222222"
+
+
+def test_uuid7_layout_and_order(monkeypatch):
+    ids = [uuid7() for _ in range(5000)]
+    assert all(u.version == 7 and u.variant == uuid.RFC_4122 for u in ids)
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    # more ids in one millisecond than the 12-bit counter holds: the next millisecond is borrowed
+    frozen = time.time_ns() + 10**9
+    monkeypatch.setattr(ids_module.time, "time_ns", lambda: frozen)
+    burst = [uuid7() for _ in range(5000)]
+    assert burst == sorted(burst) and id_time(burst[-1]) - id_time(burst[0]) >= timedelta(milliseconds=1)
+    monkeypatch.undo()
+    assert abs(id_time(new_id()) - datetime.utcnow()) < timedelta(seconds=5)
+    assert id_time(str(uuid.uuid4())) is None and id_time("not-a-uuid") is None
+
+
+def test_messages_page_with_id_only_cursors():
+    engine = create_engine("sqlite://")
+    for model in (Message, ThreadArchive):  # short pages look for archived rows
+        model.__table__.create(engine)
+    with Session(engine) as db:
+        ids = [new_id() for _ in range(7)]
+        db.add_all(Message(id=i, thread_id=THREAD, role="user", content={"n": n}) for n, i in enumerate(ids))
+        db.flush()
+        db.expire_all()
+        assert all(m.created_at == id_time(m.id) for m in db.query(Message))
+
+        repo, seen, cursor = MessageRepo(db), [], None
+        while True:
+            rows, cursor = repo.list_page(THREAD, 3, decode_cursor(cursor) if cursor else None)
+            seen += [m.content["n"] for m in rows]
+            if cursor is None:
+                break
+            assert len(json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))) == 1
+        assert seen == [6, 5, 4, 3, 2, 1, 0]
+
+
+def test_legacy_rows_keep_two_part_cursors():
+    ts, legacy = datetime(2026, 1, 1, 12, 0, 0, 123456), str(uuid.uuid4())
+    assert decode_cursor(encode_cursor(ts, legacy)) == (ts, legacy)
+    v4_only = base64.urlsafe_b64encode(json.dumps([legacy]).encode()).decode()
+    with pytest.raises(AppError) as e:
+        decode_cursor(v4_only)
+    assert e.value.code == "BAD_CURSOR"
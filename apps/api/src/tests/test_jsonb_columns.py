@@ -0,0 +1,47 @@
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from src.models import Flow, FlowSummary, GenerationRun, Message, Pipeline
+from src.repositories import message_repo, pipeline_repo
+
+
+def _pg(clause):
+    return str(clause.compile(dialect=postgresql.dialect()))
+
+
+def test_document_columns_are_jsonb_on_postgres_only():
+    for model, cols in ((Pipeline, ["content"]), (Message, ["content"]), (GenerationRun, ["result"]),
+                        (FlowSummary, ["content", "pinned"])):
+        ddl = _pg(CreateTable(model.__table__))
+        for col in cols:
+            assert f"{col} JSONB" in ddl
+
+    engine = create_engine("sqlite://")
+    for model in (Flow, Pipeline):
+        model.__table__.create(engine)  # GIN indexes are skipped off Postgres
+    with Session(engine) as db:
+        db.add(Flow(id="ffffffff-0000-0000-0000-000000000001", slug="f", name="F", meta={}))
+        db.add(Pipeline(id="aaaaaaaa-0000-0000-0000-000000000001", flow_id="ffffffff-0000-0000-0000-000000000001",
+                        version="1.0.0", schema_version="1.0.0", content={"connections": {"in": {"type": "kafka"}}}))
+        db.flush()
+        db.expire_all()
+        assert db.get(Pipeline, "aaaaaaaa-0000-0000-0000-000000000001").content["connections"]["in"]["type"] == "kafka"
+
+
+def test_gin_indexes_use_jsonb_path_ops():
+    ddl = {ix.name: _pg(CreateIndex(ix)) for m in (Pipeline, Message) for ix in m.__table__.indexes}
+    assert ddl["ix_pipeline_content_gin"].endswith("USING gin (content jsonb_path_ops)")
+    assert ddl["ix_message_content_gin"].endswith("USING gin (content jsonb_path_ops)")
+    assert "gin (jsonb_path_query_array(content, '$.connections.*.type') jsonb_path_ops)" in ddl["ix_pipeline_connection_types"]
+
+
+def test_helpers_filter_with_containment():
+    sql = _pg(pipeline_repo._containing_stmt("f", {"steps": [{"type": "join"}]}))
+    assert "pipeline.content @> %(param_1)s" in sql
+    # same expression as ix_pipeline_connection_types, so the planner can use it
+    sql = _pg(pipeline_repo._connection_type_stmt("f", "kafka"))
+    assert "jsonb_path_query_array(pipeline.content, '$.connections.*.type') @> %(param_1)s" in sql
+    sql = _pg(message_repo._containing_stmt("t", {"type": "tool_call"}, 10))
+    assert "message.content @> %(param_1)s" in sql
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Session
+
+from src.middleware.error import AppError
+from src.models import Message, ThreadArchive
+from src.pagination import decode_cursor, encode_cursor
+from src.repositories.message_repo import MessageRepo, _page_stmt
+
+THREAD = "bbbbbbbb-1111-1111-1111-111111111111"
+
+
+def _seed(db, n):
+    t0 = datetime(2026, 1, 1)
+    for i in range(n):
+        # pairs share a timestamp so the id tie-breaker is exercised
+        db.add(Message(id=f"aaaaaaaa-0000-0000-0000-{i:012d}", thread_id=THREAD, role="user",
+                       format="text", content={"i": i}, created_at=t0 + timedelta(seconds=i // 2)))
+    db.flush()
+
+
+def test_cursor_roundtrip_and_bad_cursor():
+    ts = datetime(2026, 1, 1, 12, 30, 0, 123456)
+    assert decode_cursor(encode_cursor(ts, "abc")) == (ts, "abc")
+    with pytest.raises(AppError) as e:
+        decode_cursor("not-a-cursor")
+    assert e.value.status == 400 and e.value.code == "BAD_CURSOR"
+
+
+def test_pages_walk_back_without_gaps_or_duplicates():
+    engine = create_engine("sqlite://")
+    for model in (Message, ThreadArchive):  # short pages look for archived rows
+        model.__table__.create(engine)
+    with Session(engine) as db:
+        _seed(db, 7)
+        repo = MessageRepo(db)
+        seen, cursor, pages = [], None, 0
+        while True:
+            rows, cursor = repo.list_page(THREAD, 3, decode_cursor(cursor) if cursor else None)
+            seen += [m.content["i"] for m in rows]
+            pages += 1
+            if cursor is None:
+                break
+        assert seen == [6, 5, 4, 3, 2, 1, 0]
+        assert pages == 3
+
+        # an exact multiple of the page size must not yield a trailing empty page
+        rows, cursor = repo.list_page(THREAD, 7)
+        assert len(rows) == 7 and cursor is None
+
+
+def test_page_query_is_a_single_index_range():
+    sql = str(_page_stmt(THREAD, 50, (datetime(2026, 1, 1), "x")).compile(dialect=postgresql.dialect()))
+    assert "(message.created_at, message.id) < (" in sql
+    assert "ORDER BY message.created_at DESC, message.id DESC" in sql
+    assert Message.__table__.indexes and any(
+        [c.name for c in ix.columns] == ["thread_id", "created_at", "id"] for ix in Message.__table__.indexes
+    )
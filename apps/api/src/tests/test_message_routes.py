@@ -0,0 +1,117 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+from starlette.routing import Match
+
+from src import rate_limits
+from src.infrastructure.rate_limit import MemoryRateLimiter, RateLimiter
+from src.middleware.error import AppError, handle_app_error
+from src.models import Flow, Message, Thread, ThreadArchive
+from src.routers import messages, threads
+
+FLOW = "ffffffff-0000-0000-0000-000000000001"
+THREAD = "bbbbbbbb-0000-0000-0000-000000000001"
+CLOSED = "bbbbbbbb-0000-0000-0000-000000000002"
+
+
+class _AsyncOver:
+    """Just enough of AsyncSession, over a sync sqlite Session, for the message routes."""
+
+    def __init__(self, db: Session):
+        self.sync = db
+
+    def add(self, obj):
+        self.sync.add(obj)
+
+    async def get(self, *args, **kw):
+        return self.sync.get(*args, **kw)
+
+    async def execute(self, *args, **kw):
+        return self.sync.execute(*args, **kw)
+
+    async def flush(self):
+        self.sync.flush()
+
+    async def refresh(self, *args, **kw):
+        self.sync.refresh(*args, **kw)
+
+    async def run_sync(self, fn, *args, **kw):
+        return fn(self.sync, *args, **kw)
+
+
+@pytest.fixture()
+def client(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    for model in (Flow, Thread, Message, ThreadArchive):
+        model.__table__.create(engine)
+    with Session(engine) as db:
+        db.add(Flow(id=FLOW, slug="f", name="F", meta={}))
+        db.add_all([Thread(id=THREAD, flow_id=FLOW),
+                    Thread(id=CLOSED, flow_id=FLOW, closed_at=datetime(2026, 1, 1))])
+        db.commit()
+
+    @asynccontextmanager
+    async def get_async_db():
+        with Session(engine, expire_on_commit=False) as db:
+            yield _AsyncOver(db)
+            db.commit()
+
+    monkeypatch.setattr(messages, "get_async_db", get_async_db)
+    monkeypatch.setattr(rate_limits, "limiter", RateLimiter(MemoryRateLimiter()))
+    monkeypatch.setattr(rate_limits.settings, "API_RATE_LIMIT_FLOW", "")
+    app = FastAPI()
+    app.add_exception_handler(AppError, handle_app_error)
+    # same order as main.create_app: the threads router is included first
+    app.include_router(threads.router)
+    app.include_router(messages.router)
+    return TestClient(app)
+
+
+def _endpoint(app, method: str, path: str):
+    scope = {"type": "http", "method": method, "path": path}
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.endpoint
+
+
+def test_messages_are_served_by_the_async_handlers(client):
+    path = f"/threads/{THREAD}/messages"
+    assert _endpoint(client.app, "GET", path) is messages.list_messages
+    assert _endpoint(client.app, "POST", path) is messages.create_message
+
+    r = client.post(path, json={"role": "user", "content": {"text": "hi"}})
+    assert r.status_code == 201
+    created = r.json()
+    page = client.get(path, params={"limit": 1})
+    assert [m["id"] for m in page.json()] == [created["id"]]
+    # a legacy ISO `before` cursor is still accepted
+    assert client.get(path, params={"before": "2000-01-01T00:00:00"}).json() == []
+
+
+def test_message_writes_keep_the_thread_rules(client):
+    r = client.post(f"/threads/{CLOSED}/messages", json={"role": "user", "content": {"text": "late"}})
+    assert r.status_code == 409 and r.json()["error"]["code"] == "THREAD_CLOSED"
+    r = client.post(f"/threads/{THREAD}/messages",
+                    json={"role": "user", "content": {"text": "x"}, "parent_id": "aaaaaaaa-0000-0000-0000-00000000dead"})
+    assert r.status_code == 400 and r.json()["error"]["code"] == "PARENT_NOT_SAME_THREAD"
+    r = client.get("/threads/bbbbbbbb-0000-0000-0000-00000000dead/messages")
+    assert r.status_code == 404 and r.json()["error"]["code"] == "THREAD_NOT_FOUND"
+
+
+def test_message_posts_are_rate_limited_per_thread(client, monkeypatch):
+    monkeypatch.setattr(rate_limits.settings, "API_RATE_LIMIT_MESSAGES_THREAD", "2/60")
+    path = f"/threads/{THREAD}/messages"
+    codes = [client.post(path, json={"role": "user", "content": {"text": str(i)}}).status_code for i in range(3)]
+    assert codes == [201, 201, 429]
+    r = client.post(path, json={"role": "user", "content": {"text": "again"}})
+    assert r.json()["error"]["code"] == "RATE_LIMITED" and int(r.headers["Retry-After"]) > 0
+    # reads and other threads are not charged against it
+    assert client.get(path).status_code == 200
+    assert client.post(f"/threads/{CLOSED}/messages", json={"role": "user", "content": {}}).status_code == 409
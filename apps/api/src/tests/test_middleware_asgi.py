@@ -0,0 +1,65 @@
+import asyncio
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from src.infrastructure.idempotency_store import MemoryIdempotencyStore
+from src.middleware.auth import AuthMiddleware
+from src.middleware.idempotency import IdempotencyMiddleware
+from src.middleware.limits import SizeLimitMiddleware
+from src.middleware.metrics import MetricsMiddleware
+
+app = FastAPI()
+# same order as create_app: the size limit wraps the body-buffering idempotency middleware
+app.add_middleware(IdempotencyMiddleware, store=MemoryIdempotencyStore())
+app.add_middleware(SizeLimitMiddleware, max_bytes=100)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(AuthMiddleware, token_env="TEST_ASGI_AUTH_TOKEN")
+
+
+@app.post("/echo")
+async def echo(request: Request):
+    return {"n": len(await request.body())}
+
+client = TestClient(app)
+
+
+def test_size_limit_by_content_length():
+    r = client.post("/echo", content=b"x" * 101)
+    assert r.status_code == 413
+    assert r.json()["code"] == "PAYLOAD_TOO_LARGE"
+
+
+def test_size_limit_on_streamed_body_without_content_length():
+    def chunks():
+        for _ in range(5):
+            yield b"x" * 40
+    r = client.post("/echo", content=chunks())
+    assert r.status_code == 413
+    assert client.post("/echo", content=b"x" * 50).json() == {"n": 50}
+
+
+def test_size_limit_stops_idempotent_body_early():
+    # Idempotency buffers the body to hash it; the limit must cut that off, not see it afterwards
+    pulled, sent = 0, []
+
+    async def receive():
+        nonlocal pulled
+        pulled += 1
+        return {"type": "http.request", "body": b"x" * 40, "more_body": pulled < 1000}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": "POST", "path": "/echo", "raw_path": b"/echo", "query_string": b"",
+             "headers": [(b"idempotency-key", b"chunked")], "http_version": "1.1", "scheme": "http",
+             "server": ("test", 80), "client": ("test", 1), "root_path": ""}
+    asyncio.run(app(scope, receive, send))
+    assert sent[0]["status"] == 413 and pulled == 3
+    r = client.post("/echo", content=b"x" * 50, headers={"Idempotency-Key": "small"})
+    assert r.json() == {"n": 50}
+
+
+def test_auth_applies_to_mutating_methods(monkeypatch):
+    monkeypatch.setenv("TEST_ASGI_AUTH_TOKEN", "s3cret")
+    assert client.post("/echo", content=b"{}").status_code == 401
+    assert client.post("/echo", content=b"{}", headers={"Authorization": "Bearer s3cret"}).status_code == 200
@@ -0,0 +1,122 @@
+import copy
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.infrastructure import minhash
+from src.infrastructure.similarity_index import FlowIndex, SimilarityIndex
+from src.middleware.error import AppError
+from src.models import Flow, Pipeline
+from src.routers import admin_pipelines
+from src.services.similarity_service import SimilarityService
+
+FLOW = "ffffffff-0000-0000-0000-000000000001"
+
+
+def _doc(n: int) -> dict:
+    return {
+        "version": "3.0",
+        "meta": {"name": f"orders sync {n}", "description": "copy paid orders into the warehouse"},
+        "connections": {"bus": {"type": "kafka", "url": "kafka://bus:9092"}, "wh": {"type": "postgres"}},
+        "sources": [{"id": "orders_in", "type": "kafka.subscribe", "connectionRef": "bus", "topic": f"orders.v{n}"}],
+        "actions": [{"id": "store", "type": "db.upsert", "connectionRef": "wh", "table": "orders",
+                     "retry": {"maxAttempts": 3, "backoff": "exponential"}},
+                    {"id": "notify", "type": "http.request", "url": "https://hooks.example/orders"}],
+        "pipelines": [{"id": "orders", "sources": ["orders_in"], "triggers": [{"type": "event", "event": "order.paid"}],
+                       "rules": [{"id": "paid", "when": "payload.status == 'paid'", "do": [{"id": "go", "type": "fn.invoke"}]}]}],
+    }
+
+
+def _other() -> dict:
+    return {"version": "3.0", "meta": {"name": "camera feed"},
+            "sources": [{"id": "cam", "type": "ros2.subscribe", "topic": "/camera/image"}],
+            "actions": [{"id": "push", "type": "media.push", "url": "rtmp://media/live"}]}
+
+
+def _near(doc: dict) -> dict:
+    out = copy.deepcopy(doc)
+    out["actions"][0]["id"] = "store_orders"  # renamed stage
+    out["actions"][0]["retry"]["maxAttempts"] = 5  # changed param
+    return out
+
+
+def test_signature_is_stable_and_estimates_jaccard():
+    sig = minhash.signature(_doc(1))
+    assert sig.dtype.name == "uint32" and sig.shape == (minhash.NUM_PERM,)
+    assert minhash.to_bytes(sig) == minhash.to_bytes(minhash.signature(_doc(1)))
+    assert (minhash.from_bytes(minhash.to_bytes(sig)) == sig).all()
+    assert minhash.from_bytes(b"short") is None
+    # key order does not matter: shingles come from the canonical JSON
+    assert (minhash.signature(dict(reversed(list(_doc(1).items())))) == sig).all()
+
+    a, b = minhash.shingles(_doc(1)), minhash.shingles(_near(_doc(1)))
+    exact = len(a & b) / len(a | b)
+    assert minhash.jaccard(sig, minhash.signature(_near(_doc(1)))) == pytest.approx(exact, abs=0.15)
+    assert minhash.jaccard(sig, minhash.signature(_other())) < 0.2
+
+
+def test_lsh_query_and_clusters():
+    lsh = minhash.LSHIndex()
+    lsh.add("a", minhash.signature(_doc(1)))
+    lsh.add("b", minhash.signature(_near(_doc(1))))
+    lsh.add("c", minhash.signature(_other()))
+    lsh.add("d", minhash.signature(_doc(1)))
+    assert [k for k, _ in lsh.query(minhash.signature(_doc(1)), 0.99)] == ["a", "d"]
+    assert "c" not in {k for k, _ in lsh.query(minhash.signature(_doc(1)), 0.5)}
+    assert lsh.clusters(0.7) == [["a", "b", "d"]]
+
+    lsh.remove("b")
+    lsh.add("d", minhash.signature(_other()))  # re-adding replaces the old buckets
+    assert lsh.clusters(0.99) == [["c", "d"]]
+    assert len(lsh) == 3
+
+
+@pytest.fixture()
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    for model in (Flow, Pipeline):
+        model.__table__.create(engine)
+    with Session(engine) as db:
+        db.add(Flow(id=FLOW, slug="f", name="F", meta={}))
+        for i, content in enumerate((_doc(1), _near(_doc(1)), _other())):
+            # the first row predates the minhash column; the index computes it from content
+            sig = None if i == 0 else minhash.to_bytes(minhash.signature(content))
+            db.add(Pipeline(id=f"aaaaaaaa-0000-0000-0000-00000000000{i}", flow_id=FLOW, version=f"1.0.{i}",
+                            schema_version="1.0.0", content=content, minhash=sig))
+        db.commit()
+    return engine
+
+
+def test_find_candidate_returns_near_duplicate(engine, monkeypatch):
+    monkeypatch.setattr("src.services.similarity_service.SessionLocal", lambda: Session(engine))
+    service = SimilarityService(backend="index", index=SimilarityIndex(dim=256))
+    service.near_dup_threshold = 0.7
+    edited = _near(_doc(1))
+    edited["meta"]["description"] = "copy paid orders to the warehouse"
+    hit = service.find_candidate(FLOW, {"content": edited})
+    assert hit["pipeline_id"] == "aaaaaaaa-0000-0000-0000-000000000001" and 0.7 <= hit["score"] < 1.0
+
+
+def test_admin_lists_duplicate_clusters(engine, monkeypatch):
+    monkeypatch.setattr(admin_pipelines, "pipeline_index", SimilarityIndex(dim=256))
+    with Session(engine) as db:
+        out = admin_pipelines.duplicate_clusters(FLOW, threshold=0.7, db=db)
+        assert out["pipelines"] == 3
+        assert out["clusters"] == [{"size": 2, "pipelines": [
+            {"id": "aaaaaaaa-0000-0000-0000-000000000000", "version": "1.0.0"},
+            {"id": "aaaaaaaa-0000-0000-0000-000000000001", "version": "1.0.1"}]}]
+        with pytest.raises(AppError) as e:
+            admin_pipelines.duplicate_clusters("ffffffff-0000-0000-0000-00000000dead", threshold=None, db=db)
+        assert e.value.status == 404
+
+
+def test_flow_index_keeps_row_and_lsh_in_step():
+    index = FlowIndex(256)
+    index.add("p1", "1.0.0", _doc(1))
+    index.add("p2", "1.0.1", _other(), minhash.to_bytes(minhash.signature(_other())))
+    assert [h.pipeline_id for h in index.near_duplicates(_near(_doc(1)), 0.6)] == ["p1"]
+    index.add("p1", "1.0.2", _other())
+    assert index.near_duplicates(_doc(1), 0.6) == []
+    assert index.duplicate_clusters(0.99) == [[("p1", "1.0.2"), ("p2", "1.0.1")]]
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from src.metrics import DB_POOL_HOLD_SECONDS, DB_POOL_TIMEOUTS
+from src.pool_stats import InstrumentedQueuePool, current_usage, instrument_pool, pool_status, pool_usage, reset_usage, set_usage
+
+
+def _sample_count(histogram, *labels):
+    return next(s.value for m in histogram.collect() for s in m.samples
+                if s.name.endswith("_count") and tuple(s.labels.values()) == labels)
+
+
+def test_checkouts_are_attributed_and_timeouts_counted(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool,
+                           pool_logging_name="test", pool_size=1, max_overflow=0, pool_timeout=0.05)
+    instrument_pool(engine, "test")
+    timeouts = DB_POOL_TIMEOUTS.labels("test", "uc.test")._value.get()
+
+    with pool_usage("uc.test"):
+        conn = engine.connect()
+        conn.execute(text("SELECT 1"))
+        status = pool_status({"test": engine.pool})
+        assert status["pools"]["test"]["checked_out"] == 1
+        [held] = [c for c in status["checked_out"] if c["pool"] == "test"]
+        assert held["usage"] == "uc.test"
+        assert "tests/test_pool_stats.py" in held["acquired_at"]
+
+        with pytest.raises(exc.TimeoutError):
+            engine.connect()
+        assert DB_POOL_TIMEOUTS.labels("test", "uc.test")._value.get() == timeouts + 1
+        conn.close()
+
+    assert _sample_count(DB_POOL_HOLD_SECONDS, "test", "uc.test") >= 1
+    assert not [c for c in pool_status({"test": engine.pool})["checked_out"] if c["pool"] == "test"]
+
+
+def test_route_label_is_resolved_at_checkout():
+    scope = {}
+    token = set_usage(lambda: f"GET {scope['route']}")
+    try:
+        scope["route"] = "/flows/{flow_id}"  # matched after the middleware set the label
+        assert current_usage() == "GET /flows/{flow_id}"
+    finally:
+        reset_usage(token)
+    assert current_usage() == "other"
+
+
+def test_async_engine_has_its_own_pool_budget():
+    from src import database
+    from src.config import settings
+
+    if database.async_engine is None:
+        pytest.skip("engines are not created under Alembic")
+    assert (database.engine.pool.size(), database.engine.pool._max_overflow) == (
+        settings.API_DB_POOL_SIZE, settings.API_DB_MAX_OVERFLOW)
+    assert (database.async_engine.pool.size(), database.async_engine.pool._max_overflow) == (
+        settings.API_DB_ASYNC_POOL_SIZE, settings.API_DB_ASYNC_MAX_OVERFLOW)
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from benchmarks import query_budgets as qb
+
+BUDGETS = qb.load_budgets()
+
+
+@pytest.fixture(scope="module")
+def fx():
+    # API_TEST_DSN=postgresql+psycopg://... runs every scenario (and checks row budgets) on Postgres
+    fx = qb.build_fixture(os.getenv("API_TEST_DSN"))
+    yield fx
+    qb.drop_fixture(fx)
+
+
+@pytest.mark.parametrize("name", sorted(qb.SCENARIOS))
+def test_scenario_stays_within_budget(fx, name):
+    scenario = qb.SCENARIOS[name]
+    if scenario.postgres_only and not fx.postgres:
+        pytest.skip("needs Postgres (set API_TEST_DSN)")
+    assert name in BUDGETS, f"add a budget for {name} to benchmarks/query_budgets.json"
+    log = qb.run_scenario(fx, scenario)
+    assert not qb.over_budget(log, BUDGETS[name]), log.report(len(log.records))
+
+
+def test_recorder_detaches_after_block(fx):
+    with qb.record_queries(fx.engine) as log:
+        qb.SCENARIOS["list_messages"].run(fx)
+    qb.SCENARIOS["list_messages"].run(fx)
+    assert log.count == 1 and log.records[0].statement.startswith("SELECT")
@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from src.infrastructure.rate_limit import MemoryRateLimiter, RateLimit, RateLimiter
+from src.middleware.error import AppError
+from src import rate_limits
+
+
+def test_gcra_allows_burst_then_steady_rate():
+    rl = MemoryRateLimiter()
+    rule = RateLimit(limit=3, period=60)
+    assert [rl.hit_sync("k", rule, now=0).allowed for _ in range(4)] == [True, True, True, False]
+    denied = rl.hit_sync("k", rule, now=1)
+    assert not denied.allowed and denied.retry_after == pytest.approx(19)
+    assert rl.hit_sync("k", rule, now=20).allowed
+    assert not rl.hit_sync("k", rule, now=20).allowed
+
+
+def test_idle_and_excess_keys_are_evicted():
+    rl = MemoryRateLimiter(max_keys=2)
+    rule = RateLimit(limit=10, period=10)
+    for i in range(5):
+        rl.hit_sync(f"k{i}", rule, now=0)
+    assert len(rl) == 2
+    # long after every TAT has passed, old keys are dropped as new ones arrive
+    rl.hit_sync("fresh", rule, now=100)
+    assert len(rl) == 1
+
+
+def test_parse_specs():
+    assert RateLimit.parse("30/60") == RateLimit(30, 60.0)
+    assert RateLimit.parse("5") == RateLimit(5, 60.0)
+    assert RateLimit.parse("") is None and RateLimit.parse("0/60") is None
+
+
+def test_enforce_raises_429_with_retry_after(monkeypatch):
+    monkeypatch.setattr(rate_limits, "limiter", RateLimiter(MemoryRateLimiter()))
+    monkeypatch.setattr(rate_limits.settings, "API_RATE_LIMIT_MESSAGES_THREAD", "2/60")
+    monkeypatch.setattr(rate_limits.settings, "API_RATE_LIMIT_CLIENT", "")
+
+    async def _run():
+        for _ in range(2):
+            await rate_limits.enforce("messages", thread_id="t1", client_id="c")
+        with pytest.raises(AppError) as e:
+            await rate_limits.enforce("messages", thread_id="t1", client_id="c")
+        assert e.value.status == 429 and e.value.headers["Retry-After"] == "30"
+        # other threads have their own budget
+        await rate_limits.enforce("messages", thread_id="t2", client_id="c")
+    asyncio.run(_run())
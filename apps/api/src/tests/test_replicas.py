@@ -0,0 +1,95 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.middleware.consistency import ConsistencyMiddleware
+from src.replicas import Replica, ReplicaRouter, format_lsn, min_lsn, parse_lsn
+
+
+class FakeReplica:
+    def __init__(self, name, *, healthy=True, lag=0.0, replay_lsn=None):
+        self.name, self.healthy, self.lag, self.replay_lsn = name, healthy, lag, replay_lsn
+
+
+def test_lsn_roundtrip_and_ordering():
+    assert parse_lsn("16/B374D848") == (0x16 << 32) | 0xB374D848
+    assert format_lsn(parse_lsn("16/B374D848")) == "16/B374D848"
+    assert parse_lsn("1/0") > parse_lsn("0/FFFFFFFF")
+
+
+def test_pick_skips_lagging_and_behind_token_replicas():
+    a = FakeReplica("a", lag=10.0, replay_lsn=100)
+    b = FakeReplica("b", lag=0.1, replay_lsn=50)
+    router = ReplicaRouter([a, b], max_lag=5.0, interval=1.0)
+    assert router.pick() == (b, "ok")
+    # read-your-writes: b has not replayed the write yet, so fall back to the primary
+    assert router.pick(lsn=80) == (None, "behind_token")
+    a.lag = 0.0
+    assert router.pick(lsn=80) == (a, "ok")
+    b.healthy = False
+    a.lag = 9.0
+    assert router.pick() == (None, "lagging")
+    assert ReplicaRouter([], max_lag=5.0, interval=1.0).pick() == (None, "no_replica")
+
+
+def test_pick_round_robins_between_eligible_replicas():
+    a, b = FakeReplica("a"), FakeReplica("b")
+    router = ReplicaRouter([a, b], max_lag=5.0, interval=1.0)
+    assert [router.pick()[0].name for _ in range(4)] == ["a", "b", "a", "b"]
+
+
+class FakeRouter:
+    enabled = True
+
+    async def current_lsn(self):
+        return parse_lsn("0/2A")
+
+
+def _client():
+    app = FastAPI()
+    app.add_middleware(ConsistencyMiddleware, router=FakeRouter())
+
+    @app.get("/read")
+    def read():
+        token = min_lsn.get()
+        return {"min_lsn": token}
+
+    @app.post("/write")
+    def write():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_writes_return_token_and_reads_carry_it():
+    client = _client()
+    r = client.post("/write")
+    assert r.headers["X-DB-Consistency"] == "0/2A"
+    r = client.get("/read", headers={"X-DB-Consistency": r.headers["X-DB-Consistency"]})
+    assert r.json() == {"min_lsn": 0x2A}
+    assert "X-DB-Consistency" not in r.headers
+    assert client.get("/read").json() == {"min_lsn": None}
+    assert client.get("/read", headers={"X-DB-Consistency": "garbage"}).json() == {"min_lsn": None}
+
+
+@pytest.mark.skipif(
+    not (os.getenv("API_TEST_PRIMARY_DSN") and os.getenv("API_TEST_REPLICA_DSN")),
+    reason="needs API_TEST_PRIMARY_DSN and API_TEST_REPLICA_DSN (two local Postgres instances)",
+)
+def test_two_instances():
+    from sqlalchemy import create_engine
+    from src.database import create_replica_engine
+
+    primary = create_engine(os.environ["API_TEST_PRIMARY_DSN"])
+    replica = Replica("replica0", create_replica_engine(os.environ["API_TEST_REPLICA_DSN"]))
+    router = ReplicaRouter([replica], max_lag=5.0, interval=1.0, primary=primary)
+    assert router.pick() == (None, "unhealthy")  # not sampled yet
+    router.sample_sync()
+    assert replica.healthy and replica.lag <= 5.0
+    assert router.pick() == (replica, "ok")
+    token = router.current_lsn_sync()
+    picked, reason = router.pick(lsn=token)
+    # a streaming standby that caught up serves the read; otherwise the primary does
+    assert picked is replica or reason == "behind_token"
@@ -0,0 +1,86 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+
+from src import retention
+from src.infrastructure.partitions import ensure_monthly_partitions, expire_partitions
+from src.models import AgentLog, GenerationRun, Message, ValidationIssue
+
+
+class FakeResult:
+    def __init__(self, rows): self.rows = rows
+    def all(self): return self.rows
+    def scalar(self): return self.rows[0] if self.rows else None
+
+
+class FakeDB:
+    def __init__(self, partitions=(), plain=()):
+        self.partitions = list(partitions)
+        self.plain = set(plain)
+        self.sql = []
+
+    def execute(self, stmt, params=None):
+        sql = str(stmt)
+        if "pg_inherits" in sql:
+            return FakeResult(self.partitions)
+        if "relkind" in sql:
+            return FakeResult([params["table"] not in self.plain])
+        self.sql.append(sql)
+        return FakeResult([])
+
+
+def test_history_tables_are_range_partitioned_on_created_at():
+    for model in (Message, AgentLog, GenerationRun, ValidationIssue):
+        ddl = str(CreateTable(model.__table__).compile(dialect=postgresql.dialect()))
+        assert "PARTITION BY RANGE (created_at)" in ddl
+        assert "PRIMARY KEY (id, created_at)" in ddl
+        # a foreign key onto a partitioned table's id alone is impossible
+        assert "REFERENCES message" not in ddl and "REFERENCES generation_run" not in ddl
+
+
+def test_archive_detaches_and_moves_expired_partitions():
+    db = FakeDB([
+        ("agent_log_202601", "FOR VALUES FROM ('2026-01-01 00:00:00') TO ('2026-02-01 00:00:00')"),
+        ("agent_log_202602", "FOR VALUES FROM ('2026-02-01 00:00:00') TO ('2026-03-01 00:00:00')"),
+        ("agent_log_default", "DEFAULT"),
+    ])
+    expired = expire_partitions(db, "agent_log", older_than=datetime(2026, 2, 15), action="archive", archive_schema="cold")
+    assert expired == ["agent_log_202601"]
+    assert db.sql == [
+        "ALTER TABLE agent_log DETACH PARTITION agent_log_202601",
+        "CREATE SCHEMA IF NOT EXISTS cold",
+        "ALTER TABLE agent_log_202601 SET SCHEMA cold",
+    ]
+
+
+def test_policies_with_zero_days_only_create_partitions(monkeypatch):
+    calls = []
+    monkeypatch.setattr(retention, "get_db", contextmanager(lambda: (yield FakeDB())))
+    monkeypatch.setattr(retention, "ensure_monthly_partitions", lambda db, table, **kw: calls.append(("ensure", table)))
+    monkeypatch.setattr(retention, "expire_partitions", lambda db, table, **kw: calls.append(("expire", table)) or [])
+    retention.apply_policies([
+        retention.RetentionPolicy(table="message", keep_days=0, action="archive"),
+        retention.RetentionPolicy(table="agent_log", keep_days=30),
+    ], now=datetime(2026, 3, 1))
+    assert calls == [("ensure", "message"), ("ensure", "agent_log"), ("expire", "agent_log")]
+    assert {p.table for p in retention.default_policies()} >= {"message", "agent_log", "generation_run", "validation_issue"}
+
+
+def test_startup_skips_tables_that_are_not_partitioned_yet(monkeypatch):
+    db = FakeDB(plain={"message"})
+    assert ensure_monthly_partitions(db, "message", now=datetime(2026, 1, 15)) == []
+    assert db.sql == []
+    assert ensure_monthly_partitions(db, "agent_log", now=datetime(2026, 1, 15)) == ["agent_log_202601", "agent_log_202602"]
+
+    def boom(db, table, **kw):
+        if table == "message":
+            raise RuntimeError("relation is not partitioned")
+        calls.append(table)
+    calls = []
+    monkeypatch.setattr(retention, "get_db", contextmanager(lambda: (yield FakeDB())))
+    monkeypatch.setattr(retention, "ensure_monthly_partitions", boom)
+    retention.ensure_partitions([retention.RetentionPolicy(table="message", keep_days=0),
+                                 retention.RetentionPolicy(table="agent_log", keep_days=0)])
+    assert calls == ["agent_log"]
@@ -0,0 +1,36 @@
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from src.models import GenerationRun
+from src.repositories.runs_repo import RunsRepo
+
+RUN = "dddddddd-0000-0000-0000-000000000001"
+FLOW = "eeeeeeee-0000-0000-0000-000000000001"
+
+
+def _repo():
+    engine = create_engine("sqlite://")
+    GenerationRun.__table__.create(engine)
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda conn, cursor, stmt, *a: statements.append(stmt))
+    return RunsRepo(Session(engine)), statements
+
+
+def test_each_transition_is_one_round_trip():
+    repo, statements = _repo()
+
+    run = repo.start(RUN, FLOW, None, "discovery", {"q": 1})
+    assert len(statements) == 1 and statements[0].startswith("INSERT") and "RETURNING" in statements[0]
+    assert run.status == "running" and run.started_at is not None and run.created_at is not None
+
+    statements.clear()
+    # stage change straight to a terminal status used to take a load plus two flushes
+    run = repo.tick(RUN, "validation", status="failed", result={"ok": False}, error="boom")
+    assert len(statements) == 1 and statements[0].startswith("UPDATE") and "RETURNING" in statements[0]
+    assert (run.stage, run.status, run.result, run.error) == ("validation", "failed", {"ok": False}, "boom")
+
+    statements.clear()
+    run = repo.finish(RUN, status="failed")
+    assert len(statements) == 1 and run.finished_at is not None
+
+    assert repo.tick("dddddddd-0000-0000-0000-00000000ffff", "x") is None
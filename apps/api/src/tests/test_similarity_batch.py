@@ -0,0 +1,145 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.deps import read_session
+from src.infrastructure.similarity_index import SimilarityIndex
+from src.middleware.error import AppError, handle_app_error
+from src.models import Flow, Pipeline
+from src.routers import similarity
+from src.services import similarity_service
+from src.services.similarity_service import SimilarityService
+from src.tests.test_fingerprint import _relabelled
+from src.tests.test_minhash import _doc, _near, _other
+
+FLOW_A = "ffffffff-0000-0000-0000-00000000000a"
+FLOW_B = "ffffffff-0000-0000-0000-00000000000b"
+
+
+@pytest.fixture()
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    for model in (Flow, Pipeline):
+        model.__table__.create(engine)
+    with Session(engine) as db:
+        db.add_all([Flow(id=FLOW_A, slug="a", name="A", meta={}), Flow(id=FLOW_B, slug="b", name="B", meta={})])
+        rows = [(FLOW_A, _doc(1)), (FLOW_A, _other()), (FLOW_B, _relabelled(_doc(1)))]
+        for i, (flow, content) in enumerate(rows):
+            db.add(Pipeline(id=f"cccccccc-0000-0000-0000-00000000000{i}", flow_id=flow, version=f"1.0.{i}",
+                            schema_version="1.0.0", content=content,
+                            content_hash=SimilarityService._canonical_hash(content)))
+        db.commit()
+    return engine
+
+
+def _service(engine, monkeypatch) -> SimilarityService:
+    monkeypatch.setattr("src.services.similarity_service.SessionLocal", lambda: Session(engine))
+    service = SimilarityService(threshold=0.0, backend="index", index=SimilarityIndex(dim=256))
+    service.near_dup_threshold = 0
+    return service
+
+
+def test_batch_matches_find_candidate_ranking(engine, monkeypatch):
+    service = _service(engine, monkeypatch)
+    items = [{"content": _doc(1)}, {"content": _near(_doc(1))}, "camera feed ros2 media push", {"content": {}}, ""]
+    with Session(engine) as db:
+        results, next_flow = service.find_batch(db, items, flow_id=FLOW_A, k=2)
+        results = list(results)
+    assert next_flow is None
+    assert [r["index"] for r in results] == [0, 1, 2, 3, 4]
+
+    exact = results[0]["matches"][0]
+    assert exact == {"flow_id": FLOW_A, "pipeline_id": "cccccccc-0000-0000-0000-000000000000",
+                     "version": "1.0.0", "score": 1.0, "exact": True}
+    assert len(results[0]["matches"]) == 2 and results[0]["matches"][1]["exact"] is False
+    # scored one at a time, each item ranks the same pipeline first with the same score
+    for item, result in zip(items[1:3], results[1:3]):
+        best = service.find_candidate(FLOW_A, item)
+        assert (best["pipeline_id"], best["score"]) == (result["matches"][0]["pipeline_id"],
+                                                         result["matches"][0]["score"])
+    assert results[4]["matches"] == []
+
+
+def test_batch_across_all_flows(engine, monkeypatch):
+    service = _service(engine, monkeypatch)
+    with Session(engine) as db:
+        results, next_flow = service.find_batch(db, [{"content": _doc(1)}], k=3, min_score=0.5)
+        (result,) = results
+    assert next_flow is None
+    matches = result["matches"]
+    assert matches[0]["exact"] and matches[0]["flow_id"] == FLOW_A
+    # the relabelled copy in the other flow shares its structure but little of its text
+    assert {(m["flow_id"], m["pipeline_id"]) for m in matches[1:]} == {(FLOW_B, "cccccccc-0000-0000-0000-000000000002")}
+    # one-off cross-flow scans do not take over the shared per-flow LRU
+    assert len(service.index._flows) == 0
+
+
+def test_cross_flow_batch_pages_through_flows(engine, monkeypatch):
+    service = _service(engine, monkeypatch)
+    monkeypatch.setattr(similarity_service.settings, "API_SIMILARITY_BATCH_MAX_FLOWS", 1)
+    with Session(engine) as db:
+        service.index.flow(db, FLOW_B)  # a hot flow is reused, not rebuilt or dropped
+        seen, after = [], None
+        while True:
+            results, after = service.find_batch(db, [{"content": _doc(1)}], k=3, after_flow=after)
+            seen.append({m["flow_id"] for r in results for m in r["matches"]})
+            if after is None:
+                break
+    assert seen == [{FLOW_A}, {FLOW_B}]
+    assert list(service.index._flows) == [FLOW_B]
+
+
+@pytest.fixture()
+def client(engine, monkeypatch):
+    service = _service(engine, monkeypatch)
+    app = FastAPI()
+    app.include_router(similarity.router)
+    app.add_exception_handler(AppError, handle_app_error)
+
+    def session():
+        with Session(engine) as db:
+            yield db
+
+    app.dependency_overrides[read_session] = session
+    app.dependency_overrides[similarity.get_similarity_service] = lambda: service
+    return TestClient(app)
+
+
+def test_batch_endpoint_json_and_ndjson(client, monkeypatch):
+    body = {"items": [{"content": _doc(1)}, "camera feed"], "flow_id": FLOW_A, "k": 1}
+    r = client.post("/similarity/batch", json=body)
+    assert r.status_code == 200
+    assert [len(x["matches"]) for x in r.json()["results"]] == [1, 1]
+
+    r = client.post("/similarity/batch", json=body, headers={"Accept": "application/x-ndjson"})
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines == client.post("/similarity/batch", json=body).json()["results"]
+
+    monkeypatch.setattr(similarity.settings, "API_SIMILARITY_BATCH_STREAM_MIN", 1)
+    assert client.post("/similarity/batch", json=body).headers["content-type"].startswith("application/x-ndjson")
+
+
+def test_batch_endpoint_pages_flows_with_cursor(client, monkeypatch):
+    monkeypatch.setattr(similarity.settings, "API_SIMILARITY_BATCH_MAX_FLOWS", 1)
+    body = {"items": [{"content": _doc(1)}], "k": 3}
+    first = client.post("/similarity/batch", json=body)
+    assert first.headers["X-Next-Cursor"] == FLOW_A
+    last = client.post("/similarity/batch", json={**body, "after_flow": first.headers["X-Next-Cursor"]},
+                       headers={"Accept": "application/x-ndjson"})
+    assert "X-Next-Cursor" not in last.headers
+    assert {m["flow_id"] for m in json.loads(last.text)["matches"]} == {FLOW_B}
+
+
+def test_batch_endpoint_errors(client, monkeypatch):
+    r = client.post("/similarity/batch", json={"items": ["x"], "flow_id": "ffffffff-0000-0000-0000-00000000dead"})
+    assert r.status_code == 404 and r.json()["error"]["code"] == "FLOW_NOT_FOUND"
+    monkeypatch.setattr(similarity.settings, "API_SIMILARITY_BATCH_MAX_ITEMS", 2)
+    r = client.post("/similarity/batch", json={"items": ["x", "y", "z"]})
+    assert r.status_code == 413 and r.json()["error"]["code"] == "BATCH_TOO_LARGE"
+    assert client.post("/similarity/batch", json={"items": []}).status_code == 422
@@ -0,0 +1,128 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src.infrastructure import similarity_index
+from src.infrastructure.similarity_index import FlowIndex, SimilarityIndex, add_after_commit, pipeline_text
+from src.models import Flow, Pipeline
+from src.repositories.flow_repo import FlowRepo
+from src.services.flow_service import FlowService
+from src.services.similarity_service import SimilarityService
+
+FLOW = "ffffffff-0000-0000-0000-000000000001"
+
+
+def _doc(source: str, action: str, topic: str) -> dict:
+    return {"sources": [{"id": "in", "type": source, "topic": topic}],
+            "actions": [{"id": "out", "type": action, "table": f"{topic}_events"}]}
+
+
+def test_pipeline_text_flattens_keys_and_values():
+    assert pipeline_text({"a": [{"type": "kafka.subscribe"}, 3], "b": True, "c": None}) == "a type kafka.subscribe 3 b c"
+
+
+def test_search_ranks_by_tfidf_cosine():
+    index = FlowIndex(256)
+    index.add("p1", "1.0.0", _doc("kafka.subscribe", "db.upsert", "orders"))
+    index.add("p2", "1.0.1", _doc("http.webhook", "kafka.publish", "payments"))
+    index.add("p3", "1.0.2", _doc("mqtt.subscribe", "http.request", "sensors"))
+
+    hits = index.search(pipeline_text(_doc("kafka.subscribe", "db.upsert", "orders")), k=2)
+    assert hits[0].pipeline_id == "p1"
+    assert hits[0].score == pytest.approx(1.0, abs=1e-5) and hits[1].score < 0.5
+    assert index.search("", k=3) == []
+
+    # re-adding an id replaces its row instead of appending
+    index.add("p1", "1.0.3", _doc("mqtt.subscribe", "http.request", "sensors"))
+    assert len(index) == 3
+    assert {h.pipeline_id for h in index.search("mqtt subscribe sensors", k=2)} == {"p1", "p3"}
+    assert index.versions[index.ids.index("p1")] == "1.0.3"
+
+
+@pytest.fixture()
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    for model in (Flow, Pipeline):
+        model.__table__.create(engine)
+    with Session(engine) as db:
+        db.add(Flow(id=FLOW, slug="f", name="F", meta={}))
+        db.add(Pipeline(id="aaaaaaaa-0000-0000-0000-000000000001", flow_id=FLOW, version="1.0.0",
+                        schema_version="1.0.0", content=_doc("kafka.subscribe", "db.upsert", "orders"),
+                        created_at=datetime(2026, 1, 1)))
+        db.commit()
+    return engine
+
+
+def test_index_loads_lazily_and_follows_commits(engine, monkeypatch):
+    index = SimilarityIndex(dim=256, max_flows=2, refresh_sec=3600)
+    monkeypatch.setattr(similarity_index, "pipeline_index", index)
+    with Session(engine) as db:
+        assert [h.version for h in index.search(db, FLOW, "kafka orders")] == ["1.0.0"]
+
+        doc = _doc("http.webhook", "kafka.publish", "payments")
+        db.add(Pipeline(id="aaaaaaaa-0000-0000-0000-000000000002", flow_id=FLOW, version="1.0.1",
+                        schema_version="1.0.0", content=doc))
+        add_after_commit(db, FLOW, "aaaaaaaa-0000-0000-0000-000000000002", "1.0.1", doc)
+        db.rollback()
+        assert len(index.flow(db, FLOW)) == 1  # rolled back: never indexed
+
+        db.add(Pipeline(id="aaaaaaaa-0000-0000-0000-000000000002", flow_id=FLOW, version="1.0.1",
+                        schema_version="1.0.0", content=doc))
+        add_after_commit(db, FLOW, "aaaaaaaa-0000-0000-0000-000000000002", "1.0.1", doc)
+        db.commit()
+        assert index.search(db, FLOW, "webhook payments", k=1)[0].version == "1.0.1"
+
+    # a version committed elsewhere shows up after the refresh interval
+    with Session(engine) as db:
+        db.add(Pipeline(id="aaaaaaaa-0000-0000-0000-000000000003", flow_id=FLOW, version="1.0.2",
+                        schema_version="1.0.0", content=_doc("mqtt.subscribe", "http.request", "sensors")))
+        db.commit()
+        assert len(index.flow(db, FLOW)) == 2
+        index.refresh_sec = 0
+        assert index.search(db, FLOW, "mqtt sensors", k=1)[0].version == "1.0.2"
+        assert len(index.flow(db, FLOW)) == 3
+
+
+def test_service_uses_index_backend(engine, monkeypatch):
+    monkeypatch.setattr("src.services.similarity_service.SessionLocal", lambda: Session(engine))
+    service = SimilarityService(threshold=0.5, backend="index", index=SimilarityIndex(dim=256))
+    hit = service.find_candidate(FLOW, {"text": pipeline_text(_doc("kafka.subscribe", "db.upsert", "orders"))})
+    assert hit["pipeline_id"] == "aaaaaaaa-0000-0000-0000-000000000001" and hit["version"] == "1.0.0"
+    assert SimilarityService(threshold=0.99, backend="index", index=SimilarityIndex(dim=256)).find_candidate(
+        FLOW, {"text": "something unrelated"}) is None
+
+
+def test_refresh_reconciles_ids_not_timestamps(engine):
+    index = SimilarityIndex(dim=256, refresh_sec=0)
+    with Session(engine) as db:
+        assert len(index.flow(db, FLOW)) == 1
+        # committed after the load but stamped earlier (created_at follows transaction start)
+        db.add(Pipeline(id="aaaaaaaa-0000-0000-0000-000000000004", flow_id=FLOW, version="0.9.0",
+                        schema_version="1.0.0", content=_doc("mqtt.subscribe", "http.request", "sensors"),
+                        created_at=datetime(2025, 1, 1)))
+        db.commit()
+        assert index.search(db, FLOW, "mqtt sensors", k=1)[0].version == "0.9.0"
+
+        db.execute(delete(Pipeline).where(Pipeline.id == "aaaaaaaa-0000-0000-0000-000000000001"))
+        db.commit()
+        flow = index.flow(db, FLOW)
+        assert flow.ids == ["aaaaaaaa-0000-0000-0000-000000000004"]
+        assert [h.version for h in flow.search("kafka orders mqtt sensors", k=5)] == ["0.9.0"]
+
+
+def test_flow_delete_discards_its_index_on_commit(engine, monkeypatch):
+    # the ORM cascade needs the whole schema; only the commit hook is under test here
+    monkeypatch.setattr(FlowRepo, "delete", lambda self, flow_id: True)
+    index = SimilarityIndex(dim=256, refresh_sec=3600)
+    monkeypatch.setattr(similarity_index, "pipeline_index", index)
+    with Session(engine) as db:
+        index.flow(db, FLOW)
+        FlowService(db).delete(FLOW)
+        db.rollback()
+        assert FLOW in index._flows  # rolled back: still cached
+        FlowService(db).delete(FLOW)
+        db.commit()
+        assert FLOW not in index._flows
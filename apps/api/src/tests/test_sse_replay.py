@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session
+
+from src import sse
+from src.models import SSE_WORKER_SEQ, SSEEvent
+from src.repositories.event_log_repo import EventLogRepo
+from src.sse import ChannelBus
+from src.infrastructure.event_log import EventLogWriter
+from src.infrastructure.partitions import _month_start, partition_name
+
+
+class FakeLog:
+    def __init__(self): self.items = []
+    def submit(self, item): self.items.append(item)
+    async def read_after(self, channel, after_seq, limit):
+        return [i for i in self.items if i["channel"] == channel and i["seq"] > after_seq][:limit]
+    async def contains(self, channel, seq):
+        return any(i["channel"] == channel and i["seq"] <= seq for i in self.items)
+
+
+async def _run_replay():
+    bus = ChannelBus(maxlen=3, ttl=300)
+    log = FakeLog()
+    bus.attach_log(log)
+    seqs = [await bus.publish("t1", "run.stage", {"n": n}) for n in range(6)]
+    assert seqs == sorted(seqs) and len(set(seqs)) == 6
+    assert len(log.items) == 6
+
+    # recent point is served from the ring buffer
+    assert await bus.can_replay("t1", seqs[3])
+    assert [i["data"]["n"] for i in await bus.replay("t1", seqs[3])] == [4, 5]
+    # older point has left the buffer and falls back to the log
+    assert await bus.can_replay("t1", seqs[0])
+    assert [i["data"]["n"] for i in await bus.replay("t1", seqs[0])] == [1, 2, 3, 4, 5]
+    # nothing to replay when the client is up to date
+    assert await bus.replay("t1", seqs[-1]) == []
+    # unknown point before the log starts cannot be replayed
+    assert not await bus.can_replay("t1", seqs[0] - 1)
+
+
+def test_replay_falls_back_to_log():
+    asyncio.run(_run_replay())
+
+
+def test_replay_without_log_is_bounded_by_buffer():
+    async def _run():
+        bus = ChannelBus(maxlen=2, ttl=300)
+        seqs = [await bus.publish("t1", "e", {"n": n}) for n in range(4)]
+        assert not await bus.can_replay("t1", seqs[0])
+        assert await bus.can_replay("t1", seqs[2])
+    asyncio.run(_run())
+
+
+def test_writer_submit_never_blocks():
+    async def _run():
+        w = EventLogWriter(queue_max=2)
+        for n in range(5):
+            w.submit({"channel": "t1", "seq": n, "event": "e", "data": {}, "ts": 0.0})
+        assert w._queue.qsize() == 2
+    asyncio.run(_run())
+
+
+def test_monthly_partition_bounds():
+    assert _month_start(datetime(2025, 12, 17), 1) == datetime(2026, 1, 1)
+    assert partition_name("sse_event", datetime(2026, 1, 1)) == "sse_event_202601"
+
+
+def test_workers_never_share_a_seq(monkeypatch):
+    monkeypatch.setattr(sse.time, "time", lambda: 1_790_000_000.0)
+    buses = [ChannelBus(maxlen=10, ttl=300) for _ in range(2)]
+    buses[0].set_worker(1)
+    buses[1].set_worker(1 + (1 << sse.WORKER_BITS) + 1)  # slots wrap around
+    seqs = [[b.publish_nowait("t1", "e", {"n": n}) for n in range(3)] for b in buses]
+    assert all(s == sorted(s) for s in seqs)
+    assert not set(seqs[0]) & set(seqs[1])
+    assert {s & ((1 << sse.WORKER_BITS) - 1) for s in seqs[1]} == {2}
+    # still above the microsecond seqs issued before worker slots, and exact as a JSON number
+    assert 1_790_000_000 * 1_000_000 < seqs[0][0] < 2 ** 53
+
+
+def test_event_log_repo_reports_skipped_conflicts(caplog):
+    dsn = os.getenv("API_TEST_DSN")
+    if not dsn or not dsn.startswith("postgresql"):
+        pytest.skip("needs Postgres (set API_TEST_DSN)")
+    schema = "test_sse_event_log"
+    engine = create_engine(dsn)
+
+    @event.listens_for(engine, "connect")
+    def _search_path(dbapi_conn, _):
+        with dbapi_conn.cursor() as cur:
+            cur.execute(f"SET search_path TO {schema}, public")
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {schema}"))
+    SSEEvent.__table__.create(engine)
+    SSE_WORKER_SEQ.create(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE sse_event_default PARTITION OF sse_event DEFAULT"))
+    try:
+        with Session(engine) as db:
+            repo = EventLogRepo(db)
+            assert repo.next_worker() < repo.next_worker()
+            item = {"channel": "t1", "seq": 1, "event": "e", "data": {}, "ts": 1_790_000_000.0}
+            assert repo.insert_many([item]) == 1
+            with caplog.at_level(logging.WARNING):
+                assert repo.insert_many([item, {**item, "seq": 2}]) == 1
+            assert "skipped 1 of 2" in caplog.text
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {schema} CASCADE"))
+        engine.dispose()
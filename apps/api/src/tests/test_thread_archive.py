@@ -0,0 +1,161 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from src import archive
+from src.config import settings
+from src.ids import new_id
+from src.models import AgentLog, Flow, Message, Thread, ThreadArchive
+from src.pagination import decode_cursor
+from src.repositories.message_repo import MessageRepo
+from src.routers import agent_logs
+
+FLOW = "ffffffff-0000-0000-0000-000000000001"
+
+
+@pytest.fixture()
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    for model in (Flow, Thread, Message, AgentLog, ThreadArchive):
+        model.__table__.create(engine)
+    with Session(engine) as db:
+        db.add(Flow(id=FLOW, slug="f", name="F", meta={}))
+        db.commit()
+    archive.cache.clear()
+    yield engine
+    archive.cache.clear()
+
+
+def _thread(db: Session, *, messages: int = 7, logs: int = 3, closed_at=None) -> str:
+    thread_id = new_id()
+    db.add(Thread(id=thread_id, flow_id=FLOW, status="CLOSED", closed_at=closed_at))
+    db.flush()
+    db.add_all(Message(id=new_id(), thread_id=thread_id, role="user", content={"text": f"m{i}"}) for i in range(messages))
+    db.add_all(AgentLog(id=new_id(), thread_id=thread_id, flow_id=FLOW, level="info", event=f"step{i}",
+                        data={"message": f"log {i}"}) for i in range(logs))
+    db.flush()
+    return thread_id
+
+
+def _all_pages(repo: MessageRepo, thread_id: str, limit: int):
+    texts, before = [], None
+    while True:
+        rows, cursor = repo.list_page(thread_id, limit, before,
+                                      archived=archive.may_be_archived(repo.db.get(Thread, thread_id)))
+        texts += [m.content["text"] for m in rows]
+        if cursor is None:
+            return texts
+        before = decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("storage", ["db", "file"])
+def test_archive_moves_rows_and_reads_back(engine, storage, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "API_ARCHIVE_DIR", str(tmp_path))
+    with Session(engine) as db:
+        thread_id = _thread(db)
+        before = _all_pages(MessageRepo(db), thread_id, 3)
+        row = archive.archive_thread(db, thread_id, storage=storage)
+        db.commit()
+
+        assert (row.message_count, row.agent_log_count) == (7, 3)
+        assert row.stored_bytes < row.raw_bytes
+        assert (row.blob is None) == (storage == "file")
+        if storage == "file":
+            assert (tmp_path / row.path).is_file()
+        assert db.scalar(select(func.count()).select_from(Message)) == 0
+        assert db.scalar(select(func.count()).select_from(AgentLog)) == 0
+        assert archive.archive_thread(db, thread_id) is None  # already archived
+
+        archive.cache.clear()
+        assert _all_pages(MessageRepo(db), thread_id, 3) == before
+        logs = agent_logs.by_thread(thread_id, response=_Response(), limit=None, after=None, db=db)
+        assert [l["step"] for l in logs] == ["step0", "step1", "step2"]
+        assert logs[0]["message"] == "log 0"
+
+
+def test_file_of_a_rolled_back_archive_is_removed(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "API_ARCHIVE_DIR", str(tmp_path))
+    with Session(engine) as db:
+        thread_id = _thread(db)
+        db.commit()
+        row = archive.archive_thread(db, thread_id, storage="file")
+        path = tmp_path / row.path
+        assert path.is_file()
+        db.rollback()
+        assert not path.exists()
+        assert db.scalar(select(func.count()).select_from(Message)) == 7
+
+        row = archive.archive_thread(db, thread_id, storage="file")
+        db.commit()
+        db.rollback()  # a later rollback does not touch committed archives
+        assert (tmp_path / row.path).is_file()
+
+
+class _Response:
+    def __init__(self):
+        self.headers = {}
+
+
+def test_new_rows_after_archiving_are_merged(engine):
+    with Session(engine) as db:
+        thread_id = _thread(db, messages=4, logs=2)
+        archive.archive_thread(db, thread_id)
+        db.add(Message(id=new_id(), thread_id=thread_id, role="user", content={"text": "late"}))
+        db.add(AgentLog(id=new_id(), thread_id=thread_id, level="info", event="late"))
+        db.commit()
+
+        assert _all_pages(MessageRepo(db), thread_id, 2) == ["late", "m3", "m2", "m1", "m0"]
+        response = _Response()
+        first = agent_logs.by_thread(thread_id, response=response, limit=2, after=None, db=db)
+        rest = agent_logs.by_thread(thread_id, response=_Response(), limit=2,
+                                    after=response.headers["X-Next-Cursor"], db=db)
+        assert [l["step"] for l in first + rest] == ["step0", "step1", "late"]
+
+
+def test_archived_logs_come_first_even_behind_a_full_hot_page(engine):
+    with Session(engine) as db:
+        thread_id = _thread(db, messages=1, logs=2)
+        archive.archive_thread(db, thread_id)
+        db.add_all(AgentLog(id=new_id(), thread_id=thread_id, level="info", event=f"late{i}") for i in range(3))
+        db.commit()
+
+        steps, after = [], None
+        while True:
+            response = _Response()
+            page = agent_logs.by_thread(thread_id, response=response, limit=2, after=after, db=db)
+            steps += [log["step"] for log in page]
+            after = response.headers.get("X-Next-Cursor")
+            if after is None:
+                break
+        assert steps == ["step0", "step1", "late0", "late1", "late2"]
+
+
+def test_job_archives_old_closed_threads_only(engine, monkeypatch):
+    @contextmanager
+    def get_db():
+        with Session(engine) as db:
+            yield db
+            db.commit()
+
+    monkeypatch.setattr(archive, "get_db", get_db)
+    monkeypatch.setattr(settings, "API_ARCHIVE_AFTER_DAYS", 30)
+    monkeypatch.setattr(settings, "API_ARCHIVE_STORAGE", "db")
+    now = datetime(2026, 6, 1)
+    with Session(engine) as db:
+        old = _thread(db, closed_at=now - timedelta(days=31))
+        recent = _thread(db, closed_at=now - timedelta(days=2))
+        open_ = _thread(db)
+        db.commit()
+
+    assert archive.archive_closed_threads(now=now) == 1
+    assert archive.archive_closed_threads(now=now) == 0
+    with Session(engine) as db:
+        assert set(db.scalars(select(ThreadArchive.thread_id))) == {old}
+        assert {t for t in db.scalars(select(Message.thread_id).distinct())} == {recent, open_}
+
+    monkeypatch.setattr(settings, "API_ARCHIVE_AFTER_DAYS", 0)
+    assert archive.archive_closed_threads(now=now + timedelta(days=365)) == 0
@@ -0,0 +1,42 @@
+import asyncio
+import ormsgpack
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src.ws import router
+from src.sse import bus
+
+app = FastAPI()
+app.include_router(router)
+client = TestClient(app)
+
+
+def _publish(thread_id, event, data):
+    return asyncio.run(bus.publish(thread_id, event, data))
+
+
+def test_ws_json_multiplexes_threads_and_ui_events():
+    with client.websocket_connect("/ws?thread_id=ws-a") as ws:
+        assert ws.receive_json() == {"type": "subscribed", "thread_id": "ws-a", "replay": True}
+        ws.send_json({"op": "subscribe", "thread_id": "ws-b"})
+        assert ws.receive_json()["thread_id"] == "ws-b"
+
+        ws.send_json({"op": "event", "ref": 1, "thread_id": "ws-b", "event": {"kind": "action.click", "actionId": "go"}})
+        frames = [ws.receive_json(), ws.receive_json()]
+        by_type = {f["type"]: f for f in frames}
+        assert by_type["ack"]["ref"] == 1
+        assert by_type["event"]["event"] == "ui.ack"
+        assert by_type["event"]["data"]["msg"] == 'Action "go" accepted'
+        assert by_type["event"]["id"] == by_type["ack"]["id"]
+
+        ws.send_json({"op": "nope"})
+        assert ws.receive_json()["code"] == "UNKNOWN_OP"
+
+
+def test_ws_msgpack_replays_from_last_event_id():
+    first = _publish("ws-c", "run.stage", {"n": 1})
+    _publish("ws-c", "run.stage", {"n": 2})
+    with client.websocket_connect("/ws", subprotocols=["dslhub.msgpack"]) as ws:
+        ws.send_bytes(ormsgpack.packb({"op": "subscribe", "thread_id": "ws-c", "last_event_id": first}))
+        assert ormsgpack.unpackb(ws.receive_bytes())["replay"] is True
+        frame = ormsgpack.unpackb(ws.receive_bytes())
+        assert frame["event"] == "run.stage" and frame["data"] == {"n": 2}
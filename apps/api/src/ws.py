@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio, json, logging
+from typing import Any, Dict, Optional
+
+import ormsgpack
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from .dto import UIEventIn
+from .metrics import WS_CONNECTIONS, WS_FRAMES
+from .middleware.auth import auth_token
+from .services.ui_event_service import publish_ui_event
+from .sse import bus
+
+logger = logging.getLogger(__name__)
+
+SUBPROTOCOLS = {"dslhub.msgpack": "msgpack", "dslhub.json": "json"}
+
+
+def _inc(metric, **labels) -> None:
+    try:
+        metric.labels(**labels).inc()
+    except (ValueError, TypeError, RuntimeError):
+        pass
+
+
+class Codec:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+
+    @classmethod
+    def negotiate(cls, ws: WebSocket) -> tuple["Codec", Optional[str]]:
+        """Pick the encoding from `?encoding=` or the first known subprotocol; JSON by default."""
+        offered = [p.strip() for p in ws.headers.get("sec-websocket-protocol", "").split(",") if p.strip()]
+        for proto in offered:
+            if proto in SUBPROTOCOLS:
+                return cls(SUBPROTOCOLS[proto]), proto
+        enc = (ws.query_params.get("encoding") or "json").lower()
+        return cls("msgpack" if enc == "msgpack" else "json"), None
+
+    async def send(self, ws: WebSocket, frame: Dict[str, Any]) -> None:
+        if self.encoding == "msgpack":
+            await ws.send_bytes(ormsgpack.packb(frame, option=ormsgpack.OPT_NON_STR_KEYS, default=str))
+        else:
+            await ws.send_text(json.dumps(frame, default=str))
+        _inc(WS_FRAMES, direction="out", encoding=self.encoding)
+
+    def decode(self, message: Dict[str, Any]) -> Any:
+        if message.get("bytes") is not None:
+            return ormsgpack.unpackb(message["bytes"])
+        return json.loads(message.get("text") or "null")
+
+
+class Connection:
+    """One client socket multiplexing any number of thread subscriptions."""
+
+    def __init__(self, ws: WebSocket, codec: Codec, *, authorized: bool):
+        self.ws = ws
+        self.codec = codec
+        self.authorized = authorized
+        self.out: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(maxsize=1000)
+        self.subs: Dict[str, tuple[asyncio.Queue, asyncio.Task]] = {}
+        self.closing = False
+
+    def _emit(self, frame: Dict[str, Any]) -> None:
+        try:
+            self.out.put_nowait(frame)
+        except asyncio.QueueFull:
+            # slow consumer: close instead of buffering without bound
+            if not self.closing:
+                self.closing = True
+                asyncio.create_task(self.ws.close(code=1013))
+
+    async def writer(self) -> None:
+        while True:
+            await self.codec.send(self.ws, await self.out.get())
+
+    async def _pump(self, thread_id: str, q: asyncio.Queue, after_seq: int) -> None:
+        last_sent = after_seq
+        for item in await bus.replay(thread_id, after_seq) if after_seq else []:
+            if item["seq"] > last_sent:
+                last_sent = item["seq"]
+                self._emit(_event_frame(item))
+        while True:
+            item = await q.get()
+            if item["seq"] > last_sent:
+                last_sent = item["seq"]
+                self._emit(_event_frame(item))
+
+    async def subscribe(self, thread_id: str, last_event_id: Any = None) -> None:
+        if thread_id in self.subs:
+            return
+        after_seq = 0
+        if last_event_id is not None:
+            try:
+                after_seq = int(last_event_id)
+            except (TypeError, ValueError):
+                after_seq = 0
+        replayable = True
+        if after_seq:
+            replayable = await bus.can_replay(thread_id, after_seq)
+            if not replayable:
+                after_seq = 0
+        q = bus.subscribe_channel(thread_id)
+        task = asyncio.create_task(self._pump(thread_id, q, after_seq))
+        self.subs[thread_id] = (q, task)
+        # replay=false mirrors the SSE 204: the client should refetch state instead
+        self._emit({"type": "subscribed", "thread_id": thread_id, "replay": replayable})
+
+    def unsubscribe(self, thread_id: str) -> None:
+        sub = self.subs.pop(thread_id, None)
+        if sub is None:
+            return
+        q, task = sub
+        task.cancel()
+        bus.unsubscribe(q, thread_id)
+
+    def close(self) -> None:
+        for thread_id in list(self.subs):
+            self.unsubscribe(thread_id)
+
+    async def handle(self, msg: Any) -> None:
+        if not isinstance(msg, dict):
+            self._emit(_error("BAD_FRAME", "Frame must be an object"))
+            return
+        op = msg.get("op")
+        ref = msg.get("ref")
+        thread_id = msg.get("thread_id")
+        if op == "ping":
+            self._emit({"type": "pong", "ref": ref})
+        elif op in ("subscribe", "unsubscribe", "event") and not isinstance(thread_id, str):
+            self._emit(_error("BAD_FRAME", "thread_id is required", ref))
+        elif op == "subscribe":
+            await self.subscribe(thread_id, msg.get("last_event_id"))
+        elif op == "unsubscribe":
+            self.unsubscribe(thread_id)
+            self._emit({"type": "unsubscribed", "thread_id": thread_id, "ref": ref})
+        elif op == "event":
+            if not self.authorized:
+                self._emit(_error("UNAUTHORIZED", "Missing or invalid Authorization token", ref))
+                return
+            try:
+                payload = UIEventIn(**(msg.get("event") or {}))
+            except (ValidationError, TypeError) as e:
+                self._emit(_error("VALIDATION_ERROR", str(e), ref))
+                return
+            seq = await publish_ui_event(thread_id, payload)
+            self._emit({"type": "ack", "ref": ref, "thread_id": thread_id, "id": seq})
+        else:
+            self._emit(_error("UNKNOWN_OP", f"Unknown op {op!r}", ref))
+
+
+def _event_frame(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {"type": "event", "thread_id": item["channel"], "id": item["seq"], "event": item["event"], "data": item["data"]}
+
+
+def _error(code: str, message: str, ref: Any = None) -> Dict[str, Any]:
+    return {"type": "error", "code": code, "message": message, "ref": ref}
+
+
+def _authorized(ws: WebSocket) -> bool:
+    # same rule as AuthMiddleware for mutating HTTP calls; browsers cannot set headers on
+    # WebSocket handshakes, so the token may also come as ?token=
+    token = auth_token()
+    if not token:
+        return True
+    return ws.headers.get("authorization") == f"Bearer {token}" or ws.query_params.get("token") == token
+
+
+router = APIRouter(tags=["ws"])
+@router.websocket("/ws")
+async def ws_endpoint(ws: WebSocket):
+    codec, subprotocol = Codec.negotiate(ws)
+    await ws.accept(subprotocol=subprotocol)
+    conn = Connection(ws, codec, authorized=_authorized(ws))
+    _inc(WS_CONNECTIONS, action="open", encoding=codec.encoding)
+    writer = asyncio.create_task(conn.writer())
+    try:
+        for thread_id in ws.query_params.getlist("thread_id"):
+            await conn.subscribe(thread_id)
+        while True:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            _inc(WS_FRAMES, direction="in", encoding=codec.encoding)
+            try:
+                frame = codec.decode(message)
+            except ValueError:
+                conn._emit(_error("BAD_FRAME", "Could not decode frame"))
+                continue
+            await conn.handle(frame)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        conn.close()
+        writer.cancel()
+        _inc(WS_CONNECTIONS, action="close", encoding=codec.encoding)
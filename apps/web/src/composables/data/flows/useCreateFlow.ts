@@ -19,7 +19,8 @@ export function useCreateFlow() {
       const listKey = qk.flows.list();
       const prev = qc.getQueryData<Flow[] | undefined>(listKey) ?? [];
       const exists = prev.some(f => f.id === created.id);
-      const next = exists ? prev.map(f => (f.id === created.id ? created : f)) : [...prev, created];
+      // the list is ordered by last activity, so a new flow goes first
+      const next = exists ? prev.map(f => (f.id === created.id ? created : f)) : [created, ...prev];
       qc.setQueryData(listKey, next);
     },
   });
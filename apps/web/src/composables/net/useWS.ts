@@ -0,0 +1,124 @@
+import {ref, shallowRef, onBeforeUnmount} from 'vue'
+
+export type WSEventFrame = {
+  type: 'event'
+  thread_id: string
+  id: number
+  event: string
+  data: unknown
+}
+
+type WSFrame =
+  | WSEventFrame
+  | {type: 'subscribed'; thread_id: string; replay: boolean}
+  | {type: 'unsubscribed'; thread_id: string; ref?: unknown}
+  | {type: 'ack'; ref?: unknown; thread_id: string; id: number}
+  | {type: 'error'; code: string; message: string; ref?: unknown}
+  | {type: 'pong'; ref?: unknown}
+
+type UseWSOptions = {
+  token?: string
+  retryBaseMs?: number
+  retryMaxMs?: number
+  onEvent?: (frame: WSEventFrame) => void
+  // called when the server cannot replay from the last seen id (same meaning as SSE 204)
+  onReplayExpired?: (threadId: string) => void
+}
+
+/**
+ * Single WebSocket multiplexing several thread subscriptions (JSON frames).
+ * Last seen event ids are tracked per thread and resent on reconnect.
+ */
+export function useWS(url: string, opts: UseWSOptions = {}) {
+  const isOpen = ref(false)
+  const lastEvent = shallowRef<WSEventFrame | null>(null)
+  const error = shallowRef<Error | null>(null)
+
+  const threads = new Set<string>()
+  const lastIds = new Map<string, number>()
+  let socket: WebSocket | null = null
+  let stopped = true
+  let retryDelay = opts.retryBaseMs ?? 500
+  let refSeq = 0
+
+  function send(frame: Record<string, unknown>) {
+    if (socket && socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify(frame))
+  }
+
+  function sendSubscribe(threadId: string) {
+    send({op: 'subscribe', thread_id: threadId, last_event_id: lastIds.get(threadId) ?? null})
+  }
+
+  function onFrame(frame: WSFrame) {
+    if (frame.type === 'event') {
+      lastIds.set(frame.thread_id, frame.id)
+      lastEvent.value = frame
+      opts.onEvent?.(frame)
+    } else if (frame.type === 'subscribed' && !frame.replay) {
+      lastIds.delete(frame.thread_id)
+      opts.onReplayExpired?.(frame.thread_id)
+    } else if (frame.type === 'error') {
+      error.value = new Error(`${frame.code}: ${frame.message}`)
+    }
+  }
+
+  function connect() {
+    const u = new URL(url, window.location.href)
+    u.protocol = u.protocol === 'https:' ? 'wss:' : 'ws:'
+    if (opts.token) u.searchParams.set('token', opts.token)
+    socket = new WebSocket(u.toString(), ['dslhub.json'])
+    socket.onopen = () => {
+      isOpen.value = true
+      error.value = null
+      retryDelay = opts.retryBaseMs ?? 500
+      threads.forEach(sendSubscribe)
+    }
+    socket.onmessage = (ev) => {
+      try {
+        onFrame(JSON.parse(ev.data as string) as WSFrame)
+      } catch (e) {
+        error.value = e as Error
+      }
+    }
+    socket.onclose = () => {
+      isOpen.value = false
+      socket = null
+      if (stopped) return
+      setTimeout(connect, retryDelay)
+      retryDelay = Math.min(retryDelay * 2, opts.retryMaxMs ?? 10_000)
+    }
+  }
+
+  function start() {
+    if (!stopped) return
+    stopped = false
+    connect()
+  }
+
+  function stop() {
+    stopped = true
+    socket?.close()
+    socket = null
+    isOpen.value = false
+  }
+
+  function subscribe(threadId: string) {
+    if (threads.has(threadId)) return
+    threads.add(threadId)
+    sendSubscribe(threadId)
+  }
+
+  function unsubscribe(threadId: string) {
+    threads.delete(threadId)
+    lastIds.delete(threadId)
+    send({op: 'unsubscribe', thread_id: threadId})
+  }
+
+  function postEvent(threadId: string, event: Record<string, unknown>) {
+    send({op: 'event', ref: ++refSeq, thread_id: threadId, event})
+  }
+
+  onBeforeUnmount(() => stop())
+
+  return {isOpen, lastEvent, error, start, stop, subscribe, unsubscribe, postEvent}
+}
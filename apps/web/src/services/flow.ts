@@ -4,8 +4,14 @@ import {slugify} from '@/utils/slugify';
 
 export type {Flow};
 
-export async function fetchFlowsApi(signal?: AbortSignal): Promise<Flow[]> {
-  const {data} = await api.get<Flow[]>('/api/flows', {signal});
+export type FlowSort = 'name' | 'last_activity' | 'pipelines' | 'threads';
+
+// Served from the denormalized flow_stats table; most recently active flows first by default.
+export async function fetchFlowsApi(
+  signal?: AbortSignal,
+  params: { sort?: FlowSort; order?: 'asc' | 'desc' } = {sort: 'last_activity', order: 'desc'}
+): Promise<Flow[]> {
+  const {data} = await api.get<Flow[]>('/api/flows', {signal, params});
   return data;
 }
 
@@ -2,4 +2,10 @@ export interface Flow {
   id: string;
   name: string;
   slug?: string;
+  has_published?: boolean;
+  active_version?: string | null;
+  pipeline_count?: number;
+  thread_count?: number;
+  open_thread_count?: number;
+  last_activity_at?: string | null;
 }